@@ -6,10 +6,10 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
-from sqlalchemy import inspect, text
-from backend.routers import health, settings, entries, rollup, goals, suggestions, oauth, points, auth_routes, leaderboard_routes, dashboard, waitlist_routes, referrals, platforms, entry_types, expense_categories, feedback, subscription
-from backend.db import engine, Base
-from backend.services.background_jobs import start_background_jobs, stop_background_jobs
+from backend.routers import health, settings, entries, rollup, goals, suggestions, oauth, points, auth_routes, leaderboard_routes, dashboard, waitlist_routes, referrals, platforms, entry_types, expense_categories, feedback, subscription, diagnostics, analytics
+from backend.db import dispose_async_engine
+from backend.migrations import check_schema
+from backend.services.request_metrics import profile_requests
 import os
 import re
 import logging
@@ -26,588 +26,9 @@ logger.setLevel(logging.INFO)
 # per-route decorators in auth_routes.py tighten the sensitive endpoints.
 limiter = Limiter(key_func=get_remote_address, default_limits=["200/minute"])
 
-def _migrate_api_credentials_for_multi_user() -> None:
-    """Add `user_id` column to `api_credentials` and drop the legacy
-    `UNIQUE(platform)` constraint so multiple users can connect the same
-    upstream platform. Safe to re-run on every boot — detects schema state and
-    no-ops if already migrated. Runs BEFORE `create_all` so the table is in
-    the expected shape when SQLAlchemy reflects.
-
-    Supports Postgres (production: ALTER TABLE) and SQLite (dev: table
-    rebuild, since SQLite can't drop a UNIQUE constraint in place).
-    """
-    insp = inspect(engine)
-    is_postgres = engine.url.get_backend_name().startswith("postgres")
-
-    # Recovery from a botched prior migration that left `api_credentials_old`
-    # behind. NEVER drop `_old` unless we're sure the live `api_credentials`
-    # table is the post-migration one (has `user_id`) — otherwise `_old`
-    # could be the only copy of the real credentials and a blind drop is
-    # data loss. If both exist and the live table is pre-migration, refuse
-    # to proceed and require manual cleanup.
-    if insp.has_table("api_credentials_old") and not insp.has_table("api_credentials"):
-        with engine.begin() as conn:
-            conn.execute(text("ALTER TABLE api_credentials_old RENAME TO api_credentials"))
-        insp = inspect(engine)
-    elif insp.has_table("api_credentials_old") and insp.has_table("api_credentials"):
-        live_cols = {c["name"] for c in insp.get_columns("api_credentials")}
-        if "user_id" in live_cols:
-            # Live table is already migrated — `_old` is a stale leftover
-            # whose data was copied forward. Safe to drop.
-            with engine.begin() as conn:
-                conn.execute(text("DROP TABLE api_credentials_old"))
-            insp = inspect(engine)
-        else:
-            raise RuntimeError(
-                "Both `api_credentials` and `api_credentials_old` exist but the "
-                "live table is pre-migration. Refusing to drop `_old` blindly "
-                "(it may be the only copy of real credentials). Inspect both "
-                "tables and decide which is canonical, then drop the other "
-                "manually before restarting."
-            )
-
-    if not insp.has_table("api_credentials"):
-        return  # nothing to migrate; create_all will build the new schema
-
-    cols = {c["name"] for c in insp.get_columns("api_credentials")}
-    if "user_id" in cols:
-        return  # already migrated
-
-    if is_postgres:
-        # Postgres supports add-column + drop-constraint in place. This is the
-        # production path. Wrap in defensive try/excepts because the legacy
-        # constraint may have been auto-named differently in different envs.
-        with engine.begin() as conn:
-            conn.execute(text("ALTER TABLE api_credentials ADD COLUMN user_id VARCHAR"))
-            conn.execute(text(
-                "CREATE INDEX IF NOT EXISTS ix_api_credentials_user_id "
-                "ON api_credentials (user_id)"
-            ))
-            # Find and drop any UNIQUE constraint on `platform` alone.
-            res = conn.execute(text(
-                "SELECT conname FROM pg_constraint c "
-                "JOIN pg_class t ON c.conrelid = t.oid "
-                "WHERE t.relname = 'api_credentials' AND c.contype = 'u'"
-            ))
-            for (conname,) in res.fetchall():
-                try:
-                    conn.execute(text(f'ALTER TABLE api_credentials DROP CONSTRAINT "{conname}"'))
-                except Exception as exc:
-                    logger.warning(f"Could not drop constraint {conname}: {exc}")
-            # Fail-fast if we can't install the new composite uniqueness —
-            # silently warn-and-continue would leave the schema half-migrated
-            # AND looking complete (user_id present), so the next boot would
-            # short-circuit and the bug would stay invisible until a second
-            # user tried to connect the same platform.
-            conn.execute(text(
-                "ALTER TABLE api_credentials ADD CONSTRAINT uq_user_platform "
-                "UNIQUE (user_id, platform)"
-            ))
-        logger.warning(
-            "Migrated api_credentials to per-user schema (postgres). "
-            "Legacy rows have user_id=NULL and must be reconnected via OAuth."
-        )
-        return
-
-    # SQLite path: table rebuild via rename + recreate + copy.
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE api_credentials RENAME TO api_credentials_old"))
-    Base.metadata.tables["api_credentials"].create(bind=engine)
-    with engine.begin() as conn:
-        conn.execute(text(
-            "INSERT INTO api_credentials "
-            "(id, platform, access_token, refresh_token, token_expires_at, "
-            " is_active, created_at, updated_at) "
-            "SELECT id, platform, access_token, refresh_token, token_expires_at, "
-            "       is_active, created_at, updated_at "
-            "FROM api_credentials_old"
-        ))
-        conn.execute(text("DROP TABLE api_credentials_old"))
-    logger.warning("Migrated api_credentials to per-user schema (sqlite).")
-
-
-def _migrate_synced_orders_for_multi_user() -> None:
-    """Add `user_id` to `synced_orders` so per-user dedupe in
-    `sync_service` can filter on it. Plain ADD COLUMN works on both
-    Postgres and SQLite — no constraints to juggle here."""
-    insp = inspect(engine)
-    if not insp.has_table("synced_orders"):
-        return
-    cols = {c["name"] for c in insp.get_columns("synced_orders")}
-    if "user_id" in cols:
-        return
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE synced_orders ADD COLUMN user_id VARCHAR"))
-        conn.execute(text(
-            "CREATE INDEX IF NOT EXISTS ix_synced_orders_user_id "
-            "ON synced_orders (user_id)"
-        ))
-    logger.warning("Migrated synced_orders to per-user schema. Legacy rows have user_id=NULL.")
-
-
-def _migrate_entries_add_idempotency_key() -> None:
-    """Add nullable `idempotency_key` to `entries` so `create_entry` can
-    de-duplicate replayed offline adds — a create carrying a key already saved
-    returns the original row instead of inserting a duplicate. Plain ADD COLUMN
-    works on both Postgres and SQLite; the partial UNIQUE index guards against
-    replay races while still permitting unlimited NULL-key rows (legacy rows and
-    online creates that omit the key). Safe to re-run; no-ops once migrated."""
-    insp = inspect(engine)
-    if not insp.has_table("entries"):
-        return
-    cols = {c["name"] for c in insp.get_columns("entries")}
-    if "idempotency_key" in cols:
-        return
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE entries ADD COLUMN idempotency_key VARCHAR"))
-        # Partial unique index (supported by both Postgres and SQLite >= 3.8):
-        # uniqueness only applies to non-NULL keys, so many NULL-key rows coexist.
-        conn.execute(text(
-            "CREATE UNIQUE INDEX IF NOT EXISTS uq_entries_user_idempotency "
-            "ON entries (user_id, idempotency_key) "
-            "WHERE idempotency_key IS NOT NULL"
-        ))
-    logger.warning("Added entries.idempotency_key for create de-duplication.")
-
-
-def _migrate_entries_add_custom_app() -> None:
-    """Add nullable `custom_app` to `entries` for user-created platforms.
-    Entries logged against a custom platform keep app=OTHER (the enum column is
-    untouched) and carry the display name here. Plain ADD COLUMN works on both
-    Postgres and SQLite; safe to re-run — no-ops once the column exists."""
-    insp = inspect(engine)
-    if not insp.has_table("entries"):
-        return
-    cols = {c["name"] for c in insp.get_columns("entries")}
-    if "custom_app" in cols:
-        return
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE entries ADD COLUMN custom_app VARCHAR"))
-    logger.warning("Added entries.custom_app for user-created platforms.")
-
-
-def _migrate_entries_add_custom_type() -> None:
-    """Add nullable `custom_type` to `entries` for user-created earnings types.
-    Entries logged against a custom type keep a BASE enum type (BONUS/EXPENSE)
-    and carry the display name here. Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("entries"):
-        return
-    cols = {c["name"] for c in insp.get_columns("entries")}
-    if "custom_type" in cols:
-        return
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE entries ADD COLUMN custom_type VARCHAR"))
-    logger.warning("Added entries.custom_type for user-created earnings types.")
-
-
-def _migrate_entries_add_custom_category() -> None:
-    """Add nullable `custom_category` to `entries` for user-created expense
-    categories. Entries filed under one keep enum category=OTHER and carry the
-    display name here. Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("entries"):
-        return
-    cols = {c["name"] for c in insp.get_columns("entries")}
-    if "custom_category" in cols:
-        return
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE entries ADD COLUMN custom_category VARCHAR"))
-    logger.warning("Added entries.custom_category for user-created expense categories.")
-
-
-def _migrate_user_expense_categories_ci_unique() -> None:
-    """Case-insensitive per-user uniqueness for custom expense categories, same
-    scheme as user_platforms (functional unique index). Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("user_expense_categories"):
-        return
-    with engine.begin() as conn:
-        conn.execute(text(
-            "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_expense_categories_user_lname "
-            "ON user_expense_categories (user_id, lower(name))"
-        ))
-
-
-def _migrate_user_entry_types_ci_unique() -> None:
-    """Case-insensitive per-user uniqueness for custom entry types, same scheme
-    as user_platforms (functional unique index). Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("user_entry_types"):
-        return
-    with engine.begin() as conn:
-        conn.execute(text(
-            "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_entry_types_user_lname "
-            "ON user_entry_types (user_id, lower(name))"
-        ))
-
-
-def _migrate_user_platforms_ci_unique() -> None:
-    """Enforce case-insensitive per-user uniqueness for custom platforms at the
-    DB level: a functional unique index on (user_id, lower(name)). Without it,
-    two concurrent creates like 'Roadie' and 'roadie' could both commit past
-    the route's pre-insert check. Works on both Postgres and SQLite (both
-    support expression indexes with IF NOT EXISTS); safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("user_platforms"):
-        return
-    with engine.begin() as conn:
-        conn.execute(text(
-            "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_platforms_user_lname "
-            "ON user_platforms (user_id, lower(name))"
-        ))
-
-
-def _migrate_user_platforms_add_color_icon() -> None:
-    """Add nullable `color` (hex '#rrggbb') and `icon` (short emoji) columns to
-    `user_platforms` so users can pick an identifying color/icon for a custom
-    earnings type. NULL means "auto" (client derives a stable color from the
-    name). Plain ADD COLUMN works on both Postgres and SQLite; safe to
-    re-run — no-ops once the columns exist."""
-    insp = inspect(engine)
-    if not insp.has_table("user_platforms"):
-        return
-    cols = {c["name"] for c in insp.get_columns("user_platforms")}
-    with engine.begin() as conn:
-        if "color" not in cols:
-            conn.execute(text("ALTER TABLE user_platforms ADD COLUMN color VARCHAR"))
-        if "icon" not in cols:
-            conn.execute(text("ALTER TABLE user_platforms ADD COLUMN icon VARCHAR"))
-    if "color" not in cols or "icon" not in cols:
-        logger.warning("Added user_platforms.color/icon for custom platform styling.")
-
-
-def _migrate_points_for_multi_user() -> None:
-    """Scope the gamification tables to authenticated users.
-
-    `users` (points singleton): add nullable `auth_user_id` column + unique
-    index so each AuthUser gets their own points row instead of sharing id=1.
-
-    `daily_usage` (check-in log): add nullable `auth_user_id` column and
-    replace the global UNIQUE(usage_date) constraint with a per-user composite
-    UNIQUE(auth_user_id, usage_date) so two users can check in on the same day.
-
-    Safe to re-run on every boot — short-circuits once both columns exist.
-    Supports Postgres (production) and SQLite (dev).
-    """
-    insp = inspect(engine)
-    is_postgres = engine.url.get_backend_name().startswith("postgres")
-
-    # --- users table ---
-    if insp.has_table("users"):
-        users_cols = {c["name"] for c in insp.get_columns("users")}
-        if "auth_user_id" not in users_cols:
-            with engine.begin() as conn:
-                conn.execute(text("ALTER TABLE users ADD COLUMN auth_user_id VARCHAR"))
-                conn.execute(text(
-                    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_auth_user_id "
-                    "ON users (auth_user_id) WHERE auth_user_id IS NOT NULL"
-                ))
-            logger.warning("Migrated users table: added auth_user_id for per-user points.")
-
-    # --- daily_usage table ---
-    if insp.has_table("daily_usage"):
-        du_cols = {c["name"] for c in insp.get_columns("daily_usage")}
-        if "auth_user_id" not in du_cols:
-            if is_postgres:
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE daily_usage ADD COLUMN auth_user_id VARCHAR"))
-                    conn.execute(text(
-                        "CREATE INDEX IF NOT EXISTS ix_daily_usage_auth_user_id "
-                        "ON daily_usage (auth_user_id)"
-                    ))
-                    # Drop the old global UNIQUE constraint on usage_date alone.
-                    res = conn.execute(text(
-                        "SELECT conname FROM pg_constraint c "
-                        "JOIN pg_class t ON c.conrelid = t.oid "
-                        "WHERE t.relname = 'daily_usage' AND c.contype IN ('u')"
-                    ))
-                    for (conname,) in res.fetchall():
-                        try:
-                            conn.execute(text(
-                                f'ALTER TABLE daily_usage DROP CONSTRAINT "{conname}"'
-                            ))
-                        except Exception as exc:
-                            logger.warning(f"Could not drop daily_usage constraint {conname}: {exc}")
-                    conn.execute(text(
-                        "CREATE UNIQUE INDEX IF NOT EXISTS uq_daily_usage_user_date "
-                        "ON daily_usage (auth_user_id, usage_date) "
-                        "WHERE auth_user_id IS NOT NULL"
-                    ))
-            else:
-                # SQLite: table rebuild to drop the old UNIQUE index on usage_date.
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE daily_usage RENAME TO daily_usage_old"))
-                Base.metadata.tables["daily_usage"].create(bind=engine)
-                with engine.begin() as conn:
-                    conn.execute(text(
-                        "INSERT INTO daily_usage "
-                        "(id, auth_user_id, usage_date, points_earned, created_at) "
-                        "SELECT id, NULL, usage_date, points_earned, created_at "
-                        "FROM daily_usage_old"
-                    ))
-                    conn.execute(text("DROP TABLE daily_usage_old"))
-            logger.warning("Migrated daily_usage table: added auth_user_id for per-user check-ins.")
-
-
-def _migrate_auth_users_add_referral_code() -> None:
-    """Add nullable `referral_code` to `auth_users` for the referral program.
-    Plain ADD COLUMN works on both Postgres and SQLite; the unique index is
-    created separately and tolerates NULLs (many legacy rows have no code yet).
-    Safe to re-run; no-ops once the column exists."""
-    insp = inspect(engine)
-    if not insp.has_table("auth_users"):
-        return
-    cols = {c["name"] for c in insp.get_columns("auth_users")}
-    if "referral_code" in cols:
-        return
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE auth_users ADD COLUMN referral_code VARCHAR"))
-        conn.execute(text(
-            "CREATE UNIQUE INDEX IF NOT EXISTS ix_auth_users_referral_code "
-            "ON auth_users (referral_code) WHERE referral_code IS NOT NULL"
-        ))
-    logger.warning("Added auth_users.referral_code for the referral program.")
-
-
-def _migrate_auth_users_add_mfa() -> None:
-    """Add opt-in email-2FA columns to `auth_users`. All additive ADD COLUMNs
-    (safe on both Postgres and SQLite); booleans/integers get a server default
-    so existing rows backfill to "MFA off, 0 attempts". Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("auth_users"):
-        return
-    cols = {c["name"] for c in insp.get_columns("auth_users")}
-    is_pg = engine.dialect.name == "postgresql"
-    false_default = "FALSE" if is_pg else "0"
-    with engine.begin() as conn:
-        if "mfa_enabled" not in cols:
-            conn.execute(text(
-                f"ALTER TABLE auth_users ADD COLUMN mfa_enabled BOOLEAN NOT NULL DEFAULT {false_default}"
-            ))
-        if "mfa_code_hash" not in cols:
-            conn.execute(text("ALTER TABLE auth_users ADD COLUMN mfa_code_hash VARCHAR"))
-        if "mfa_code_expires_at" not in cols:
-            conn.execute(text("ALTER TABLE auth_users ADD COLUMN mfa_code_expires_at VARCHAR"))
-        if "mfa_code_attempts" not in cols:
-            conn.execute(text(
-                "ALTER TABLE auth_users ADD COLUMN mfa_code_attempts INTEGER NOT NULL DEFAULT 0"
-            ))
-    logger.warning("Ensured auth_users MFA columns exist (email two-factor auth).")
-
-
-def _migrate_auth_users_add_email_verification() -> None:
-    """Add email-confirmation columns to `auth_users`. All additive ADD COLUMNs
-    (safe on Postgres + SQLite). CRITICAL: the one-time backfill that marks
-    existing rows verified runs ONLY when the column is first created — re-running
-    it on every boot would silently re-verify legitimately-unverified new signups.
-    Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("auth_users"):
-        return
-    cols = {c["name"] for c in insp.get_columns("auth_users")}
-    is_pg = engine.dialect.name == "postgresql"
-    false_default = "FALSE" if is_pg else "0"
-    true_value = "TRUE" if is_pg else "1"
-    with engine.begin() as conn:
-        if "email_verified" not in cols:
-            conn.execute(text(
-                f"ALTER TABLE auth_users ADD COLUMN email_verified BOOLEAN NOT NULL DEFAULT {false_default}"
-            ))
-            # Grandfather every pre-existing account (incl. demo) as verified so
-            # the nudge only ever targets accounts created after this feature.
-            conn.execute(text(f"UPDATE auth_users SET email_verified = {true_value}"))
-        if "email_verification_code_hash" not in cols:
-            conn.execute(text("ALTER TABLE auth_users ADD COLUMN email_verification_code_hash VARCHAR"))
-        if "email_verification_expires_at" not in cols:
-            conn.execute(text("ALTER TABLE auth_users ADD COLUMN email_verification_expires_at VARCHAR"))
-        if "email_verification_attempts" not in cols:
-            conn.execute(text(
-                "ALTER TABLE auth_users ADD COLUMN email_verification_attempts INTEGER NOT NULL DEFAULT 0"
-            ))
-    logger.warning("Ensured auth_users email-verification columns exist.")
-
-
-def _migrate_auth_users_add_onboarding() -> None:
-    """Add `onboarding_completed` to `auth_users` for the conversion onboarding
-    funnel. CRITICAL: the one-time backfill that grandfathers existing rows as
-    completed runs ONLY when the column is first created — re-running it on
-    every boot would silently skip onboarding for legitimately-new signups.
-    Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("auth_users"):
-        return
-    cols = {c["name"] for c in insp.get_columns("auth_users")}
-    if "onboarding_completed" in cols:
-        return
-    is_pg = engine.dialect.name == "postgresql"
-    false_default = "FALSE" if is_pg else "0"
-    true_value = "TRUE" if is_pg else "1"
-    with engine.begin() as conn:
-        conn.execute(text(
-            f"ALTER TABLE auth_users ADD COLUMN onboarding_completed BOOLEAN NOT NULL DEFAULT {false_default}"
-        ))
-        # Grandfather every pre-existing account (incl. demo) so ONLY accounts
-        # created after this feature ever see the onboarding flow.
-        conn.execute(text(f"UPDATE auth_users SET onboarding_completed = {true_value}"))
-    logger.warning("Added auth_users.onboarding_completed (grandfathered existing rows).")
-
-
-def _migrate_auth_users_add_walkthrough() -> None:
-    """Add `walkthrough_completed` to `auth_users` so the dashboard tutorial's
-    completion survives reinstalls (device AsyncStorage alone gets wiped).
-    CRITICAL: the grandfather backfill runs ONLY when the column is first
-    created — re-running it on every boot would mark new signups as done.
-    Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("auth_users"):
-        return
-    cols = {c["name"] for c in insp.get_columns("auth_users")}
-    if "walkthrough_completed" in cols:
-        return
-    is_pg = engine.dialect.name == "postgresql"
-    false_default = "FALSE" if is_pg else "0"
-    true_value = "TRUE" if is_pg else "1"
-    with engine.begin() as conn:
-        conn.execute(text(
-            f"ALTER TABLE auth_users ADD COLUMN walkthrough_completed BOOLEAN NOT NULL DEFAULT {false_default}"
-        ))
-        # Grandfather every pre-existing account so only accounts created after
-        # this feature can ever be auto-shown the tour by the server flag.
-        conn.execute(text(f"UPDATE auth_users SET walkthrough_completed = {true_value}"))
-    logger.warning("Added auth_users.walkthrough_completed (grandfathered existing rows).")
-
-
-_migrate_api_credentials_for_multi_user()
-_migrate_synced_orders_for_multi_user()
-_migrate_entries_add_idempotency_key()
-_migrate_entries_add_custom_app()
-_migrate_user_platforms_ci_unique()
-_migrate_user_platforms_add_color_icon()
-_migrate_entries_add_custom_type()
-_migrate_user_entry_types_ci_unique()
-_migrate_entries_add_custom_category()
-_migrate_user_expense_categories_ci_unique()
-_migrate_points_for_multi_user()
-_migrate_auth_users_add_referral_code()
-_migrate_auth_users_add_mfa()
-_migrate_auth_users_add_email_verification()
-_migrate_auth_users_add_onboarding()
-_migrate_auth_users_add_walkthrough()
-
-
-def _migrate_user_label_overrides_add_emoji() -> None:
-    """Add `emoji` to `user_label_overrides` (heading rows only: custom emoji
-    shown before the section title; NULL = default). Plain additive ADD COLUMN,
-    safe on both Postgres and SQLite; safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("user_label_overrides"):
-        return
-    cols = {c["name"] for c in insp.get_columns("user_label_overrides")}
-    if "emoji" in cols:
-        return
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE user_label_overrides ADD COLUMN emoji VARCHAR"))
-    logger.warning("Added user_label_overrides.emoji for heading emoji customization.")
-
-
-def _migrate_auth_users_add_password_changed_at() -> None:
-    """Security-event stamp used to revoke pre-existing JWTs on password reset /
-    email change. Nullable — existing rows keep NULL (no revocation) until their
-    first security event. Plain ADD COLUMN works on both Postgres and SQLite.
-    Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("auth_users"):
-        return
-    cols = {c["name"] for c in insp.get_columns("auth_users")}
-    if "password_changed_at" in cols:
-        return
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE auth_users ADD COLUMN password_changed_at VARCHAR"))
-    logger.warning("Added auth_users.password_changed_at.")
-
-
-_migrate_auth_users_add_password_changed_at()
-
-
-def _migrate_auth_users_add_pro_entitlement() -> None:
-    """Server-side Pro entitlement state, kept current by the RevenueCat
-    webhook and REST fallback. All additive ADD COLUMNs (safe on Postgres +
-    SQLite); the boolean gets a FALSE default so every existing row starts
-    non-Pro until a webhook/REST check says otherwise (the client remains
-    fail-open for UX; this is the server-side backstop). Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("auth_users"):
-        return
-    cols = {c["name"] for c in insp.get_columns("auth_users")}
-    is_pg = engine.dialect.name == "postgresql"
-    false_default = "FALSE" if is_pg else "0"
-    with engine.begin() as conn:
-        if "pro_entitlement_active" not in cols:
-            conn.execute(text(
-                f"ALTER TABLE auth_users ADD COLUMN pro_entitlement_active BOOLEAN NOT NULL DEFAULT {false_default}"
-            ))
-        if "pro_entitlement_expires_at" not in cols:
-            conn.execute(text("ALTER TABLE auth_users ADD COLUMN pro_entitlement_expires_at VARCHAR"))
-        if "pro_entitlement_updated_at" not in cols:
-            conn.execute(text("ALTER TABLE auth_users ADD COLUMN pro_entitlement_updated_at VARCHAR"))
-        if "pro_entitlement_source" not in cols:
-            conn.execute(text("ALTER TABLE auth_users ADD COLUMN pro_entitlement_source VARCHAR"))
-        if "pro_entitlement_event_ts_ms" not in cols:
-            conn.execute(text("ALTER TABLE auth_users ADD COLUMN pro_entitlement_event_ts_ms BIGINT"))
-    if "pro_entitlement_active" not in cols:
-        logger.warning("Ensured auth_users pro entitlement columns exist (server-side Pro state).")
-
-
-_migrate_auth_users_add_pro_entitlement()
-
-
-def _migrate_auth_users_add_timezone() -> None:
-    """Per-user IANA timezone for all day/week/month bucketing. The
-    grandfather backfill to America/New_York lives INSIDE the add-column guard
-    (never re-runs), so existing accounts keep bit-identical buckets to the
-    old fixed-EST behavior while new signups get their device zone. Plain ADD
-    COLUMN works on both Postgres and SQLite. Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("auth_users"):
-        return
-    cols = {c["name"] for c in insp.get_columns("auth_users")}
-    if "timezone" in cols:
-        return
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE auth_users ADD COLUMN timezone VARCHAR"))
-        conn.execute(text("UPDATE auth_users SET timezone = 'America/New_York' WHERE timezone IS NULL"))
-    logger.warning("Added auth_users.timezone (grandfathered to America/New_York).")
-
-
-_migrate_auth_users_add_timezone()
-
-
-def _migrate_problem_reports_add_title() -> None:
-    """Optional short issue title for bug reports (used in the notification
-    email subject). Nullable — legacy reports keep NULL. Plain ADD COLUMN
-    works on both Postgres and SQLite. Safe to re-run."""
-    insp = inspect(engine)
-    if not insp.has_table("problem_reports"):
-        return
-    cols = {c["name"] for c in insp.get_columns("problem_reports")}
-    if "title" in cols:
-        return
-    with engine.begin() as conn:
-        conn.execute(text("ALTER TABLE problem_reports ADD COLUMN title VARCHAR"))
-    logger.warning("Added problem_reports.title.")
-
-
-_migrate_problem_reports_add_title()
-
-Base.metadata.create_all(bind=engine)
-
-# The CI-unique functional index for user_entry_types must be (re)applied AFTER
-# create_all — on the boot that first introduces the table, the guarded call in
-# the migration list above no-ops because the table doesn't exist yet.
-_migrate_user_label_overrides_add_emoji()
-_migrate_user_entry_types_ci_unique()
-_migrate_user_expense_categories_ci_unique()
+# Schema upgrades run once per deploy (`python -m backend.migrations`, the
+# release step); here we only check the schema is current — one SELECT.
+check_schema()
 
 app = FastAPI(title="Delivery Driver Earnings API", docs_url=None, redoc_url=None)
 
@@ -615,22 +36,13 @@ app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.add_middleware(SlowAPIMiddleware)
 
-# Start background jobs on startup
-@app.on_event("startup")
-async def startup_event():
-    try:
-        start_background_jobs()
-        logger.info("Background jobs started successfully")
-    except Exception as e:
-        logger.error(f"Failed to start background jobs: {e}")
+# Platform order sync runs in `python -m backend.worker`, fed by the jobs
+# table (services/job_queue.py); web workers only enqueue.
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    try:
-        stop_background_jobs()
-        logger.info("Background jobs stopped successfully")
-    except Exception as e:
-        logger.error(f"Error during shutdown: {e}")
+    # Return pooled asyncpg connections to the server on worker shutdown.
+    await dispose_async_engine()
 
 # CORS — explicit allow-list. `CORS_ALLOWED_ORIGINS` is a comma-separated env
 # var of full origins (scheme + host + optional port). The defaults below
@@ -668,6 +80,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "X-Requested-With"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -700,6 +113,12 @@ async def add_security_and_cache_headers(request, call_next):
         )
     return response
 
+
+# Per-route latency and SQL statement counts (services/request_metrics.py).
+# Registered after the headers middleware so it wraps it and times the whole
+# request; aggregated at GET /api/diagnostics/metrics.
+app.middleware("http")(profile_requests)
+
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(auth_routes.router, prefix="/api", tags=["auth"])
 app.include_router(settings.router, prefix="/api", tags=["settings"])
@@ -709,6 +128,7 @@ app.include_router(platforms.router, prefix="/api", tags=["platforms"])
 app.include_router(entry_types.router, prefix="/api", tags=["entry-types"])
 app.include_router(expense_categories.router, prefix="/api", tags=["expense-categories"])
 app.include_router(rollup.router, prefix="/api", tags=["rollup"])
+app.include_router(analytics.router, prefix="/api", tags=["analytics"])
 app.include_router(goals.router, prefix="/api", tags=["goals"])
 app.include_router(suggestions.router, prefix="/api", tags=["suggestions"])
 app.include_router(oauth.router, prefix="/api", tags=["oauth"])
@@ -718,6 +138,7 @@ app.include_router(referrals.router, prefix="/api", tags=["referrals"])
 app.include_router(waitlist_routes.router, tags=["waitlist"])
 app.include_router(feedback.router, prefix="/api", tags=["feedback"])
 app.include_router(subscription.router, prefix="/api", tags=["subscription"])
+app.include_router(diagnostics.router, prefix="/api", tags=["diagnostics"])
 
 # Serve frontend static files (must be after all API routes)
 # Check multiple possible dist locations
@@ -1,9 +1,14 @@
 import os
+import threading
+import time
 import jwt
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+from itertools import chain
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
 from backend.db import get_db
 from backend.models import AuthUser
 import logging
@@ -87,6 +92,176 @@ def get_or_create_default_user(db: Session) -> AuthUser:
     return user
 
 
+# ---------------------------------------------------------------------------
+# Authenticated-principal cache
+# ---------------------------------------------------------------------------
+# Every authenticated request used to SELECT its auth_users row and re-parse
+# password_changed_at. A principal that passed those checks is cached here,
+# keyed by (sub, iat), as a snapshot of its column values; a hit merges the
+# snapshot into the request's session without touching the database, so
+# handlers still get an ordinary persistent AuthUser they can modify and
+# commit. The JWT itself is still decoded on every request, so signature,
+# expiry and MFA-token checks are unchanged.
+#
+# Revocation stays exact within a process: the Session event hooks below drop
+# a user's entries whenever an AuthUser row is flushed, committed, or bulk
+# updated/deleted (password reset, email change, timezone, entitlement
+# webhooks, account deletion, ...), and a generation counter stops a request
+# that read the row before such a write from re-caching the stale copy. A
+# write made by ANOTHER process (a second gunicorn worker, a replica, the job
+# worker) is only picked up when the entry expires: a password reset there
+# leaves the old token usable here for up to AUTH_USER_CACHE_TTL_SECONDS. So
+# the cache is off by default (0) and revocation is exact everywhere; only
+# turn it on for a single-process deployment, or where that window is an
+# accepted trade for the saved round-trip.
+
+AUTH_USER_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_USER_CACHE_TTL_SECONDS", "0"))
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_USER_CACHE_MAX_ENTRIES", "4096"))
+
+_PENDING_INVALIDATIONS = "auth_user_cache_pending"
+_INVALIDATE_ALL = object()
+
+
+class _PrincipalCache:
+    """Thread-safe bounded TTL/LRU map of (sub, iat) -> AuthUser column snapshot."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, snapshot: dict, generation: int) -> None:
+        with self._lock:
+            # A user row changed while this request was reading it: the
+            # snapshot may predate the write, so don't cache it.
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if user_ids is _INVALIDATE_ALL:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] in user_ids]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.hits = self.misses = self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+_principal_cache = _PrincipalCache(AUTH_USER_CACHE_TTL_SECONDS, AUTH_USER_CACHE_MAX_ENTRIES)
+
+
+def principal_cache_stats() -> dict:
+    """Hit/miss counters for the get_current_user cache. Each hit is one
+    auth_users round-trip saved."""
+    return _principal_cache.stats()
+
+
+def invalidate_cached_user(user_id: str) -> None:
+    """Drop every cached principal for `user_id`. ORM writes to AuthUser do
+    this automatically; call it after changing auth_users outside the ORM."""
+    _principal_cache.invalidate({str(user_id)})
+
+
+def clear_principal_cache() -> None:
+    _principal_cache.clear()
+
+
+def _snapshot(user: AuthUser) -> dict:
+    return {attr.key: getattr(user, attr.key) for attr in AuthUser.__mapper__.column_attrs}
+
+
+def _from_snapshot(db: Session, snapshot: dict) -> AuthUser:
+    user = AuthUser(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+
+def _queue_invalidation(session: Session, user_ids) -> None:
+    _principal_cache.invalidate(user_ids)
+    pending = session.info.setdefault(_PENDING_INVALIDATIONS, set())
+    if user_ids is _INVALIDATE_ALL:
+        pending.add(_INVALIDATE_ALL)
+    else:
+        pending.update(user_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_users(session, flush_context):
+    user_ids = {
+        obj.id for obj in chain(session.dirty, session.deleted)
+        if isinstance(obj, AuthUser)
+    }
+    if user_ids:
+        _queue_invalidation(session, user_ids)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_bulk_user_writes(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is AuthUser:
+        _queue_invalidation(orm_execute_state.session, _INVALIDATE_ALL)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_on_transaction_end(session):
+    # Invalidate again once the write is visible (or abandoned): a request
+    # that missed between the flush and the commit must not keep the old row.
+    pending = session.info.pop(_PENDING_INVALIDATIONS, None)
+    if pending:
+        _principal_cache.invalidate(_INVALIDATE_ALL if _INVALIDATE_ALL in pending else pending)
+
+
 def _unauthorized(detail: str = "Not authenticated") -> HTTPException:
     return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -129,6 +304,13 @@ def get_current_user(
     if not user_id:
         raise _unauthorized("Invalid token")
 
+    cache_key = (str(user_id), payload.get("iat"))
+    if _principal_cache.enabled:
+        snapshot = _principal_cache.get(cache_key)
+        if snapshot is not None:
+            return _from_snapshot(db, snapshot)
+    generation = _principal_cache.generation
+
     user = db.query(AuthUser).filter(AuthUser.id == str(user_id)).first()
     if not user:
         # Token's user no longer exists (deleted account, etc). Do NOT auto-create.
@@ -158,4 +340,6 @@ def get_current_user(
         except (ValueError, TypeError):
             pass  # malformed stamp — never lock every session out
 
+    if _principal_cache.enabled:
+        _principal_cache.put(cache_key, _snapshot(user), generation)
     return user
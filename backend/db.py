@@ -1,11 +1,20 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as SATimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from typing import TYPE_CHECKING, AsyncIterator
 import ipaddress
 import os
 import re
+import threading
+import time
 from urllib.parse import urlparse
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 # Refuse to start on a throwaway SQLite database when DATABASE_URL is missing.
@@ -94,14 +103,186 @@ if "postgresql" in DATABASE_URL:
     if _injected_sslmode:
         connect_args["sslmode"] = _injected_sslmode
 
-# Configure engine with proper connection pooling
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Test connections before using them (reconnects if closed)
-    pool_size=5 if "postgresql" in DATABASE_URL else 1,  # Smaller pools for Neon, 1 for SQLite
-    max_overflow=10 if "postgresql" in DATABASE_URL else 0,  # No overflow for SQLite
-    connect_args=connect_args
-)
+# ---------------------------------------------------------------------------
+# Connection pool profiles
+# ---------------------------------------------------------------------------
+# DB_POOL_MODE picks how each process holds Postgres connections:
+#
+#   direct  (default) — a LIFO QueuePool per process. LIFO keeps reusing the
+#           few most recently returned connections so the rest go idle and are
+#           retired by DB_POOL_RECYCLE_SECONDS, instead of pinging every
+#           checkout (pre-ping costs a round-trip per request; opt back in with
+#           DB_POOL_PRE_PING=1). Each process has two engines, sync and async
+#           (get_async_engine). DB_POOL_SIZE / DB_MAX_OVERFLOW size each of
+#           them. Or set DB_CONNECTION_BUDGET (what this app may hold on the
+#           server in total): it is split across WEB_CONCURRENCY worker
+#           processes, and each process's share is split between its two
+#           engines (DB_ASYNC_POOL_SHARE of it, default half, to the async
+#           one), so sync plus async never exceeds the share.
+#   pooler  — DATABASE_URL points at PgBouncer / the Neon pooled endpoint,
+#           which does the pooling: NullPool here, and no server-side prepared
+#           statements on asyncpg (transaction pooling can't keep them).
+#           Migrations work here too: their advisory lock is
+#           transaction-scoped (see migrations._migration_lock).
+#
+# DB_STATEMENT_TIMEOUT_MS sets a per-connection statement_timeout in direct
+# mode (the poolers reject startup options; set it on the role there).
+# Checkout counts, in-use / overflow and time spent waiting for a connection
+# are recorded per process; see pool_stats() and GET /api/diagnostics/pool.
+
+DB_POOL_MODES = ("direct", "pooler")
+
+
+def _env_int(env, name: str, default: int) -> int:
+    raw = (env.get(name) or "").strip()
+    return int(raw) if raw else default
+
+
+def pool_settings(database_url: str, env=os.environ) -> dict:
+    """Resolve the pool profile for `database_url` from the environment.
+    Pure (no engine is built) so tests and diagnostics can call it."""
+    if "postgresql" not in database_url:
+        # One file, one writer: a single pooled connection, no overflow.
+        return {"mode": "sqlite", "pool_size": 1, "max_overflow": 0, "pool_timeout": 30,
+                "pool_recycle": -1, "pool_pre_ping": False, "statement_timeout_ms": 0}
+    mode = (env.get("DB_POOL_MODE") or "direct").strip().lower()
+    if mode not in DB_POOL_MODES:
+        raise RuntimeError(f"DB_POOL_MODE must be one of {', '.join(DB_POOL_MODES)}, not {mode!r}")
+    statement_timeout_ms = _env_int(env, "DB_STATEMENT_TIMEOUT_MS", 0)
+    if mode == "pooler":
+        return {"mode": mode, "statement_timeout_ms": 0}
+
+    pool_size = _env_int(env, "DB_POOL_SIZE", 5)
+    max_overflow = _env_int(env, "DB_MAX_OVERFLOW", 10)
+    async_pool_size, async_max_overflow = pool_size, max_overflow
+    budget = _env_int(env, "DB_CONNECTION_BUDGET", 0)
+    if budget:
+        # At least one connection per engine, even when the budget is tighter.
+        per_process = max(2, budget // max(1, _env_int(env, "WEB_CONCURRENCY", 1)))
+        async_share = float((env.get("DB_ASYNC_POOL_SHARE") or "0.5").strip())
+        async_total = min(per_process - 1, max(1, round(per_process * async_share)))
+        sync_total = per_process - async_total
+        async_pool_size = min(pool_size, async_total)
+        async_max_overflow = async_total - async_pool_size
+        pool_size = min(pool_size, sync_total)
+        max_overflow = sync_total - pool_size
+    return {
+        "mode": mode,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "async_pool_size": async_pool_size,
+        "async_max_overflow": async_max_overflow,
+        "pool_timeout": _env_int(env, "DB_POOL_TIMEOUT_SECONDS", 30),
+        "pool_recycle": _env_int(env, "DB_POOL_RECYCLE_SECONDS", 300),
+        "pool_pre_ping": (env.get("DB_POOL_PRE_PING") or "").strip().lower() in ("1", "true", "yes"),
+        "statement_timeout_ms": statement_timeout_ms,
+    }
+
+
+class PoolMetrics:
+    """Per-process counters for one engine's pool. Waits are only measured
+    for queue pools (NullPool never waits; it connects every time)."""
+
+    WAIT_BUCKETS_MS = (1, 10, 100, 1000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.checkout_timeouts = 0
+        self.waits = 0               # checkouts that found no idle connection
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.wait_buckets = {b: 0 for b in self.WAIT_BUCKETS_MS}
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+            if seconds >= 0.001:
+                self.waits += 1
+            for bucket in self.WAIT_BUCKETS_MS:
+                if seconds * 1000 >= bucket:
+                    self.wait_buckets[bucket] += 1
+
+    def count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            out = {
+                "pool": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "checkout_timeouts": self.checkout_timeouts,
+                "waits": self.waits,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "waits_over_ms": {str(b): n for b, n in self.wait_buckets.items()},
+            }
+        if isinstance(pool, QueuePool):
+            out.update(size=pool.size(), checked_in=pool.checkedin(),
+                       checked_out=pool.checkedout(), overflow=max(0, pool.overflow()))
+        return out
+
+
+class _TimedCheckout:
+    """Mixin timing the blocking part of QueuePool checkout."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except SATimeoutError:
+            self.metrics.count("checkout_timeouts")
+            raise
+        finally:
+            self.metrics.record_wait(time.perf_counter() - started)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_pool(pool) -> PoolMetrics:
+    """Attach a PoolMetrics to `pool` (idempotent) and return it."""
+    if getattr(pool, "metrics", None) is None:
+        metrics = pool.metrics = PoolMetrics()
+        event.listen(pool, "checkout", lambda *_: metrics.count("checkouts"))
+        event.listen(pool, "connect", lambda *_: metrics.count("connects"))
+        event.listen(pool, "invalidate", lambda *_: metrics.count("invalidations"))
+    return pool.metrics
+
+
+def engine_pool_kwargs(settings: dict, queue_pool=InstrumentedQueuePool, prefix: str = "") -> dict:
+    """create_engine / create_async_engine pool arguments for `settings`;
+    prefix="async_" picks the async engine's share of the pool."""
+    if settings["mode"] == "pooler":
+        return {"poolclass": NullPool}
+    return {
+        "poolclass": queue_pool,
+        "pool_size": settings[prefix + "pool_size"],
+        "max_overflow": settings[prefix + "max_overflow"],
+        "pool_timeout": settings["pool_timeout"],
+        "pool_recycle": settings["pool_recycle"],
+        "pool_pre_ping": settings["pool_pre_ping"],
+        "pool_use_lifo": True,
+    }
+
+
+POOL_SETTINGS = pool_settings(DATABASE_URL)
+if POOL_SETTINGS["statement_timeout_ms"]:
+    connect_args["options"] = f"-c statement_timeout={POOL_SETTINGS['statement_timeout_ms']}"
+
+engine = create_engine(DATABASE_URL, connect_args=connect_args, **engine_pool_kwargs(POOL_SETTINGS))
+instrument_pool(engine.pool)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -113,3 +294,97 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ---------------------------------------------------------------------------
+# Async engine (asyncpg on Postgres, aiosqlite locally)
+# ---------------------------------------------------------------------------
+# `async def` routes that use the sync SessionLocal block the event loop for
+# every round-trip. Hot read routes take `get_async_db` instead; code shared
+# with the sync routes (calculate_rollup, ...) runs unchanged through
+# `await db.run_sync(fn, ...)`. The engine is created on first use so the
+# async drivers stay optional for scripts and sync-only tooling.
+
+# libpq-only query parameters asyncpg rejects; sslmode is translated below.
+_LIBPQ_ONLY_PARAMS = {"sslmode", "channel_binding", "connect_timeout", "target_session_attrs"}
+
+
+def async_database_url(url: str, allow_insecure: bool = False):
+    """Map a sync DATABASE_URL to its async-driver form. Returns (url,
+    connect_args) with the same TLS guarantees resolve_postgres_sslmode
+    enforces for the sync engine."""
+    parsed = make_url(url)
+    if parsed.drivername.startswith("sqlite"):
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False), {}
+    if not parsed.drivername.startswith("postgres"):
+        raise RuntimeError(f"No async driver configured for {parsed.drivername!r} URLs")
+
+    sslmode = resolve_postgres_sslmode(url, allow_insecure) or parsed.query.get("sslmode")
+    connect_args = {"timeout": 10}
+    if sslmode:
+        connect_args["ssl"] = sslmode
+    parsed = parsed.difference_update_query(_LIBPQ_ONLY_PARAMS).set(drivername="postgresql+asyncpg")
+    return parsed.render_as_string(hide_password=False), connect_args
+
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_engine():
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        _allow_insecure_async = os.getenv("ALLOW_INSECURE_DB", "").strip().lower() in ("1", "true", "yes")
+        async_url, async_connect_args = async_database_url(DATABASE_URL, _allow_insecure_async)
+        # Same pool profile as the sync engine on Postgres, with the async
+        # share of the connection budget; aiosqlite keeps its default pool,
+        # which takes no sizing arguments.
+        pool_kwargs = {}
+        if "postgresql" in DATABASE_URL:
+            pool_kwargs = engine_pool_kwargs(POOL_SETTINGS, InstrumentedAsyncQueuePool, prefix="async_")
+            if POOL_SETTINGS["mode"] == "pooler":
+                # PgBouncer transaction pooling can't keep server-side
+                # prepared statements across transactions.
+                async_connect_args["statement_cache_size"] = 0
+                async_url = make_url(async_url).update_query_dict(
+                    {"prepared_statement_cache_size": "0"}).render_as_string(hide_password=False)
+            elif POOL_SETTINGS["statement_timeout_ms"]:
+                async_connect_args["server_settings"] = {
+                    "statement_timeout": str(POOL_SETTINGS["statement_timeout_ms"])}
+        _async_engine = create_async_engine(
+            async_url,
+            connect_args=async_connect_args,
+            **pool_kwargs,
+        )
+        instrument_pool(_async_engine.sync_engine.pool)
+        # expire_on_commit=False: an expired attribute would need implicit IO
+        # on access, which AsyncSession can't do outside an await.
+        _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _async_sessionmaker
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_sessionmaker = None
+
+
+async def get_async_db() -> AsyncIterator["AsyncSession"]:
+    get_async_engine()
+    async with _async_sessionmaker() as db:
+        yield db
+
+
+def pool_stats() -> dict:
+    """This process's pool profile and live counters for both engines (the
+    async one is None until first used)."""
+    async_pool = _async_engine.sync_engine.pool if _async_engine is not None else None
+    return {
+        "pid": os.getpid(),
+        "settings": POOL_SETTINGS,
+        "sync": instrument_pool(engine.pool).snapshot(engine.pool),
+        "async": instrument_pool(async_pool).snapshot(async_pool) if async_pool is not None else None,
+    }
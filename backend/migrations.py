@@ -0,0 +1,1016 @@
+"""Versioned schema migrations.
+
+Every boot used to run ~20 `_migrate_*` functions, each introspecting the live
+catalog, plus `create_all` — dozens of round-trips per worker per cold start.
+Steps are now registered once, in order, in MIGRATIONS; the database records
+each step it has run in `schema_migrations`, one row per version. A run
+reads those rows, and only when a step is missing takes a cross-process lock
+(see _migration_lock) and applies the missing steps, recording each. Runs
+happen once per deploy, as a release step; the app and worker only check
+(see check_schema).
+
+The steps are the historical boot migrations and stay idempotent (they still
+check the schema before changing it), so a database that predates the
+tracking simply runs them all once. A guarded step that declines to run (see
+run_migrations) is recorded as deferred: later steps are still recorded as
+applied, and the next run retries just that one. To change the schema: write
+a new guarded `_migrate_*` function and append it to MIGRATIONS with the next
+version number — a new table is `create_tables` appended again. Never
+renumber or reorder existing entries.
+
+    python -m backend.migrations            # apply pending steps
+    python -m backend.migrations --status   # applied / deferred / pending steps
+    python -m backend.migrations --rerun entries_order_id_unique
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+from backend.db import engine, Base
+import backend.models  # noqa: F401 — registers every table on Base.metadata
+import argparse
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+def _migrate_api_credentials_for_multi_user() -> None:
+    """Add `user_id` column to `api_credentials` and drop the legacy
+    `UNIQUE(platform)` constraint so multiple users can connect the same
+    upstream platform. Safe to re-run on every boot — detects schema state and
+    no-ops if already migrated. Runs BEFORE `create_all` so the table is in
+    the expected shape when SQLAlchemy reflects.
+
+    Supports Postgres (production: ALTER TABLE) and SQLite (dev: table
+    rebuild, since SQLite can't drop a UNIQUE constraint in place).
+    """
+    insp = inspect(engine)
+    is_postgres = engine.url.get_backend_name().startswith("postgres")
+
+    # Recovery from a botched prior migration that left `api_credentials_old`
+    # behind. NEVER drop `_old` unless we're sure the live `api_credentials`
+    # table is the post-migration one (has `user_id`) — otherwise `_old`
+    # could be the only copy of the real credentials and a blind drop is
+    # data loss. If both exist and the live table is pre-migration, refuse
+    # to proceed and require manual cleanup.
+    if insp.has_table("api_credentials_old") and not insp.has_table("api_credentials"):
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE api_credentials_old RENAME TO api_credentials"))
+        insp = inspect(engine)
+    elif insp.has_table("api_credentials_old") and insp.has_table("api_credentials"):
+        live_cols = {c["name"] for c in insp.get_columns("api_credentials")}
+        if "user_id" in live_cols:
+            # Live table is already migrated — `_old` is a stale leftover
+            # whose data was copied forward. Safe to drop.
+            with engine.begin() as conn:
+                conn.execute(text("DROP TABLE api_credentials_old"))
+            insp = inspect(engine)
+        else:
+            raise RuntimeError(
+                "Both `api_credentials` and `api_credentials_old` exist but the "
+                "live table is pre-migration. Refusing to drop `_old` blindly "
+                "(it may be the only copy of real credentials). Inspect both "
+                "tables and decide which is canonical, then drop the other "
+                "manually before restarting."
+            )
+
+    if not insp.has_table("api_credentials"):
+        return  # nothing to migrate; create_all will build the new schema
+
+    cols = {c["name"] for c in insp.get_columns("api_credentials")}
+    if "user_id" in cols:
+        return  # already migrated
+
+    if is_postgres:
+        # Postgres supports add-column + drop-constraint in place. This is the
+        # production path. Wrap in defensive try/excepts because the legacy
+        # constraint may have been auto-named differently in different envs.
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE api_credentials ADD COLUMN user_id VARCHAR"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_api_credentials_user_id "
+                "ON api_credentials (user_id)"
+            ))
+            # Find and drop any UNIQUE constraint on `platform` alone.
+            res = conn.execute(text(
+                "SELECT conname FROM pg_constraint c "
+                "JOIN pg_class t ON c.conrelid = t.oid "
+                "WHERE t.relname = 'api_credentials' AND c.contype = 'u'"
+            ))
+            for (conname,) in res.fetchall():
+                try:
+                    conn.execute(text(f'ALTER TABLE api_credentials DROP CONSTRAINT "{conname}"'))
+                except Exception as exc:
+                    logger.warning(f"Could not drop constraint {conname}: {exc}")
+            # Fail-fast if we can't install the new composite uniqueness —
+            # silently warn-and-continue would leave the schema half-migrated
+            # AND looking complete (user_id present), so the next boot would
+            # short-circuit and the bug would stay invisible until a second
+            # user tried to connect the same platform.
+            conn.execute(text(
+                "ALTER TABLE api_credentials ADD CONSTRAINT uq_user_platform "
+                "UNIQUE (user_id, platform)"
+            ))
+        logger.warning(
+            "Migrated api_credentials to per-user schema (postgres). "
+            "Legacy rows have user_id=NULL and must be reconnected via OAuth."
+        )
+        return
+
+    # SQLite path: table rebuild via rename + recreate + copy.
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE api_credentials RENAME TO api_credentials_old"))
+    Base.metadata.tables["api_credentials"].create(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO api_credentials "
+            "(id, platform, access_token, refresh_token, token_expires_at, "
+            " is_active, created_at, updated_at) "
+            "SELECT id, platform, access_token, refresh_token, token_expires_at, "
+            "       is_active, created_at, updated_at "
+            "FROM api_credentials_old"
+        ))
+        conn.execute(text("DROP TABLE api_credentials_old"))
+    logger.warning("Migrated api_credentials to per-user schema (sqlite).")
+
+
+def _migrate_synced_orders_for_multi_user() -> None:
+    """Add `user_id` to `synced_orders` so per-user dedupe in
+    `sync_service` can filter on it. Plain ADD COLUMN works on both
+    Postgres and SQLite — no constraints to juggle here."""
+    insp = inspect(engine)
+    if not insp.has_table("synced_orders"):
+        return
+    cols = {c["name"] for c in insp.get_columns("synced_orders")}
+    if "user_id" in cols:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE synced_orders ADD COLUMN user_id VARCHAR"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_synced_orders_user_id "
+            "ON synced_orders (user_id)"
+        ))
+    logger.warning("Migrated synced_orders to per-user schema. Legacy rows have user_id=NULL.")
+
+
+def _migrate_entries_add_idempotency_key() -> None:
+    """Add nullable `idempotency_key` to `entries` so `create_entry` can
+    de-duplicate replayed offline adds — a create carrying a key already saved
+    returns the original row instead of inserting a duplicate. Plain ADD COLUMN
+    works on both Postgres and SQLite; the partial UNIQUE index guards against
+    replay races while still permitting unlimited NULL-key rows (legacy rows and
+    online creates that omit the key). Safe to re-run; no-ops once migrated."""
+    insp = inspect(engine)
+    if not insp.has_table("entries"):
+        return
+    cols = {c["name"] for c in insp.get_columns("entries")}
+    if "idempotency_key" in cols:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE entries ADD COLUMN idempotency_key VARCHAR"))
+        # Partial unique index (supported by both Postgres and SQLite >= 3.8):
+        # uniqueness only applies to non-NULL keys, so many NULL-key rows coexist.
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_entries_user_idempotency "
+            "ON entries (user_id, idempotency_key) "
+            "WHERE idempotency_key IS NOT NULL"
+        ))
+    logger.warning("Added entries.idempotency_key for create de-duplication.")
+
+
+def _migrate_entries_add_custom_app() -> None:
+    """Add nullable `custom_app` to `entries` for user-created platforms.
+    Entries logged against a custom platform keep app=OTHER (the enum column is
+    untouched) and carry the display name here. Plain ADD COLUMN works on both
+    Postgres and SQLite; safe to re-run — no-ops once the column exists."""
+    insp = inspect(engine)
+    if not insp.has_table("entries"):
+        return
+    cols = {c["name"] for c in insp.get_columns("entries")}
+    if "custom_app" in cols:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE entries ADD COLUMN custom_app VARCHAR"))
+    logger.warning("Added entries.custom_app for user-created platforms.")
+
+
+def _migrate_entries_add_custom_type() -> None:
+    """Add nullable `custom_type` to `entries` for user-created earnings types.
+    Entries logged against a custom type keep a BASE enum type (BONUS/EXPENSE)
+    and carry the display name here. Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("entries"):
+        return
+    cols = {c["name"] for c in insp.get_columns("entries")}
+    if "custom_type" in cols:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE entries ADD COLUMN custom_type VARCHAR"))
+    logger.warning("Added entries.custom_type for user-created earnings types.")
+
+
+def _migrate_entries_add_custom_category() -> None:
+    """Add nullable `custom_category` to `entries` for user-created expense
+    categories. Entries filed under one keep enum category=OTHER and carry the
+    display name here. Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("entries"):
+        return
+    cols = {c["name"] for c in insp.get_columns("entries")}
+    if "custom_category" in cols:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE entries ADD COLUMN custom_category VARCHAR"))
+    logger.warning("Added entries.custom_category for user-created expense categories.")
+
+
+def _migrate_entries_add_user_timestamp_index() -> bool:
+    """Composite (user_id, timestamp DESC, id DESC) index for the per-user
+    date-range scans every dashboard read does (see ix_entries_user_timestamp_id
+    in models.py). On Postgres it INCLUDEs the aggregate columns and is built
+    CONCURRENTLY so a large `entries` table stays writable during the build;
+    that can't run inside a transaction, hence the AUTOCOMMIT connection. A
+    failed concurrent build leaves an INVALID index behind, which IF NOT EXISTS
+    would then skip forever — so that case is logged loudly and the step
+    reports itself deferred (returns False) rather than applied. Safe to
+    re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("entries"):
+        return True
+    if any(ix["name"] == "ix_entries_user_timestamp_id" for ix in insp.get_indexes("entries")):
+        if engine.dialect.name == "postgresql":
+            with engine.connect() as conn:
+                valid = conn.execute(text(
+                    "SELECT i.indisvalid FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = 'ix_entries_user_timestamp_id'"
+                )).scalar()
+            if valid is False:
+                logger.error(
+                    "ix_entries_user_timestamp_id is INVALID (interrupted concurrent build). "
+                    "Run: DROP INDEX CONCURRENTLY ix_entries_user_timestamp_id; then "
+                    "python -m backend.migrations --rerun entries_add_user_timestamp_index"
+                )
+                return False
+        return True
+    if engine.dialect.name == "postgresql":
+        from backend.models import ENTRY_RANGE_INDEX_INCLUDE
+        ddl = (
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_entries_user_timestamp_id "
+            "ON entries (user_id, timestamp DESC, id DESC) "
+            f"INCLUDE ({', '.join(ENTRY_RANGE_INDEX_INCLUDE)})"
+        )
+        try:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(ddl))
+        except Exception as e:
+            # Another worker booting at the same time may be building it.
+            logger.warning(f"Could not create ix_entries_user_timestamp_id: {e}")
+            return False
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_entries_user_timestamp_id "
+                "ON entries (user_id, timestamp DESC, id DESC)"
+            ))
+    logger.warning("Added ix_entries_user_timestamp_id for per-user entry range scans.")
+    return True
+
+
+def _migrate_entries_order_id_unique() -> bool:
+    """Partial unique index on (user_id, order_id) for non-empty order ids —
+    the dedup key bulk import relies on (see services/entry_import.py). Rows
+    saved before import deduped may already collide; deleting or rewriting
+    user data at boot isn't safe, so that case is logged with the query to
+    find them and the step is deferred until they're resolved (import still
+    works meanwhile, checking existing order ids per chunk). Built
+    CONCURRENTLY on Postgres, like ix_entries_user_timestamp_id. Safe to
+    re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("entries"):
+        return True
+    if any(ix["name"] == "uq_entries_user_order_id" for ix in insp.get_indexes("entries")):
+        return True
+    with engine.connect() as conn:
+        collision = conn.execute(text(
+            "SELECT 1 FROM entries WHERE order_id IS NOT NULL AND order_id <> '' "
+            "GROUP BY user_id, order_id HAVING COUNT(*) > 1 LIMIT 1"
+        )).first()
+    if collision:
+        logger.error(
+            "Not creating uq_entries_user_order_id: some users have duplicate order ids. Find them with "
+            "SELECT user_id, order_id, COUNT(*) FROM entries WHERE order_id <> '' "
+            "GROUP BY user_id, order_id HAVING COUNT(*) > 1; then "
+            "python -m backend.migrations --rerun entries_order_id_unique"
+        )
+        return False
+    ddl = (
+        "CREATE UNIQUE INDEX {concurrently}IF NOT EXISTS uq_entries_user_order_id "
+        "ON entries (user_id, order_id) WHERE order_id IS NOT NULL AND order_id <> ''"
+    )
+    if engine.dialect.name == "postgresql":
+        try:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(ddl.format(concurrently="CONCURRENTLY ")))
+        except Exception as e:
+            logger.warning(f"Could not create uq_entries_user_order_id: {e}")
+            return False
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(ddl.format(concurrently="")))
+    logger.warning("Added uq_entries_user_order_id for bulk-import dedup.")
+    return True
+
+
+def _migrate_synced_orders_user_order_unique() -> bool:
+    """Unique index on synced_orders (user_id, platform, platform_order_id) —
+    what batched sync dedups against so overlapping runs can't double-import
+    (see services/sync_service.py). Same policy as entries_order_id_unique:
+    existing duplicates are logged with the query to find them and the step
+    is deferred; built CONCURRENTLY on Postgres. Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("synced_orders"):
+        return True
+    if any(ix["name"] == "uq_synced_orders_user_platform_order" for ix in insp.get_indexes("synced_orders")):
+        return True
+    with engine.connect() as conn:
+        collision = conn.execute(text(
+            "SELECT 1 FROM synced_orders WHERE user_id IS NOT NULL "
+            "GROUP BY user_id, platform, platform_order_id HAVING COUNT(*) > 1 LIMIT 1"
+        )).first()
+    if collision:
+        logger.error(
+            "Not creating uq_synced_orders_user_platform_order: some orders were synced twice. Find them with "
+            "SELECT user_id, platform, platform_order_id, COUNT(*) FROM synced_orders "
+            "GROUP BY user_id, platform, platform_order_id HAVING COUNT(*) > 1; then "
+            "python -m backend.migrations --rerun synced_orders_user_order_unique"
+        )
+        return False
+    ddl = (
+        "CREATE UNIQUE INDEX {concurrently}IF NOT EXISTS uq_synced_orders_user_platform_order "
+        "ON synced_orders (user_id, platform, platform_order_id)"
+    )
+    if engine.dialect.name == "postgresql":
+        try:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.execute(text(ddl.format(concurrently="CONCURRENTLY ")))
+        except Exception as e:
+            logger.warning(f"Could not create uq_synced_orders_user_platform_order: {e}")
+            return False
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(ddl.format(concurrently="")))
+    logger.warning("Added uq_synced_orders_user_platform_order for sync dedup.")
+    return True
+
+
+def _migrate_api_credentials_add_sync_cursor() -> None:
+    """Per-credential sync watermark (`sync_cursor_at`) and last full
+    reconciliation (`last_full_sync_at`). Both start NULL, so every existing
+    credential's first run after deploy is a full-window sync. Plain ADD
+    COLUMN works on both Postgres and SQLite. Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("api_credentials"):
+        return
+    cols = {c["name"] for c in insp.get_columns("api_credentials")}
+    with engine.begin() as conn:
+        if "sync_cursor_at" not in cols:
+            conn.execute(text("ALTER TABLE api_credentials ADD COLUMN sync_cursor_at TIMESTAMP"))
+        if "last_full_sync_at" not in cols:
+            conn.execute(text("ALTER TABLE api_credentials ADD COLUMN last_full_sync_at TIMESTAMP"))
+    if not {"sync_cursor_at", "last_full_sync_at"} <= cols:
+        logger.warning("Added api_credentials.sync_cursor_at / last_full_sync_at.")
+
+def _migrate_user_expense_categories_ci_unique() -> None:
+    """Case-insensitive per-user uniqueness for custom expense categories, same
+    scheme as user_platforms (functional unique index). Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("user_expense_categories"):
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_expense_categories_user_lname "
+            "ON user_expense_categories (user_id, lower(name))"
+        ))
+
+
+def _migrate_user_entry_types_ci_unique() -> None:
+    """Case-insensitive per-user uniqueness for custom entry types, same scheme
+    as user_platforms (functional unique index). Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("user_entry_types"):
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_entry_types_user_lname "
+            "ON user_entry_types (user_id, lower(name))"
+        ))
+
+
+def _migrate_user_platforms_ci_unique() -> None:
+    """Enforce case-insensitive per-user uniqueness for custom platforms at the
+    DB level: a functional unique index on (user_id, lower(name)). Without it,
+    two concurrent creates like 'Roadie' and 'roadie' could both commit past
+    the route's pre-insert check. Works on both Postgres and SQLite (both
+    support expression indexes with IF NOT EXISTS); safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("user_platforms"):
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_user_platforms_user_lname "
+            "ON user_platforms (user_id, lower(name))"
+        ))
+
+
+def _migrate_user_platforms_add_color_icon() -> None:
+    """Add nullable `color` (hex '#rrggbb') and `icon` (short emoji) columns to
+    `user_platforms` so users can pick an identifying color/icon for a custom
+    earnings type. NULL means "auto" (client derives a stable color from the
+    name). Plain ADD COLUMN works on both Postgres and SQLite; safe to
+    re-run — no-ops once the columns exist."""
+    insp = inspect(engine)
+    if not insp.has_table("user_platforms"):
+        return
+    cols = {c["name"] for c in insp.get_columns("user_platforms")}
+    with engine.begin() as conn:
+        if "color" not in cols:
+            conn.execute(text("ALTER TABLE user_platforms ADD COLUMN color VARCHAR"))
+        if "icon" not in cols:
+            conn.execute(text("ALTER TABLE user_platforms ADD COLUMN icon VARCHAR"))
+    if "color" not in cols or "icon" not in cols:
+        logger.warning("Added user_platforms.color/icon for custom platform styling.")
+
+
+def _migrate_points_for_multi_user() -> None:
+    """Scope the gamification tables to authenticated users.
+
+    `users` (points singleton): add nullable `auth_user_id` column + unique
+    index so each AuthUser gets their own points row instead of sharing id=1.
+
+    `daily_usage` (check-in log): add nullable `auth_user_id` column and
+    replace the global UNIQUE(usage_date) constraint with a per-user composite
+    UNIQUE(auth_user_id, usage_date) so two users can check in on the same day.
+
+    Safe to re-run on every boot — short-circuits once both columns exist.
+    Supports Postgres (production) and SQLite (dev).
+    """
+    insp = inspect(engine)
+    is_postgres = engine.url.get_backend_name().startswith("postgres")
+
+    # --- users table ---
+    if insp.has_table("users"):
+        users_cols = {c["name"] for c in insp.get_columns("users")}
+        if "auth_user_id" not in users_cols:
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE users ADD COLUMN auth_user_id VARCHAR"))
+                conn.execute(text(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_auth_user_id "
+                    "ON users (auth_user_id) WHERE auth_user_id IS NOT NULL"
+                ))
+            logger.warning("Migrated users table: added auth_user_id for per-user points.")
+
+    # --- daily_usage table ---
+    if insp.has_table("daily_usage"):
+        du_cols = {c["name"] for c in insp.get_columns("daily_usage")}
+        if "auth_user_id" not in du_cols:
+            if is_postgres:
+                with engine.begin() as conn:
+                    conn.execute(text("ALTER TABLE daily_usage ADD COLUMN auth_user_id VARCHAR"))
+                    conn.execute(text(
+                        "CREATE INDEX IF NOT EXISTS ix_daily_usage_auth_user_id "
+                        "ON daily_usage (auth_user_id)"
+                    ))
+                    # Drop the old global UNIQUE constraint on usage_date alone.
+                    res = conn.execute(text(
+                        "SELECT conname FROM pg_constraint c "
+                        "JOIN pg_class t ON c.conrelid = t.oid "
+                        "WHERE t.relname = 'daily_usage' AND c.contype IN ('u')"
+                    ))
+                    for (conname,) in res.fetchall():
+                        try:
+                            conn.execute(text(
+                                f'ALTER TABLE daily_usage DROP CONSTRAINT "{conname}"'
+                            ))
+                        except Exception as exc:
+                            logger.warning(f"Could not drop daily_usage constraint {conname}: {exc}")
+                    conn.execute(text(
+                        "CREATE UNIQUE INDEX IF NOT EXISTS uq_daily_usage_user_date "
+                        "ON daily_usage (auth_user_id, usage_date) "
+                        "WHERE auth_user_id IS NOT NULL"
+                    ))
+            else:
+                # SQLite: table rebuild to drop the old UNIQUE index on usage_date.
+                with engine.begin() as conn:
+                    conn.execute(text("ALTER TABLE daily_usage RENAME TO daily_usage_old"))
+                Base.metadata.tables["daily_usage"].create(bind=engine)
+                with engine.begin() as conn:
+                    conn.execute(text(
+                        "INSERT INTO daily_usage "
+                        "(id, auth_user_id, usage_date, points_earned, created_at) "
+                        "SELECT id, NULL, usage_date, points_earned, created_at "
+                        "FROM daily_usage_old"
+                    ))
+                    conn.execute(text("DROP TABLE daily_usage_old"))
+            logger.warning("Migrated daily_usage table: added auth_user_id for per-user check-ins.")
+
+
+def _migrate_auth_users_add_referral_code() -> None:
+    """Add nullable `referral_code` to `auth_users` for the referral program.
+    Plain ADD COLUMN works on both Postgres and SQLite; the unique index is
+    created separately and tolerates NULLs (many legacy rows have no code yet).
+    Safe to re-run; no-ops once the column exists."""
+    insp = inspect(engine)
+    if not insp.has_table("auth_users"):
+        return
+    cols = {c["name"] for c in insp.get_columns("auth_users")}
+    if "referral_code" in cols:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE auth_users ADD COLUMN referral_code VARCHAR"))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_auth_users_referral_code "
+            "ON auth_users (referral_code) WHERE referral_code IS NOT NULL"
+        ))
+    logger.warning("Added auth_users.referral_code for the referral program.")
+
+
+def _migrate_auth_users_add_mfa() -> None:
+    """Add opt-in email-2FA columns to `auth_users`. All additive ADD COLUMNs
+    (safe on both Postgres and SQLite); booleans/integers get a server default
+    so existing rows backfill to "MFA off, 0 attempts". Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("auth_users"):
+        return
+    cols = {c["name"] for c in insp.get_columns("auth_users")}
+    is_pg = engine.dialect.name == "postgresql"
+    false_default = "FALSE" if is_pg else "0"
+    with engine.begin() as conn:
+        if "mfa_enabled" not in cols:
+            conn.execute(text(
+                f"ALTER TABLE auth_users ADD COLUMN mfa_enabled BOOLEAN NOT NULL DEFAULT {false_default}"
+            ))
+        if "mfa_code_hash" not in cols:
+            conn.execute(text("ALTER TABLE auth_users ADD COLUMN mfa_code_hash VARCHAR"))
+        if "mfa_code_expires_at" not in cols:
+            conn.execute(text("ALTER TABLE auth_users ADD COLUMN mfa_code_expires_at VARCHAR"))
+        if "mfa_code_attempts" not in cols:
+            conn.execute(text(
+                "ALTER TABLE auth_users ADD COLUMN mfa_code_attempts INTEGER NOT NULL DEFAULT 0"
+            ))
+    logger.warning("Ensured auth_users MFA columns exist (email two-factor auth).")
+
+
+def _migrate_auth_users_add_email_verification() -> None:
+    """Add email-confirmation columns to `auth_users`. All additive ADD COLUMNs
+    (safe on Postgres + SQLite). CRITICAL: the one-time backfill that marks
+    existing rows verified runs ONLY when the column is first created — re-running
+    it on every boot would silently re-verify legitimately-unverified new signups.
+    Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("auth_users"):
+        return
+    cols = {c["name"] for c in insp.get_columns("auth_users")}
+    is_pg = engine.dialect.name == "postgresql"
+    false_default = "FALSE" if is_pg else "0"
+    true_value = "TRUE" if is_pg else "1"
+    with engine.begin() as conn:
+        if "email_verified" not in cols:
+            conn.execute(text(
+                f"ALTER TABLE auth_users ADD COLUMN email_verified BOOLEAN NOT NULL DEFAULT {false_default}"
+            ))
+            # Grandfather every pre-existing account (incl. demo) as verified so
+            # the nudge only ever targets accounts created after this feature.
+            conn.execute(text(f"UPDATE auth_users SET email_verified = {true_value}"))
+        if "email_verification_code_hash" not in cols:
+            conn.execute(text("ALTER TABLE auth_users ADD COLUMN email_verification_code_hash VARCHAR"))
+        if "email_verification_expires_at" not in cols:
+            conn.execute(text("ALTER TABLE auth_users ADD COLUMN email_verification_expires_at VARCHAR"))
+        if "email_verification_attempts" not in cols:
+            conn.execute(text(
+                "ALTER TABLE auth_users ADD COLUMN email_verification_attempts INTEGER NOT NULL DEFAULT 0"
+            ))
+    logger.warning("Ensured auth_users email-verification columns exist.")
+
+
+def _migrate_auth_users_add_onboarding() -> None:
+    """Add `onboarding_completed` to `auth_users` for the conversion onboarding
+    funnel. CRITICAL: the one-time backfill that grandfathers existing rows as
+    completed runs ONLY when the column is first created — re-running it on
+    every boot would silently skip onboarding for legitimately-new signups.
+    Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("auth_users"):
+        return
+    cols = {c["name"] for c in insp.get_columns("auth_users")}
+    if "onboarding_completed" in cols:
+        return
+    is_pg = engine.dialect.name == "postgresql"
+    false_default = "FALSE" if is_pg else "0"
+    true_value = "TRUE" if is_pg else "1"
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"ALTER TABLE auth_users ADD COLUMN onboarding_completed BOOLEAN NOT NULL DEFAULT {false_default}"
+        ))
+        # Grandfather every pre-existing account (incl. demo) so ONLY accounts
+        # created after this feature ever see the onboarding flow.
+        conn.execute(text(f"UPDATE auth_users SET onboarding_completed = {true_value}"))
+    logger.warning("Added auth_users.onboarding_completed (grandfathered existing rows).")
+
+
+def _migrate_auth_users_add_walkthrough() -> None:
+    """Add `walkthrough_completed` to `auth_users` so the dashboard tutorial's
+    completion survives reinstalls (device AsyncStorage alone gets wiped).
+    CRITICAL: the grandfather backfill runs ONLY when the column is first
+    created — re-running it on every boot would mark new signups as done.
+    Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("auth_users"):
+        return
+    cols = {c["name"] for c in insp.get_columns("auth_users")}
+    if "walkthrough_completed" in cols:
+        return
+    is_pg = engine.dialect.name == "postgresql"
+    false_default = "FALSE" if is_pg else "0"
+    true_value = "TRUE" if is_pg else "1"
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"ALTER TABLE auth_users ADD COLUMN walkthrough_completed BOOLEAN NOT NULL DEFAULT {false_default}"
+        ))
+        # Grandfather every pre-existing account so only accounts created after
+        # this feature can ever be auto-shown the tour by the server flag.
+        conn.execute(text(f"UPDATE auth_users SET walkthrough_completed = {true_value}"))
+    logger.warning("Added auth_users.walkthrough_completed (grandfathered existing rows).")
+
+
+def _migrate_user_label_overrides_add_emoji() -> None:
+    """Add `emoji` to `user_label_overrides` (heading rows only: custom emoji
+    shown before the section title; NULL = default). Plain additive ADD COLUMN,
+    safe on both Postgres and SQLite; safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("user_label_overrides"):
+        return
+    cols = {c["name"] for c in insp.get_columns("user_label_overrides")}
+    if "emoji" in cols:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE user_label_overrides ADD COLUMN emoji VARCHAR"))
+    logger.warning("Added user_label_overrides.emoji for heading emoji customization.")
+
+
+def _migrate_auth_users_add_password_changed_at() -> None:
+    """Security-event stamp used to revoke pre-existing JWTs on password reset /
+    email change. Nullable — existing rows keep NULL (no revocation) until their
+    first security event. Plain ADD COLUMN works on both Postgres and SQLite.
+    Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("auth_users"):
+        return
+    cols = {c["name"] for c in insp.get_columns("auth_users")}
+    if "password_changed_at" in cols:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE auth_users ADD COLUMN password_changed_at VARCHAR"))
+    logger.warning("Added auth_users.password_changed_at.")
+
+
+def _migrate_auth_users_add_pro_entitlement() -> None:
+    """Server-side Pro entitlement state, kept current by the RevenueCat
+    webhook and REST fallback. All additive ADD COLUMNs (safe on Postgres +
+    SQLite); the boolean gets a FALSE default so every existing row starts
+    non-Pro until a webhook/REST check says otherwise (the client remains
+    fail-open for UX; this is the server-side backstop). Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("auth_users"):
+        return
+    cols = {c["name"] for c in insp.get_columns("auth_users")}
+    is_pg = engine.dialect.name == "postgresql"
+    false_default = "FALSE" if is_pg else "0"
+    with engine.begin() as conn:
+        if "pro_entitlement_active" not in cols:
+            conn.execute(text(
+                f"ALTER TABLE auth_users ADD COLUMN pro_entitlement_active BOOLEAN NOT NULL DEFAULT {false_default}"
+            ))
+        if "pro_entitlement_expires_at" not in cols:
+            conn.execute(text("ALTER TABLE auth_users ADD COLUMN pro_entitlement_expires_at VARCHAR"))
+        if "pro_entitlement_updated_at" not in cols:
+            conn.execute(text("ALTER TABLE auth_users ADD COLUMN pro_entitlement_updated_at VARCHAR"))
+        if "pro_entitlement_source" not in cols:
+            conn.execute(text("ALTER TABLE auth_users ADD COLUMN pro_entitlement_source VARCHAR"))
+        if "pro_entitlement_event_ts_ms" not in cols:
+            conn.execute(text("ALTER TABLE auth_users ADD COLUMN pro_entitlement_event_ts_ms BIGINT"))
+    if "pro_entitlement_active" not in cols:
+        logger.warning("Ensured auth_users pro entitlement columns exist (server-side Pro state).")
+
+
+def _migrate_auth_users_add_timezone() -> None:
+    """Per-user IANA timezone for all day/week/month bucketing. The
+    grandfather backfill to America/New_York lives INSIDE the add-column guard
+    (never re-runs), so existing accounts keep bit-identical buckets to the
+    old fixed-EST behavior while new signups get their device zone. Plain ADD
+    COLUMN works on both Postgres and SQLite. Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("auth_users"):
+        return
+    cols = {c["name"] for c in insp.get_columns("auth_users")}
+    if "timezone" in cols:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE auth_users ADD COLUMN timezone VARCHAR"))
+        conn.execute(text("UPDATE auth_users SET timezone = 'America/New_York' WHERE timezone IS NULL"))
+    logger.warning("Added auth_users.timezone (grandfathered to America/New_York).")
+
+
+def _migrate_problem_reports_add_title() -> None:
+    """Optional short issue title for bug reports (used in the notification
+    email subject). Nullable — legacy reports keep NULL. Plain ADD COLUMN
+    works on both Postgres and SQLite. Safe to re-run."""
+    insp = inspect(engine)
+    if not insp.has_table("problem_reports"):
+        return
+    cols = {c["name"] for c in insp.get_columns("problem_reports")}
+    if "title" in cols:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE problem_reports ADD COLUMN title VARCHAR"))
+    logger.warning("Added problem_reports.title.")
+
+
+def _migrate_leaderboard_stats_backfill() -> None:
+    """Seed `leaderboard_stats` for users who have entries but no row yet —
+    everyone whose last entry write predates the table, who would otherwise
+    rank with 0 points until their next write. One grouped pass over
+    `entries` with the same sums refresh_leaderboard_stats takes from the
+    daily rollups. Users that already have a row are left alone. Safe to
+    re-run."""
+    from sqlalchemy import case, exists, func, insert, select
+    from backend.models import AuthUser, Entry, EntryType, LeaderboardStats
+    from backend.services.leaderboard_service import points_for
+
+    insp = inspect(engine)
+    if not (insp.has_table("entries") and insp.has_table("leaderboard_stats")):
+        return
+    query = (
+        select(
+            Entry.user_id,
+            func.count(),
+            func.coalesce(func.sum(case((Entry.amount > 0, Entry.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((Entry.type == EntryType.ORDER, Entry.amount), else_=0)), 0),
+        )
+        .join(AuthUser, AuthUser.id == Entry.user_id)
+        .where(~exists().where(LeaderboardStats.user_id == Entry.user_id))
+        .group_by(Entry.user_id)
+    )
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        rows = [
+            {"user_id": user_id, "entry_count": count, "positive_earnings": positive,
+             "order_earnings": orders, "points": points_for(positive, count), "updated_at": now}
+            for user_id, count, positive, orders in conn.execute(query)
+        ]
+        if rows:
+            conn.execute(insert(LeaderboardStats), rows)
+    if rows:
+        logger.warning(f"Backfilled leaderboard_stats for {len(rows)} users.")
+
+
+def _create_tables() -> None:
+    """Create any table in models.py that doesn't exist yet (create_all only
+    adds missing tables; it never alters existing ones)."""
+    Base.metadata.create_all(bind=engine)
+
+
+# (version, step). Column/table-shape fixes run before create_tables so it
+# sees the expected shape; index steps run after it so they also apply on the
+# boot that first creates their table. Append only.
+MIGRATIONS = [
+    (1, _migrate_api_credentials_for_multi_user),
+    (2, _migrate_synced_orders_for_multi_user),
+    (3, _migrate_points_for_multi_user),
+    (4, _migrate_entries_add_idempotency_key),
+    (5, _migrate_entries_add_custom_app),
+    (6, _migrate_entries_add_custom_type),
+    (7, _migrate_entries_add_custom_category),
+    (8, _migrate_user_platforms_add_color_icon),
+    (9, _migrate_auth_users_add_referral_code),
+    (10, _migrate_auth_users_add_mfa),
+    (11, _migrate_auth_users_add_email_verification),
+    (12, _migrate_auth_users_add_onboarding),
+    (13, _migrate_auth_users_add_walkthrough),
+    (14, _migrate_auth_users_add_password_changed_at),
+    (15, _migrate_auth_users_add_pro_entitlement),
+    (16, _migrate_auth_users_add_timezone),
+    (17, _migrate_problem_reports_add_title),
+    (18, _migrate_user_label_overrides_add_emoji),
+    (19, _create_tables),
+    (20, _migrate_user_platforms_ci_unique),
+    (21, _migrate_user_entry_types_ci_unique),
+    (22, _migrate_user_expense_categories_ci_unique),
+    (23, _migrate_entries_add_user_timestamp_index),
+    (24, _migrate_entries_order_id_unique),
+    (25, _migrate_synced_orders_user_order_unique),
+    (26, _migrate_api_credentials_add_sync_cursor),
+    (27, _create_tables),  # jobs
+    (28, _create_tables),  # user_suggestions
+    (29, _migrate_leaderboard_stats_backfill),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Arbitrary app-wide key for the advisory lock; only migrations take it.
+MIGRATION_LOCK_KEY = 0x6E696E6A61_01
+MIGRATION_LOCK_POLL_SECONDS = 2.0
+
+
+def step_name(step) -> str:
+    return step.__name__.removeprefix("_migrate_").lstrip("_")
+
+
+STEP_APPLIED = "applied"
+STEP_DEFERRED = "deferred"
+
+
+def step_states():
+    """{version: status} of every recorded step, or None before the first
+    tracked run. This one read is all a warm boot costs."""
+    try:
+        with engine.connect() as conn:
+            return dict(conn.execute(text("SELECT version, status FROM schema_migrations")).all())
+    except DBAPIError:
+        return None
+
+
+def pending_steps(states) -> list:
+    """(version, step) of every step not recorded as applied, in order."""
+    states = states or {}
+    return [(v, step) for v, step in MIGRATIONS if states.get(v) != STEP_APPLIED]
+
+
+def _record_step(version: int, step, status: str) -> None:
+    params = {"v": version, "name": step_name(step), "status": status, "at": datetime.utcnow().isoformat()}
+    with engine.begin() as conn:
+        updated = conn.execute(
+            text("UPDATE schema_migrations SET name = :name, status = :status, applied_at = :at WHERE version = :v"),
+            params,
+        ).rowcount
+        if not updated:
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, status, applied_at) "
+                     "VALUES (:v, :name, :status, :at)"),
+                params,
+            )
+
+
+def _adopt_legacy_version() -> None:
+    """Databases migrated before per-step tracking only have the one-row
+    `schema_version` high-water mark: everything up to it counts as applied."""
+    if not inspect(engine).has_table("schema_version"):
+        return
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM schema_migrations LIMIT 1")).first():
+            return
+        version = conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+        if version is None:
+            return
+        at = datetime.utcnow().isoformat()
+        for step_version, step in MIGRATIONS:
+            if step_version <= version:
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name, status, applied_at) "
+                         "VALUES (:v, :name, :status, :at)"),
+                    {"v": step_version, "name": step_name(step), "status": STEP_APPLIED, "at": at},
+                )
+
+
+@contextmanager
+def _migration_lock():
+    """Serialize migrators (two overlapping deploys' release steps, or an
+    operator's --rerun during one). A second migrator waits here, then finds
+    the steps already recorded and skips them.
+
+    On Postgres the lock is transaction-scoped and its transaction stays open
+    on a connection of its own while the steps run on others: behind
+    PgBouncer / the Neon pooler (DB_POOL_MODE=pooler) an open transaction
+    keeps its server backend, so the lock is taken and released on the same
+    one. A session-level pg_advisory_lock / unlock pair isn't safe there —
+    each statement may land on a different backend and leak the lock.
+
+    Waiting polls pg_try_advisory_xact_lock between sleeps, ending the
+    transaction each time, rather than blocking in pg_advisory_xact_lock: a
+    backend blocked in a statement holds a snapshot, and CREATE INDEX
+    CONCURRENTLY in the holder's steps waits for every older snapshot — so
+    the waiter and the holder would wait on each other for good. The idle
+    transaction that holds the lock has no snapshot, so it doesn't block the
+    build either."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            while True:
+                with conn.begin():
+                    if conn.execute(text("SELECT pg_try_advisory_xact_lock(:k)"),
+                                    {"k": MIGRATION_LOCK_KEY}).scalar():
+                        yield
+                        return
+                logger.info("Another migrator holds the lock; waiting")
+                time.sleep(MIGRATION_LOCK_POLL_SECONDS)
+    database = engine.url.database
+    try:
+        import fcntl
+    except ImportError:  # non-POSIX dev box: single process assumed
+        fcntl = None
+    if fcntl is None or not database or database == ":memory:":
+        yield
+        return
+    with open(os.path.abspath(database) + ".migrate.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def run_migrations(rerun=()) -> list:
+    """Apply every step not yet recorded as applied; returns the names of
+    steps still pending afterwards (empty when the schema is current).
+    `rerun` names steps (see step_name) to apply again even though they are
+    recorded as applied.
+
+    A guarded step that declines to run (returns False: duplicate rows in the
+    way, a concurrent index build that failed) is recorded as deferred, not
+    applied. The steps after it still run and are recorded on their own, so
+    the next run retries only the deferred step."""
+    rerun = set(rerun)
+    unknown = rerun - {step_name(step) for _, step in MIGRATIONS}
+    if unknown:
+        raise ValueError(f"Unknown migration step(s): {', '.join(sorted(unknown))}")
+    if not rerun:
+        states = step_states()
+        if states is not None and not pending_steps(states):
+            return []
+
+    with _migration_lock():
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, "
+                "name VARCHAR NOT NULL, status VARCHAR NOT NULL, applied_at VARCHAR)"
+            ))
+        _adopt_legacy_version()
+        states = step_states() or {}
+        for step_version, step in MIGRATIONS:
+            if states.get(step_version) == STEP_APPLIED and step_name(step) not in rerun:
+                continue
+            logger.warning(f"Applying migration {step_version}: {step_name(step)}")
+            if step() is False:
+                logger.error(f"Migration {step_version}: {step_name(step)} deferred; "
+                             "the next `python -m backend.migrations` retries it")
+                _record_step(step_version, step, STEP_DEFERRED)
+            else:
+                _record_step(step_version, step, STEP_APPLIED)
+    return [step_name(step) for _, step in pending_steps(step_states())]
+
+
+def check_schema() -> None:
+    """Boot-time check for the web app and the job worker: one SELECT, no
+    DDL. Migrations run once per deploy as a release step
+    (`python -m backend.migrations`, see railway.json / Procfile), not from
+    every process at import. Raises RuntimeError when a step has never been
+    run, so a deploy that skipped the release step fails loudly instead of
+    serving against a stale schema; a deferred step only logs.
+
+    A SQLite database (local dev, tests) is migrated here instead — one
+    process, nothing to coordinate."""
+    if engine.dialect.name == "sqlite":
+        run_migrations()
+        return
+    states = step_states() or {}
+    missing = [step_name(step) for v, step in MIGRATIONS if v not in states]
+    if missing:
+        raise RuntimeError(
+            f"Schema is behind ({len(missing)} pending: {', '.join(missing)}); "
+            "run `python -m backend.migrations` before starting the app"
+        )
+    deferred = [step_name(step) for _, step in pending_steps(states)]
+    if deferred:
+        logger.error(f"Deferred migration steps: {', '.join(deferred)} (see python -m backend.migrations --status)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+    parser.add_argument("--status", action="store_true", help="print versions and exit")
+    parser.add_argument("--rerun", action="append", default=[], metavar="STEP",
+                        help="apply this step again (repeatable)")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        states = step_states() or {}
+        print(f"latest: {LATEST_VERSION}")
+        for step_version, step in MIGRATIONS:
+            mark = {STEP_APPLIED: "x", STEP_DEFERRED: "d"}.get(states.get(step_version), " ")
+            print(f"  [{mark}] {step_version:3d} {step_name(step)}")
+        return
+    pending = run_migrations(args.rerun)
+    print("schema current" if not pending else f"deferred: {', '.join(pending)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
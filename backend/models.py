@@ -140,8 +140,98 @@ class Entry(Base):
             sqlite_where=text("idempotency_key IS NOT NULL"),
             postgresql_where=text("idempotency_key IS NOT NULL"),
         ),
+        # A platform order id identifies one order, so it may appear at most
+        # once per user. Rows without one (manual entries) are unconstrained.
+        # Bulk import dedupes against this with ON CONFLICT DO NOTHING.
+        Index(
+            "uq_entries_user_order_id",
+            "user_id",
+            "order_id",
+            unique=True,
+            sqlite_where=text("order_id IS NOT NULL AND order_id <> ''"),
+            postgresql_where=text("order_id IS NOT NULL AND order_id <> ''"),
+        ),
+    )
+
+# Every hot entry read is "this user's rows in [a, b], newest first"
+# (GET /entries, dashboard overview, calculate_rollup, AI suggestions, daily
+# rollup refresh). The composite index serves the range AND the
+# ORDER BY timestamp DESC, id DESC without a sort step; on Postgres the
+# aggregate columns are INCLUDEd so calculate_rollup's grouped SUMs can run as
+# an index-only scan. Existing databases get it from
+# _migrate_entries_add_user_timestamp_index() in migrations.py.
+ENTRY_RANGE_INDEX_INCLUDE = ["type", "app", "amount", "distance_miles", "duration_minutes"]
+Index(
+    "ix_entries_user_timestamp_id",
+    Entry.user_id,
+    Entry.timestamp.desc(),
+    Entry.id.desc(),
+    postgresql_include=ENTRY_RANGE_INDEX_INCLUDE,
+)
+
+class DailyRollup(Base):
+    """Materialized per-user, per-local-day totals of `entries`.
+
+    One row per (user, local calendar day, type, app) that has at least one
+    entry, so a day usually holds 1-3 rows and per-type/per-app breakdowns fall
+    out of a plain GROUP BY. Day buckets are in the account's timezone AT BUILD
+    TIME; `DailyRollupState.tz_name` records which zone the rows were bucketed
+    in so reads can tell when a timezone change has made them stale. Rows are
+    never edited in place: `services/daily_rollup_service.refresh_daily_rollups`
+    recomputes every touched day from `entries` inside the writer's transaction.
+    """
+    __tablename__ = "daily_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, ForeignKey("auth_users.id"), nullable=False, index=True)
+    local_date = Column(Date, nullable=False)
+    type = Column(SQLEnum(EntryType), nullable=False)
+    app = Column(SQLEnum(AppType), nullable=False)
+    entry_count = Column(Integer, default=0, nullable=False)
+    total_amount = Column(Numeric(12, 2), default=Decimal("0"), nullable=False)
+    revenue = Column(Numeric(12, 2), default=Decimal("0"), nullable=False)   # sum of amount > 0
+    expenses = Column(Numeric(12, 2), default=Decimal("0"), nullable=False)  # abs(sum of amount <= 0)
+    miles = Column(Float, default=0.0, nullable=False)
+    minutes = Column(Integer, default=0, nullable=False)
+    first_timestamp = Column(DateTime, nullable=True)
+    last_timestamp = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("uq_daily_rollups_user_date_type_app", "user_id", "local_date", "type", "app", unique=True),
     )
 
+class DailyRollupState(Base):
+    """Whether a user's `daily_rollups` rows are complete, and in which zone.
+
+    No row (or a tz_name that differs from the account's current timezone)
+    means the rollup rows can't be trusted: reads fall back to aggregating
+    `entries` directly and the next entry write rebuilds the user's rows.
+    """
+    __tablename__ = "daily_rollup_state"
+
+    user_id = Column(String, ForeignKey("auth_users.id"), primary_key=True)
+    tz_name = Column(String, nullable=False)
+    built_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class LeaderboardStats(Base):
+    """All-time per-user totals behind GET /leaderboard, so a request ranks
+    users with one indexed ORDER BY instead of scanning every entry.
+
+    Derived from `daily_rollups` (all-time sums don't depend on the timezone
+    the days were bucketed in) and refreshed by daily_rollup_service on every
+    entry write. A user with no entries has no row and ranks with 0 points.
+    """
+    __tablename__ = "leaderboard_stats"
+
+    user_id = Column(String, ForeignKey("auth_users.id"), primary_key=True)
+    # int(sum of positive amounts) + 10 per entry — see leaderboard_service.
+    points = Column(Integer, default=0, nullable=False, index=True)
+    entry_count = Column(Integer, default=0, nullable=False)
+    positive_earnings = Column(Numeric(14, 2), default=Decimal("0"), nullable=False)
+    order_earnings = Column(Numeric(14, 2), default=Decimal("0"), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
 class UserPlatform(Base):
     """A user-created delivery platform (beyond the built-in AppType enum).
 
@@ -339,6 +429,12 @@ class ApiCredential(Base):
     refresh_token = Column(String, nullable=True)
     token_expires_at = Column(DateTime, nullable=True)
     is_active = Column(Integer, default=1, nullable=False)
+    # Incremental sync watermark: the upper bound of the last window fetched
+    # successfully. The next run starts there (minus an overlap for
+    # late-arriving orders); NULL means no successful sync yet.
+    sync_cursor_at = Column(DateTime, nullable=True)
+    # Last full-window reconciliation run for this credential.
+    last_full_sync_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
@@ -364,6 +460,62 @@ class SyncedOrder(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        # One bookkeeping row per upstream order per user, so two overlapping
+        # sync runs can't both import it. Batched sync inserts against this
+        # with ON CONFLICT DO NOTHING. Legacy NULL-user rows are unconstrained.
+        Index(
+            "uq_synced_orders_user_platform_order",
+            "user_id",
+            "platform",
+            "platform_order_id",
+            unique=True,
+        ),
+    )
+
+class Job(Base):
+    """A unit of background work for `python -m backend.worker` (see
+    services/job_queue.py). Web processes only insert rows here."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=True)        # JSON object
+    # Periodic jobs carry their schedule slot here so each slot is queued once.
+    dedup_key = Column(String, nullable=True, unique=True)
+    status = Column(String, default="queued", nullable=False)
+    run_at = Column(DateTime, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    locked_by = Column(String, nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    result = Column(Text, nullable=True)         # JSON object
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # The claim query: runnable jobs of a kind, oldest first.
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+class UserSuggestion(Base):
+    """A Pro user's precomputed /api/suggestions answer for their trailing
+    window, written by the nightly worker job and served without touching
+    `entries` or the model (see services/suggestion_store.py). `orders` and
+    `revenue` are the window's order totals at generation time: the read path
+    compares them to a cheap aggregate to decide whether to refresh."""
+    __tablename__ = "user_suggestions"
+
+    user_id = Column(String, ForeignKey("auth_users.id"), primary_key=True)
+    window_start = Column(DateTime, nullable=False)
+    orders = Column(Integer, default=0, nullable=False)
+    revenue = Column(Numeric(14, 2), default=Decimal("0"), nullable=False)
+    stats = Column(Text, nullable=True)          # JSON object sent to the model
+    payload = Column(Text, nullable=False)       # JSON response body
+    generated_at = Column(DateTime, nullable=False)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import get_async_db
+from backend.schemas import HeatmapResponse, SeriesResponse
+from backend.services.earnings_series import SERIES_BUCKETS, earnings_series
+from backend.services.hourly_stats import WEEKDAYS, earnings_heatmap
+from backend.services.period import get_est_date_range, user_tz_name
+from backend.models import AuthUser
+from backend.auth import get_current_user
+from typing import Optional, Tuple
+from datetime import datetime, timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _parse_range(from_date: Optional[str], to_date: Optional[str], tz: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Naive UTC bounds for an optional from/to pair. Same formats as
+    /rollup: YYYY-MM-DD is an inclusive calendar day in the user's timezone,
+    anything with a 'T' is an ISO datetime."""
+    def _bound(value: Optional[str], end: bool) -> Optional[datetime]:
+        if not value:
+            return None
+        if 'T' in value:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
+        return get_est_date_range(value, value, tz)[1 if end else 0]
+
+    try:
+        from_dt, to_dt = _bound(from_date, False), _bound(to_date, True)
+    except Exception:
+        # Don't leak parser internals to the client; details go to logs.
+        logger.warning("Analytics date range parse failed", exc_info=True)
+        raise HTTPException(status_code=400, detail="Invalid date range. Use YYYY-MM-DD or ISO datetimes.")
+    if from_dt and to_dt and from_dt > to_dt:
+        raise HTTPException(status_code=400, detail="from_date must not be after to_date")
+    return from_dt, to_dt
+
+
+@router.get("/analytics/heatmap", response_model=HeatmapResponse)
+async def get_heatmap(
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user)
+):
+    """Weekday × hour earnings grid in the user's timezone: orders, revenue,
+    average order value and $/hour per slot, from one grouped query."""
+    tz = user_tz_name(current_user)
+    from_dt, to_dt = _parse_range(from_date, to_date, tz)
+    grid = await db.run_sync(earnings_heatmap, current_user.id, tz, from_dt, to_dt)
+    return {
+        "timezone": tz,
+        "from_date": from_dt,
+        "to_date": to_dt,
+        "weekdays": list(WEEKDAYS),
+        "grid": grid,
+    }
+
+
+@router.get("/analytics/series", response_model=SeriesResponse)
+async def get_series(
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    bucket: str = "day",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: AuthUser = Depends(get_current_user)
+):
+    """Revenue, expenses, profit, miles and orders per local day, week or
+    month of the range: one request and one grouped query per chart."""
+    if bucket not in SERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail="Invalid bucket. Use day, week or month.")
+    tz = user_tz_name(current_user)
+    from_dt, to_dt = _parse_range(from_date, to_date, tz)
+    series = await db.run_sync(earnings_series, current_user.id, tz, from_dt, to_dt, bucket)
+    return {
+        "timezone": tz,
+        "bucket": bucket,
+        "from_date": from_dt,
+        "to_date": to_dt,
+        "series": series,
+    }
@@ -14,6 +14,7 @@ import hashlib
 import re
 import secrets
 from backend.auth import get_current_user, verify_prelaunch_token
+from backend.services.password_hashing import PasswordHashingBusy, run_hashing
 from backend.services.email_service import (
     send_password_reset_email,
     send_mfa_code_email,
@@ -126,6 +127,27 @@ def verify_password(password: str, hash_value: str) -> bool:
     except Exception:
         return False
 
+async def hash_password_async(password: str) -> str:
+    """hash_password on the bcrypt pool so the event loop keeps serving other
+    requests. Every async route must use this (or verify_password_async)."""
+    try:
+        return await run_hashing(hash_password, password)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
+
+async def verify_password_async(password: str, hash_value: str) -> bool:
+    try:
+        return await run_hashing(verify_password, password, hash_value)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
+
+def _hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-in requests right now. Please try again in a moment.",
+        headers={"Retry-After": "1"},
+    )
+
 def _hash_reset_token(token: str) -> str:
     """Reset tokens are stored ONLY as SHA-256 digests: a read-only DB leak must
     never expose a live account-takeover secret. The raw token exists solely in
@@ -213,7 +235,7 @@ async def _issue_mfa_challenge(
     never extend the overall window — once `issued_at + MFA_CHALLENGE_TTL` passes
     the session is dead and the user must re-enter their password."""
     code = _generate_mfa_code()
-    user.mfa_code_hash = hash_password(code)
+    user.mfa_code_hash = await hash_password_async(code)
     user.mfa_code_expires_at = (datetime.utcnow() + MFA_CODE_TTL).isoformat()
     user.mfa_code_attempts = 0
     db.commit()
@@ -278,7 +300,7 @@ async def _issue_email_verification(user: AuthUser, db: Session) -> Optional[str
     if user.is_demo or not user.email or user.email_verified:
         return None
     code = _generate_mfa_code()
-    user.email_verification_code_hash = hash_password(code)
+    user.email_verification_code_hash = await hash_password_async(code)
     user.email_verification_expires_at = (datetime.utcnow() + EMAIL_VERIFY_CODE_TTL).isoformat()
     user.email_verification_attempts = 0
     db.commit()
@@ -336,7 +358,7 @@ async def _signup(
     user = AuthUser(
         id=user_id,
         email=request.email,
-        password_hash=hash_password(request.password),
+        password_hash=await hash_password_async(request.password),
         first_name=username,
         last_name="",
         # Auto-detected device zone; all day/week/month bucketing uses it.
@@ -536,7 +558,7 @@ async def _login(request: LoginRequest, db: Session = Depends(get_db)):
     if not user or not user.password_hash:
         raise HTTPException(status_code=401, detail="Invalid email, username, or password")
     
-    if not verify_password(request.password, user.password_hash):
+    if not await verify_password_async(request.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid email, username, or password")
 
     # Password is correct. If this user opted into email 2FA, withhold the access
@@ -591,7 +613,7 @@ async def mfa_verify(request: Request, body: MfaVerifyRequest, db: Session = Dep
         raise HTTPException(status_code=429, detail="Too many incorrect codes. Please request a new one.")
 
     code = (body.code or "").strip()
-    if not verify_password(code, user.mfa_code_hash):
+    if not await verify_password_async(code, user.mfa_code_hash):
         user.mfa_code_attempts = (user.mfa_code_attempts or 0) + 1
         db.commit()
         remaining = max(0, MFA_MAX_ATTEMPTS - user.mfa_code_attempts)
@@ -670,7 +692,7 @@ async def mfa_disable(
     """Turn off 2FA. Password-based accounts must re-enter their password so a
     stolen unlocked session can't silently strip the second factor."""
     if current_user.password_hash:
-        if not body.password or not verify_password(body.password, current_user.password_hash):
+        if not body.password or not await verify_password_async(body.password, current_user.password_hash):
             raise HTTPException(status_code=401, detail="Incorrect password.")
     current_user.mfa_enabled = False
     current_user.mfa_code_hash = None
@@ -719,6 +741,10 @@ async def update_timezone(
         raise HTTPException(status_code=400, detail="Invalid timezone (expected an IANA name like America/Detroit)")
     if current_user.timezone != tz:
         current_user.timezone = tz
+        # Day buckets in daily_rollups are zone-specific; re-bucket now so the
+        # next dashboard read hits the fast path instead of scanning entries.
+        from backend.services.daily_rollup_service import rebuild_daily_rollups
+        rebuild_daily_rollups(db, current_user.id, tz)
         db.commit()
     return {"timezone": tz}
 
@@ -806,7 +832,7 @@ async def verify_email(
     if (current_user.email_verification_attempts or 0) >= EMAIL_VERIFY_MAX_ATTEMPTS:
         raise HTTPException(status_code=429, detail="Too many attempts. Tap resend to get a new code.")
 
-    if not verify_password(code, current_user.email_verification_code_hash):
+    if not await verify_password_async(code, current_user.email_verification_code_hash):
         current_user.email_verification_attempts = (current_user.email_verification_attempts or 0) + 1
         db.commit()
         raise HTTPException(status_code=400, detail="That code is incorrect.")
@@ -921,7 +947,7 @@ async def change_email(
     # would be enough to rebind the login email — block them instead of
     # silently allowing an account takeover pivot.
     if current_user.password_hash:
-        if not body.password or not verify_password(body.password, current_user.password_hash):
+        if not body.password or not await verify_password_async(body.password, current_user.password_hash):
             raise HTTPException(status_code=401, detail="Incorrect password.")
     else:
         raise HTTPException(
@@ -1096,7 +1122,7 @@ async def reset_password(request: Request, body: ResetPasswordRequest, db: Sessi
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
 
     # Update password
-    user.password_hash = hash_password(body.new_password)
+    user.password_hash = await hash_password_async(body.new_password)
     # Kill every previously-issued session token: a stolen JWT must not survive
     # the victim resetting their password (see get_current_user iat check).
     user.password_changed_at = datetime.utcnow().isoformat()
@@ -1249,7 +1275,12 @@ def create_demo_transactions(db: Session, user_id: str):
                 note="Demo expense"
             )
             db.add(entry)
-    
+
+    # Added in bulk, so no per-entry refresh ran: build the daily rollups (and
+    # the leaderboard row derived from them) in one pass.
+    from backend.services.daily_rollup_service import rebuild_daily_rollups
+    from backend.services.period import user_tz_name
+    rebuild_daily_rollups(db, user_id, user_tz_name(db.get(AuthUser, user_id)))
     db.commit()
 
 class DemoRequest(BaseModel):
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.db import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import get_async_db
 from backend.models import Entry, AuthUser
 from backend.auth import get_current_user
 from backend.services.rollup_service import calculate_rollup
@@ -13,7 +14,7 @@ router = APIRouter()
 async def get_dashboard_overview(
     timeframe: Optional[str] = None,
     day_offset: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthUser = Depends(get_current_user)
 ):
     """Combined endpoint: returns entries + rollup + goal in ONE call"""
@@ -43,14 +44,16 @@ async def get_dashboard_overview(
         from_dt, to_dt = get_today(tz)
     
     # Get entries - limited to 100 most recent for performance
-    entries = db.query(Entry).filter(
-        Entry.user_id == current_user.id,
-        Entry.timestamp >= from_dt,
-        Entry.timestamp <= to_dt
-    ).order_by(Entry.timestamp.desc()).limit(100).all()  # Limited result set for faster queries
+    entries = (await db.execute(
+        select(Entry).where(
+            Entry.user_id == current_user.id,
+            Entry.timestamp >= from_dt,
+            Entry.timestamp <= to_dt
+        ).order_by(Entry.timestamp.desc()).limit(100)  # Limited result set for faster queries
+    )).scalars().all()
     
     # Get rollup (includes goal data)
-    rollup = calculate_rollup(db, from_dt, to_dt, timeframe, current_user.id, tz)
+    rollup = await db.run_sync(calculate_rollup, from_dt, to_dt, timeframe, current_user.id, tz)
     
     return {
         "entries": entries,
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+from backend.db import get_db, pool_stats
+from backend.services.job_queue import JOB_SYNC_ORDERS, last_result
+from backend.services.request_metrics import diagnostics_token, render_prometheus
+import hmac
+
+router = APIRouter()
+
+
+def require_diagnostics_token(request: Request) -> None:
+    """Operator-only endpoints authenticate with `Authorization: Bearer
+    <DIAGNOSTICS_TOKEN>`, not a user JWT. Fails closed when unset."""
+    secret = diagnostics_token()
+    if not secret:
+        raise HTTPException(status_code=503, detail="Diagnostics not configured")
+    provided = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(provided, f"Bearer {secret}"):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+@router.get("/diagnostics/pool", dependencies=[Depends(require_diagnostics_token)])
+async def diagnostics_pool():
+    """Pool profile and counters of the worker process that served this
+    request (each gunicorn worker has its own pools)."""
+    return pool_stats()
+
+
+@router.get("/diagnostics/metrics", dependencies=[Depends(require_diagnostics_token)])
+def diagnostics_metrics(db: Session = Depends(get_db)):
+    """Prometheus scrape target: per-route latency / query-count histograms and
+    pool, cache and hashing counters of this worker process, plus the last
+    sync run's stats."""
+    return PlainTextResponse(
+        render_prometheus(last_sync_run=last_result(db, JOB_SYNC_ORDERS)),
+        media_type="text/plain; version=0.0.4",
+    )
@@ -1,18 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from backend.db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import get_db, get_async_db
 from backend.models import Entry, EntryType, AppType, AuthUser, Goal, ExpenseCategory
 from backend.schemas import EntryCreate, EntryUpdate, EntryResponse
 from backend.auth import get_current_user
 from backend.entitlements import require_pro
-from typing import List, Optional
+from backend.services.daily_rollup_service import refresh_daily_rollups, clear_daily_rollups
+from backend.services.entry_import import IMPORT_BATCH_SIZE, REJECT_INVALID, import_entry_rows
+from backend.services.csv_import import CsvImportError, CsvRowMapper, iter_csv_records
+from backend.services.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from backend.services.period import user_tz_name
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timezone
 from decimal import Decimal
 
 router = APIRouter()
 
-
+ENTRIES_DEFAULT_PAGE_SIZE = 100
 def _est_components_to_utc_naive(date_str: str, time_str: str, tz_name: str = "America/New_York") -> datetime:
     """Convert a user-local wall-clock date + time into a naive UTC datetime.
 
@@ -62,7 +70,6 @@ async def create_entry(entry: EntryCreate, db: Session = Depends(get_db), curren
         # Parse date and time in the user's timezone, then convert to UTC.
         # Tolerant of non-zero-padded components (see _est_components_to_utc_naive).
         try:
-            from backend.services.period import user_tz_name
             timestamp = _est_components_to_utc_naive(entry.date, entry.time, user_tz_name(current_user))
         except Exception:
             timestamp = entry.timestamp or datetime.utcnow()
@@ -90,6 +97,8 @@ async def create_entry(entry: EntryCreate, db: Session = Depends(get_db), curren
     )
     db.add(db_entry)
     try:
+        db.flush()
+        refresh_daily_rollups(db, current_user.id, user_tz_name(current_user), [db_entry.timestamp])
         db.commit()
     except IntegrityError:
         # Lost a race with a concurrent replay carrying the same key — the other
@@ -103,28 +112,40 @@ async def create_entry(entry: EntryCreate, db: Session = Depends(get_db), curren
             ).first()
             if existing:
                 return existing
+        if db_entry.order_id:
+            # uq_entries_user_order_id: this platform order is already logged.
+            raise HTTPException(status_code=409, detail="An entry with this order ID already exists")
         raise
     db.refresh(db_entry)
     return db_entry
 
 @router.get("/entries", response_model=List[EntryResponse])
 async def get_entries(
+    response: Response,
     timeframe: Optional[str] = None,
     day_offset: Optional[int] = None,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
-    limit: int = 500,
-    cursor: Optional[int] = None,
-    db: Session = Depends(get_db),
+    limit: int = Query(ENTRIES_DEFAULT_PAGE_SIZE, ge=1),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthUser = Depends(get_current_user)
 ):
+    """Newest-first page of the user's entries.
+
+    Pages are keyed on (timestamp, id), the same key the list is sorted by,
+    so backdated or imported rows are neither skipped nor repeated. When more
+    rows remain, the opaque cursor for the next page is returned in the
+    X-Next-Cursor header (the body stays a plain list for existing clients);
+    pass it back as ``cursor`` with the same filters.
+    """
     from backend.services.period import (
         get_today, get_yesterday, get_this_week, get_last_7_days,
         get_this_month, get_last_month, get_day_offset, user_tz_name
     )
     tz = user_tz_name(current_user)
     
-    query = db.query(Entry).filter(Entry.user_id == current_user.id)
+    query = select(Entry).where(Entry.user_id == current_user.id)
     
     # Use timeframe if provided (new approach - avoids timezone issues)
     if timeframe:
@@ -146,8 +167,8 @@ async def get_entries(
         else:
             from_dt, to_dt = get_today(tz)
         
-        query = query.filter(Entry.timestamp >= from_dt)
-        query = query.filter(Entry.timestamp <= to_dt)
+        query = query.where(Entry.timestamp >= from_dt)
+        query = query.where(Entry.timestamp <= to_dt)
     # Fall back to old from_date/to_date parameters for backward compatibility.
     # Accepts either full ISO datetimes OR YYYY-MM-DD (interpreted as inclusive
     # EST calendar days, mirroring the timeframe helpers).
@@ -156,23 +177,47 @@ async def get_entries(
         if from_date and to_date and 'T' not in from_date and 'T' not in to_date:
             try:
                 from_dt, to_dt = get_est_date_range(from_date, to_date, _utz(current_user))
-                query = query.filter(Entry.timestamp >= from_dt)
-                query = query.filter(Entry.timestamp <= to_dt)
+                query = query.where(Entry.timestamp >= from_dt)
+                query = query.where(Entry.timestamp <= to_dt)
             except Exception:
                 pass
         else:
             if from_date:
                 from_dt = datetime.fromisoformat(from_date.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
-                query = query.filter(Entry.timestamp >= from_dt)
+                query = query.where(Entry.timestamp >= from_dt)
             if to_date:
                 to_dt = datetime.fromisoformat(to_date.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
-                query = query.filter(Entry.timestamp <= to_dt)
+                query = query.where(Entry.timestamp <= to_dt)
     
     if cursor:
-        query = query.filter(Entry.id < cursor)
+        if cursor.isdigit():
+            # Legacy integer cursor (the id of the last row seen). Resolve it
+            # to that row's key; if it's gone, fall back to the old id filter.
+            after = (await db.execute(
+                select(Entry.timestamp, Entry.id).where(Entry.id == int(cursor), Entry.user_id == current_user.id)
+            )).first()
+            if after is None:
+                query = query.where(Entry.id < int(cursor))
+        else:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        if after is not None:
+            after_ts, after_id = after
+            # Written as a range on timestamp plus a tie-break so the planner
+            # seeks ix_entries_user_timestamp_id instead of filtering a scan.
+            query = query.where(
+                Entry.timestamp <= after_ts,
+                or_(Entry.timestamp < after_ts, and_(Entry.timestamp == after_ts, Entry.id < after_id)),
+            )
     
     query = query.order_by(Entry.timestamp.desc(), Entry.id.desc())
-    entries = query.limit(limit).all()
+    # One extra row tells us whether there is a next page without a COUNT.
+    entries = (await db.execute(query.limit(limit + 1))).scalars().all()
+    if len(entries) > limit:
+        entries = entries[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(entries[-1].timestamp, entries[-1].id)
     
     return entries
 
@@ -183,12 +228,12 @@ async def update_entry(entry_id: int, entry_update: EntryUpdate, db: Session = D
         raise HTTPException(status_code=404, detail="Entry not found")
     
     update_data = entry_update.model_dump(exclude_unset=True)
+    old_timestamp = db_entry.timestamp
     
     # Handle date/time components if provided (for proper timezone handling).
     # Tolerant of non-zero-padded components (see _est_components_to_utc_naive).
     if "date" in update_data and "time" in update_data and update_data["date"] and update_data["time"]:
         try:
-            from backend.services.period import user_tz_name
             update_data["timestamp"] = _est_components_to_utc_naive(
                 update_data["date"], update_data["time"], user_tz_name(current_user)
             )
@@ -242,7 +287,13 @@ async def update_entry(entry_id: int, entry_update: EntryUpdate, db: Session = D
             db_entry.category = ExpenseCategory.OTHER
 
     setattr(db_entry, 'updated_at', datetime.utcnow())
-    db.commit()
+    try:
+        # Recompute both the day the entry left and the day it landed on.
+        refresh_daily_rollups(db, current_user.id, user_tz_name(current_user), [old_timestamp, db_entry.timestamp])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="An entry with this order ID already exists")
     db.refresh(db_entry)
     return db_entry
 
@@ -252,7 +303,9 @@ async def delete_entry(entry_id: int, db: Session = Depends(get_db), current_use
     if not db_entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
+    timestamp = db_entry.timestamp
     db.delete(db_entry)
+    refresh_daily_rollups(db, current_user.id, user_tz_name(current_user), [timestamp])
     db.commit()
     return {"message": "Entry deleted successfully"}
 
@@ -261,6 +314,7 @@ async def delete_all_entries(db: Session = Depends(get_db), current_user: AuthUs
     try:
         # Delete entries first
         db.query(Entry).filter(Entry.user_id == current_user.id).delete(synchronize_session=False)
+        clear_daily_rollups(db, current_user.id)
         # Delete goals - use raw string comparison to ensure matching
         user_id_str = str(current_user.id)
         db.query(Goal).filter(Goal.user_id == user_id_str).delete(synchronize_session=False)
@@ -275,87 +329,117 @@ async def delete_all_entries(db: Session = Depends(get_db), current_user: AuthUs
         raise HTTPException(status_code=500, detail="Failed to delete data")
 
 @router.post("/entries/import")
-async def import_entries(entries_data: List[EntryCreate], db: Session = Depends(get_db), current_user: AuthUser = Depends(require_pro)):
+async def import_entries(entries_data: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db), current_user: AuthUser = Depends(require_pro)):
     # CSV import is a Pro feature. The client gates it too (paywall), but the
     # client is presentation-only: require_pro is the server-side enforcement
     # backstop (fails closed with 403; re-verifies stale state against
     # RevenueCat first so a paying user is never wrongly rejected).
-    imported_entries = []
-    skipped_duplicates = 0
-
+    #
+    # Rows are validated one at a time so a single malformed line is reported
+    # in `rejected` instead of failing the whole file with a 422.
+    #
     # Duplicate prevention: platform CSVs (Uber/DoorDash) carry a stable per-order
-    # id, so re-importing the same file must not create duplicate rows. We dedupe
-    # on a non-empty `order_id` scoped to this user — both against rows already in
-    # the DB and against earlier rows within this same batch. Rows without an
-    # order_id (e.g. manual entries) are NOT deduped, to avoid wrongly dropping two
-    # legitimately-identical manual entries.
-    existing_order_ids = {
-        oid for (oid,) in db.query(Entry.order_id).filter(
-            Entry.user_id == current_user.id,
-            Entry.order_id.isnot(None),
-            Entry.order_id != "",
-        ).all()
+    # id, so re-importing the same file must not create duplicate rows. A
+    # non-empty `order_id` is unique per user (uq_entries_user_order_id), checked
+    # by the INSERT itself, and repeated ids within this file are rejected too.
+    # Rows without an order_id (e.g. manual entries) are NOT deduped, to avoid
+    # wrongly dropping two legitimately-identical manual entries.
+    tz = user_tz_name(current_user)
+    try:
+        imported_entries, rejected = import_entry_rows(
+            db, current_user.id, tz, entries_data,
+            to_utc=lambda d, t: _est_components_to_utc_naive(d, t, tz),
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to import entries")
+
+    skipped_duplicates = sum(1 for r in rejected if r["reason"] != REJECT_INVALID)
+    msg = f"Successfully imported {len(imported_entries)} entries"
+    if skipped_duplicates:
+        msg += f" ({skipped_duplicates} duplicate{'s' if skipped_duplicates != 1 else ''} skipped)"
+    invalid = len(rejected) - skipped_duplicates
+    if invalid:
+        msg += f" ({invalid} invalid row{'s' if invalid != 1 else ''} rejected)"
+    return {
+        "message": msg,
+        "count": len(imported_entries),
+        "skipped_duplicates": skipped_duplicates,
+        "rejected": rejected,
+        "entries": [EntryResponse.model_validate(e) for e in imported_entries],
     }
-    seen_order_ids: set[str] = set()
 
-    for entry in entries_data:
-        try:
-            order_id = (entry.order_id or "").strip()
-            if order_id and (order_id in existing_order_ids or order_id in seen_order_ids):
-                skipped_duplicates += 1
-                continue
 
-            amount = entry.amount
-            
-            if entry.type in [EntryType.EXPENSE, EntryType.CANCELLATION]:
-                amount = -abs(amount)
-            else:
-                amount = abs(amount)
-            
-            # Calculate timestamp - prefer date/time components over timestamp (for proper timezone handling).
-            # Tolerant of non-zero-padded components (see _est_components_to_utc_naive).
-            if entry.date and entry.time:
-                try:
-                    from backend.services.period import user_tz_name
-                    timestamp = _est_components_to_utc_naive(entry.date, entry.time, user_tz_name(current_user))
-                except Exception:
-                    timestamp = entry.timestamp or datetime.utcnow()
-            else:
-                timestamp = entry.timestamp or datetime.utcnow()
-            
-            db_entry = Entry(
-                user_id=current_user.id,
-                timestamp=timestamp,
-                type=entry.type,
-                app=entry.app,
-                order_id=entry.order_id,
-                amount=amount,
-                distance_miles=entry.distance_miles or 0.0,
-                duration_minutes=entry.duration_minutes or 0,
-                category=entry.category,
-                note=entry.note,
-                receipt_url=entry.receipt_url
-            )
-            db.add(db_entry)
-            imported_entries.append(db_entry)
-            if order_id:
-                seen_order_ids.add(order_id)
-        except Exception as e:
-            continue
-    
+CSV_IMPORT_MAX_BYTES = 25 * 1024 * 1024
+# The full reject list for a hopeless file would be as big as the file.
+CSV_IMPORT_MAX_REPORTED_REJECTS = 200
+
+
+@router.post("/entries/import/csv")
+async def import_entries_csv(request: Request, platform: Optional[str] = None, db: Session = Depends(get_db), current_user: AuthUser = Depends(require_pro)):
+    """Import a raw Uber / DoorDash / Instacart earnings export (or the app's
+    own CSV template) sent as the request body, e.g. Content-Type: text/csv.
+
+    The body is parsed while it streams in and inserted IMPORT_BATCH_SIZE rows
+    at a time with the same validation and order_id dedup as /entries/import
+    (see services/csv_import.py); the format is detected from the header row
+    unless ?platform= names it. The whole file commits or rolls back together.
+    Rejected rows are numbered from 1, counting data rows after the header.
+    """
+    tz = user_tz_name(current_user)
+    to_utc = lambda d, t: _est_components_to_utc_naive(d, t, tz)
+    seen_order_ids: set = set()
+    mapper: Optional[CsvRowMapper] = None
+    chunk: List[dict] = []
+    rows_read = 0
+    imported = 0
+    rejected: List[dict] = []
+    rejected_count = 0
+    skipped_duplicates = 0
+
+    async def _flush():
+        nonlocal chunk, rows_read, imported, rejected_count, skipped_duplicates
+        rows, chunk = chunk, []
+        # Each chunk is a couple of round-trips; keep them off the event loop.
+        inserted, rejects = await run_in_threadpool(
+            import_entry_rows, db, current_user.id, tz, rows, to_utc, rows_read + 1, seen_order_ids,
+        )
+        rows_read += len(rows)
+        imported += len(inserted)
+        rejected_count += len(rejects)
+        skipped_duplicates += sum(1 for r in rejects if r["reason"] != REJECT_INVALID)
+        rejected.extend(rejects[:CSV_IMPORT_MAX_REPORTED_REJECTS - len(rejected)])
+
     try:
-        db.commit()
-        for entry in imported_entries:
-            db.refresh(entry)
-        msg = f"Successfully imported {len(imported_entries)} entries"
-        if skipped_duplicates:
-            msg += f" ({skipped_duplicates} duplicate{'s' if skipped_duplicates != 1 else ''} skipped)"
-        return {
-            "message": msg,
-            "count": len(imported_entries),
-            "skipped_duplicates": skipped_duplicates,
-            "entries": imported_entries
-        }
+        async for record in iter_csv_records(request.stream(), CSV_IMPORT_MAX_BYTES):
+            if mapper is None:
+                mapper = CsvRowMapper(record, platform)
+                continue
+            chunk.append(mapper(record))
+            if len(chunk) >= IMPORT_BATCH_SIZE:
+                await _flush()
+        if mapper is None:
+            raise CsvImportError("CSV file is empty.")
+        if chunk:
+            await _flush()
+        await run_in_threadpool(db.commit)
+    except CsvImportError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to import entries")
+
+    msg = f"Successfully imported {imported} entries"
+    if rejected_count:
+        msg += f" ({rejected_count} row{'s' if rejected_count != 1 else ''} skipped)"
+    return {
+        "message": msg,
+        "format": mapper.format,
+        "count": imported,
+        "rows": rows_read,
+        "skipped_duplicates": skipped_duplicates,
+        "rejected_count": rejected_count,
+        "rejected": rejected,
+    }
@@ -166,8 +166,7 @@ async def submit_problem_report(
 async def _send_report_email(report: ProblemReport, screenshots: list[str]) -> None:
     import asyncio
     import base64
-    import resend
-    from backend.services.email_service import RESEND_API_KEY, RESEND_FROM, RESEND_REPLY_TO
+    from backend.services.email_service import RESEND_API_KEY, RESEND_FROM, RESEND_REPLY_TO, resend_client
 
     # BUG_REPORT_EMAIL takes precedence; SUPPORT_EMAIL kept for back-compat.
     to_addr = (
@@ -233,7 +232,7 @@ async def _send_report_email(report: ProblemReport, screenshots: list[str]) -> N
         params["attachments"] = attachments
     if RESEND_REPLY_TO:
         params["reply_to"] = [report.contact_email]
-    result = await asyncio.to_thread(resend.Emails.send, params)
+    result = await asyncio.to_thread(resend_client().Emails.send, params)
     logger.info(
         "problem-report email sent for report %s to %s (resend id %s)",
         report.id, to_addr, (result or {}).get("id"),
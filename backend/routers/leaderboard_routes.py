@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy import and_, desc, func, or_
 from backend.db import get_db
-from backend.models import AuthUser, Friend, Achievement, Congratulation, Entry, EntryType
+from backend.models import AuthUser, Friend, Achievement, Congratulation
 from backend.auth import get_current_user
+from backend.services.leaderboard_service import top_users, users_with_stats
+from backend.services.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 from pydantic import BaseModel
 from typing import List, Optional, Literal
 
 router = APIRouter()
 
+RECENT_CONGRATS_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
 # ---- Schemas --------------------------------------------------------------
 
 class UserLeaderboardItem(BaseModel):
@@ -49,21 +54,6 @@ class RespondFriendRequest(BaseModel):
 
 # ---- Helpers --------------------------------------------------------------
 
-def calculate_user_points(db: Session, user_id: str) -> int:
-    """Calculate points based on earnings and entry count."""
-    entries = db.query(Entry).filter(Entry.user_id == user_id).all()
-    total_earnings = sum(float(e.amount) for e in entries if float(e.amount) > 0)
-    points = int(total_earnings) + (len(entries) * 10)
-    return points
-
-def calculate_total_earnings(db: Session, user_id: str) -> float:
-    """Sum of ORDER-type entry amounts for the user."""
-    total = db.query(func.coalesce(func.sum(Entry.amount), 0)).filter(
-        Entry.user_id == user_id,
-        Entry.type == EntryType.ORDER,
-    ).scalar()
-    return float(total or 0)
-
 def _display_name(user: AuthUser) -> str:
     """Public display name. Never falls back to email — that would leak
     contact info via the username field for users who haven't set a name."""
@@ -75,6 +65,37 @@ def _display_name(user: AuthUser) -> str:
     suffix = (user.id or "")[-4:] or "0000"
     return f"Driver {suffix}"
 
+# Only what _display_name and the inbox items need — not the whole AuthUser
+# row (password hash, MFA state, entitlement fields).
+_SENDER_COLUMNS = (AuthUser.id, AuthUser.first_name, AuthUser.profile_image_url)
+
+def _after_cursor(query, cursor: Optional[str], created_col, id_col):
+    """Restrict an inbox query to the rows after `cursor`; 400 if malformed."""
+    if not cursor:
+        return query
+    try:
+        after_ts, after_id = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return query.filter(or_(
+        created_col < after_ts,
+        and_(created_col == after_ts, id_col < after_id),
+    ))
+
+def _page(query, limit: Optional[int], created_col, id_col, response: Response):
+    """One newest-first page (every row when `limit` is None). One extra row
+    tells us whether there is a next page without a COUNT; if there is, its
+    cursor goes in the X-Next-Cursor header, as on GET /entries."""
+    query = query.order_by(desc(created_col), desc(id_col))
+    if limit is None:
+        return query.all()
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows
+    rows = rows[:limit]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].row_id)
+    return rows
+
 # ---- Endpoints ------------------------------------------------------------
 
 @router.get("/leaderboard")
@@ -86,11 +107,6 @@ async def get_leaderboard(
     points, and (placeholder) streak. Email, total earnings, and the
     stable user id are restricted to accepted friends."""
 
-    all_users = db.query(AuthUser).filter(
-        AuthUser.id != current_user.id,
-        AuthUser.id != "default-user",
-    ).all()
-
     # Resolve the caller's accepted friend set once, so we can gate which
     # rows include the privileged fields.
     friend_ids = {
@@ -100,23 +116,25 @@ async def get_leaderboard(
             Friend.status == "accepted",
         ).all()
     }
-
-    leaderboard_items: List[UserLeaderboardItem] = []
-    for user in all_users:
-        points = calculate_user_points(db, user.id)
-        is_friend = user.id in friend_ids
-        leaderboard_items.append(UserLeaderboardItem(
-            id=user.id if is_friend else None,
-            username=_display_name(user),
-            points=points,
+    excluded = {current_user.id, "default-user"}
+
+    def _item(row) -> UserLeaderboardItem:
+        is_friend = row.id in friend_ids
+        return UserLeaderboardItem(
+            id=row.id if is_friend else None,
+            username=_display_name(row),
+            points=int(row.points),
             daily_streak=0,
-            total_earnings=calculate_total_earnings(db, user.id) if is_friend else None,
+            total_earnings=float(row.order_earnings) if is_friend else None,
             is_friend=is_friend,
-            profile_image_url=user.profile_image_url,
-        ))
-
-    leaderboard_items.sort(key=lambda x: x.points, reverse=True)
-    friends = [item for item in leaderboard_items if item.is_friend]
+            profile_image_url=row.profile_image_url,
+        )
+
+    # Points live in the maintained leaderboard_stats table (refreshed on
+    # every entry write), so ranking is one indexed ORDER BY ... LIMIT and
+    # the friend rows are one IN query — no per-user entry scans.
+    leaderboard_items = [_item(row) for row in top_users(db, excluded, limit=50)]
+    friends = [_item(row) for row in users_with_stats(db, friend_ids - excluded)]
     friends.sort(key=lambda x: x.points, reverse=True)
 
     achievements = db.query(Achievement).filter(
@@ -124,7 +142,7 @@ async def get_leaderboard(
     ).all()
 
     return {
-        "leaderboard": leaderboard_items[:50],
+        "leaderboard": leaderboard_items,
         "friends": friends,
         "achievements": [
             {"title": a.title, "description": a.description, "icon": a.icon}
@@ -187,25 +205,32 @@ async def add_friend(
 
 @router.get("/leaderboard/friend-requests")
 async def list_friend_requests(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Pending friend requests addressed to the caller."""
-    rows = db.query(Friend).filter(
-        Friend.friend_id == current_user.id,
-        Friend.status == "pending",
-    ).order_by(desc(Friend.created_at)).all()
-
-    out: List[FriendRequestItem] = []
-    for row in rows:
-        sender = db.query(AuthUser).filter(AuthUser.id == row.user_id).first()
-        if not sender:
-            continue
-        out.append(FriendRequestItem(
-            request_id=row.id,
-            from_username=_display_name(sender),
-            profile_image_url=sender.profile_image_url,
-        ))
+    """Pending friend requests addressed to the caller, newest first, with
+    each sender's public fields joined in. All of them unless `limit` is
+    given; then, when more remain, the next page's cursor is in the
+    X-Next-Cursor header — pass it back as `cursor`."""
+    query = (
+        db.query(Friend.id.label("row_id"), Friend.created_at, *_SENDER_COLUMNS)
+        .join(AuthUser, AuthUser.id == Friend.user_id)
+        .filter(Friend.friend_id == current_user.id, Friend.status == "pending")
+    )
+    query = _after_cursor(query, cursor, Friend.created_at, Friend.id)
+    rows = _page(query, limit, Friend.created_at, Friend.id, response)
+
+    out: List[FriendRequestItem] = [
+        FriendRequestItem(
+            request_id=row.row_id,
+            from_username=_display_name(row),
+            profile_image_url=row.profile_image_url,
+        )
+        for row in rows
+    ]
     return {"requests": out}
 
 @router.post("/leaderboard/friend-requests/respond")
@@ -278,21 +303,29 @@ async def send_congratulations(
 
 @router.get("/leaderboard/recent-congrats")
 async def get_recent_congrats(
+    response: Response,
+    limit: int = Query(RECENT_CONGRATS_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: AuthUser = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Recent congratulations received by the caller."""
-    congrats = db.query(Congratulation).filter(
-        Congratulation.to_user_id == current_user.id
-    ).order_by(desc(Congratulation.created_at)).limit(10).all()
-
-    result = []
-    for c in congrats:
-        from_user = db.query(AuthUser).filter(AuthUser.id == c.from_user_id).first()
-        if from_user:
-            result.append({
-                "from_username": _display_name(from_user),
-                "message": c.message,
-                "created_at": c.created_at,
-            })
+    """Recent congratulations received by the caller, newest first; paged
+    like the friend-request inbox."""
+    query = (
+        db.query(Congratulation.id.label("row_id"), Congratulation.created_at, Congratulation.message,
+                 *_SENDER_COLUMNS)
+        .join(AuthUser, AuthUser.id == Congratulation.from_user_id)
+        .filter(Congratulation.to_user_id == current_user.id)
+    )
+    query = _after_cursor(query, cursor, Congratulation.created_at, Congratulation.id)
+    rows = _page(query, limit, Congratulation.created_at, Congratulation.id, response)
+
+    result = [
+        {
+            "from_username": _display_name(row),
+            "message": row.message,
+            "created_at": row.created_at,
+        }
+        for row in rows
+    ]
     return {"congrats": result}
@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from backend.db import get_db
 from backend.models import ApiCredential, PlatformIntegration, AuthUser
 from backend.auth import get_current_user, SECRET_KEY, JWT_ALGORITHM
+from backend.services.job_queue import JOB_SYNC_ORDERS, enqueue
 import httpx
 import jwt
 import logging
@@ -184,6 +185,8 @@ async def uber_callback(
                 )
                 db.add(cred)
 
+            # Pull the user's orders now instead of at the next hourly slot.
+            enqueue(db, JOB_SYNC_ORDERS, {"user_id": user_id})
             db.commit()
             return _callback_html("Uber connected. You can close this window and return to the app.")
 
@@ -262,6 +265,8 @@ async def shipt_callback(
                 )
                 db.add(cred)
 
+            # Pull the user's orders now instead of at the next hourly slot.
+            enqueue(db, JOB_SYNC_ORDERS, {"user_id": user_id})
             db.commit()
             return _callback_html("Shipt connected. You can close this window and return to the app.")
 
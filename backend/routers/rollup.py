@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db import get_async_db
 from backend.schemas import RollupResponse
 from backend.services.rollup_service import calculate_rollup
 from backend.services.period import (
@@ -24,7 +24,7 @@ async def get_rollup(
     day_offset: int = 0,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: AuthUser = Depends(get_current_user)
 ):
     from_dt = None
@@ -45,7 +45,7 @@ async def get_rollup(
             # Don't leak parser internals to the client; details go to logs.
             logger.warning("Rollup date range parse failed", exc_info=True)
             raise HTTPException(status_code=400, detail="Invalid date range. Use YYYY-MM-DD or ISO datetimes.")
-        rollup = calculate_rollup(db, from_dt, to_dt, None, current_user.id, tz)
+        rollup = await db.run_sync(calculate_rollup, from_dt, to_dt, None, current_user.id, tz)
         return rollup
 
     # Use timeframe parameter to calculate date boundaries server-side (eliminates timezone issues)
@@ -72,5 +72,5 @@ async def get_rollup(
             logger.warning("Rollup timeframe computation failed", exc_info=True)
             raise HTTPException(status_code=400, detail="Invalid timeframe")
     
-    rollup = calculate_rollup(db, from_dt, to_dt, timeframe, current_user.id, tz)
+    rollup = await db.run_sync(calculate_rollup, from_dt, to_dt, timeframe, current_user.id, tz)
     return rollup
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from backend.db import get_db
 from backend.services.ai_suggestions import get_ai_suggestions
+from backend.services.suggestion_store import stored_suggestions
 from backend.entitlements import require_pro
 from typing import Optional
 from datetime import datetime, timezone
@@ -19,7 +20,14 @@ async def get_suggestions(
     # (with an on-demand RevenueCat re-check for stale state).
     current_user = Depends(require_pro)
 ):
-    """Get AI-powered suggestions for earning optimization (Pro only)"""
+    """Get AI-powered suggestions for earning optimization (Pro only).
+
+    Without a range, answers for the trailing SUGGESTIONS_WINDOW_DAYS (30 by
+    default) from the user's nightly precomputed suggestion (see
+    services/suggestion_store.py) — not all time, as before precomputation —
+    with its generated_at and window_start. The dashboard's tips use this.
+    Pass from_date (and to_date) for any other range, e.g. an early from_date
+    for all-time stats; those are always answered live."""
     from_dt = None
     to_dt = None
     
@@ -29,5 +37,7 @@ async def get_suggestions(
         to_dt = datetime.fromisoformat(to_date.replace('Z', '+00:00')).astimezone(timezone.utc).replace(tzinfo=None)
     
     user_id = current_user.id if current_user else None
-    suggestions = get_ai_suggestions(db, from_dt, to_dt, user_id)
+    if from_dt is None and to_dt is None and user_id:
+        return await stored_suggestions(db, user_id)
+    suggestions = await get_ai_suggestions(db, from_dt, to_dt, user_id)
     return suggestions
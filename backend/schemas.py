@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator, model_validator
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional
 from backend.models import EntryType, AppType, ExpenseCategory, TimeframeType
@@ -332,3 +332,35 @@ class RollupResponse(BaseModel):
     by_app: dict[str, float]
     goal: Optional[GoalResponse] = None
     goal_progress: Optional[float] = None
+
+class HeatmapCell(BaseModel):
+    orders: int
+    revenue: float
+    average_order_value: float
+    hours: int
+    dollars_per_hour: float
+
+class HeatmapResponse(BaseModel):
+    timezone: str
+    from_date: Optional[datetime] = None
+    to_date: Optional[datetime] = None
+    weekdays: list[str]
+    # grid[weekday][hour], weekday 0 = Monday, hours in the user's timezone.
+    grid: list[list[HeatmapCell]]
+
+class SeriesPoint(BaseModel):
+    start: date
+    revenue: float
+    expenses: float
+    profit: float
+    miles: float
+    orders: int
+
+class SeriesResponse(BaseModel):
+    timezone: str
+    bucket: str
+    from_date: Optional[datetime] = None
+    to_date: Optional[datetime] = None
+    # One point per local bucket, oldest first; `start` is the bucket's
+    # first local day (Mondays for weeks, the 1st for months).
+    series: list[SeriesPoint]
@@ -0,0 +1,82 @@
+"""
+Benchmark: cold-start time from `import backend.app` to the first served
+request, and how many SQL statements boot issues on the way.
+
+Each boot is a fresh interpreter (as for a new uvicorn worker) that imports
+backend.app from --app-dir and serves GET /api/health in-process. The first
+boot against the throwaway database creates the schema and is reported
+separately; the remaining --runs boots are warm, i.e. what every redeploy and
+worker restart pays. --latency-ms adds a sleep before every statement to
+stand in for the round-trip to a remote database (Neon / Railway Postgres are
+typically 1-20 ms away); local SQLite hides that cost entirely.
+
+To compare two versions, point --app-dir at each checkout in turn, e.g.:
+    git worktree add /tmp/baseline <old-commit>
+    python -m backend.scripts.bench_cold_start --app-dir /tmp/baseline --latency-ms 5
+    python -m backend.scripts.bench_cold_start --latency-ms 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+
+_BOOT = """
+import json, sys, time
+sys.path.insert(0, {app_dir!r})
+started = time.perf_counter()
+from sqlalchemy import event
+import backend.db
+statements = 0
+
+@event.listens_for(backend.db.engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+    if {latency:.6f}:
+        time.sleep({latency:.6f})
+
+import backend.app
+from fastapi.testclient import TestClient
+assert TestClient(backend.app.app).get("/api/health").status_code == 200
+print(json.dumps({{"seconds": time.perf_counter() - started, "statements": statements}}))
+"""
+
+
+def _boot(app_dir: str, database_url: str, latency_ms: float) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, ALLOW_INSECURE_DB="1",
+               JWT_SECRET_KEY=os.environ.get("JWT_SECRET_KEY", "bench-only-secret-bench-only-secret-0000"))
+    code = _BOOT.format(app_dir=app_dir, latency=latency_ms / 1000.0)
+    out = subprocess.run([sys.executable, "-c", code], cwd=app_dir, env=env,
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-to-first-request time for backend.app.")
+    parser.add_argument("--app-dir", default=REPO_ROOT, help="checkout to boot (default: this one)")
+    parser.add_argument("--database-url", help="DB to boot against (default: temp SQLite file)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated per-statement round-trip")
+    args = parser.parse_args(argv)
+
+    app_dir = os.path.abspath(args.app_dir)
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='coldstart-'), 'boot.db')}"
+
+    first = _boot(app_dir, database_url, args.latency_ms)
+    warm = [_boot(app_dir, database_url, args.latency_ms) for _ in range(args.runs)]
+    seconds = sorted(r["seconds"] * 1000 for r in warm)
+
+    print(f"{app_dir} — simulated latency {args.latency_ms:g} ms/statement")
+    print(f"  first boot (empty DB): {first['seconds'] * 1000:8.1f} ms  {first['statements']:4d} statements")
+    print(f"  warm boot  (n={len(warm)}):     p50={statistics.median(seconds):8.1f} ms  "
+          f"max={seconds[-1]:8.1f} ms  {warm[-1]['statements']:4d} statements")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark: the weekday × hour heatmap (GET /api/analytics/heatmap) for one
+heavy user.
+
+Seeds a throwaway database with a synthetic driver (default 50,000 entries
+spread over the last year: orders, cancellations and expenses at shift-like
+hours) plus some noise users, then times over --runs runs:
+
+  grouped   — services.hourly_stats.earnings_heatmap, the one GROUP BY the
+              endpoint runs (at most 7 × 24 rows come back)
+  per-row   — the same grid built the naive way: load every entry in the
+              range and convert each timestamp with pytz in Python
+
+for the full year and for the last 30 days, and prints p50/max of each. The
+two grids are checked for equality first.
+
+Usage (local SQLite, throwaway DB in a temp dir):
+    python -m backend.scripts.bench_heatmap
+    python -m backend.scripts.bench_heatmap --entries 100000 --runs 20
+
+Against a local Postgres (the DB is seeded, so never point this at
+production):
+    python -m backend.scripts.bench_heatmap --database-url postgresql://localhost/bench
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+# Make `backend.*` importable when invoked as a script.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+os.environ.setdefault("JWT_SECRET_KEY", "bench-only-secret-bench-only-secret-000000")
+os.environ.setdefault("ALLOW_EPHEMERAL_SQLITE", "1")
+
+from pytz import timezone as pytz_timezone  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from backend.db import Base  # noqa: E402
+from backend.models import AppType, AuthUser, Entry, EntryType  # noqa: E402
+from backend.services.hourly_stats import _cell, earnings_heatmap  # noqa: E402
+
+USER_ID = "bench-heavy"
+TZ = "America/New_York"
+
+
+def _seed(Session, entries: int, now: datetime) -> None:
+    rng = random.Random(42)
+    apps = list(AppType)
+    with Session() as db:
+        for uid in (USER_ID, "bench-noise-1", "bench-noise-2"):
+            db.add(AuthUser(id=uid, email=f"{uid}@example.com", password_hash="x", timezone=TZ))
+        db.commit()
+        rows = []
+        for i in range(entries + 2000):
+            uid = USER_ID if i < entries else f"bench-noise-{i % 2 + 1}"
+            # Mostly lunch and dinner shifts (UTC, so ~11-14 and 17-22 local).
+            hour = rng.choice((15, 16, 17, 18, 21, 22, 23, 0, 1, 2, rng.randrange(24)))
+            ts = (now - timedelta(days=rng.randrange(365))).replace(hour=hour, minute=rng.randrange(60))
+            roll = rng.random()
+            if roll < 0.85:
+                entry_type, amount = EntryType.ORDER, Decimal(rng.randint(400, 4500)) / 100
+            elif roll < 0.9:
+                entry_type, amount = EntryType.ORDER, -Decimal(rng.randint(100, 900)) / 100
+            else:
+                entry_type, amount = EntryType.EXPENSE, -Decimal(rng.randint(500, 6000)) / 100
+            rows.append({"user_id": uid, "timestamp": ts, "type": entry_type, "app": rng.choice(apps),
+                         "amount": amount, "distance_miles": 0.0, "duration_minutes": 0,
+                         "created_at": now, "updated_at": now})
+            if len(rows) == 5000:
+                db.execute(insert(Entry), rows)
+                rows = []
+        if rows:
+            db.execute(insert(Entry), rows)
+        db.commit()
+
+
+def _per_row(db, from_dt: datetime, to_dt: datetime) -> list:
+    tz = pytz_timezone(TZ)
+    slots = {}
+    rows = db.query(Entry.timestamp, Entry.type, Entry.amount).filter(
+        Entry.user_id == USER_ID, Entry.timestamp >= from_dt, Entry.timestamp <= to_dt)
+    for ts, entry_type, amount in rows:
+        local = ts.replace(tzinfo=timezone.utc).astimezone(tz)
+        slot = slots.setdefault((local.weekday(), local.hour), {"orders": 0, "revenue": Decimal("0"), "days": set()})
+        slot["days"].add(local.date())
+        if entry_type == EntryType.ORDER and amount > 0:
+            slot["orders"] += 1
+            slot["revenue"] += Decimal(str(amount))
+    return [[_cell(dict(slots[(d, h)], hours=len(slots[(d, h)]["days"])) if (d, h) in slots else None)
+             for h in range(24)] for d in range(7)]
+
+
+def _time(fn, runs: int) -> list:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _summary(samples: list) -> str:
+    return f"p50={statistics.median(samples):8.1f} ms  max={max(samples):8.1f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the weekday × hour heatmap for one heavy user.")
+    parser.add_argument("--entries", type=int, default=50_000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args(argv)
+
+    tmp = None
+    url = args.database_url
+    if not url:
+        tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(tmp.name, 'bench_heatmap.db')}"
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    _seed(Session, args.entries, now)
+
+    print(f"{args.entries} entries for one user over 365 days ({engine.dialect.name}), {args.runs} runs:")
+    with Session() as db:
+        for label, days in (("last 365 days", 366), ("last 30 days", 30)):
+            from_dt, to_dt = now - timedelta(days=days), now
+            grouped = earnings_heatmap(db, USER_ID, TZ, from_dt, to_dt)
+            assert grouped == _per_row(db, from_dt, to_dt), "grouped and per-row grids differ"
+            print(f"  {label}")
+            print(f"    grouped : {_summary(_time(lambda: earnings_heatmap(db, USER_ID, TZ, from_dt, to_dt), args.runs))}")
+            print(f"    per-row : {_summary(_time(lambda: _per_row(db, from_dt, to_dt), args.runs))}")
+
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
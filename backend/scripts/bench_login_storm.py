@@ -0,0 +1,143 @@
+"""
+Benchmark: latency of an unrelated endpoint while a login storm runs.
+
+Drives the real /api/auth/login route (real bcrypt, default cost) in-process
+over ASGI, with N concurrent logins in flight, while a second task polls
+/api/health and records its latency. Runs twice:
+
+  inline  — bcrypt called directly inside the async handler (the old code)
+  pool    — bcrypt awaited on backend.services.password_hashing (current)
+
+and prints p50/p99/max of the health checks for each, plus the hashing pool
+counters. Uses a throwaway in-memory SQLite DB; touches nothing else.
+
+Usage:
+    python -m backend.scripts.bench_login_storm
+    python -m backend.scripts.bench_login_storm --logins 40 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Make `backend.*` importable when invoked as a script.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+os.environ.setdefault("JWT_SECRET_KEY", "bench-only-secret-bench-only-secret-000000")
+os.environ.setdefault("ALLOW_EPHEMERAL_SQLITE", "1")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from backend.db import Base, get_db  # noqa: E402
+from backend.models import AuthUser  # noqa: E402
+from backend.routers import auth_routes, health  # noqa: E402
+from backend.services import password_hashing  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+PROBE_INTERVAL = 0.01
+
+
+def _build_app():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        db.add(AuthUser(id="bench-user", email="bench@example.com",
+                        password_hash=auth_routes.hash_password(PASSWORD)))
+        db.commit()
+
+    def _db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.state.limiter = auth_routes.auth_limiter
+    auth_routes.auth_limiter.enabled = False  # measuring the loop, not the limiter
+    app.include_router(auth_routes.router, prefix="/api")
+    app.include_router(health.router, prefix="/api")
+    app.dependency_overrides[get_db] = _db
+    return app
+
+
+async def _storm(app, logins: int, concurrency: int) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        sem = asyncio.Semaphore(concurrency)
+        done = asyncio.Event()
+
+        async def _login():
+            async with sem:
+                r = await client.post("/api/auth/login",
+                                      json={"credential": "bench@example.com", "password": PASSWORD})
+                assert r.status_code == 200, r.text
+
+        async def _probe(samples: list):
+            # Latency is measured from when the probe was DUE, not when the
+            # loop finally got round to sending it — otherwise a blocked loop
+            # just shows up as fewer samples instead of slow ones.
+            due = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                r = await client.get("/api/health")
+                samples.append((time.perf_counter() - due) * 1000)
+                assert r.status_code == 200
+                due += PROBE_INTERVAL
+                # Never queue a backlog of overdue probes behind a stall.
+                due = max(due, time.perf_counter())
+
+        samples: list = []
+        probe = asyncio.create_task(_probe(samples))
+        await asyncio.gather(*[_login() for _ in range(logins)])
+        done.set()
+        await probe
+        return samples
+
+
+def _summary(samples: list) -> str:
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (f"n={len(ordered):4d}  p50={statistics.median(ordered):8.1f} ms  "
+            f"p99={p99:8.1f} ms  max={ordered[-1]:8.1f} ms")
+
+
+async def _inline(fn, *args):
+    return fn(*args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Health-check latency during a login storm.")
+    parser.add_argument("--logins", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    app = _build_app()
+    pooled = auth_routes.run_hashing
+
+    auth_routes.run_hashing = _inline
+    try:
+        before = asyncio.run(_storm(app, args.logins, args.concurrency))
+    finally:
+        auth_routes.run_hashing = pooled
+    after = asyncio.run(_storm(app, args.logins, args.concurrency))
+
+    print(f"{args.logins} logins, {args.concurrency} concurrent; GET /api/health latency:")
+    print(f"  inline bcrypt : {_summary(before)}")
+    print(f"  hashing pool  : {_summary(after)}")
+    print(f"  pool stats    : {password_hashing.hashing_pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -42,6 +42,8 @@ from backend.models import (  # noqa: E402
     AuthUser, Entry, Settings, Goal,
     EntryType, AppType, ExpenseCategory, TimeframeType,
 )
+from backend.services.daily_rollup_service import clear_daily_rollups, rebuild_daily_rollups  # noqa: E402
+from backend.services.period import user_tz_name  # noqa: E402
 
 
 DEMO_EMAIL = os.environ.get("DEMO_EMAIL", "reviewer@earningsninja.app")
@@ -86,6 +88,7 @@ def make_demo_account(db) -> str:
 def wipe_demo_data(db, user_id: str) -> None:
     """Remove this user's existing entries/settings/goals so re-runs are idempotent."""
     db.query(Entry).filter(Entry.user_id == user_id).delete()
+    clear_daily_rollups(db, user_id)
     db.query(Settings).filter(Settings.user_id == user_id).delete()
     db.query(Goal).filter(Goal.user_id == user_id).delete()
     db.flush()
@@ -174,6 +177,7 @@ def main():
         user_id = make_demo_account(db)
         wipe_demo_data(db, user_id)
         counts = seed_demo_data(db, user_id)
+        rebuild_daily_rollups(db, user_id, user_tz_name(db.get(AuthUser, user_id)))
         db.commit()
 
         print(f"  · Seeded {counts['orders']} orders + {counts['expenses']} expenses across 14 days.")
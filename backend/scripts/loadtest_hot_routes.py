@@ -0,0 +1,192 @@
+"""
+Load test for the hot dashboard read routes at a fixed worker count.
+
+Starts `uvicorn backend.app:app --workers N` from a checkout against a fresh
+database seeded with one user and a few months of entries, then hammers
+
+    GET /api/entries?timeframe=THIS_MONTH
+    GET /api/rollup?timeframe=THIS_MONTH
+    GET /api/dashboard/overview?timeframe=THIS_MONTH
+    GET /api/auth/me
+
+from C concurrent clients for D seconds and prints throughput and p50/p99
+latency per route. To compare two versions at the same worker count, point
+--app-dir at each checkout in turn (e.g. a `git worktree` of the old
+commit); both runs use the same seed data.
+
+Usage (local SQLite, throwaway DB in a temp dir):
+    python -m backend.scripts.loadtest_hot_routes --workers 1 --concurrency 32 --duration 15
+    python -m backend.scripts.loadtest_hot_routes --app-dir /tmp/baseline
+
+Usage against a local Postgres (the DB is seeded, so never point this at
+production):
+    python -m backend.scripts.loadtest_hot_routes --database-url postgresql://localhost/loadtest
+"""
+
+import argparse
+import asyncio
+import os
+import secrets
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+ROUTES = [
+    "/api/entries?timeframe=THIS_MONTH",
+    "/api/rollup?timeframe=THIS_MONTH",
+    "/api/dashboard/overview?timeframe=THIS_MONTH",
+    "/api/auth/me",
+]
+USER_ID = "loadtest-user"
+
+
+def _seed(database_url: str, entries: int) -> None:
+    """Seed via the models in THIS checkout; run in a child process so its
+    module-level engine binds to `database_url`."""
+    code = f"""
+import sys
+sys.path.insert(0, {REPO_ROOT!r})
+from datetime import datetime, timedelta
+from decimal import Decimal
+from backend.db import Base, SessionLocal, engine
+from backend.models import AuthUser, Entry, EntryType, AppType
+Base.metadata.create_all(bind=engine)
+db = SessionLocal()
+db.query(Entry).filter(Entry.user_id == {USER_ID!r}).delete()
+db.query(AuthUser).filter(AuthUser.id == {USER_ID!r}).delete()
+db.add(AuthUser(id={USER_ID!r}, email="loadtest@example.com", password_hash="x", timezone="America/New_York"))
+now = datetime.utcnow()
+apps = list(AppType)
+db.bulk_save_objects([
+    Entry(user_id={USER_ID!r}, timestamp=now - timedelta(minutes=97 * i),
+          type=EntryType.EXPENSE if i % 6 == 0 else EntryType.ORDER, app=apps[i % len(apps)],
+          amount=Decimal("-4.50") if i % 6 == 0 else Decimal("9.75") + i % 20,
+          distance_miles=(i % 9) / 2.0, duration_minutes=5 + i % 40)
+    for i in range({entries})
+])
+db.commit()
+"""
+    env = dict(os.environ, DATABASE_URL=database_url)
+    subprocess.run([sys.executable, "-c", code], check=True, env=env)
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _token(secret: str) -> str:
+    import jwt
+    now = datetime.utcnow()
+    return jwt.encode({"sub": USER_ID, "iat": now, "exp": now + timedelta(hours=1)}, secret, algorithm="HS256")
+
+
+def _start_server(app_dir: str, database_url: str, secret: str, workers: int, port: int):
+    env = dict(os.environ, DATABASE_URL=database_url, JWT_SECRET_KEY=secret, ALLOW_INSECURE_DB="1")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=app_dir, env=env,
+    )
+    import httpx
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError("server did not become healthy within 60s")
+
+
+async def _load(base_url: str, token: str, concurrency: int, duration: float) -> dict:
+    import httpx
+    samples = {route: [] for route in ROUTES}
+    errors = 0
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=10) as client:
+        stop_at = time.perf_counter() + duration
+
+        async def _client(offset: int):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < stop_at:
+                route = ROUTES[i % len(ROUTES)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    r = await client.get(route)
+                except httpx.TimeoutException:
+                    # A stalled worker (e.g. sync DB calls starving the pool
+                    # from the event loop) shows up here, not as a crash.
+                    errors += 1
+                    continue
+                if r.status_code != 200:
+                    errors += 1
+                    continue
+                samples[route].append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*[_client(n) for n in range(concurrency)])
+    return {"samples": samples, "errors": errors}
+
+
+def _report(result: dict, duration: float) -> None:
+    total = sum(len(v) for v in result["samples"].values())
+    print(f"  total: {total / duration:8.1f} req/s  ({total} ok, {result['errors']} errors)")
+    for route, values in result["samples"].items():
+        if not values:
+            print(f"  {route:48s} no successful requests")
+            continue
+        ordered = sorted(values)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        print(f"  {route:48s} {len(values) / duration:7.1f} req/s  "
+              f"p50={statistics.median(ordered):7.1f} ms  p99={p99:7.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the hot read routes.")
+    parser.add_argument("--app-dir", default=REPO_ROOT, help="checkout to serve (default: this one)")
+    parser.add_argument("--database-url", help="DB to seed and serve (default: temp SQLite file)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--entries", type=int, default=3000)
+    parser.add_argument("--port", type=int, default=0, help="default: any free port")
+    args = parser.parse_args(argv)
+
+    tmpdir = tempfile.mkdtemp(prefix="loadtest-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(tmpdir, 'loadtest.db')}"
+    secret = secrets.token_hex(32)
+    port = args.port or _free_port()
+
+    _seed(database_url, args.entries)
+    proc = _start_server(os.path.abspath(args.app_dir), database_url, secret, args.workers, port)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(_load(base_url, _token(secret), args.concurrency, 2.0))  # warm-up
+        result = asyncio.run(_load(base_url, _token(secret), args.concurrency, args.duration))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    print(f"{args.app_dir} — {args.workers} worker(s), {args.concurrency} clients, {args.duration:.0f}s, "
+          f"{args.entries} entries")
+    _report(result, args.duration)
+
+
+if __name__ == "__main__":
+    main()
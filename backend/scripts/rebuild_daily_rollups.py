@@ -0,0 +1,71 @@
+"""
+Rebuild the materialized `daily_rollups` rows from `entries`.
+
+Rollup rows are bucketed by local calendar day in each account's timezone, so
+they must be rebuilt whenever that zone changes outside POST /auth/timezone
+(e.g. a bulk UPDATE of auth_users.timezone), and once after first deploying
+the table so existing users hit the fast read path straight away. Users
+without current rollups are always answered correctly from `entries`; this
+just moves the one-time rebuild off the request path.
+
+Usage (against the local SQLite dev DB):
+    python -m backend.scripts.rebuild_daily_rollups
+
+Usage against Railway production (set DATABASE_URL inline):
+    DATABASE_URL="postgresql://..." python -m backend.scripts.rebuild_daily_rollups
+
+Options:
+    --user <id>   rebuild a single account (repeatable)
+    --stale-only  skip accounts whose rollups are already current
+"""
+
+import argparse
+import os
+import sys
+
+# Make `backend.*` importable when invoked as a script.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from backend.db import SessionLocal, engine, Base  # noqa: E402
+from backend.models import AuthUser  # noqa: E402
+from backend.services.daily_rollup_service import daily_rollups_ready, rebuild_daily_rollups  # noqa: E402
+from backend.services.period import user_tz_name  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild materialized daily rollups.")
+    parser.add_argument("--user", action="append", dest="users", help="only rebuild this user id")
+    parser.add_argument("--stale-only", action="store_true", help="skip users whose rollups are current")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        query = db.query(AuthUser.id, AuthUser.timezone).order_by(AuthUser.id)
+        if args.users:
+            query = query.filter(AuthUser.id.in_(args.users))
+        users = query.all()
+
+        rebuilt = skipped = rows = 0
+        for user in users:
+            tz = user_tz_name(user)
+            if args.stale_only and daily_rollups_ready(db, user.id, tz):
+                skipped += 1
+                continue
+            rows += rebuild_daily_rollups(db, user.id, tz)
+            # Commit per user so a failure midway keeps the work already done
+            # and never holds one giant transaction open on production.
+            db.commit()
+            rebuilt += 1
+
+        print(f"Rebuilt daily rollups for {rebuilt} user(s) ({rows} rows); skipped {skipped} current.")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Failed: {e}", file=sys.stderr)
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Startup profile: `python -X importtime` breakdown of `import backend.app`,
+plus the resident set size of a worker once the app is ready.
+
+Runs the import in a fresh interpreter (as for a new uvicorn worker) against a
+throwaway SQLite database, then prints total import time, peak RSS, the
+heaviest third-party packages by cumulative import time, and which of the
+optional stacks (OpenAI, Resend) got loaded. Those are deferred to first use;
+if one shows up as loaded here, something imports it at module level again
+(tests/test_startup_imports.py guards the same thing).
+
+To compare two versions, point --app-dir at each checkout in turn:
+    python -m backend.scripts.startup_profile
+    python -m backend.scripts.startup_profile --app-dir /tmp/baseline --runs 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+DEFERRED = ("openai", "resend")
+
+_BOOT = """
+import json, resource, sys
+sys.path.insert(0, {app_dir!r})
+import backend.app
+from fastapi.testclient import TestClient
+assert TestClient(backend.app.app).get("/api/health").status_code == 200
+print(json.dumps({{
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [m for m in {deferred!r} if m in sys.modules],
+}}))
+"""
+
+
+def profile_once(app_dir: str, database_url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, ALLOW_INSECURE_DB="1",
+               JWT_SECRET_KEY=os.environ.get("JWT_SECRET_KEY", "bench-only-secret-bench-only-secret-0000"))
+    code = _BOOT.format(app_dir=app_dir, deferred=DEFERRED)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=app_dir, env=env,
+                          check=True, capture_output=True, text=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # importtime lines: "import time: self [us] | cumulative | <indent>name"
+    packages = defaultdict(int)
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        name = name.strip()
+        if name == "backend.app":
+            total_us = int(cumulative)
+        root = name.split(".")[0]
+        if name == root and root != "backend":
+            packages[root] = max(packages[root], int(cumulative))
+    result["import_ms"] = total_us / 1000
+    result["packages_ms"] = {k: v / 1000 for k, v in packages.items()}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="importtime / RSS profile of backend.app startup.")
+    parser.add_argument("--app-dir", default=REPO_ROOT, help="checkout to profile (default: this one)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args(argv)
+
+    app_dir = os.path.abspath(args.app_dir)
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='startup-'), 'boot.db')}"
+    profile_once(app_dir, database_url)  # schema creation isn't what we're measuring
+    runs = [profile_once(app_dir, database_url) for _ in range(args.runs)]
+
+    print(f"{app_dir} — {len(runs)} run(s), medians")
+    print(f"  import backend.app : {statistics.median(r['import_ms'] for r in runs):8.1f} ms")
+    print(f"  peak RSS when ready: {statistics.median(r['rss_mb'] for r in runs):8.1f} MB")
+    print(f"  deferred stacks loaded at boot: {', '.join(runs[-1]['loaded']) or 'none'}")
+    names = {name for r in runs for name in r["packages_ms"]}
+    ranked = sorted(names, key=lambda n: -statistics.median(r["packages_ms"].get(n, 0) for r in runs))
+    for name in ranked[:args.top]:
+        print(f"    {statistics.median(r['packages_ms'].get(name, 0) for r in runs):8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
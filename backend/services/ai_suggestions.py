@@ -1,103 +1,230 @@
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from openai import OpenAI
-from backend.models import Entry, EntryType
+import threading
+import time
+from collections import OrderedDict
+from backend.models import AuthUser
+from backend.services.hourly_stats import WEEKDAYS, hour_weekday_buckets
+from backend.services.period import user_tz_name
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime
 from typing import Optional
 
-# Initialize OpenAI client lazily - only if API key is available
+logger = logging.getLogger(__name__)
+
+# ─── AI suggestion engine ────────────────────────────────────────────────────
+#
+# A suggestion is an LLM completion over a handful of summary stats, and the
+# round-trip takes seconds. So the route never waits on it synchronously: the
+# stats are computed on the threadpool, the completion is awaited on the
+# AsyncOpenAI client, and while it is in flight the worker's event loop keeps
+# serving other requests.
+#
+# The stats come from one grouped query (services/hourly_stats.py): at most
+# 7 × 24 rows per request, bucketed by the driver's local hour and weekday,
+# feeding both the prompt and the statistical fallback.
+#
+# Three bounds keep it cheap and predictable:
+#   - AI_SUGGESTIONS_TIMEOUT_SECONDS caps the whole call; past it the user
+#     gets the statistical fallback instead of a spinner.
+#   - AI_SUGGESTIONS_CONCURRENCY caps completions in flight per worker process
+#     (uvicorn runs one event loop per worker). A request that can't get a
+#     slot within the timeout falls back too, rather than queueing.
+#   - Completions are cached for AI_SUGGESTIONS_CACHE_TTL_SECONDS under
+#     (user_id, range, fingerprint of the stats sent to the model). Tapping
+#     "suggestions" again over unchanged data costs no LLM call; a new entry
+#     changes the stats, hence the fingerprint, hence the answer.
+#
+# The OpenAI SDK is imported on first use: it's the heaviest import in the
+# app (~0.5 s and tens of MB per worker) and most workers never serve a
+# suggestion.
+
+AI_SUGGESTIONS_MODEL = os.environ.get("AI_SUGGESTIONS_MODEL", "gpt-4o-mini")
+AI_SUGGESTIONS_TIMEOUT_SECONDS = float(os.environ.get("AI_SUGGESTIONS_TIMEOUT_SECONDS", "8"))
+AI_SUGGESTIONS_CONCURRENCY = int(os.environ.get("AI_SUGGESTIONS_CONCURRENCY", "4"))
+AI_SUGGESTIONS_CACHE_TTL_SECONDS = float(os.environ.get("AI_SUGGESTIONS_CACHE_TTL_SECONDS", "900"))
+AI_SUGGESTIONS_CACHE_MAX_ENTRIES = int(os.environ.get("AI_SUGGESTIONS_CACHE_MAX_ENTRIES", "2048"))
+
 _client = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
 _api_key = os.environ.get("AI_INTEGRATIONS_OPENAI_API_KEY")
 _base_url = os.environ.get("AI_INTEGRATIONS_OPENAI_BASE_URL")
 
+SYSTEM_PROMPT = (
+    "You are an expert delivery driver coach. Provide practical, data-driven "
+    "suggestions to help drivers maximize earnings."
+)
+
+
 def get_client():
+    """The shared AsyncOpenAI client, or None if no API key is configured."""
     global _client
     if _client is None and _api_key:
         try:
-            _client = OpenAI(api_key=_api_key, base_url=_base_url)
+            from openai import AsyncOpenAI
+            # The deadline is enforced around the whole call; no SDK retries
+            # behind it.
+            _client = AsyncOpenAI(api_key=_api_key, base_url=_base_url,
+                                  timeout=AI_SUGGESTIONS_TIMEOUT_SECONDS, max_retries=0)
         except Exception as e:
-            print(f"Warning: Failed to initialize OpenAI client: {e}")
+            logger.warning(f"Failed to initialize OpenAI client: {e}")
     return _client
 
-def get_ai_suggestions(
+
+def _bind_to_running_loop() -> None:
+    """The client's connection pool and the semaphore belong to the event
+    loop they were first used on; start fresh ones if called from another
+    (a new asyncio.run(), a test's loop)."""
+    global _client, _semaphore, _loop
+    loop = asyncio.get_running_loop()
+    if loop is not _loop:
+        _client, _semaphore, _loop = None, None, loop
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(max(1, AI_SUGGESTIONS_CONCURRENCY))
+    return _semaphore
+
+
+class _SuggestionCache:
+    """Thread-safe bounded TTL/LRU map of cache key -> suggestion text."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, text: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_cache = _SuggestionCache(AI_SUGGESTIONS_CACHE_TTL_SECONDS, AI_SUGGESTIONS_CACHE_MAX_ENTRIES)
+
+
+def suggestion_cache_stats() -> dict:
+    return _cache.stats()
+
+
+def clear_suggestion_cache() -> None:
+    _cache.clear()
+
+
+def _peak(buckets: list, key: str):
+    """(bucket value, revenue per order) of the best `key` by revenue per order."""
+    totals = {}
+    for b in buckets:
+        if b["orders"]:
+            count, revenue = totals.get(b[key], (0, 0.0))
+            totals[b[key]] = (count + b["orders"], revenue + b["revenue"])
+    if not totals:
+        return None, 0
+    best = max(sorted(totals), key=lambda k: totals[k][1] / totals[k][0])
+    return best, totals[best][1] / totals[best][0]
+
+
+def suggestion_stats(
     db: Session,
     from_date: Optional[datetime] = None,
     to_date: Optional[datetime] = None,
-    user_id: str = ""
-) -> dict:
-    """Generate AI suggestions for earning optimization based on recent data"""
-    
-    # Suggestions must always be scoped to the requesting user; a silent
-    # fallback account could surface another user's totals.
-    if not user_id:
-        raise ValueError("get_ai_suggestions requires a user_id")
-    
-    query = db.query(Entry).filter(Entry.user_id == user_id)
-    if from_date:
-        query = query.filter(Entry.timestamp >= from_date)
-    if to_date:
-        query = query.filter(Entry.timestamp <= to_date)
-    
-    entries = query.all()
-    
+    user_id: str = "",
+    tz_name: Optional[str] = None,
+) -> Optional[dict]:
+    """Summary stats of the user's entries in the range — everything the
+    suggestion depends on — or None if there are none. Folded from the local
+    hour × weekday aggregate, so peak times are the driver's own clock."""
+    if tz_name is None:
+        tz_name = user_tz_name(db.get(AuthUser, user_id))
+    buckets = hour_weekday_buckets(db, user_id, tz_name, from_date, to_date)
+    entries = sum(b["entries"] for b in buckets)
     if not entries:
-        return {
-            "suggestion": "Start logging your deliveries to get personalized earning optimization tips!",
-            "minimum_order": None,
-            "peak_time": None,
-            "reasoning": "No data available yet"
-        }
-    
-    # Calculate metrics
-    total_revenue = 0
-    total_expenses = 0
-    order_amounts = []
-    order_times = []
-    by_hour = {}
-    
-    for entry in entries:
-        amount = float(entry.amount)
-        if entry.type == EntryType.ORDER and amount > 0:
-            # Only count positive ORDER amounts (exclude cancellations)
-            total_revenue += amount
-            order_amounts.append(amount)
-            hour = entry.timestamp.hour
-            order_times.append(hour)
-            
-            if hour not in by_hour:
-                by_hour[hour] = {"count": 0, "total": 0}
-            by_hour[hour]["count"] += 1
-            by_hour[hour]["total"] += amount
-        elif entry.type == EntryType.EXPENSE:
-            total_expenses += abs(amount)
-    
-    # Calculate statistics
-    avg_order = sum(order_amounts) / len(order_amounts) if order_amounts else 0
-    min_order = min(order_amounts) if order_amounts else 0
-    max_order = max(order_amounts) if order_amounts else 0
-    
-    # Find peak time
-    peak_hour = None
-    peak_earnings = 0
-    for hour, data in by_hour.items():
-        avg_per_order = data["total"] / data["count"]
-        if avg_per_order > peak_earnings:
-            peak_earnings = avg_per_order
-            peak_hour = hour
-    
-    # Find minimum viable order based on data
-    min_viable_order = avg_order * 0.7  # 70% of average
-    
-    # Prepare context for AI
-    context = f"""
+        return None
+
+    orders = sum(b["orders"] for b in buckets)
+    total_revenue = sum(b["revenue"] for b in buckets)
+    mins = [b["min_order"] for b in buckets if b["min_order"] is not None]
+    maxes = [b["max_order"] for b in buckets if b["max_order"] is not None]
+    peak_hour, peak_earnings = _peak(buckets, "hour")
+    peak_weekday, peak_weekday_earnings = _peak(buckets, "weekday")
+
+    return {
+        "entries": entries,
+        "orders": orders,
+        "avg_order": total_revenue / orders if orders else 0,
+        "min_order": min(mins) if mins else 0,
+        "max_order": max(maxes) if maxes else 0,
+        "total_revenue": total_revenue,
+        "total_expenses": sum(b["expenses"] for b in buckets),
+        "peak_hour": peak_hour,
+        "peak_earnings": peak_earnings,
+        "peak_weekday": WEEKDAYS[peak_weekday] if peak_weekday is not None else None,
+        "peak_weekday_earnings": peak_weekday_earnings,
+    }
+
+
+def stats_fingerprint(stats: dict) -> str:
+    """Digest of the stats as the model sees them (to the cent), so float
+    noise doesn't defeat the cache."""
+    rounded = {k: round(v, 2) if isinstance(v, float) else v for k, v in stats.items()}
+    return hashlib.sha256(json.dumps(rounded, sort_keys=True).encode()).hexdigest()
+
+
+def _prompt(stats: dict) -> str:
+    return f"""
 Based on delivery driver data:
-- Total orders: {len(order_amounts)}
-- Average order value: ${avg_order:.2f}
-- Minimum order seen: ${min_order:.2f}
-- Maximum order seen: ${max_order:.2f}
-- Total revenue: ${total_revenue:.2f}
-- Total expenses: ${total_expenses:.2f}
-- Peak earning hour: {peak_hour}:00 (avg ${peak_earnings:.2f}/order)
+- Total orders: {stats["orders"]}
+- Average order value: ${stats["avg_order"]:.2f}
+- Minimum order seen: ${stats["min_order"]:.2f}
+- Maximum order seen: ${stats["max_order"]:.2f}
+- Total revenue: ${stats["total_revenue"]:.2f}
+- Total expenses: ${stats["total_expenses"]:.2f}
+- Peak earning hour (local time): {stats["peak_hour"]}:00 (avg ${stats["peak_earnings"]:.2f}/order)
+- Best day of the week: {stats["peak_weekday"]} (avg ${stats["peak_weekday_earnings"]:.2f}/order)
 
 Provide 2-3 specific, actionable tips to help this driver earn more. Focus on:
 1. Minimum order amounts to accept to optimize income
@@ -106,63 +233,101 @@ Provide 2-3 specific, actionable tips to help this driver earn more. Focus on:
 
 Keep response concise, practical, and directly applicable.
 """
-    
-    # Try to get AI suggestions if OpenAI is configured
+
+
+async def _complete(client, stats: dict) -> str:
+    """One completion, bounded by the concurrency cap and the deadline
+    (waiting for a slot counts against it). Raises asyncio.TimeoutError."""
+    async def _call():
+        async with _get_semaphore():
+            response = await client.chat.completions.create(
+                model=AI_SUGGESTIONS_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": _prompt(stats)},
+                ],
+                temperature=0.7,
+                max_tokens=300,
+            )
+            return response.choices[0].message.content
+    return await asyncio.wait_for(_call(), AI_SUGGESTIONS_TIMEOUT_SECONDS)
+
+
+def _result(stats: dict, suggestion: Optional[str], reasoning: str) -> dict:
+    peak_hour = stats["peak_hour"]
+    # Find minimum viable order based on data
+    min_viable_order = stats["avg_order"] * 0.7  # 70% of average
+    if suggestion is None:
+        peak_hours = f"{peak_hour}:00" if peak_hour else "business hours"
+        suggestion = f"Keep working during peak hours ({peak_hours}) and aim for orders above ${min_viable_order:.2f}"
+    return {
+        "suggestion": suggestion,
+        "minimum_order": round(min_viable_order, 2),
+        "peak_time": f"{peak_hour}:00 - {peak_hour+1}:00" if peak_hour is not None else None,
+        "average_order": round(stats["avg_order"], 2),
+        "total_orders": stats["orders"],
+        "reasoning": reasoning,
+    }
+
+
+NO_DATA_SUGGESTION = {
+    "suggestion": "Start logging your deliveries to get personalized earning optimization tips!",
+    "minimum_order": None,
+    "peak_time": None,
+    "reasoning": "No data available yet"
+}
+
+
+async def suggestion_for(
+    stats: dict,
+    user_id: str,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+) -> dict:
+    """The response for a user's range stats: the model's (cached) advice, or
+    the statistical fallback if it is unconfigured, slow or failing."""
+    _bind_to_running_loop()
     client = get_client()
-    
     if client is None:
         # OpenAI not configured - return statistical analysis
-        peak_hours = f"{peak_hour}:00" if peak_hour else "business hours"
-        return {
-            "suggestion": f"Keep working during peak hours ({peak_hours}) and aim for orders above ${min_viable_order:.2f}",
-            "minimum_order": round(min_viable_order, 2),
-            "peak_time": f"{peak_hour}:00 - {peak_hour+1}:00" if peak_hour else None,
-            "average_order": round(avg_order, 2),
-            "total_orders": len(order_amounts),
-            "reasoning": f"Statistical analysis of {len(entries)} entries (AI suggestions unavailable)"
-        }
-    
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert delivery driver coach. Provide practical, data-driven suggestions to help drivers maximize earnings."
-                },
-                {
-                    "role": "user",
-                    "content": context
-                }
-            ],
-            temperature=0.7,
-            max_tokens=300
-        )
-        
-        suggestion_text = response.choices[0].message.content
-        
-        # Convert peak hour to readable format
-        peak_time = None
-        if peak_hour is not None:
-            peak_time = f"{peak_hour}:00 - {peak_hour+1}:00"
-        
-        return {
-            "suggestion": suggestion_text,
-            "minimum_order": round(min_viable_order, 2),
-            "peak_time": peak_time,
-            "average_order": round(avg_order, 2),
-            "total_orders": len(order_amounts),
-            "reasoning": f"Based on {len(entries)} entries across {len(order_amounts)} orders"
-        }
-    
-    except Exception as e:
-        # Fallback if AI call fails
-        peak_hours = f"{peak_hour}:00" if peak_hour else "business hours"
-        return {
-            "suggestion": f"Keep working during peak hours ({peak_hours}) and aim for orders above ${min_viable_order:.2f}",
-            "minimum_order": round(min_viable_order, 2),
-            "peak_time": f"{peak_hour}:00 - {peak_hour+1}:00" if peak_hour else None,
-            "average_order": round(avg_order, 2),
-            "total_orders": len(order_amounts),
-            "reasoning": f"Statistical analysis of {len(entries)} entries"
-        }
+        return _result(stats, None, f"Statistical analysis of {stats['entries']} entries (AI suggestions unavailable)")
+
+    key = (
+        user_id,
+        from_date.isoformat() if from_date else None,
+        to_date.isoformat() if to_date else None,
+        stats_fingerprint(stats),
+    )
+    suggestion = _cache.get(key) if _cache.enabled else None
+    if suggestion is None:
+        try:
+            suggestion = await _complete(client, stats)
+        except asyncio.TimeoutError:
+            logger.warning(f"AI suggestion timed out after {AI_SUGGESTIONS_TIMEOUT_SECONDS:g}s; using statistics")
+        except Exception as e:
+            logger.warning(f"AI suggestion failed ({type(e).__name__}: {e}); using statistics")
+        if suggestion is None:
+            return _result(stats, None, f"Statistical analysis of {stats['entries']} entries")
+        if _cache.enabled:
+            _cache.put(key, suggestion)
+
+    return _result(stats, suggestion, f"Based on {stats['entries']} entries across {stats['orders']} orders")
+
+
+async def get_ai_suggestions(
+    db: Session,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    user_id: str = ""
+) -> dict:
+    """Generate AI suggestions for earning optimization based on recent data"""
+
+    # Suggestions must always be scoped to the requesting user; a silent
+    # fallback account could surface another user's totals.
+    if not user_id:
+        raise ValueError("get_ai_suggestions requires a user_id")
+
+    stats = await run_in_threadpool(suggestion_stats, db, from_date, to_date, user_id)
+    if stats is None:
+        return dict(NO_DATA_SUGGESTION)
+    return await suggestion_for(stats, user_id, from_date, to_date)
@@ -0,0 +1,239 @@
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+import codecs
+import csv
+import re
+
+# ─── Server-side CSV import ──────────────────────────────────────────────────
+#
+# POST /entries/import/csv takes the raw file as the request body and parses
+# it while it streams in: bytes are decoded incrementally, split into CSV
+# records (a quoted field may span lines, so a record is only released once
+# its quotes balance), and each record is mapped to an EntryCreate-shaped dict
+# for the detected export format. The route validates and inserts those dicts
+# in fixed-size chunks through services/entry_import.py, so memory stays flat
+# however large the file is and the validation / order_id dedup rules are the
+# same as the JSON import.
+#
+# Formats are matched on normalized header names ("Distance (mi)" ->
+# "distance_mi"). Each platform's export has changed column names over the
+# years, so every field lists the spellings we accept; a format is picked by
+# its signature column (the per-order id), or forced with ?platform=.
+
+
+class CsvImportError(ValueError):
+    """The file can't be imported at all (unknown format, no header)."""
+
+
+def normalize_header(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_")
+
+
+# field -> accepted header spellings (normalized), first match wins.
+CSV_FORMATS: Dict[str, dict] = {
+    "generic": {
+        # The app's own export/template, same columns the mobile importer reads.
+        "signature": ("type", "app", "amount"),
+        "app": None,
+        "fields": {
+            "type": ("type",),
+            "app": ("app",),
+            "amount": ("amount",),
+            "date": ("date",),
+            "time": ("time",),
+            "order_id": ("order_id",),
+            "distance_miles": ("distance_miles", "miles"),
+            "duration_minutes": ("duration_minutes", "minutes"),
+            "category": ("category",),
+            "note": ("note", "notes"),
+        },
+    },
+    "uber": {
+        "signature": ("trip_uuid",),
+        "app": "UBEREATS",
+        "fields": {
+            "order_id": ("trip_uuid",),
+            "datetime": ("trip_request_time", "trip_drop_off_time", "date_time", "trip_date", "date"),
+            "amount": ("paid_to_you", "total_earnings", "earnings", "total"),
+            "distance_miles": ("trip_distance_mi", "distance_mi", "distance"),
+            "duration_minutes": ("trip_duration_min", "duration_min", "duration"),
+            "note": ("description",),
+        },
+    },
+    "doordash": {
+        "signature": ("delivery_id",),
+        "app": "DOORDASH",
+        "fields": {
+            "order_id": ("delivery_id",),
+            "datetime": ("delivery_time", "dropoff_time", "dash_date", "date"),
+            "amount": ("total_pay", "dasher_pay", "total_earnings", "total"),
+            "distance_miles": ("miles", "distance_mi", "distance"),
+            "duration_minutes": ("active_time_min", "delivery_time_min", "duration"),
+            "note": ("store_name", "merchant"),
+        },
+    },
+    "instacart": {
+        "signature": ("batch_id",),
+        "app": "INSTACART",
+        "fields": {
+            "order_id": ("batch_id",),
+            "datetime": ("delivered_at", "completed_at", "batch_date", "date"),
+            "amount": ("total_earnings", "batch_earnings", "earnings", "total"),
+            "distance_miles": ("miles", "distance_mi", "distance"),
+            "duration_minutes": ("duration_min", "duration"),
+            "note": ("store", "retailer"),
+        },
+    },
+}
+
+_LOCAL_DATETIME_FORMATS = (
+    "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M",
+    "%Y-%m-%d %I:%M %p", "%Y-%m-%d %I:%M:%S %p",
+    "%m/%d/%Y %I:%M %p", "%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%y %I:%M %p", "%m/%d/%y %H:%M",
+)
+_LOCAL_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y")
+
+
+def detect_format(header: List[str], platform: Optional[str] = None) -> str:
+    if platform:
+        key = platform.strip().lower()
+        if key not in CSV_FORMATS:
+            raise CsvImportError(f"Unknown platform '{platform}'. Supported: {', '.join(CSV_FORMATS)}.")
+        return key
+    columns = set(header)
+    for key in ("uber", "doordash", "instacart", "generic"):
+        if all(col in columns for col in CSV_FORMATS[key]["signature"]):
+            return key
+    raise CsvImportError(
+        "Unrecognized CSV format. Upload an Uber, DoorDash or Instacart earnings export, "
+        "or a file with type, app and amount columns."
+    )
+
+
+def _clean_amount(raw: str) -> str:
+    value = raw.strip().replace("$", "").replace(",", "")
+    if value.startswith("(") and value.endswith(")"):
+        value = "-" + value[1:-1]
+    return value
+
+
+def _split_local_datetime(raw: str) -> dict:
+    """Wall-clock export values become date/time (interpreted in the user's
+    zone, like the mobile importer); values carrying an offset are absolute.
+    Anything else is passed through as `timestamp` so validation rejects the
+    row with a readable reason instead of defaulting it to now."""
+    value = raw.strip()
+    for fmt in _LOCAL_DATETIME_FORMATS:
+        try:
+            parsed = datetime.strptime(value, fmt)
+            return {"date": parsed.strftime("%Y-%m-%d"), "time": parsed.strftime("%H:%M")}
+        except ValueError:
+            pass
+    for fmt in _LOCAL_DATE_FORMATS:
+        try:
+            return {"date": datetime.strptime(value, fmt).strftime("%Y-%m-%d"), "time": "12:00"}
+        except ValueError:
+            pass
+    return {"timestamp": value.replace("Z", "+00:00")}
+
+
+class CsvRowMapper:
+    """Maps raw CSV records of one export format to EntryCreate-shaped dicts."""
+
+    def __init__(self, header: List[str], platform: Optional[str] = None):
+        normalized = [normalize_header(h) for h in header]
+        self.format = detect_format(normalized, platform)
+        spec = CSV_FORMATS[self.format]
+        self.app = spec["app"]
+        self.columns: Dict[str, int] = {}
+        for field, spellings in spec["fields"].items():
+            for name in spellings:
+                if name in normalized:
+                    self.columns[field] = normalized.index(name)
+                    break
+
+    def __call__(self, record: List[str]) -> dict:
+        def cell(field: str) -> str:
+            i = self.columns.get(field)
+            return record[i].strip() if i is not None and i < len(record) else ""
+
+        row: dict = {}
+        amount = _clean_amount(cell("amount"))
+        row["amount"] = amount or None
+        if self.app:
+            row["app"] = self.app
+            # Platform exports list adjustments/refunds as negative pay.
+            row["type"] = "CANCELLATION" if amount.startswith("-") else "ORDER"
+        else:
+            row["type"] = cell("type").upper() or None
+            row["app"] = cell("app").upper() or "OTHER"
+            if cell("category"):
+                row["category"] = cell("category").upper()
+        if cell("datetime"):
+            row.update(_split_local_datetime(cell("datetime")))
+        elif cell("date") or cell("time"):
+            # Same parsing as the platform exports: a bad or missing date
+            # becomes an invalid-row reject, never an entry dated now.
+            row.update(_split_local_datetime(f"{cell('date')} {cell('time')}".strip()))
+        for field in ("order_id", "note"):
+            if cell(field):
+                row[field] = cell(field)
+        for field in ("distance_miles", "duration_minutes"):
+            value = cell(field).replace(",", "")
+            if value:
+                # Durations are whole minutes; exports often say "12.0".
+                row[field] = value if field == "distance_miles" else value.split(".")[0]
+        return row
+
+
+class CsvRecordSplitter:
+    """Incrementally turns decoded text into parsed CSV records. A record is
+    emitted once its quotes balance, so quoted fields may contain newlines and
+    chunk boundaries can fall anywhere."""
+
+    def __init__(self):
+        self._tail = ""
+        self._record = ""
+
+    def feed(self, text: str) -> List[List[str]]:
+        lines = (self._tail + text).split("\n")
+        self._tail = lines.pop()
+        return self._emit(lines)
+
+    def close(self) -> List[List[str]]:
+        lines, self._tail = ([self._tail] if self._tail else []), ""
+        records = self._emit(lines)
+        if self._record:  # unterminated quote: keep what csv makes of it
+            records.extend(csv.reader([self._record]))
+            self._record = ""
+        return records
+
+    def _emit(self, lines: Iterable[str]) -> List[List[str]]:
+        records = []
+        for line in lines:
+            self._record += line + "\n"
+            if self._record.count('"') % 2:
+                continue
+            record = next(csv.reader([self._record]), [])
+            self._record = ""
+            if any(field.strip() for field in record):
+                records.append(record)
+        return records
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes], max_bytes: Optional[int] = None) -> AsyncIterator[List[str]]:
+    """Parsed records (header first) from a stream of raw bytes. UTF-8, with
+    or without a BOM; undecodable bytes are replaced rather than failing the
+    whole file. Raises CsvImportError once more than `max_bytes` arrive."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    splitter = CsvRecordSplitter()
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if max_bytes is not None and received > max_bytes:
+            raise CsvImportError(f"CSV file is larger than {max_bytes // (1024 * 1024)} MB.")
+        for record in splitter.feed(decoder.decode(chunk)):
+            yield record
+    for record in splitter.feed(decoder.decode(b"", final=True)) + splitter.close():
+        yield record
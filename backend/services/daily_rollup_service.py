@@ -0,0 +1,203 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from backend.models import Entry, DailyRollup, DailyRollupState, LeaderboardStats
+from backend.services.leaderboard_service import refresh_leaderboard_stats
+from backend.services.period import _day_bounds_utc, get_est_date_for_utc
+from pytz import timezone as pytz_timezone
+from decimal import Decimal
+from datetime import date, datetime
+from typing import Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ─── Materialized daily rollups ──────────────────────────────────────────────
+#
+# `daily_rollups` holds one row per (user, local day, type, app) so week /
+# month / custom-range rollups read a few dozen small rows instead of every
+# entry. Rows are derived data and never edited in place: every entry write
+# calls refresh_daily_rollups() with the timestamps it touched (old AND new
+# for an edit), which recomputes those whole days from `entries` inside the
+# writer's own transaction — so the rollup commits or rolls back with the
+# entry change itself.
+#
+# Day buckets depend on the account timezone (see services/period.py). The
+# zone the rows were built in is recorded in `daily_rollup_state`; when it no
+# longer matches the account's zone (or no state row exists yet) reads fall
+# back to aggregating `entries` directly and the next write rebuilds every day
+# for the user. POST /auth/timezone rebuilds eagerly, and
+# `python -m backend.scripts.rebuild_daily_rollups` backfills in bulk.
+#
+# The all-time `leaderboard_stats` row is derived from the same rollup rows
+# and refreshed alongside them, so the leaderboard never scans `entries`.
+
+
+def _bucket_entries(rows, tz_name: str, only_dates: Optional[set] = None) -> dict:
+    """Fold (timestamp, type, app, amount, miles, minutes) rows into
+    {(local_date, type, app): totals} using the same sign rules as
+    calculate_rollup (amount > 0 is revenue, everything else an expense)."""
+    buckets: dict = {}
+    for timestamp, entry_type, app, amount, miles, minutes in rows:
+        local_date = get_est_date_for_utc(timestamp, tz_name)
+        if only_dates is not None and local_date not in only_dates:
+            continue
+        bucket = buckets.get((local_date, entry_type, app))
+        if bucket is None:
+            bucket = buckets[(local_date, entry_type, app)] = {
+                "entry_count": 0,
+                "total_amount": Decimal("0"),
+                "revenue": Decimal("0"),
+                "expenses": Decimal("0"),
+                "miles": 0.0,
+                "minutes": 0,
+                "first_timestamp": timestamp,
+                "last_timestamp": timestamp,
+            }
+        amount = Decimal(str(amount))
+        bucket["entry_count"] += 1
+        bucket["total_amount"] += amount
+        if amount > 0:
+            bucket["revenue"] += amount
+        else:
+            bucket["expenses"] += abs(amount)
+        bucket["miles"] += miles or 0.0
+        bucket["minutes"] += minutes or 0
+        bucket["first_timestamp"] = min(bucket["first_timestamp"], timestamp)
+        bucket["last_timestamp"] = max(bucket["last_timestamp"], timestamp)
+    return buckets
+
+
+def _entry_columns(db: Session, user_id: str):
+    return db.query(
+        Entry.timestamp, Entry.type, Entry.app, Entry.amount,
+        Entry.distance_miles, Entry.duration_minutes,
+    ).filter(Entry.user_id == user_id)
+
+
+def _insert_buckets(db: Session, user_id: str, buckets: dict) -> None:
+    if not buckets:
+        return
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(DailyRollup, [
+        {"user_id": user_id, "local_date": local_date, "type": entry_type, "app": app,
+         "updated_at": now, **totals}
+        for (local_date, entry_type, app), totals in buckets.items()
+    ])
+
+
+def rebuild_daily_rollups(db: Session, user_id: str, tz_name: str) -> int:
+    """Recompute every daily rollup row for a user in `tz_name`. Used on first
+    write, on timezone change, and by the backfill script. Does not commit;
+    returns the number of rows written."""
+    db.flush()
+    db.query(DailyRollup).filter(DailyRollup.user_id == user_id).delete(synchronize_session=False)
+    buckets = _bucket_entries(_entry_columns(db, user_id).yield_per(1000), tz_name)
+    _insert_buckets(db, user_id, buckets)
+
+    state = db.get(DailyRollupState, user_id)
+    if state is None:
+        db.add(DailyRollupState(user_id=user_id, tz_name=tz_name, built_at=datetime.utcnow()))
+    else:
+        state.tz_name = tz_name
+        state.built_at = datetime.utcnow()
+    db.flush()
+    refresh_leaderboard_stats(db, user_id)
+    db.flush()
+    return len(buckets)
+
+
+def refresh_daily_rollups(db: Session, user_id: str, tz_name: str, timestamps: Iterable[Optional[datetime]]) -> None:
+    """Recompute the local days containing `timestamps` after an entry write.
+
+    Call AFTER the entry change is applied to the session (it is flushed here)
+    and BEFORE commit. Locks the user's state row first so two concurrent
+    writers for the same user serialize on Postgres instead of racing each
+    other's delete/insert of the same day. Falls back to a full rebuild when
+    the user has no rollups yet or they were built in another timezone.
+    """
+    db.flush()
+    state = (
+        db.query(DailyRollupState)
+        .filter(DailyRollupState.user_id == user_id)
+        .with_for_update()
+        .first()
+    )
+    if state is None or state.tz_name != tz_name:
+        rebuild_daily_rollups(db, user_id, tz_name)
+        return
+
+    dates = {get_est_date_for_utc(ts, tz_name) for ts in timestamps if ts is not None}
+    if not dates:
+        return
+    tz = pytz_timezone(tz_name)
+    first, last = min(dates), max(dates)
+    start_utc, _ = _day_bounds_utc(tz, first.year, first.month, first.day)
+    _, end_utc = _day_bounds_utc(tz, last.year, last.month, last.day)
+
+    db.query(DailyRollup).filter(
+        DailyRollup.user_id == user_id,
+        DailyRollup.local_date.in_(dates),
+    ).delete(synchronize_session=False)
+    rows = _entry_columns(db, user_id).filter(
+        Entry.timestamp >= start_utc,
+        Entry.timestamp <= end_utc,
+    )
+    _insert_buckets(db, user_id, _bucket_entries(rows, tz_name, only_dates=dates))
+    db.flush()
+    refresh_leaderboard_stats(db, user_id)
+    db.flush()
+
+
+def clear_daily_rollups(db: Session, user_id: str) -> None:
+    """Drop a user's rollup rows and state (e.g. after deleting all entries).
+    Reads fall back to `entries` until the next write rebuilds."""
+    db.query(DailyRollup).filter(DailyRollup.user_id == user_id).delete(synchronize_session=False)
+    db.query(DailyRollupState).filter(DailyRollupState.user_id == user_id).delete(synchronize_session=False)
+    db.query(LeaderboardStats).filter(LeaderboardStats.user_id == user_id).delete(synchronize_session=False)
+
+
+def daily_rollups_ready(db: Session, user_id: str, tz_name: str) -> bool:
+    state = db.get(DailyRollupState, user_id)
+    return state is not None and state.tz_name == tz_name
+
+
+def whole_day_span(from_date: Optional[datetime], to_date: Optional[datetime], tz_name: str):
+    """If [from_date, to_date] is exactly a run of whole local days in
+    `tz_name` (which every period.py window and every YYYY-MM-DD custom range
+    is), return (first_date, last_date); (None, None) for an unbounded
+    all-time window. Returns None for anything else (ISO datetime ranges,
+    half-open windows) — those must aggregate `entries` directly."""
+    if from_date is None and to_date is None:
+        return (None, None)
+    if from_date is None or to_date is None:
+        return None
+    tz = pytz_timezone(tz_name)
+    first: date = get_est_date_for_utc(from_date, tz_name)
+    last: date = get_est_date_for_utc(to_date, tz_name)
+    if _day_bounds_utc(tz, first.year, first.month, first.day)[0] != from_date:
+        return None
+    if _day_bounds_utc(tz, last.year, last.month, last.day)[1] != to_date:
+        return None
+    return (first, last)
+
+
+def daily_rollup_groups(db: Session, user_id: str, first: Optional[date], last: Optional[date]):
+    """Per-(type, app) sums over the rollup rows in [first, last], in the same
+    tuple shape as rollup_service's grouped `entries` query."""
+    query = db.query(
+        DailyRollup.type,
+        DailyRollup.app,
+        func.sum(DailyRollup.entry_count),
+        func.sum(DailyRollup.total_amount),
+        func.sum(DailyRollup.revenue),
+        func.sum(DailyRollup.expenses),
+        func.sum(DailyRollup.miles),
+        func.sum(DailyRollup.minutes),
+        func.min(DailyRollup.first_timestamp),
+        func.max(DailyRollup.last_timestamp),
+    ).filter(DailyRollup.user_id == user_id)
+    if first is not None:
+        query = query.filter(DailyRollup.local_date >= first)
+    if last is not None:
+        query = query.filter(DailyRollup.local_date <= last)
+    return query.group_by(DailyRollup.type, DailyRollup.app).all()
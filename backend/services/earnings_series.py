@@ -0,0 +1,148 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import Date, DateTime, case, cast, func, literal_column, select
+from backend.models import DailyRollup, Entry, EntryType
+from backend.services.daily_rollup_service import daily_rollups_ready, whole_day_span
+from backend.services.period import get_est_date_for_utc, local_time_sql
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional
+
+# ─── Per-day / week / month earnings series ──────────────────────────────────
+#
+# One row per local bucket (day, Monday-start week, or calendar month) with
+# revenue, expenses, profit, miles and order count, so a chart is one request
+# and one grouped query instead of a rollup per day_offset.
+#
+# Like calculate_rollup, whole-local-day ranges (every YYYY-MM-DD range) read
+# `daily_rollups` when they're current for the user's timezone and just group
+# the stored local_date; anything else groups `entries` by its local date
+# computed in SQL (period.local_time_sql). Totals follow the rollup's sign
+# rules (amount > 0 is revenue, the rest expenses; profit is the net) and
+# `orders` counts ORDER entries the way /rollup's order_count does, so a
+# series sums to the rollup of the same range.
+#
+# Buckets with no entries are filled with zeros between the range bounds (or
+# the first and last bucket with data, for an open range).
+
+SERIES_BUCKETS = ("day", "week", "month")
+
+
+def _bucket_start(dialect_name: str, local_date, bucket: str):
+    """SQL for the first local date of `local_date`'s bucket."""
+    if bucket == "day":
+        return local_date
+    if dialect_name.startswith("postgres"):
+        return cast(func.date_trunc(bucket, cast(local_date, DateTime)), Date)
+    if bucket == "week":
+        # Forward to the week's Sunday (same day if it is one), back to Monday.
+        return func.date(local_date, "weekday 0", "-6 days", type_=Date)
+    return func.date(local_date, "start of month", type_=Date)
+
+
+def _money(value) -> float:
+    return float(round(Decimal(str(value or 0)), 2))
+
+
+def _python_bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, bucket: str) -> date:
+    if bucket == "week":
+        return start + timedelta(days=7)
+    if bucket == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _rollup_query(dialect_name: str, user_id: str, first: Optional[date], last: Optional[date], bucket: str):
+    start = _bucket_start(dialect_name, DailyRollup.local_date, bucket).label("bucket_start")
+    query = select(
+        start,
+        func.sum(DailyRollup.revenue).label("revenue"),
+        func.sum(DailyRollup.expenses).label("expenses"),
+        func.sum(DailyRollup.total_amount).label("profit"),
+        func.sum(DailyRollup.miles).label("miles"),
+        func.sum(case((DailyRollup.type == EntryType.ORDER, DailyRollup.entry_count), else_=0)).label("orders"),
+    ).where(DailyRollup.user_id == user_id)
+    if first is not None:
+        query = query.where(DailyRollup.local_date >= first)
+    if last is not None:
+        query = query.where(DailyRollup.local_date <= last)
+    return query
+
+
+def _entries_query(dialect_name: str, user_id: str, tz_name: str,
+                   from_date: Optional[datetime], to_date: Optional[datetime], bucket: str):
+    local_date = func.date(local_time_sql(dialect_name, Entry.timestamp, tz_name, from_date, to_date), type_=Date)
+    start = _bucket_start(dialect_name, local_date, bucket).label("bucket_start")
+    amount = Entry.amount
+    query = select(
+        start,
+        func.coalesce(func.sum(case((amount > 0, amount), else_=0)), 0).label("revenue"),
+        func.abs(func.coalesce(func.sum(case((amount <= 0, amount), else_=0)), 0)).label("expenses"),
+        func.coalesce(func.sum(amount), 0).label("profit"),
+        func.coalesce(func.sum(Entry.distance_miles), 0.0).label("miles"),
+        func.sum(case((Entry.type == EntryType.ORDER, 1), else_=0)).label("orders"),
+    ).where(Entry.user_id == user_id)
+    if from_date:
+        query = query.where(Entry.timestamp >= from_date)
+    if to_date:
+        query = query.where(Entry.timestamp <= to_date)
+    return query
+
+
+def earnings_series(
+    db: Session,
+    user_id: str,
+    tz_name: str,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+    bucket: str = "day",
+) -> List[dict]:
+    """[{start, revenue, expenses, profit, miles, orders}] per local bucket
+    in [from_date, to_date] (naive UTC), oldest first, gaps zero-filled."""
+    if bucket not in SERIES_BUCKETS:
+        raise ValueError(f"bucket must be one of {SERIES_BUCKETS}")
+    if not user_id:
+        raise ValueError("earnings_series requires a user_id")
+    dialect_name = db.get_bind().dialect.name
+    span = whole_day_span(from_date, to_date, tz_name)
+    if span is not None and daily_rollups_ready(db, user_id, tz_name):
+        query = _rollup_query(dialect_name, user_id, *span, bucket)
+    else:
+        query = _entries_query(dialect_name, user_id, tz_name, from_date, to_date, bucket)
+    # By output name: the bound unit / modifiers would make Postgres treat a
+    # repeated GROUP BY expression as a different one.
+    query = query.group_by(literal_column("bucket_start")).order_by(literal_column("bucket_start"))
+
+    rows = {}
+    for row in db.execute(query):
+        start = row.bucket_start
+        if isinstance(start, datetime):
+            start = start.date()
+        rows[start] = {
+            "start": start,
+            "revenue": _money(row.revenue),
+            "expenses": _money(row.expenses),
+            "profit": _money(row.profit),
+            "miles": round(float(row.miles or 0), 2),
+            "orders": int(row.orders or 0),
+        }
+
+    first = _python_bucket_start(get_est_date_for_utc(from_date, tz_name), bucket) if from_date else min(rows, default=None)
+    last = _python_bucket_start(get_est_date_for_utc(to_date, tz_name), bucket) if to_date else max(rows, default=None)
+    if first is None or last is None:
+        return list(rows.values())
+    series = []
+    current = first
+    while current <= last:
+        series.append(rows.get(current) or {
+            "start": current, "revenue": 0.0, "expenses": 0.0, "profit": 0.0, "miles": 0.0, "orders": 0,
+        })
+        current = _next_bucket(current, bucket)
+    return series
@@ -1,6 +1,5 @@
 import asyncio
 import os
-import resend
 from typing import Optional
 
 RESEND_API_KEY = os.environ.get("RESEND_API_KEY", "")
@@ -18,7 +17,14 @@ RESEND_FROM = os.environ.get("RESEND_FROM", "Earnings Ninja <onboarding@resend.d
 # RESEND_REPLY_TO; set to empty to omit the header entirely.
 RESEND_REPLY_TO = os.environ.get("RESEND_REPLY_TO", "earningsninjaapp@gmail.com").strip()
 
-resend.api_key = RESEND_API_KEY
+
+def resend_client():
+    """The Resend SDK, imported on first send rather than at boot (it drags in
+    `requests` and friends, which most workers never need). The key is applied
+    on every call so it always matches RESEND_API_KEY here."""
+    import resend
+    resend.api_key = RESEND_API_KEY
+    return resend
 
 # Legal pages on the branded production domain — the single source of truth
 # for legal links in outgoing emails. (Never earningsninja.APP — its /privacy
@@ -155,7 +161,7 @@ If you didn't request a password reset, you can safely ignore this email — you
         # directly inside an async route/background task stalls the whole event
         # loop until Resend responds, serializing every other request behind it.
         # Offload to a worker thread so dispatch is non-blocking and concurrent.
-        email_response = await asyncio.to_thread(resend.Emails.send, params)
+        email_response = await asyncio.to_thread(resend_client().Emails.send, params)
         print(f"[Email Service] Password reset email sent to {to_email}, id: {email_response.get('id', 'unknown')}")
         return True
     except Exception as e:
@@ -242,7 +248,7 @@ This code expires in 10 minutes. If you didn't try to sign in, change your passw
         # directly inside an async route/background task stalls the whole event
         # loop until Resend responds, serializing every other request behind it.
         # Offload to a worker thread so dispatch is non-blocking and concurrent.
-        email_response = await asyncio.to_thread(resend.Emails.send, params)
+        email_response = await asyncio.to_thread(resend_client().Emails.send, params)
         print(f"[Email Service] MFA code email sent to {to_email}, id: {email_response.get('id', 'unknown')}")
         return True
     except Exception as e:
@@ -328,7 +334,7 @@ This code expires in 24 hours. If you didn't create an account, ignore this emai
         # directly inside an async route/background task stalls the whole event
         # loop until Resend responds, serializing every other request behind it.
         # Offload to a worker thread so dispatch is non-blocking and concurrent.
-        email_response = await asyncio.to_thread(resend.Emails.send, params)
+        email_response = await asyncio.to_thread(resend_client().Emails.send, params)
         print(f"[Email Service] Verification email sent to {to_email}, id: {email_response.get('id', 'unknown')}")
         return True
     except Exception as e:
@@ -426,7 +432,7 @@ Terms of Service: {TERMS_URL}
         # directly inside an async route/background task stalls the whole event
         # loop until Resend responds, serializing every other request behind it.
         # Offload to a worker thread so dispatch is non-blocking and concurrent.
-        email_response = await asyncio.to_thread(resend.Emails.send, params)
+        email_response = await asyncio.to_thread(resend_client().Emails.send, params)
         print(f"[Email Service] Welcome email sent to {to_email}, id: {email_response.get('id', 'unknown')}")
         return True
     except Exception as e:
@@ -0,0 +1,189 @@
+from sqlalchemy import inspect, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from pydantic import ValidationError
+from backend.models import Entry, EntryType
+from backend.schemas import EntryCreate
+from backend.services.daily_rollup_service import refresh_daily_rollups
+from datetime import datetime
+from typing import Any, Callable, Iterable, List, Optional
+
+# ─── Bulk entry import ───────────────────────────────────────────────────────
+#
+# POST /entries/import used to build one ORM Entry per CSV row, db.add() it,
+# and db.refresh() every row after commit — thousands of round-trips for a
+# single platform export. Rows are now turned into plain dicts and inserted in
+# multi-row INSERT ... RETURNING batches (SQLAlchemy's insertmanyvalues), so a
+# 5,000-row file is a handful of statements.
+#
+# Duplicate orders are rejected by the database, not an in-memory set of every
+# order id the user has: uq_entries_user_order_id (partial unique on
+# (user_id, order_id) for non-empty ids) plus ON CONFLICT (user_id, order_id)
+# WHERE <the index predicate> DO NOTHING. Rows the INSERT skipped are simply
+# absent from RETURNING; any other constraint violation still raises.
+#
+# An old database that still has duplicate order ids has no such index (the
+# boot migration defers it until they're cleaned up). There each batch first
+# looks up which of its order ids the user already has — one
+# `order_id IN (...)` query per batch — and inserts only the rest, so imports
+# keep deduping across files, just without the database guarding a race.
+#
+# Every row that doesn't become an entry is reported back with its position in
+# the payload and a reason, rather than silently dropped.
+
+IMPORT_BATCH_SIZE = 500
+
+REJECT_INVALID = "invalid_row"
+REJECT_DUPLICATE_IN_FILE = "duplicate_in_file"
+REJECT_DUPLICATE_ORDER = "duplicate_order_id"
+
+ORDER_ID_INDEX = "uq_entries_user_order_id"
+# Must match the index's WHERE clause for Postgres to pick it as the arbiter.
+ORDER_ID_INDEX_WHERE = text("order_id IS NOT NULL AND order_id <> ''")
+
+# Binds the index has been seen on. Only presence is cached: a database
+# without it gets it from a later migration run, and is re-checked until then.
+_order_id_index_binds = set()
+
+
+def _reject(row: int, reason: str, order_id: Optional[str] = None, detail: Optional[str] = None) -> dict:
+    out = {"row": row, "reason": reason}
+    if order_id:
+        out["order_id"] = order_id
+    if detail:
+        out["detail"] = detail
+    return out
+
+
+def _validation_detail(exc: ValidationError) -> str:
+    err = exc.errors()[0]
+    field = ".".join(str(p) for p in err.get("loc", ())) or "row"
+    return f"{field}: {err.get('msg', 'invalid value')}"
+
+
+def entry_values(entry: EntryCreate, user_id: str, to_utc: Callable[[str, str], datetime]) -> dict:
+    """Column values for one imported row, with the same sign and timestamp
+    rules as create_entry. `to_utc(date, time)` converts user-local wall-clock
+    components; on failure the row falls back to its ISO timestamp / now."""
+    amount = entry.amount
+    if entry.type in [EntryType.EXPENSE, EntryType.CANCELLATION]:
+        amount = -abs(amount)
+    else:
+        amount = abs(amount)
+
+    if entry.date and entry.time:
+        try:
+            timestamp = to_utc(entry.date, entry.time)
+        except Exception:
+            timestamp = entry.timestamp or datetime.utcnow()
+    else:
+        timestamp = entry.timestamp or datetime.utcnow()
+
+    return {
+        "user_id": user_id,
+        "timestamp": timestamp,
+        "type": entry.type,
+        "app": entry.app,
+        "order_id": (entry.order_id or "").strip() or None,
+        "amount": amount,
+        "distance_miles": entry.distance_miles or 0.0,
+        "duration_minutes": entry.duration_minutes or 0,
+        "category": entry.category,
+        "note": entry.note,
+        "receipt_url": entry.receipt_url,
+    }
+
+
+def dialect_insert(db: Session):
+    """The dialect's insert() — both support ON CONFLICT and RETURNING."""
+    return pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+
+def _has_order_id_index(db: Session) -> bool:
+    bind = db.get_bind()
+    if bind in _order_id_index_binds:
+        return True
+    if any(ix["name"] == ORDER_ID_INDEX for ix in inspect(db.connection()).get_indexes("entries")):
+        _order_id_index_binds.add(bind)
+        return True
+    return False
+
+
+def _existing_order_ids(db: Session, user_id: str, order_ids: List[str]) -> set:
+    if not order_ids:
+        return set()
+    return set(db.scalars(select(Entry.order_id).where(Entry.user_id == user_id, Entry.order_id.in_(order_ids))))
+
+
+def import_entry_rows(
+    db: Session,
+    user_id: str,
+    tz_name: str,
+    rows: Iterable[Any],
+    to_utc: Callable[[str, str], datetime],
+    first_row: int = 0,
+    seen_order_ids: Optional[set] = None,
+) -> tuple:
+    """Validate, dedupe and bulk-insert `rows` (raw dicts or EntryCreate) for
+    one user inside the caller's transaction, and refresh the daily rollups for
+    every day touched. Returns (inserted Entry objects, rejects).
+
+    `first_row` offsets the row numbers in rejects and `seen_order_ids` carries
+    the in-file dedup set across calls, so a caller streaming a large file can
+    import it chunk by chunk. The caller commits."""
+    seen = seen_order_ids if seen_order_ids is not None else set()
+    rejects: List[dict] = []
+    pending: List[tuple] = []  # (row number, values)
+
+    for n, raw in enumerate(rows, start=first_row):
+        try:
+            entry = raw if isinstance(raw, EntryCreate) else EntryCreate.model_validate(raw)
+            values = entry_values(entry, user_id, to_utc)
+        except ValidationError as e:
+            rejects.append(_reject(n, REJECT_INVALID, detail=_validation_detail(e)))
+            continue
+        except (TypeError, ValueError, ArithmeticError):
+            rejects.append(_reject(n, REJECT_INVALID))
+            continue
+        order_id = values["order_id"]
+        if order_id:
+            if order_id in seen:
+                rejects.append(_reject(n, REJECT_DUPLICATE_IN_FILE, order_id))
+                continue
+            seen.add(order_id)
+        pending.append((n, values))
+
+    inserted: List[Entry] = []
+    guarded = _has_order_id_index(db)
+    stmt = dialect_insert(db)(Entry)
+    if guarded:
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[Entry.user_id, Entry.order_id], index_where=ORDER_ID_INDEX_WHERE,
+        )
+    stmt = stmt.returning(Entry)
+    for start in range(0, len(pending), IMPORT_BATCH_SIZE):
+        batch = pending[start:start + IMPORT_BATCH_SIZE]
+        if not guarded:
+            taken = _existing_order_ids(db, user_id, [values["order_id"] for _, values in batch if values["order_id"]])
+            rejects.extend(_reject(n, REJECT_DUPLICATE_ORDER, values["order_id"])
+                           for n, values in batch if values["order_id"] in taken)
+            batch = [(n, values) for n, values in batch if values["order_id"] not in taken]
+            if not batch:
+                continue
+        created = db.scalars(stmt, [values for _, values in batch]).all()
+        inserted.extend(created)
+        if len(created) != len(batch):
+            # Only order-id rows can conflict; whatever didn't come back was
+            # already on the account.
+            landed = {e.order_id for e in created if e.order_id}
+            rejects.extend(
+                _reject(n, REJECT_DUPLICATE_ORDER, values["order_id"])
+                for n, values in batch
+                if values["order_id"] and values["order_id"] not in landed
+            )
+
+    if inserted:
+        refresh_daily_rollups(db, user_id, tz_name, [e.timestamp for e in inserted])
+    rejects.sort(key=lambda r: r["row"])
+    return inserted, rejects
@@ -0,0 +1,107 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+from sqlalchemy import and_, case, distinct, func, literal_column, select
+from sqlalchemy.orm import Session
+from backend.models import Entry, EntryType
+from backend.services.period import local_parts_sql
+
+# ─── Local hour × weekday aggregates ─────────────────────────────────────────
+#
+# One GROUP BY over a user's entries in a range, bucketed by the LOCAL weekday
+# and hour of each entry in the user's timezone (see period.local_parts_sql).
+# The database returns at most 7 × 24 rows however many entries the range
+# holds, and every per-hour, per-weekday or whole-range figure downstream
+# (suggestion stats, the analytics heatmap) is folded from those rows.
+#
+# Sign rules match calculate_rollup: a positive ORDER is an order (revenue),
+# an EXPENSE counts by its absolute amount; cancellations (ORDER <= 0) are
+# counted as entries only.
+#
+# `hours` is the number of distinct local dates with an entry in the bucket,
+# i.e. how many times the driver was out in that weekday-hour; revenue over it
+# is what an hour in that slot has actually paid.
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def hour_weekday_buckets(
+    db: Session,
+    user_id: str,
+    tz_name: str,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+) -> List[dict]:
+    """[{weekday (0 = Monday), hour, entries, hours, orders, revenue,
+    min_order, max_order, expenses}] for every local (weekday, hour) with
+    entries."""
+    weekday, hour, day = local_parts_sql(db.get_bind().dialect.name, Entry.timestamp, tz_name, from_date, to_date)
+    is_order = and_(Entry.type == EntryType.ORDER, Entry.amount > 0)
+    order_amount = case((is_order, Entry.amount))
+
+    query = (
+        select(
+            weekday.label("local_dow"),
+            hour.label("local_hour"),
+            func.count(Entry.id).label("entries"),
+            func.count(distinct(day)).label("hours"),
+            func.count(order_amount).label("orders"),
+            func.coalesce(func.sum(order_amount), 0).label("revenue"),
+            func.min(order_amount).label("min_order"),
+            func.max(order_amount).label("max_order"),
+            func.coalesce(func.sum(case((Entry.type == EntryType.EXPENSE, func.abs(Entry.amount)), else_=0)), 0)
+            .label("expenses"),
+        )
+        .where(Entry.user_id == user_id)
+        # By output name, so the zone shift is written (and bound) once.
+        .group_by(literal_column("local_dow"), literal_column("local_hour"))
+    )
+    if from_date:
+        query = query.where(Entry.timestamp >= from_date)
+    if to_date:
+        query = query.where(Entry.timestamp <= to_date)
+
+    return [
+        {
+            "weekday": (int(row.local_dow) + 6) % 7,
+            "hour": int(row.local_hour),
+            "entries": row.entries,
+            "hours": row.hours,
+            "orders": row.orders,
+            "revenue": float(row.revenue),
+            "min_order": float(row.min_order) if row.min_order is not None else None,
+            "max_order": float(row.max_order) if row.max_order is not None else None,
+            "expenses": float(row.expenses),
+        }
+        for row in db.execute(query)
+    ]
+
+
+def _cell(bucket: Optional[dict]) -> dict:
+    if bucket is None:
+        return {"orders": 0, "revenue": 0.0, "average_order_value": 0.0, "hours": 0, "dollars_per_hour": 0.0}
+    orders, hours = bucket["orders"], bucket["hours"]
+    # Divide in Decimal, as calculate_rollup does, so half-cents round the
+    # same way on every path.
+    revenue = Decimal(str(bucket["revenue"]))
+    return {
+        "orders": orders,
+        "revenue": float(round(revenue, 2)),
+        "average_order_value": float(round(revenue / orders, 2)) if orders else 0.0,
+        "hours": hours,
+        "dollars_per_hour": float(round(revenue / hours, 2)) if hours else 0.0,
+    }
+
+
+def earnings_heatmap(
+    db: Session,
+    user_id: str,
+    tz_name: str,
+    from_date: Optional[datetime] = None,
+    to_date: Optional[datetime] = None,
+) -> List[List[dict]]:
+    """7 × 24 grid, grid[weekday][hour] (0 = Monday, local time), of orders,
+    revenue, average order value, hours worked and $/hour. Empty slots are
+    zero cells, so the client can render the grid as is."""
+    by_slot = {(b["weekday"], b["hour"]): b for b in hour_weekday_buckets(db, user_id, tz_name, from_date, to_date)}
+    return [[_cell(by_slot.get((day, hour))) for hour in range(24)] for day in range(7)]
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.orm import Session
+from backend.models import Job
+from backend.services.entry_import import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# ─── Job queue ───────────────────────────────────────────────────────────────
+#
+# Background work (platform order sync) runs in dedicated worker processes
+# (`python -m backend.worker`), not inside the uvicorn workers. The two sides
+# meet in the `jobs` table: web code only enqueue()s; workers claim_next() a
+# runnable job under a lease, run it, and complete() or fail() it.
+#
+# Claiming is SELECT ... FOR UPDATE SKIP LOCKED on Postgres, so any number of
+# workers can poll without blocking on each other, followed by a guarded
+# UPDATE (compare-and-set on status / attempts) that also keeps SQLite — which
+# renders no row locks — from handing one job to two workers. The worker
+# running a job renews its lease every third of the lease time (renew_lease),
+# so however long a sync takes it keeps the job; one that dies mid-job stops
+# renewing, the lease expires after the kind's lease time, and the job is
+# claimed again, up to max_attempts.
+#
+# complete() and fail() are compare-and-set as well: they only write when the
+# job is still running under the reporting worker's id. A worker whose lease
+# lapsed (stalled past it, heartbeat lost) and whose job was claimed again
+# drops its outcome instead of overwriting the new owner's run.
+#
+# Periodic jobs are enqueued with a dedup_key naming their time slot (unique,
+# ON CONFLICT DO NOTHING), so however many workers tick the schedule, each
+# slot runs exactly once. Finished jobs are kept JOB_RETENTION_DAYS for
+# last_result and inspection, then deleted (purge_finished).
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+JOB_SYNC_ORDERS = "sync_orders"
+JOB_PRECOMPUTE_SUGGESTIONS = "precompute_suggestions"
+JOB_REFRESH_SUGGESTION = "refresh_suggestion"
+
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "900"))
+# Kinds whose single steps can outlast the default lease (how long a dead
+# worker's job waits before it is retried).
+JOB_LEASES = {
+    JOB_PRECOMPUTE_SUGGESTIONS: 4 * 3600,
+}
+JOB_RETRY_BASE_SECONDS = 30
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "14"))
+
+
+def job_lease_seconds(kind: str) -> int:
+    return JOB_LEASES.get(kind, JOB_LEASE_SECONDS)
+
+
+def enqueue(db: Session, kind: str, payload: Optional[dict] = None, dedup_key: Optional[str] = None,
+            run_at: Optional[datetime] = None, max_attempts: int = 3) -> Optional[int]:
+    """Queue a job inside the caller's transaction and return its id, or None
+    if a job with the same dedup_key already exists. The caller commits."""
+    now = datetime.utcnow()
+    stmt = dialect_insert(db)(Job).values(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        dedup_key=dedup_key,
+        status=JOB_QUEUED,
+        run_at=run_at or now,
+        attempts=0,
+        max_attempts=max_attempts,
+        created_at=now,
+        updated_at=now,
+    ).on_conflict_do_nothing().returning(Job.id)
+    return db.execute(stmt).scalar()
+
+
+def claimable_jobs(kinds: Iterable[str], now: datetime):
+    """The oldest runnable job of `kinds`: queued and due, or running with an
+    expired lease. Row-locked with SKIP LOCKED where the dialect supports it."""
+    return (
+        select(Job)
+        .where(
+            Job.kind.in_(list(kinds)),
+            or_(
+                and_(Job.status == JOB_QUEUED, Job.run_at <= now),
+                and_(Job.status == JOB_RUNNING, Job.locked_until < now),
+            ),
+        )
+        .order_by(Job.run_at, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def claim_next(db: Session, worker_id: str, kinds: Iterable[str],
+               lease_seconds: Optional[int] = None) -> Optional[Job]:
+    """Lease the next runnable job to `worker_id` and commit the claim.
+    Returns None when nothing is runnable."""
+    kinds = list(kinds)
+    while True:
+        now = datetime.utcnow()
+        job = db.scalars(claimable_jobs(kinds, now)).first()
+        if job is None:
+            db.rollback()
+            return None
+        if job.attempts >= job.max_attempts:
+            # Its last lease ran out without the worker reporting back.
+            job.status = JOB_FAILED
+            job.last_error = job.last_error or "lease expired"
+            job.finished_at = now
+            db.commit()
+            logger.error(f"Job {job.id} ({job.kind}) failed: lease expired after {job.attempts} attempts")
+            continue
+        lease = timedelta(seconds=lease_seconds or job_lease_seconds(job.kind))
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.status == job.status, Job.attempts == job.attempts)
+            .values(status=JOB_RUNNING, attempts=job.attempts + 1, locked_by=worker_id,
+                    locked_until=now + lease, updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if claimed:
+            db.refresh(job)
+            return job
+        # Another worker took it between our read and write; look again.
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str, lease_seconds: int) -> bool:
+    """Push a running job's lease out by `lease_seconds` and commit. False if
+    the job is no longer this worker's (finished, or its lease already ran
+    out and another worker claimed it)."""
+    now = datetime.utcnow()
+    renewed = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JOB_RUNNING, Job.locked_by == worker_id)
+        .values(locked_until=now + timedelta(seconds=lease_seconds), updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return bool(renewed)
+
+
+def _finish(db: Session, job: Job, worker_id: str, values: dict) -> bool:
+    """Write a running job's outcome and commit, if it is still `worker_id`'s."""
+    finished = db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == JOB_RUNNING, Job.locked_by == worker_id)
+        .values(locked_until=None, **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if not finished:
+        logger.warning(f"Job {job.id} ({job.kind}) is no longer {worker_id}'s; its outcome was dropped")
+    return bool(finished)
+
+
+def complete(db: Session, job: Job, worker_id: str, result: Optional[dict] = None) -> bool:
+    """Mark `worker_id`'s running job done. False (nothing written) if the
+    job is no longer its."""
+    now = datetime.utcnow()
+    return _finish(db, job, worker_id, {
+        "status": JOB_DONE,
+        "result": json.dumps(result, default=str) if result is not None else None,
+        "finished_at": now,
+        "updated_at": now,
+    })
+
+
+def fail(db: Session, job: Job, worker_id: str, error: str) -> bool:
+    """Record a failed attempt: back off and requeue, or give up after
+    max_attempts. False (nothing written) if the job is no longer
+    `worker_id`'s."""
+    now = datetime.utcnow()
+    values = {"last_error": error[:2000], "updated_at": now}
+    if job.attempts < job.max_attempts:
+        values.update(status=JOB_QUEUED,
+                      run_at=now + timedelta(seconds=JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)))
+    else:
+        values.update(status=JOB_FAILED, finished_at=now)
+    return _finish(db, job, worker_id, values)
+
+
+def purge_finished(db: Session, now: datetime) -> int:
+    """Delete done and failed jobs that finished more than JOB_RETENTION_DAYS
+    before `now`; returns how many. The caller commits."""
+    return db.execute(
+        delete(Job)
+        .where(Job.status.in_([JOB_DONE, JOB_FAILED]),
+               Job.finished_at < now - timedelta(days=JOB_RETENTION_DAYS))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def job_payload(job: Job) -> dict:
+    return json.loads(job.payload) if job.payload else {}
+
+
+def last_result(db: Session, kind: str) -> Optional[dict]:
+    """Result of the most recently finished `kind` job, if any."""
+    result = db.scalars(
+        select(Job.result)
+        .where(Job.kind == kind, Job.status == JOB_DONE)
+        .order_by(Job.finished_at.desc())
+        .limit(1)
+    ).first()
+    return json.loads(result) if result else None
@@ -0,0 +1,90 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import case, func
+from backend.models import AuthUser, DailyRollup, EntryType, LeaderboardStats
+from decimal import Decimal
+from datetime import datetime
+from typing import Iterable
+
+POINTS_PER_ENTRY = 10
+
+
+def points_for(positive_earnings, entry_count: int) -> int:
+    """Leaderboard points: whole dollars earned (positive amounts only) plus a
+    flat bonus per logged entry."""
+    return int(positive_earnings or 0) + (entry_count or 0) * POINTS_PER_ENTRY
+
+
+def refresh_leaderboard_stats(db: Session, user_id: str) -> None:
+    """Recompute a user's leaderboard row from their daily rollups. Called by
+    daily_rollup_service right after it rewrites rollup rows, inside the same
+    transaction. Reads a few hundred small rows at most, never `entries`."""
+    entry_count, positive, orders = db.query(
+        func.coalesce(func.sum(DailyRollup.entry_count), 0),
+        func.coalesce(func.sum(DailyRollup.revenue), 0),
+        func.coalesce(func.sum(case((DailyRollup.type == EntryType.ORDER, DailyRollup.total_amount), else_=0)), 0),
+    ).filter(DailyRollup.user_id == user_id).one()
+
+    stats = db.get(LeaderboardStats, user_id)
+    if not entry_count:
+        if stats is not None:
+            db.delete(stats)
+        return
+    if stats is None:
+        stats = LeaderboardStats(user_id=user_id)
+        db.add(stats)
+    positive = Decimal(str(positive))
+    stats.entry_count = int(entry_count)
+    stats.positive_earnings = positive
+    stats.order_earnings = Decimal(str(orders))
+    stats.points = points_for(positive, int(entry_count))
+    stats.updated_at = datetime.utcnow()
+
+
+def _ranked_columns(db: Session):
+    return db.query(
+        AuthUser.id,
+        AuthUser.first_name,
+        AuthUser.profile_image_url,
+        func.coalesce(LeaderboardStats.points, 0).label("points"),
+        func.coalesce(LeaderboardStats.order_earnings, 0).label("order_earnings"),
+    )
+
+
+def top_users(db: Session, exclude_ids: Iterable[str], limit: int = 50):
+    """The `limit` highest-ranked users, excluding `exclude_ids`. Ranked rows
+    come from the indexed `leaderboard_stats.points`; when fewer users than
+    `limit` have any entries the list is padded with 0-point accounts, exactly
+    like the old every-user scan produced."""
+    exclude_ids = list(exclude_ids)
+    ranked = (
+        _ranked_columns(db)
+        .join(LeaderboardStats, LeaderboardStats.user_id == AuthUser.id)
+        .filter(AuthUser.id.notin_(exclude_ids))
+        .order_by(LeaderboardStats.points.desc(), AuthUser.id)
+        .limit(limit)
+        .all()
+    )
+    if len(ranked) < limit:
+        ranked += (
+            _ranked_columns(db)
+            .outerjoin(LeaderboardStats, LeaderboardStats.user_id == AuthUser.id)
+            .filter(LeaderboardStats.user_id.is_(None), AuthUser.id.notin_(exclude_ids))
+            .order_by(AuthUser.id)
+            .limit(limit - len(ranked))
+            .all()
+        )
+    return ranked
+
+
+def users_with_stats(db: Session, user_ids: Iterable[str]):
+    """Leaderboard columns for a specific set of users (e.g. the caller's
+    friends) in one query."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return []
+    return (
+        _ranked_columns(db)
+        .outerjoin(LeaderboardStats, LeaderboardStats.user_id == AuthUser.id)
+        .filter(AuthUser.id.in_(user_ids))
+        .all()
+    )
@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Tuple
+import base64
+import binascii
+
+# ─── Keyset cursors ──────────────────────────────────────────────────────────
+#
+# Newest-first listings (GET /entries, the leaderboard inboxes) page on
+# (timestamp, id) — the same key they sort by, so rows sharing a timestamp or
+# inserted mid-walk are neither skipped nor repeated. The cursor is that key
+# of the last row served, base64url-encoded so clients treat it as opaque.
+#
+# When more rows remain, the next cursor travels in the X-Next-Cursor response
+# header (exposed via CORS in app.py), leaving each endpoint's body exactly as
+# it was before paging; clients pass it back as `cursor`.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """Opaque cursor for "everything after this row" in (sort_value DESC,
+    id DESC) order."""
+    raw = f"{sort_value.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on anything else."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
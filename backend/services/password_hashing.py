@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# ─── Password / OTP hashing pool ─────────────────────────────────────────────
+#
+# bcrypt at the default cost takes ~200–300 ms of CPU per hashpw/checkpw. Run
+# inline in an `async def` route that blocks the whole uvicorn event loop, so
+# a burst of logins stalls every other request on the worker. Auth routes
+# instead await run_hashing(), which hands the call to a small dedicated
+# thread pool: the bcrypt C extension releases the GIL while it works, so the
+# loop keeps serving requests, and a thread pool avoids pickling secrets to a
+# subprocess.
+#
+# The pool is bounded twice: PASSWORD_HASH_WORKERS caps how many hashes run at
+# once (so a storm can't take every core), and PASSWORD_HASH_MAX_QUEUE caps
+# how many may wait behind them. Past that run_hashing() raises
+# PasswordHashingBusy instead of queueing unbounded work nobody will wait for.
+
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+
+class PasswordHashingBusy(RuntimeError):
+    """The hashing queue is full; the caller should answer 503 and let the
+    client retry."""
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_stats = {
+    "queued": 0,
+    "in_flight": 0,
+    "peak_queued": 0,
+    "completed": 0,
+    "rejected": 0,
+    "wait_seconds_total": 0.0,
+    "run_seconds_total": 0.0,
+}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, PASSWORD_HASH_WORKERS),
+                    thread_name_prefix="password-hash",
+                )
+    return _executor
+
+
+async def run_hashing(fn: Callable[..., T], *args) -> T:
+    """Run a CPU-bound hashing call (bcrypt hash/verify) on the hashing pool
+    and await its result without blocking the event loop."""
+    submitted = time.perf_counter()
+    with _lock:
+        if _stats["queued"] >= PASSWORD_HASH_MAX_QUEUE:
+            _stats["rejected"] += 1
+            logger.warning("Password hashing queue full (%d waiting); rejecting", _stats["queued"])
+            raise PasswordHashingBusy("Password hashing queue is full")
+        _stats["queued"] += 1
+        _stats["peak_queued"] = max(_stats["peak_queued"], _stats["queued"])
+
+    def _job():
+        started = time.perf_counter()
+        with _lock:
+            _stats["queued"] -= 1
+            _stats["in_flight"] += 1
+            _stats["wait_seconds_total"] += started - submitted
+        try:
+            return fn(*args)
+        finally:
+            with _lock:
+                _stats["in_flight"] -= 1
+                _stats["completed"] += 1
+                _stats["run_seconds_total"] += time.perf_counter() - started
+
+    future = _get_executor().submit(_job)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # Client went away. If the job never started, cancelling the
+        # awaitable cancelled it too — take it back off the queue count.
+        if future.cancelled():
+            with _lock:
+                _stats["queued"] -= 1
+        raise
+
+
+def hashing_pool_stats() -> dict:
+    """Queue depth and throughput counters for the hashing pool."""
+    with _lock:
+        stats = dict(_stats)
+    completed = stats["completed"]
+    stats["workers"] = max(1, PASSWORD_HASH_WORKERS)
+    stats["max_queue"] = PASSWORD_HASH_MAX_QUEUE
+    stats["avg_wait_ms"] = round(stats["wait_seconds_total"] / completed * 1000, 2) if completed else 0.0
+    stats["avg_run_ms"] = round(stats["run_seconds_total"] / completed * 1000, 2) if completed else 0.0
+    return stats
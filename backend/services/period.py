@@ -1,6 +1,9 @@
+from bisect import bisect_right
 from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
 from pytz import timezone as pytz_timezone
 from pytz.exceptions import UnknownTimeZoneError
+from sqlalchemy import Integer, case, cast, extract, func, literal
 
 # ─── Per-user timezone day bucketing ─────────────────────────────────────────
 #
@@ -134,3 +137,84 @@ def get_est_today_date(tz_name: str = DEFAULT_TZ):
     (Name kept for backward compatibility.)"""
     tz = pytz_timezone(tz_name)
     return datetime.now(timezone.utc).astimezone(tz).date()
+
+
+# ─── Local wall-clock time in SQL ────────────────────────────────────────────
+#
+# Grouping entries by local hour or weekday in the database needs each UTC
+# timestamp shifted into the user's zone, DST included. Postgres does that
+# natively with timezone(). SQLite has no zone database, so there the shift is
+# datetime(ts, '+N minutes') with N picked by a CASE over the zone's UTC
+# offset changes inside the queried range (a couple per year of range).
+# local_parts_sql gives the weekday, hour and day directly, which on SQLite
+# is much cheaper than re-parsing the shifted text for each of them.
+
+def utc_offset_spans(tz_name: str, start: datetime, end: datetime) -> List[Tuple[Optional[datetime], int]]:
+    """[(until, offset_minutes), ...] covering [start, end] (naive UTC): each
+    offset applies to instants before `until`; the last span's until is None."""
+    tz = pytz_timezone(tz_name)
+    transitions = getattr(tz, "_utc_transition_times", None) or []
+    infos = getattr(tz, "_transition_info", None) or []
+
+    def offset_at(instant: datetime) -> int:
+        if not transitions:
+            return int(tz.utcoffset(instant).total_seconds() // 60)
+        i = max(bisect_right(transitions, instant) - 1, 0)
+        return int(infos[i][0].total_seconds() // 60)
+
+    spans = []
+    current = offset_at(start)
+    for i in range(bisect_right(transitions, start), bisect_right(transitions, end)):
+        offset = int(infos[i][0].total_seconds() // 60)
+        if offset != current:
+            spans.append((transitions[i], current))
+            current = offset
+    spans.append((None, current))
+    return spans
+
+
+def local_time_sql(dialect_name: str, column, tz_name: str,
+                   start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """SQL expression for `column` (naive UTC) as wall-clock time in tz_name.
+    start / end bound the rows the query reads (only needed off Postgres)."""
+    if dialect_name.startswith("postgres"):
+        return func.timezone(tz_name, func.timezone("UTC", column))
+    spans = utc_offset_spans(
+        tz_name,
+        start or datetime(2000, 1, 1),
+        end or datetime.utcnow() + timedelta(days=1),
+    )
+    modifiers = [(until, f"{offset:+d} minutes") for until, offset in spans]
+    if len(modifiers) == 1:
+        return func.datetime(column, literal(modifiers[0][1]))
+    return func.datetime(column, case(
+        *[(column < until, literal(mod)) for until, mod in modifiers[:-1]],
+        else_=literal(modifiers[-1][1]),
+    ))
+
+
+def local_parts_sql(dialect_name: str, column, tz_name: str,
+                    start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """(weekday, hour, day) SQL expressions for `column` (naive UTC) in
+    tz_name: weekday 0 = Sunday, hour 0-23, and a value unique per local
+    calendar day. On SQLite they are integer arithmetic on the shifted epoch
+    second, so the timestamp text is parsed once per row instead of once per
+    datetime()/strftime() call."""
+    if dialect_name.startswith("postgres"):
+        local = local_time_sql(dialect_name, column, tz_name)
+        return extract("dow", local), extract("hour", local), func.date(local)
+    spans = utc_offset_spans(
+        tz_name,
+        start or datetime(2000, 1, 1),
+        end or datetime.utcnow() + timedelta(days=1),
+    )
+    if len(spans) == 1:
+        offset = literal(spans[0][1] * 60)
+    else:
+        offset = case(
+            *[(column < until, literal(minutes * 60)) for until, minutes in spans[:-1]],
+            else_=literal(spans[-1][1] * 60),
+        )
+    epoch = cast(func.strftime("%s", column), Integer) + offset
+    # 1970-01-01 was a Thursday (dow 4).
+    return (epoch // 86400 + 4) % 7, (epoch % 86400) // 3600, epoch // 86400
@@ -0,0 +1,326 @@
+import contextvars
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from typing import Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ─── Request profiling ───────────────────────────────────────────────────────
+#
+# The profile_requests middleware (registered in app.py) opens a RequestProfile for every
+# request; SQLAlchemy cursor events on *every* Engine (sync, async via its
+# sync_engine, test engines) add each statement's count and wall time to the
+# profile of the request that issued it. The profile lives in a ContextVar, so
+# it follows the request into run_in_threadpool (sync routes / dependencies)
+# and into the async driver's greenlet; statements issued outside a request
+# (worker, migrations) are not counted.
+#
+# Finished requests are aggregated per (method, route template) — never the
+# raw path, which would explode label cardinality — into latency and
+# queries-per-request histograms. render_prometheus() exposes them, together
+# with the pool / auth cache / hashing / sync counters, for
+# GET /api/diagnostics/metrics. Each worker process keeps its own numbers.
+#
+# The same listeners feed the slow-query log (every process, in a request or
+# not): a statement slower than SLOW_QUERY_MS is logged at WARNING, slower
+# than SLOW_QUERY_CRITICAL_MS at ERROR, and a request issuing more than
+# REQUEST_QUERY_WARN_COUNT statements (the signature of an N+1) at WARNING.
+# Statements are logged normalized — literals and bind values replaced by `?`,
+# IN lists collapsed — so logs never carry user data and repeats group.
+
+# Server-Timing reveals query counts and DB time, so it is off for ordinary
+# callers: SERVER_TIMING_HEADER=1 turns it on for every response (local dev
+# only); otherwise only a request carrying `X-Diagnostics-Token:
+# <DIAGNOSTICS_TOKEN>` gets it.
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "0").strip().lower() in ("1", "true", "yes")
+
+# 0 disables the corresponding log line.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+SLOW_QUERY_CRITICAL_MS = float(os.getenv("SLOW_QUERY_CRITICAL_MS", "5000"))
+REQUEST_QUERY_WARN_COUNT = int(os.getenv("REQUEST_QUERY_WARN_COUNT", "50"))
+
+slow_query_logger = logging.getLogger("backend.slow_query")
+
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestProfile:
+    __slots__ = ("started", "queries", "db_seconds", "route")
+
+    def __init__(self, route: Optional[str] = None):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.route = route  # "METHOD /path" for log lines
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("request_profile", default=None)
+
+
+def start_request(route: Optional[str] = None) -> RequestProfile:
+    profile = RequestProfile(route)
+    _current.set(profile)
+    return profile
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|\$\d+|:\w+\b|%s")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str, max_length: int = 1000) -> str:
+    """`statement` with every bind placeholder and literal as `?` and IN /
+    VALUES lists collapsed to `(?...)`, on one line."""
+    text = _PLACEHOLDER.sub("?", statement)
+    text = _STRING_LITERAL.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _VALUE_LIST.sub("(?...)", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text if len(text) <= max_length else text[:max_length] + "…"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.queries += 1
+        profile.db_seconds += elapsed
+    _log_if_slow(statement, elapsed * 1000, profile)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start.
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+def _log_if_slow(statement: str, ms: float, profile: Optional["RequestProfile"]) -> None:
+    if SLOW_QUERY_CRITICAL_MS and ms >= SLOW_QUERY_CRITICAL_MS:
+        level = logging.ERROR
+    elif SLOW_QUERY_MS and ms >= SLOW_QUERY_MS:
+        level = logging.WARNING
+    else:
+        return
+    where = f" [{profile.route}]" if profile is not None and profile.route else ""
+    slow_query_logger.log(level, f"Slow query {ms:.0f} ms{where}: {normalize_sql(statement)}")
+
+
+def server_timing(profile: RequestProfile) -> str:
+    return (f"app;dur={profile.elapsed() * 1000:.1f}, "
+            f'db;dur={profile.db_seconds * 1000:.1f};desc="{profile.queries} queries"')
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        running = 0
+        for bound, n in zip(self.bounds, self.counts):
+            running += n
+            yield bound, running
+
+
+class _RouteStats:
+    __slots__ = ("latency", "queries", "db_seconds", "statuses")
+
+    def __init__(self):
+        self.latency = _Histogram(LATENCY_BUCKETS_S)
+        self.queries = _Histogram(QUERY_COUNT_BUCKETS)
+        self.db_seconds = 0.0
+        self.statuses = {}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, method: str, route: str, status: int, profile: RequestProfile) -> None:
+        elapsed = profile.elapsed()
+        with self._lock:
+            stats = self._routes.get((method, route))
+            if stats is None:
+                stats = self._routes[(method, route)] = _RouteStats()
+            stats.latency.observe(elapsed)
+            stats.queries.observe(profile.queries)
+            stats.db_seconds += profile.db_seconds
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+    def snapshot(self) -> dict:
+        """{(method, route): totals} — for tests and scripts."""
+        with self._lock:
+            return {
+                key: {
+                    "requests": s.latency.count,
+                    "latency_seconds_sum": s.latency.sum,
+                    "queries_sum": int(s.queries.sum),
+                    "db_seconds_sum": s.db_seconds,
+                    "statuses": dict(s.statuses),
+                }
+                for key, s in self._routes.items()
+            }
+
+    def render(self, out: list) -> None:
+        with self._lock:
+            routes = sorted(self._routes.items())
+            _help(out, "http_request_duration_seconds", "histogram", "Request latency by route.")
+            for (method, route), s in routes:
+                _histogram(out, "http_request_duration_seconds", {"method": method, "route": route}, s.latency)
+            _help(out, "http_request_db_queries", "histogram", "SQL statements per request by route.")
+            for (method, route), s in routes:
+                _histogram(out, "http_request_db_queries", {"method": method, "route": route}, s.queries)
+            _help(out, "http_request_db_seconds_total", "counter", "Time spent in SQL by route.")
+            for (method, route), s in routes:
+                _sample(out, "http_request_db_seconds_total", {"method": method, "route": route}, s.db_seconds)
+            _help(out, "http_requests_total", "counter", "Requests by route and status.")
+            for (method, route), s in routes:
+                for status, n in sorted(s.statuses.items()):
+                    _sample(out, "http_requests_total", {"method": method, "route": route, "status": status}, n)
+
+
+request_metrics = RequestMetrics()
+
+
+def route_label(scope: dict) -> str:
+    """The matched route's template (`/api/entries/{entry_id}`). Routes of an
+    included router keep their own unprefixed path on scope["route"]; the full
+    template is on FastAPI's effective route context."""
+    effective = (scope.get("fastapi") or {}).get("effective_route_context")
+    path = getattr(effective, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or UNMATCHED_ROUTE
+
+
+def diagnostics_token() -> str:
+    """Operator secret for the diagnostics endpoints; empty = disabled."""
+    return (os.getenv("DIAGNOSTICS_TOKEN") or "").strip()
+
+
+def _wants_server_timing(request) -> bool:
+    if SERVER_TIMING_HEADER:
+        return True
+    secret = diagnostics_token()
+    provided = request.headers.get("X-Diagnostics-Token", "")
+    return bool(secret) and hmac.compare_digest(provided, secret)
+
+
+async def profile_requests(request, call_next):
+    """HTTP middleware: profile the request, record it under its route
+    template and, for operators, report it in a Server-Timing header."""
+    profile = start_request(f"{request.method} {request.url.path}")
+    response = await call_next(request)
+    route = route_label(request.scope)
+    request_metrics.record(request.method, route, response.status_code, profile)
+    if REQUEST_QUERY_WARN_COUNT and profile.queries > REQUEST_QUERY_WARN_COUNT:
+        slow_query_logger.warning(
+            f"{request.method} {route} issued {profile.queries} queries "
+            f"({profile.db_seconds * 1000:.0f} ms in SQL) — possible N+1"
+        )
+    if _wants_server_timing(request):
+        response.headers["Server-Timing"] = server_timing(profile)
+    return response
+
+
+# ─── Prometheus text format ──────────────────────────────────────────────────
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _help(out: list, name: str, kind: str, text: str) -> None:
+    out.append(f"# HELP {name} {text}")
+    out.append(f"# TYPE {name} {kind}")
+
+
+def _sample(out: list, name: str, labels: dict, value) -> None:
+    if isinstance(value, bool):
+        value = int(value)
+    out.append(f"{name}{_labels(labels)} {value}")
+
+
+def _histogram(out: list, name: str, labels: dict, hist: _Histogram) -> None:
+    for bound, n in hist.cumulative():
+        _sample(out, f"{name}_bucket", dict(labels, le=bound), n)
+    _sample(out, f"{name}_bucket", dict(labels, le="+Inf"), hist.count)
+    _sample(out, f"{name}_sum", labels, round(hist.sum, 6))
+    _sample(out, f"{name}_count", labels, hist.count)
+
+
+def _gauges(out: list, prefix: str, stats: Optional[dict]) -> None:
+    """Every numeric field of a stats dict as a `<prefix>_<field>` gauge."""
+    for key, value in sorted((stats or {}).items()):
+        if isinstance(value, (int, float)):
+            name = f"{prefix}_{key}"
+            _help(out, name, "gauge", f"{prefix.replace('_', ' ')} {key.replace('_', ' ')}.")
+            _sample(out, name, {}, value)
+
+
+def render_prometheus(last_sync_run: Optional[dict] = None) -> str:
+    """Request metrics plus this process's pool, auth cache, hashing pool and
+    suggestion cache counters, in Prometheus text exposition format. Sync runs in the worker,
+    so its last run's stats are passed in (from the jobs table)."""
+    from backend.auth import principal_cache_stats
+    from backend.db import pool_stats
+    from backend.services.ai_suggestions import suggestion_cache_stats
+    from backend.services.password_hashing import hashing_pool_stats
+
+    out = []
+    request_metrics.render(out)
+    pools = pool_stats()
+    for engine_name in ("sync", "async"):
+        _gauges(out, f"db_pool_{engine_name}", pools[engine_name])
+    _gauges(out, "auth_principal_cache", principal_cache_stats())
+    _gauges(out, "password_hashing", hashing_pool_stats())
+    _gauges(out, "ai_suggestions_cache", suggestion_cache_stats())
+    _gauges(out, "sync_last_run", last_sync_run)
+    return "\n".join(out) + "\n"
@@ -1,79 +1,126 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from backend.models import Entry, Settings, EntryType, AppType, Goal, DailyGoal, TimeframeType
+from sqlalchemy import func, case, literal
+from backend.models import Entry, EntryType, AppType, Goal, DailyGoal, TimeframeType
 from backend.services.period import get_est_date_for_utc
+from backend.services.daily_rollup_service import daily_rollup_groups, daily_rollups_ready, whole_day_span
 from decimal import Decimal
 from datetime import datetime
 from typing import Optional
 
+
+def _entry_groups(db: Session, user_id: str, from_date: Optional[datetime], to_date: Optional[datetime]):
+    """Sum a user's entries in [from_date, to_date] with ONE grouped SQL query.
+
+    Grouping by (type, app) yields at most len(EntryType) * len(AppType) rows,
+    so the work shipped back to Python is constant no matter how many entries
+    the window holds (a heavy driver's THIS_MONTH used to materialize thousands
+    of ORM rows). Each group carries conditional sums for revenue (amount > 0)
+    vs expenses (amount <= 0). Amounts come back as Decimal via the Numeric
+    column type on every dialect, so money sums stay exact.
+    """
+    amount = Entry.amount
+    zero = literal(0, amount.type)
+    query = db.query(
+        Entry.type,
+        Entry.app,
+        func.count(Entry.id),
+        func.coalesce(func.sum(amount), zero),
+        func.coalesce(func.sum(case((amount > 0, amount), else_=zero)), zero),
+        func.coalesce(func.sum(case((amount <= 0, amount), else_=zero)), zero),
+        func.coalesce(func.sum(Entry.distance_miles), 0.0),
+        func.coalesce(func.sum(Entry.duration_minutes), 0),
+        func.min(Entry.timestamp),
+        func.max(Entry.timestamp),
+    ).filter(Entry.user_id == user_id)
+    if from_date:
+        query = query.filter(Entry.timestamp >= from_date)
+    if to_date:
+        query = query.filter(Entry.timestamp <= to_date)
+    return query.group_by(Entry.type, Entry.app).all()
+
+
+def _fold_groups(groups) -> dict:
+    """Fold per-(type, app) group sums — from `entries` or `daily_rollups` —
+    into exactly the totals the old per-row Decimal loop produced."""
+    totals = {
+        "entry_count": 0,
+        "total_amount": Decimal("0"),
+        "revenue": Decimal("0"),
+        "expenses": Decimal("0"),
+        "miles": 0.0,
+        "minutes": 0,
+        "order_count": 0,
+        "order_revenue": Decimal("0"),
+        "first_timestamp": None,
+        "last_timestamp": None,
+        "by_type": {t.value: Decimal("0") for t in EntryType},
+        "by_app": {a.value: Decimal("0") for a in AppType},
+    }
+    for (entry_type, app, count, total, revenue, expenses,
+         miles, minutes, first_ts, last_ts) in groups:
+        total = Decimal(str(total))
+        totals["entry_count"] += count
+        totals["total_amount"] += total
+        totals["revenue"] += Decimal(str(revenue))
+        totals["expenses"] += abs(Decimal(str(expenses)))
+        totals["miles"] += float(miles)
+        totals["minutes"] += int(minutes)
+        totals["by_type"][entry_type.value] += total
+        totals["by_app"][app.value] += total
+        if entry_type == EntryType.ORDER:
+            totals["order_count"] += count
+            totals["order_revenue"] += total
+        if first_ts is not None and (totals["first_timestamp"] is None or first_ts < totals["first_timestamp"]):
+            totals["first_timestamp"] = first_ts
+        if last_ts is not None and (totals["last_timestamp"] is None or last_ts > totals["last_timestamp"]):
+            totals["last_timestamp"] = last_ts
+    return totals
+
+
 def calculate_rollup(db: Session, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None, timeframe: Optional[str] = None, user_id: str = "", tz_name: str = "America/New_York"):
     # A rollup without a user filter would aggregate EVERY user's entries —
     # never allowed. Fail loudly instead of silently computing global totals.
     if not user_id:
         raise ValueError("calculate_rollup requires a user_id; refusing to aggregate across all users")
-    query = db.query(Entry).filter(Entry.user_id == user_id)
-    if from_date:
-        query = query.filter(Entry.timestamp >= from_date)
-    if to_date:
-        query = query.filter(Entry.timestamp <= to_date)
-    
-    # Fetch entries first for by_type and by_app calculations
-    entries = query.all()
-    
-    settings = db.query(Settings).filter(Settings.user_id == user_id).first()
-    cost_per_mile = settings.cost_per_mile if settings else Decimal("0")
-    
-    total_amount = Decimal("0")
-    revenue = Decimal("0")
-    expenses = Decimal("0")
-    miles = 0.0
-    total_minutes = 0
-    
-    by_type = {t.value: Decimal("0") for t in EntryType}
-    by_app = {a.value: Decimal("0") for a in AppType}
-    
-    for entry in entries:
-        amount = Decimal(str(entry.amount))
-        total_amount += amount
-        
-        if amount > 0:
-            revenue += amount
-        else:
-            expenses += abs(amount)
-        
-        miles += entry.distance_miles
-        total_minutes += entry.duration_minutes
-        
-        by_type[entry.type.value] += amount
-        by_app[entry.app.value] += amount
-    
+    # Whole-local-day windows (every timeframe and YYYY-MM-DD range) read the
+    # materialized daily rollups when they're current for this timezone;
+    # anything else aggregates `entries` directly.
+    span = whole_day_span(from_date, to_date, tz_name)
+    if span is not None and daily_rollups_ready(db, user_id, tz_name):
+        groups = daily_rollup_groups(db, user_id, *span)
+    else:
+        groups = _entry_groups(db, user_id, from_date, to_date)
+    totals = _fold_groups(groups)
+
+    revenue = totals["revenue"]
+    expenses = totals["expenses"]
+    miles = totals["miles"]
+    total_minutes = totals["minutes"]
+    by_type = totals["by_type"]
+    by_app = totals["by_app"]
+
     hours = total_minutes / 60.0 if total_minutes > 0 else 0.0
-    net_earnings = total_amount
-    profit = total_amount
-    
+    net_earnings = totals["total_amount"]
+    profit = totals["total_amount"]
+
     dollars_per_mile = net_earnings / Decimal(str(miles)) if miles > 0 else Decimal("0")
-    
+
     # Calculate metrics for orders
-    order_entries = [e for e in entries if e.type.value == 'ORDER']
-    order_count = len(order_entries)
+    order_count = totals["order_count"]
     average_order_value = Decimal("0")
     dollars_per_hour = Decimal("0")
-    
+
     # Calculate per-hour rate based on earliest and latest entries in timeframe
-    if entries:
-        total_order_revenue = Decimal("0")
-        for order in order_entries:
-            total_order_revenue += Decimal(str(order.amount))
+    if totals["entry_count"]:
         if order_count > 0:
-            average_order_value = total_order_revenue / Decimal(str(order_count))
-        
-        # Get earliest and latest timestamps from ALL entries in the timeframe
-        all_timestamps = sorted([e.timestamp for e in entries])
-        first_timestamp = all_timestamps[0]
-        last_timestamp = all_timestamps[-1]
-        
+            average_order_value = totals["order_revenue"] / Decimal(str(order_count))
+
+        # Earliest and latest timestamps from ALL entries in the timeframe
+        first_timestamp = totals["first_timestamp"]
+        last_timestamp = totals["last_timestamp"]
+
         hours_first_to_last = (last_timestamp - first_timestamp).total_seconds() / 3600.0
-        
+
         # Calculate hourly rate
         if hours_first_to_last > 0:
             # If under 1 hour, use total revenue as the $/hour rate
@@ -87,7 +134,7 @@ def calculate_rollup(db: Session, from_date: Optional[datetime] = None, to_date:
     else:
         # No entries at all
         dollars_per_hour = Decimal("0")
-    
+
     # Get goal data if timeframe provided
     goal_data = None
     goal_progress = None
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from backend.entitlements import is_pro_now
+from backend.models import AuthUser, Entry, EntryType, UserSuggestion
+from backend.services.ai_suggestions import (
+    AI_SUGGESTIONS_CONCURRENCY, NO_DATA_SUGGESTION, suggestion_for, suggestion_stats,
+)
+from backend.services.entry_import import dialect_insert
+from backend.services.job_queue import JOB_REFRESH_SUGGESTION, enqueue
+from backend.services.period import user_tz_name
+
+logger = logging.getLogger(__name__)
+
+# ─── Precomputed suggestions ─────────────────────────────────────────────────
+#
+# Pro users mostly open the suggestions screen first thing in the morning, and
+# a live answer costs an aggregate over their entries plus an LLM round-trip. So the
+# worker's nightly precompute_suggestions job walks every active Pro user in
+# id-ordered chunks and stores each one's answer for the trailing
+# SUGGESTIONS_WINDOW_DAYS in `user_suggestions`, with the window's order count
+# and revenue at generation time.
+#
+# GET /api/suggestions without a range then serves that row immediately. The
+# only other work is one indexed COUNT/SUM over the window. If the count moved
+# by SUGGESTIONS_REFRESH_MIN_ORDERS or more, or the revenue by
+# SUGGESTIONS_REFRESH_MIN_CHANGE (relative), a refresh_suggestion job is queued
+# for the worker. The stored answer is still returned; the next open gets the
+# new one. A Pro user with no row yet (e.g. upgraded today), or whose row is
+# older than SUGGESTIONS_MAX_AGE_HOURS (the nightly job missed them: worker
+# down, lapsed and renewed Pro), is answered live once, and that answer is
+# stored.
+#
+# The job commits after every chunk and skips users refreshed in the last
+# SUGGESTIONS_FRESH_HOURS, so a retried run resumes where the last one died.
+
+SUGGESTIONS_WINDOW_DAYS = int(os.getenv("SUGGESTIONS_WINDOW_DAYS", "30"))
+SUGGESTIONS_BATCH_SIZE = int(os.getenv("SUGGESTIONS_BATCH_SIZE", "100"))
+SUGGESTIONS_PRECOMPUTE_CONCURRENCY = int(os.getenv("SUGGESTIONS_PRECOMPUTE_CONCURRENCY", str(AI_SUGGESTIONS_CONCURRENCY)))
+SUGGESTIONS_FRESH_HOURS = float(os.getenv("SUGGESTIONS_FRESH_HOURS", "12"))
+SUGGESTIONS_MAX_AGE_HOURS = float(os.getenv("SUGGESTIONS_MAX_AGE_HOURS", str(2 * SUGGESTIONS_FRESH_HOURS)))
+SUGGESTIONS_REFRESH_MIN_ORDERS = int(os.getenv("SUGGESTIONS_REFRESH_MIN_ORDERS", "5"))
+SUGGESTIONS_REFRESH_MIN_CHANGE = float(os.getenv("SUGGESTIONS_REFRESH_MIN_CHANGE", "0.1"))
+
+
+def window_start(now: datetime) -> datetime:
+    """Start of the stored window. Day-aligned, so the stats (and the
+    model's cache key) don't change minute to minute."""
+    return (now - timedelta(days=SUGGESTIONS_WINDOW_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def order_totals(db: Session, user_id: str, since: datetime) -> Tuple[int, Decimal]:
+    """(count, revenue) of the user's positive orders since `since`: one
+    aggregate over ix_entries_user_timestamp_id, no rows loaded."""
+    count, revenue = db.execute(
+        select(func.count(Entry.id), func.coalesce(func.sum(Entry.amount), 0))
+        .where(Entry.user_id == user_id, Entry.timestamp >= since,
+               Entry.type == EntryType.ORDER, Entry.amount > 0)
+    ).one()
+    return int(count), Decimal(str(revenue))
+
+
+def changed_materially(row: UserSuggestion, orders: int, revenue: Decimal) -> bool:
+    if abs(orders - row.orders) >= SUGGESTIONS_REFRESH_MIN_ORDERS:
+        return True
+    stored = Decimal(str(row.revenue or 0))
+    if stored == 0:
+        return revenue != 0
+    return abs(revenue - stored) / stored >= Decimal(str(SUGGESTIONS_REFRESH_MIN_CHANGE))
+
+
+def _values(user_id: str, since: datetime, stats: Optional[dict], payload: dict, now: datetime) -> dict:
+    return {
+        "user_id": user_id,
+        "window_start": since,
+        "orders": stats["orders"] if stats else 0,
+        "revenue": Decimal(str(round(stats["total_revenue"], 2))) if stats else Decimal("0"),
+        "stats": json.dumps(stats) if stats else None,
+        "payload": json.dumps(payload, default=str),
+        "generated_at": now,
+    }
+
+
+def save_suggestions(db: Session, rows: list) -> None:
+    """Upsert `_values` dicts into user_suggestions. The caller commits."""
+    if not rows:
+        return
+    stmt = dialect_insert(db)(UserSuggestion).values(rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[UserSuggestion.user_id],
+        set_={c: stmt.excluded[c] for c in ("window_start", "orders", "revenue", "stats", "payload", "generated_at")},
+    ))
+
+
+async def _answer(user_id: str, since: datetime, stats: Optional[dict]) -> dict:
+    if stats is None:
+        return dict(NO_DATA_SUGGESTION)
+    return await suggestion_for(stats, user_id, since)
+
+
+async def refresh_user_suggestion(db: Session, user_id: str, now: Optional[datetime] = None) -> dict:
+    """Compute, store and commit one user's answer for the current window."""
+    now = now or datetime.utcnow()
+    since = window_start(now)
+    stats = await run_in_threadpool(suggestion_stats, db, since, None, user_id)
+    payload = await _answer(user_id, since, stats)
+
+    def _save():
+        save_suggestions(db, [_values(user_id, since, stats, payload, now)])
+        db.commit()
+    await run_in_threadpool(_save)
+    return dict(payload, generated_at=now, window_start=since)
+
+
+def _stored_or_stale(db: Session, user_id: str, now: Optional[datetime] = None) -> Optional[dict]:
+    row = db.get(UserSuggestion, user_id)
+    now = now or datetime.utcnow()
+    if row is None or row.generated_at < now - timedelta(hours=SUGGESTIONS_MAX_AGE_HOURS):
+        # Too old to stand in for the current window: answer live instead.
+        return None
+    orders, revenue = order_totals(db, user_id, row.window_start)
+    if changed_materially(row, orders, revenue):
+        # One queued refresh per stored version, however often it's opened.
+        enqueue(db, JOB_REFRESH_SUGGESTION, {"user_id": user_id},
+                dedup_key=f"{JOB_REFRESH_SUGGESTION}:{user_id}@{row.generated_at.isoformat()}")
+        db.commit()
+    return dict(json.loads(row.payload), generated_at=row.generated_at, window_start=row.window_start)
+
+
+async def stored_suggestions(db: Session, user_id: str) -> dict:
+    """The user's stored answer (queuing a refresh if their data moved), or
+    a live one, stored, if they have none yet or theirs is too old."""
+    stored = await run_in_threadpool(_stored_or_stale, db, user_id)
+    if stored is not None:
+        return stored
+    return await refresh_user_suggestion(db, user_id)
+
+
+def _pro_user_chunk(db: Session, after: str, fresh_since: datetime) -> Tuple[list, Optional[str]]:
+    """The next chunk of (user id, timezone) of active Pro users after
+    `after` that weren't refreshed since `fresh_since`, and the id to
+    continue after."""
+    rows = db.execute(
+        select(AuthUser.id, AuthUser.timezone, AuthUser.pro_entitlement_active,
+               AuthUser.pro_entitlement_expires_at, UserSuggestion.generated_at)
+        .outerjoin(UserSuggestion, UserSuggestion.user_id == AuthUser.id)
+        .where(AuthUser.pro_entitlement_active.is_(True), AuthUser.id > after)
+        .order_by(AuthUser.id)
+        .limit(SUGGESTIONS_BATCH_SIZE)
+    ).all()
+    if not rows:
+        return [], None
+    due = [(r.id, user_tz_name(r)) for r in rows
+           if is_pro_now(r) and (r.generated_at is None or r.generated_at < fresh_since)]
+    return due, rows[-1].id
+
+
+async def precompute_suggestions(db: Session, now: Optional[datetime] = None) -> dict:
+    """Store every active Pro user's answer for the current window, chunk by
+    chunk, with at most SUGGESTIONS_PRECOMPUTE_CONCURRENCY answers in flight."""
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    since = window_start(now)
+    fresh_since = now - timedelta(hours=SUGGESTIONS_FRESH_HOURS)
+    gate = asyncio.Semaphore(max(1, SUGGESTIONS_PRECOMPUTE_CONCURRENCY))
+    stats = {"users": 0, "chunks": 0, "no_data": 0}
+
+    async def _one(user_id: str, user_stats: Optional[dict]) -> dict:
+        async with gate:
+            return await _answer(user_id, since, user_stats)
+
+    after = ""
+    while True:
+        users, after = await run_in_threadpool(_pro_user_chunk, db, after, fresh_since)
+        if after is None:
+            break
+        if not users:
+            continue
+        user_ids = [uid for uid, _ in users]
+        # Stats share the one Session, so they're read in turn; only the
+        # model calls overlap.
+        chunk_stats = await run_in_threadpool(
+            lambda: [suggestion_stats(db, since, None, uid, tz) for uid, tz in users]
+        )
+        payloads = await asyncio.gather(*(_one(uid, s) for uid, s in zip(user_ids, chunk_stats)))
+
+        def _save():
+            save_suggestions(db, [_values(uid, since, s, p, now)
+                                  for uid, s, p in zip(user_ids, chunk_stats, payloads)])
+            db.commit()
+        await run_in_threadpool(_save)
+        stats["users"] += len(user_ids)
+        stats["chunks"] += 1
+        stats["no_data"] += sum(1 for s in chunk_stats if s is None)
+
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    logger.info(f"Precomputed suggestions: {stats}")
+    return stats
@@ -1,208 +1,464 @@
+import asyncio
 import httpx
 import json
+import logging
+import random
+import time
 from datetime import datetime, timedelta
 from decimal import Decimal
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from backend.models import Entry, EntryType, AppType, SyncedOrder, PlatformIntegration, ApiCredential, AuthUser
+from backend.services.daily_rollup_service import refresh_daily_rollups
+from backend.services.entry_import import dialect_insert
+from backend.services.period import user_tz_name
+from typing import Callable, List, Optional
 import os
 
+logger = logging.getLogger(__name__)
+
+# ─── Sync engine ─────────────────────────────────────────────────────────────
+#
+# sync_all_platforms fans credentials out concurrently (at most
+# SYNC_CONCURRENCY in flight) over one pooled httpx.AsyncClient per platform,
+# so connections are reused across users instead of a fresh client + TLS
+# handshake per credential. Every upstream request has a timeout; 429s, 5xxs,
+# timeouts and connection errors are retried with exponential backoff (honoring
+# Retry-After) up to SYNC_MAX_RETRIES times. Each run returns latency and
+# throughput stats, also kept for last_sync_run_stats().
+#
+# Writes stay on the caller's single Session: sync_orders never awaits, so one
+# credential's DB work always runs to completion before another's starts.
+
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", "8"))
+SYNC_REQUEST_TIMEOUT_SECONDS = float(os.getenv("SYNC_REQUEST_TIMEOUT_SECONDS", "15"))
+SYNC_MAX_RETRIES = int(os.getenv("SYNC_MAX_RETRIES", "3"))
+SYNC_BACKOFF_BASE_SECONDS = 0.5
+SYNC_BACKOFF_MAX_SECONDS = 30.0
+
+# Incremental windows: each credential resumes from its sync_cursor_at minus
+# SYNC_OVERLAP_MINUTES (orders can show up upstream a while after they
+# complete) instead of re-fetching the whole SYNC_FULL_WINDOW_DAYS every run.
+# The full window is still fetched on a credential's first sync and then every
+# SYNC_FULL_RECONCILE_HOURS, to catch anything later than the overlap.
+SYNC_OVERLAP_MINUTES = int(os.getenv("SYNC_OVERLAP_MINUTES", "30"))
+SYNC_FULL_WINDOW_DAYS = int(os.getenv("SYNC_FULL_WINDOW_DAYS", "7"))
+SYNC_FULL_RECONCILE_HOURS = int(os.getenv("SYNC_FULL_RECONCILE_HOURS", "24"))
+
+
+def _sync_timeout() -> httpx.Timeout:
+    return httpx.Timeout(SYNC_REQUEST_TIMEOUT_SECONDS, connect=min(5.0, SYNC_REQUEST_TIMEOUT_SECONDS))
+
+
+class SyncRunStats:
+    """Counters for one sync run (all updated from the event loop thread)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration_s = 0.0
+        self.credentials = 0
+        self.full_syncs = 0
+        self.window_hours = 0.0
+        self.succeeded = 0
+        self.failed = 0
+        self.orders_fetched = 0
+        self.entries_created = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.server_errors = 0
+        self.timeouts = 0
+        self.request_latencies_ms: list = []
+
+    def finish(self) -> "SyncRunStats":
+        self.duration_s = time.perf_counter() - self.started
+        return self
+
+    def as_dict(self) -> dict:
+        latencies = sorted(self.request_latencies_ms)
+
+        def _pct(p: float):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 1) if latencies else None
+
+        return {
+            "credentials": self.credentials,
+            "full_syncs": self.full_syncs,
+            "window_hours": round(self.window_hours, 1),
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "orders_fetched": self.orders_fetched,
+            "entries_created": self.entries_created,
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "server_errors": self.server_errors,
+            "timeouts": self.timeouts,
+            "request_p50_ms": _pct(0.50),
+            "request_p95_ms": _pct(0.95),
+            "duration_s": round(self.duration_s, 3),
+            "credentials_per_s": round(self.credentials / self.duration_s, 2) if self.duration_s else None,
+        }
+
+
+_last_run_stats: Optional[dict] = None
+
+
+def last_sync_run_stats() -> Optional[dict]:
+    """Stats of the most recent sync_all_platforms run in this process."""
+    return _last_run_stats
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After", "")
+        try:
+            return min(SYNC_BACKOFF_MAX_SECONDS, max(0.0, float(retry_after)))
+        except ValueError:
+            pass  # absent, or an HTTP date — fall back to our own backoff
+    delay = SYNC_BACKOFF_BASE_SECONDS * (2 ** attempt)
+    return min(SYNC_BACKOFF_MAX_SECONDS, delay * random.uniform(0.5, 1.0))
+
+
+async def request_with_backoff(client: httpx.AsyncClient, method: str, url: str,
+                               stats: Optional[SyncRunStats] = None, **kwargs) -> httpx.Response:
+    """Send one upstream request, retrying 429 / 5xx / timeouts / connection
+    errors with backoff. Returns the final response (which may still be an
+    error status once retries run out) or re-raises the last transport error."""
+    for attempt in range(SYNC_MAX_RETRIES + 1):
+        response = None
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TimeoutException:
+            if stats:
+                stats.timeouts += 1
+            if attempt == SYNC_MAX_RETRIES:
+                raise
+        except httpx.TransportError:
+            if attempt == SYNC_MAX_RETRIES:
+                raise
+        finally:
+            if stats:
+                stats.requests += 1
+                stats.request_latencies_ms.append((time.perf_counter() - started) * 1000)
+        if response is not None:
+            if response.status_code == 429:
+                if stats:
+                    stats.throttled += 1
+            elif response.status_code >= 500:
+                if stats:
+                    stats.server_errors += 1
+            else:
+                return response
+            if attempt == SYNC_MAX_RETRIES:
+                return response
+        if stats:
+            stats.retries += 1
+        await asyncio.sleep(_retry_delay(attempt, response))
+
+
+def _refresh_synced_days(db: Session, user_id: str, entries: list) -> None:
+    """Keep the user's daily rollups current for the days synced orders landed on."""
+    if entries:
+        user = db.get(AuthUser, user_id)
+        refresh_daily_rollups(db, user_id, user_tz_name(user), [e.timestamp for e in entries])
+
+
+# ─── Batched order import ────────────────────────────────────────────────────
+#
+# A sync window holds 100+ orders per credential. Rather than a SELECT, an
+# INSERT and a flush per order, each credential's batch is: one IN (...)
+# lookup of already-synced platform_order_ids, one multi-row INSERT ...
+# RETURNING for the new entries, and one multi-row INSERT for their
+# synced_orders rows (chunked at SYNC_BATCH_SIZE).
+#
+# Two overlapping runs (or a sync racing a CSV import of the same export) are
+# settled by the database: entries dedup on uq_entries_user_order_id and
+# synced_orders on uq_synced_orders_user_platform_order, both with ON CONFLICT
+# DO NOTHING. An order whose entry already existed is linked to that entry.
+
+SYNC_BATCH_SIZE = 500
+
+
+def _chunks(items: list):
+    for start in range(0, len(items), SYNC_BATCH_SIZE):
+        yield items[start:start + SYNC_BATCH_SIZE]
+
+
+def import_synced_orders(db: Session, user_id: str, platform: PlatformIntegration,
+                         orders: list, entry_values: Callable[[dict], dict]) -> list:
+    """Insert entries + synced_orders rows for the not-yet-synced `orders`,
+    refresh the touched daily rollups and commit. Returns the new Entry rows."""
+    by_id = {}
+    for order in orders:
+        order_id = order.get("order_id")
+        if order_id is None:
+            logger.warning(f"Skipping {platform.value} order without order_id for {user_id}")
+            continue
+        by_id.setdefault(str(order_id), order)
+
+    synced = set()
+    for chunk in _chunks(list(by_id)):
+        synced.update(db.scalars(
+            select(SyncedOrder.platform_order_id).where(
+                SyncedOrder.user_id == user_id,
+                SyncedOrder.platform == platform,
+                SyncedOrder.platform_order_id.in_(chunk),
+            )
+        ))
+    pending = {order_id: order for order_id, order in by_id.items() if order_id not in synced}
+    if not pending:
+        return []
+
+    insert = dialect_insert(db)
+    created: List[Entry] = []
+    for chunk in _chunks(list(pending.items())):
+        values = [dict(entry_values(order), order_id=order_id) for order_id, order in chunk]
+        created.extend(db.scalars(insert(Entry).on_conflict_do_nothing().returning(Entry), values))
+
+    entry_ids = {e.order_id: e.id for e in created}
+    already_entered = [order_id for order_id in pending if order_id not in entry_ids]
+    for chunk in _chunks(already_entered):
+        entry_ids.update(db.execute(
+            select(Entry.order_id, Entry.id).where(Entry.user_id == user_id, Entry.order_id.in_(chunk))
+        ).tuples().all())
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "platform": platform,
+            "platform_order_id": order_id,
+            "entry_id": entry_ids.get(order_id),
+            "sync_status": "completed",
+            "synced_at": now,
+            "raw_data": json.dumps(order),
+        }
+        for order_id, order in pending.items()
+    ]
+    for chunk in _chunks(rows):
+        db.execute(insert(SyncedOrder).on_conflict_do_nothing(), chunk)
+
+    _refresh_synced_days(db, user_id, created)
+    db.commit()
+    return created
+
+
 class UberSyncService:
     """Service to sync orders from Uber Eats API"""
     BASE_URL = "https://api.uber.com/v1"
 
-    def __init__(self, access_token: str, user_id: str):
+    def __init__(self, access_token: str, user_id: str,
+                 client: Optional[httpx.AsyncClient] = None, stats: Optional[SyncRunStats] = None):
         self.access_token = access_token
         self.user_id = user_id
         self.headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
+        # Shared pooled client from the sync engine; None = one-off client.
+        self.client = client
+        self.stats = stats
+        self.last_error: Optional[str] = None
+
+    async def _get(self, endpoint: str, params: dict) -> httpx.Response:
+        self.last_error = None
+        if self.client is not None:
+            return await request_with_backoff(self.client, "GET", endpoint, self.stats,
+                                              headers=self.headers, params=params)
+        async with httpx.AsyncClient(timeout=_sync_timeout()) as client:
+            return await request_with_backoff(client, "GET", endpoint, self.stats,
+                                              headers=self.headers, params=params)
     
     async def fetch_orders(self, start_date: datetime, end_date: datetime):
         """Fetch orders from Uber API"""
         try:
-            async with httpx.AsyncClient() as client:
-                # Uber API endpoint for deliveries
-                endpoint = f"{self.BASE_URL}/marketplace/orders"
-                params = {
-                    "start_time": int(start_date.timestamp()),
-                    "end_time": int(end_date.timestamp()),
-                    "limit": 100,
-                    "status": "completed"
-                }
-                
-                response = await client.get(endpoint, headers=self.headers, params=params)
-                if response.status_code == 200:
-                    return response.json().get("orders", [])
-                return []
+            # Uber API endpoint for deliveries
+            endpoint = f"{self.BASE_URL}/marketplace/orders"
+            params = {
+                "start_time": int(start_date.timestamp()),
+                "end_time": int(end_date.timestamp()),
+                "limit": 100,
+                "status": "completed"
+            }
+            response = await self._get(endpoint, params)
+            if response.status_code == 200:
+                return response.json().get("orders", [])
+            self.last_error = f"HTTP {response.status_code}"
+            return []
         except Exception as e:
-            print(f"Error fetching Uber orders: {e}")
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.warning(f"Error fetching Uber orders for {self.user_id}: {self.last_error}")
             return []
     
+    def entry_values(self, order: dict) -> dict:
+        """Entry column values for one Uber order."""
+        return {
+            "user_id": self.user_id,
+            "timestamp": datetime.fromtimestamp(order.get("completed_at", 0)),
+            "type": EntryType.ORDER,
+            "app": AppType.UBEREATS,
+            "order_id": order.get("order_id"),
+            "amount": Decimal(str(order.get("fare", {}).get("total_amount", 0))),
+            "distance_miles": order.get("trip_distance", 0),
+            "duration_minutes": int(order.get("trip_duration", 0) / 60),
+        }
+
     async def sync_orders(self, db: Session, orders: list):
         """Convert Uber orders to Entry records"""
-        created_entries = []
-        
-        for order in orders:
-            order_id = order.get("order_id")
-            
-            # Check if already synced
-            existing = db.query(SyncedOrder).filter(
-                SyncedOrder.user_id == self.user_id,
-                SyncedOrder.platform == PlatformIntegration.UBER,
-                SyncedOrder.platform_order_id == order_id
-            ).first()
-            
-            if existing:
-                continue
-            
-            # Create entry from Uber order
-            amount = Decimal(str(order.get("fare", {}).get("total_amount", 0)))
-            distance_miles = order.get("trip_distance", 0)
-            timestamp = datetime.fromtimestamp(order.get("completed_at", 0))
-            
-            entry = Entry(
-                user_id=self.user_id,
-                timestamp=timestamp,
-                type=EntryType.ORDER,
-                app=AppType.UBEREATS,
-                order_id=order_id,
-                amount=amount,
-                distance_miles=distance_miles,
-                duration_minutes=int(order.get("trip_duration", 0) / 60)
-            )
-            
-            db.add(entry)
-            db.flush()
-            
-            # Track synced order
-            synced_order = SyncedOrder(
-                user_id=self.user_id,
-                platform=PlatformIntegration.UBER,
-                platform_order_id=order_id,
-                entry_id=entry.id,
-                sync_status="completed",
-                synced_at=datetime.utcnow(),
-                raw_data=json.dumps(order)
-            )
-            db.add(synced_order)
-            created_entries.append(entry)
-        
-        db.commit()
-        return created_entries
+        return import_synced_orders(db, self.user_id, PlatformIntegration.UBER, orders, self.entry_values)
 
 
 class ShiptSyncService:
     """Service to sync orders from Shipt API"""
     BASE_URL = "https://shipt.com/api/v1"
 
-    def __init__(self, access_token: str, user_id: str):
+    def __init__(self, access_token: str, user_id: str,
+                 client: Optional[httpx.AsyncClient] = None, stats: Optional[SyncRunStats] = None):
         self.access_token = access_token
         self.user_id = user_id
         self.headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
+        # Shared pooled client from the sync engine; None = one-off client.
+        self.client = client
+        self.stats = stats
+        self.last_error: Optional[str] = None
+
+    async def _get(self, endpoint: str, params: dict) -> httpx.Response:
+        self.last_error = None
+        if self.client is not None:
+            return await request_with_backoff(self.client, "GET", endpoint, self.stats,
+                                              headers=self.headers, params=params)
+        async with httpx.AsyncClient(timeout=_sync_timeout()) as client:
+            return await request_with_backoff(client, "GET", endpoint, self.stats,
+                                              headers=self.headers, params=params)
     
     async def fetch_orders(self, start_date: datetime, end_date: datetime):
         """Fetch orders from Shipt API"""
         try:
-            async with httpx.AsyncClient() as client:
-                endpoint = f"{self.BASE_URL}/orders"
-                params = {
-                    "start_date": start_date.isoformat(),
-                    "end_date": end_date.isoformat(),
-                    "status": "completed"
-                }
-                
-                response = await client.get(endpoint, headers=self.headers, params=params)
-                if response.status_code == 200:
-                    return response.json().get("results", [])
-                return []
+            endpoint = f"{self.BASE_URL}/orders"
+            params = {
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat(),
+                "status": "completed"
+            }
+            response = await self._get(endpoint, params)
+            if response.status_code == 200:
+                return response.json().get("results", [])
+            self.last_error = f"HTTP {response.status_code}"
+            return []
         except Exception as e:
-            print(f"Error fetching Shipt orders: {e}")
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.warning(f"Error fetching Shipt orders for {self.user_id}: {self.last_error}")
             return []
     
+    def entry_values(self, order: dict) -> dict:
+        """Entry column values for one Shipt order."""
+        return {
+            "user_id": self.user_id,
+            "timestamp": datetime.fromisoformat(order.get("completed_at")),
+            "type": EntryType.ORDER,
+            "app": AppType.SHIPT,
+            "order_id": order.get("order_id"),
+            "amount": Decimal(str(order.get("payout", 0))),
+            "distance_miles": order.get("estimated_mileage", 0),
+            "duration_minutes": int(order.get("estimated_time", 0)),
+        }
+
     async def sync_orders(self, db: Session, orders: list):
         """Convert Shipt orders to Entry records"""
-        created_entries = []
-        
-        for order in orders:
-            order_id = order.get("order_id")
-            
-            # Check if already synced
-            existing = db.query(SyncedOrder).filter(
-                SyncedOrder.user_id == self.user_id,
-                SyncedOrder.platform == PlatformIntegration.SHIPT,
-                SyncedOrder.platform_order_id == order_id
-            ).first()
-            
-            if existing:
-                continue
-            
-            # Create entry from Shipt order
-            amount = Decimal(str(order.get("payout", 0)))
-            distance_miles = order.get("estimated_mileage", 0)
-            timestamp = datetime.fromisoformat(order.get("completed_at"))
-            
-            entry = Entry(
-                user_id=self.user_id,
-                timestamp=timestamp,
-                type=EntryType.ORDER,
-                app=AppType.SHIPT,
-                order_id=order_id,
-                amount=amount,
-                distance_miles=distance_miles,
-                duration_minutes=int(order.get("estimated_time", 0))
-            )
-            
-            db.add(entry)
-            db.flush()
-            
-            # Track synced order
-            synced_order = SyncedOrder(
-                user_id=self.user_id,
-                platform=PlatformIntegration.SHIPT,
-                platform_order_id=order_id,
-                entry_id=entry.id,
-                sync_status="completed",
-                synced_at=datetime.utcnow(),
-                raw_data=json.dumps(order)
-            )
-            db.add(synced_order)
-            created_entries.append(entry)
-        
-        db.commit()
-        return created_entries
-
-
-async def sync_all_platforms(db: Session):
-    """Sync orders for every active per-user credential. Credentials with a
-    NULL user_id are legacy single-tenant rows from before the multi-user
-    migration — we skip them because we can't safely attribute the synced
-    Entry rows to a user."""
-    credentials = (
+        return import_synced_orders(db, self.user_id, PlatformIntegration.SHIPT, orders, self.entry_values)
+
+
+SYNC_SERVICES = {
+    PlatformIntegration.UBER: UberSyncService,
+    PlatformIntegration.SHIPT: ShiptSyncService,
+}
+
+
+def sync_window(cred: ApiCredential, now: datetime, full: bool = False) -> tuple:
+    """(start, is_full) of the window to fetch for `cred` up to `now`."""
+    due = (
+        full
+        or cred.sync_cursor_at is None
+        or cred.last_full_sync_at is None
+        or now - cred.last_full_sync_at >= timedelta(hours=SYNC_FULL_RECONCILE_HOURS)
+    )
+    full_start = now - timedelta(days=SYNC_FULL_WINDOW_DAYS)
+    if due:
+        return full_start, True
+    return max(full_start, cred.sync_cursor_at - timedelta(minutes=SYNC_OVERLAP_MINUTES)), False
+
+
+async def _sync_credential(db: Session, cred: ApiCredential, client: httpx.AsyncClient,
+                           sem: asyncio.Semaphore, stats: SyncRunStats,
+                           end_date: datetime, full: bool) -> None:
+    service = SYNC_SERVICES[cred.platform](cred.access_token, cred.user_id, client=client, stats=stats)
+    start_date, is_full = sync_window(cred, end_date, full)
+    stats.full_syncs += is_full
+    stats.window_hours += (end_date - start_date).total_seconds() / 3600
+    async with sem:
+        try:
+            orders = await service.fetch_orders(start_date, end_date)
+            stats.orders_fetched += len(orders)
+            if service.last_error:
+                stats.failed += 1
+                return
+            # Advanced in the same transaction as the import, so the cursor
+            # only moves past orders that actually landed.
+            cred.sync_cursor_at = end_date
+            if is_full:
+                cred.last_full_sync_at = end_date
+            created = await service.sync_orders(db, orders)
+            db.commit()
+            stats.entries_created += len(created)
+        except Exception as e:
+            db.rollback()
+            stats.failed += 1
+            logger.warning(f"Error syncing {cred.platform} for {cred.user_id}: {e}")
+            return
+    stats.succeeded += 1
+
+
+async def sync_all_platforms(db: Session, full: bool = False, user_id: Optional[str] = None) -> dict:
+    """Sync orders for every active per-user credential (or only `user_id`'s).
+    Credentials with a NULL user_id are legacy single-tenant rows from before
+    the multi-user migration — we skip them because we can't safely attribute
+    the synced Entry rows to a user. Each credential fetches from its
+    watermark (see sync_window); `full=True` forces a full-window
+    reconciliation. Returns the run's SyncRunStats as a dict."""
+    global _last_run_stats
+    query = (
         db.query(ApiCredential)
         .join(AuthUser, AuthUser.id == ApiCredential.user_id)
         .filter(
             ApiCredential.is_active == 1,
             ApiCredential.user_id.isnot(None),
         )
-        .all()
     )
+    if user_id is not None:
+        query = query.filter(ApiCredential.user_id == user_id)
+    credentials = query.all()
+    credentials = [c for c in credentials if c.platform in SYNC_SERVICES]
 
-    start_date = datetime.utcnow() - timedelta(days=7)
     end_date = datetime.utcnow()
 
-    for cred in credentials:
-        try:
-            if cred.platform == PlatformIntegration.UBER:
-                service = UberSyncService(cred.access_token, cred.user_id)
-                orders = await service.fetch_orders(start_date, end_date)
-                await service.sync_orders(db, orders)
-            elif cred.platform == PlatformIntegration.SHIPT:
-                service = ShiptSyncService(cred.access_token, cred.user_id)
-                orders = await service.fetch_orders(start_date, end_date)
-                await service.sync_orders(db, orders)
-        except Exception as e:
-            print(f"Error syncing {cred.platform}: {e}")
+    stats = SyncRunStats()
+    stats.credentials = len(credentials)
+    sem = asyncio.Semaphore(SYNC_CONCURRENCY)
+    limits = httpx.Limits(max_connections=SYNC_CONCURRENCY, max_keepalive_connections=SYNC_CONCURRENCY)
+    clients = {platform: httpx.AsyncClient(timeout=_sync_timeout(), limits=limits) for platform in SYNC_SERVICES}
+    try:
+        await asyncio.gather(*[
+            _sync_credential(db, cred, clients[cred.platform], sem, stats, end_date, full)
+            for cred in credentials
+        ])
+    finally:
+        for client in clients.values():
+            await client.aclose()
+
+    _last_run_stats = stats.finish().as_dict()
+    logger.info(f"Sync run: {_last_run_stats}")
+    return _last_run_stats
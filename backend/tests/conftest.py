@@ -12,11 +12,27 @@ impossible for EVERY test in this suite:
 3. Outbound network connections to non-loopback hosts are blocked at the
    socket layer. A test that genuinely needs the network can opt out with
    the `allow_outbound_network` marker:  @pytest.mark.allow_outbound_network
+
+It also provides the query-count guards: `count_queries` and
+`assert_no_n_plus_one`, which fails a test when an endpoint's SQL statement
+count grows with the number of rows it returns; and the router test harness:
+`db_session` (a fresh in-memory database), `pro_user` (a Pro AuthUser
+factory) and `api_client` (a TestClient for a few routers, signed in).
 """
 import os
 import socket
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 
 import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.services.request_metrics import normalize_sql
 
 # Secrets that must never be live inside a test run.
 _BLANKED_ENV_VARS = [
@@ -106,3 +122,136 @@ def _no_outbound_network(request, monkeypatch):
     monkeypatch.setattr(socket.socket, "connect_ex", connect_ex)
     monkeypatch.setattr(socket, "create_connection", create_connection)
     yield
+
+
+@pytest.fixture(autouse=True)
+def _fresh_principal_cache():
+    """Each test builds its own in-memory DB, so a principal cached by an
+    earlier test (same user id, same iat second) must never leak into it."""
+    from backend.auth import clear_principal_cache
+    clear_principal_cache()
+    yield
+    clear_principal_cache()
+
+
+class QueryCounter:
+    """Records every SQL statement any Engine runs while the block is open.
+    Listens on the Engine class, not one engine: TestClient runs the app in
+    its own thread and the async routes go through a separate engine."""
+
+    def __init__(self):
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(Engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(Engine, "before_cursor_execute", self._record)
+
+    def __len__(self):
+        return len(self.statements)
+
+    def normalized(self) -> Counter:
+        return Counter(normalize_sql(s) for s in self.statements)
+
+
+@pytest.fixture
+def count_queries():
+    """`with count_queries() as q: client.get(...)` then `len(q)`."""
+    return QueryCounter
+
+
+@pytest.fixture
+def assert_no_n_plus_one():
+    """check(call, grow, sizes=(2, 8)): for each size, grow(n) brings the data
+    behind the endpoint to n rows, then call() makes the request. Fails,
+    listing the statements that repeat per row, if the largest size issues
+    more statements than the smallest."""
+
+    def check(call, grow, sizes=(2, 8)):
+        runs = []
+        for n in sizes:
+            grow(n)
+            with QueryCounter() as queries:
+                response = call()
+            assert response.status_code < 400, response.text
+            runs.append(queries)
+        small, large = runs[0], runs[-1]
+        if len(large) > len(small):
+            grown = large.normalized() - small.normalized()
+            pytest.fail(
+                f"Query count grows with row count: {len(small)} statements at "
+                f"{sizes[0]} rows, {len(large)} at {sizes[-1]}. Repeated per row:\n"
+                + "\n".join(f"  +{n}x {sql}" for sql, n in grown.most_common()),
+                pytrace=False,
+            )
+
+    return check
+
+
+@pytest.fixture
+def db_session():
+    """A session on a fresh in-memory SQLite database with every table. The
+    StaticPool shares its one connection with the TestClient's thread; the
+    engine is `db_session.get_bind()`."""
+    from backend.db import Base
+    import backend.models  # noqa: F401 — registers every table on Base.metadata
+
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def pro_user():
+    """pro_user(user_id, tz=None, expires_in_days=30, **fields): an unsaved
+    AuthUser with a Pro entitlement expiring in `expires_in_days` (negative
+    for a lapsed one)."""
+    from backend.models import AuthUser
+
+    def make(user_id, tz=None, expires_in_days=30, **fields):
+        now = datetime.now(timezone.utc)
+        fields.setdefault("email", f"{user_id}@test.com")
+        fields.setdefault("password_hash", "x")
+        return AuthUser(
+            id=user_id, timezone=tz,
+            pro_entitlement_active=True,
+            pro_entitlement_expires_at=(now + timedelta(days=expires_in_days)).isoformat(),
+            pro_entitlement_updated_at=now.isoformat(),
+            **fields,
+        )
+
+    return make
+
+
+@pytest.fixture
+def api_client(db_session):
+    """api_client(*routers, user_id, session=db_session, auth=get_current_user):
+    a TestClient for an app serving `routers` under /api, with get_db yielding
+    `session` and `auth` resolving to the AuthUser `user_id` — an id, or a
+    callable returning one, for tests that switch users."""
+    from backend.auth import get_current_user
+    from backend.db import get_db
+    from backend.models import AuthUser
+
+    def make(*routers, user_id, session=None, auth=get_current_user):
+        session = session or db_session
+        app = FastAPI()
+        for router in routers:
+            app.include_router(router, prefix="/api")
+        app.dependency_overrides[get_db] = lambda: session
+        app.dependency_overrides[auth] = lambda: session.get(AuthUser, user_id() if callable(user_id) else user_id)
+        return TestClient(app)
+
+    return make
@@ -0,0 +1,175 @@
+"""AI suggestions: completions are awaited on the async client (the event
+loop keeps running), bounded by a deadline and a concurrency cap, and cached
+per (user, range, stats fingerprint). Exercised against a loopback stub of
+the OpenAI chat completions API."""
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import Base
+from backend.models import AppType, AuthUser, Entry, EntryType
+from backend.services import ai_suggestions
+from backend.services.ai_suggestions import get_ai_suggestions, suggestion_cache_stats
+
+USER_ID = "ai-user"
+START = datetime(2026, 3, 2, 9)
+
+
+class _StubModel(BaseHTTPRequestHandler):
+    """Answers every chat completion after `server.delay` seconds, echoing
+    the order count from the prompt so tests can tell answers apart."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.calls += 1
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            orders = body["messages"][1]["content"].split("Total orders: ")[1].split()[0]
+            data = json.dumps({
+                "id": "cmpl-stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": f"tip for {orders} orders"}}],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (deadline tests)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def model(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubModel)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.calls, server.in_flight, server.peak, server.delay = 0, 0, 0, 0.0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(ai_suggestions, "_api_key", "sk-test")
+    monkeypatch.setattr(ai_suggestions, "_base_url", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setattr(ai_suggestions, "_loop", None)
+    ai_suggestions.clear_suggestion_cache()
+    yield server
+    ai_suggestions.clear_suggestion_cache()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ai.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    db.add(AuthUser(id=USER_ID, email="ai@test.com", password_hash="x", timezone="UTC"))
+    for day in range(10):
+        db.add(Entry(user_id=USER_ID, timestamp=START + timedelta(days=day), type=EntryType.ORDER,
+                     app=AppType.DOORDASH, amount=Decimal("10") + day))
+    db.commit()
+    db.close()
+    yield Session
+    engine.dispose()
+
+
+def test_identical_requests_reuse_the_completion(model, sessions):
+    db = sessions()
+    to_dt = START + timedelta(days=5)
+
+    async def scenario():
+        first = await get_ai_suggestions(db, START, to_dt, USER_ID)
+        again = await get_ai_suggestions(db, START, to_dt, USER_ID)
+        wider = await get_ai_suggestions(db, START, START + timedelta(days=9), USER_ID)
+        return first, again, wider
+
+    first, again, wider = asyncio.run(scenario())
+    assert first["suggestion"] == "tip for 6 orders" and first == again
+    assert wider["suggestion"] == "tip for 10 orders"
+    assert model.calls == 2
+
+    # New data in the range changes the fingerprint: a fresh completion.
+    db.add(Entry(user_id=USER_ID, timestamp=START + timedelta(hours=3), type=EntryType.ORDER,
+                 app=AppType.UBEREATS, amount=Decimal("25")))
+    db.commit()
+    changed = asyncio.run(get_ai_suggestions(db, START, to_dt, USER_ID))
+    assert changed["suggestion"] == "tip for 7 orders" and model.calls == 3
+    assert suggestion_cache_stats()["hits"] == 1
+    # Another user never sees this user's cached answer.
+    assert asyncio.run(get_ai_suggestions(db, START, to_dt, "someone-else"))["reasoning"] == "No data available yet"
+
+
+def test_slow_model_falls_back_at_the_deadline(model, sessions, monkeypatch):
+    monkeypatch.setattr(ai_suggestions, "AI_SUGGESTIONS_TIMEOUT_SECONDS", 0.3)
+    model.delay = 2
+    db = sessions()
+
+    started = time.perf_counter()
+    result = asyncio.run(get_ai_suggestions(db, START, None, USER_ID))
+    assert time.perf_counter() - started < 1.5
+    assert result["reasoning"] == "Statistical analysis of 10 entries"
+    assert result["suggestion"].startswith("Keep working during peak hours")
+    assert result["average_order"] == 14.5
+
+    # Fallbacks aren't cached: once the model recovers, it is asked again.
+    model.delay = 0
+    assert asyncio.run(get_ai_suggestions(db, START, None, USER_ID))["suggestion"] == "tip for 10 orders"
+    assert model.calls == 2
+
+
+def test_completions_are_capped_and_do_not_block_the_loop(model, sessions, monkeypatch):
+    monkeypatch.setattr(ai_suggestions, "AI_SUGGESTIONS_CONCURRENCY", 2)
+    model.delay = 0.3
+
+    async def scenario():
+        ticks = 0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0.02)
+
+        tick_task = asyncio.create_task(ticker())
+        # Distinct ranges, so nothing is served from the cache.
+        results = await asyncio.gather(*(
+            get_ai_suggestions(sessions(), START, START + timedelta(days=day), USER_ID) for day in range(4)
+        ))
+        done.set()
+        await tick_task
+        return results, ticks
+
+    started = time.perf_counter()
+    results, ticks = asyncio.run(scenario())
+    elapsed = time.perf_counter() - started
+    assert [r["suggestion"] for r in results] == [f"tip for {n} orders" for n in (1, 2, 3, 4)]
+    assert model.peak == 2 and model.calls == 4
+    assert 0.55 < elapsed < 1.2   # two waves of two
+    assert ticks >= 20            # the loop kept running throughout
+
+
+def test_unconfigured_model_uses_statistics(sessions, monkeypatch):
+    monkeypatch.setattr(ai_suggestions, "_api_key", None)
+    monkeypatch.setattr(ai_suggestions, "_loop", None)
+    result = asyncio.run(get_ai_suggestions(sessions(), START, None, USER_ID))
+    assert result["reasoning"].endswith("(AI suggestions unavailable)")
+    assert result["peak_time"] == "9:00 - 10:00" and result["total_orders"] == 10
@@ -0,0 +1,180 @@
+"""GET /api/analytics/heatmap: a 7 × 24 weekday × hour grid in the user's
+timezone, filled from one grouped statement, with calendar-day ranges
+resolved on the same DST-correct boundaries as /rollup."""
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.auth import get_current_user
+from backend.db import Base, get_async_db
+from backend.models import AppType, Entry, EntryType
+from backend.routers import analytics
+
+USER_ID = "analytics-user"
+
+
+class FakeUser:
+    id = USER_ID
+    timezone = "America/Chicago"
+
+
+@pytest.fixture
+def setup(tmp_path):
+    db_path = tmp_path / "analytics.db"
+    engine = create_engine(f"sqlite:///{db_path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def _async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(analytics.router, prefix="/api")
+    app.dependency_overrides[get_async_db] = _async_db
+    app.dependency_overrides[get_current_user] = lambda: FakeUser()
+    with TestClient(app) as client:
+        yield client, Session
+    engine.dispose()
+
+
+def _add(Session, *entries):
+    with Session() as db:
+        for ts, amount, entry_type in entries:
+            db.add(Entry(user_id=USER_ID, timestamp=ts, type=entry_type, app=AppType.DOORDASH,
+                         amount=Decimal(str(amount))))
+        db.add(Entry(user_id="someone-else", timestamp=datetime(2026, 3, 6, 23, 5), type=EntryType.ORDER,
+                     app=AppType.DOORDASH, amount=Decimal("99")))
+        db.commit()
+
+
+def test_heatmap_grid_in_local_time(setup, count_queries):
+    client, Session = setup
+    _add(
+        Session,
+        # Friday 17:00 local, two Fridays running: one order, then two.
+        (datetime(2026, 3, 6, 23, 5), 12, EntryType.ORDER),
+        (datetime(2026, 3, 13, 22, 10), 20, EntryType.ORDER),   # after spring-forward: 17:10 CDT
+        (datetime(2026, 3, 13, 22, 40), 10, EntryType.ORDER),
+        (datetime(2026, 3, 13, 22, 50), -4, EntryType.ORDER),   # cancellation
+        (datetime(2026, 3, 13, 22, 55), -30, EntryType.EXPENSE),
+        # Saturday 01:00 UTC is still Friday evening (20:00 CDT).
+        (datetime(2026, 3, 14, 1, 0), 8, EntryType.ORDER),
+    )
+
+    with count_queries() as queries:
+        res = client.get("/api/analytics/heatmap")
+    assert res.status_code == 200
+    body = res.json()
+    assert body["timezone"] == "America/Chicago" and body["weekdays"][4] == "Friday"
+    grid = body["grid"]
+    assert len(grid) == 7 and all(len(day) == 24 for day in grid)
+    assert grid[4][17] == {"orders": 3, "revenue": 42.0, "average_order_value": 14.0,
+                           "hours": 2, "dollars_per_hour": 21.0}
+    assert grid[4][20]["orders"] == 1 and grid[5][1]["orders"] == 0
+    assert sum(cell["orders"] for day in grid for cell in day) == 4
+    assert len([q for q in queries.statements if "FROM entries" in q]) == 1
+
+
+def test_heatmap_range_uses_local_calendar_days(setup):
+    client, Session = setup
+    _add(
+        Session,
+        (datetime(2026, 3, 10, 4, 30), 15, EntryType.ORDER),    # Mon 3/9 23:30 CDT
+        (datetime(2026, 3, 10, 15, 0), 9, EntryType.ORDER),     # Tue 3/10 10:00 CDT
+    )
+    grid = client.get("/api/analytics/heatmap", params={"from_date": "2026-03-09", "to_date": "2026-03-09"}).json()["grid"]
+    assert grid[0][23]["revenue"] == 15.0
+    assert sum(cell["orders"] for day in grid for cell in day) == 1
+
+    assert client.get("/api/analytics/heatmap", params={"from_date": "2026-03-10", "to_date": "2026-03-09"}).status_code == 400
+    bad = client.get("/api/analytics/heatmap", params={"from_date": "not-a-date"})
+    assert bad.status_code == 400 and "not-a-date" not in bad.text
+
+
+SERIES_ENTRIES = (
+    (datetime(2026, 3, 2, 15, 0), 20, EntryType.ORDER),       # Mon 3/2 09:00 CST
+    (datetime(2026, 3, 3, 5, 30), 10, EntryType.ORDER),       # Mon 3/2 23:30 CST
+    (datetime(2026, 3, 3, 18, 0), -25, EntryType.EXPENSE),    # Tue 3/3
+    (datetime(2026, 3, 9, 4, 30), 15, EntryType.ORDER),       # Sun 3/8 23:30 CDT
+    (datetime(2026, 3, 9, 16, 0), -3, EntryType.ORDER),       # Mon 3/9 cancellation
+    (datetime(2026, 4, 1, 4, 0), 40, EntryType.ORDER),        # Tue 3/31 23:00 CDT
+)
+
+
+def _series(client, bucket, **params):
+    res = client.get("/api/analytics/series", params={"bucket": bucket, **params})
+    assert res.status_code == 200, res.text
+    return res.json()["series"]
+
+
+def test_series_buckets_by_local_day_week_and_month(setup, count_queries):
+    client, Session = setup
+    _add(Session, *SERIES_ENTRIES)
+    with Session() as db:
+        for ts, amount, entry_type in SERIES_ENTRIES:
+            db.query(Entry).filter(Entry.timestamp == ts).update({"distance_miles": 2.5})
+        db.commit()
+    params = {"from_date": "2026-03-01", "to_date": "2026-03-31"}
+
+    with count_queries() as queries:
+        days = _series(client, "day", **params)
+    assert len([q for q in queries.statements if "FROM entries" in q]) == 1
+    assert [d["start"] for d in days][:3] == ["2026-03-01", "2026-03-02", "2026-03-03"] and len(days) == 31
+    by_day = {d["start"]: d for d in days}
+    assert by_day["2026-03-02"] == {"start": "2026-03-02", "revenue": 30.0, "expenses": 0.0, "profit": 30.0,
+                                    "miles": 5.0, "orders": 2}
+    assert by_day["2026-03-03"]["expenses"] == 25.0 and by_day["2026-03-03"]["profit"] == -25.0
+    assert by_day["2026-03-08"]["revenue"] == 15.0
+    assert by_day["2026-03-09"]["orders"] == 1 and by_day["2026-03-09"]["profit"] == -3.0
+    assert by_day["2026-03-31"]["revenue"] == 40.0 and by_day["2026-03-20"]["orders"] == 0
+
+    weeks = _series(client, "week", **params)
+    assert [(w["start"], w["orders"], w["profit"]) for w in weeks[:3]] == [
+        ("2026-02-23", 0, 0.0), ("2026-03-02", 3, 20.0), ("2026-03-09", 1, -3.0),
+    ]
+    assert weeks[-1]["start"] == "2026-03-30" and weeks[-1]["revenue"] == 40.0
+
+    months = _series(client, "month", from_date="2026-02-15", to_date="2026-04-30")
+    assert [(m["start"], m["orders"], m["revenue"], m["expenses"]) for m in months] == [
+        ("2026-02-01", 0, 0.0, 0.0), ("2026-03-01", 5, 85.0, 28.0), ("2026-04-01", 0, 0.0, 0.0),
+    ]
+
+
+def test_series_reads_daily_rollups_when_current(setup, count_queries):
+    from backend.services.daily_rollup_service import rebuild_daily_rollups
+    from backend.services.rollup_service import calculate_rollup
+    from backend.services.period import get_est_date_range
+
+    client, Session = setup
+    _add(Session, *SERIES_ENTRIES)
+    params = {"from_date": "2026-03-01", "to_date": "2026-03-31"}
+    from_entries = {b: _series(client, b, **params) for b in ("day", "week", "month")}
+    with Session() as db:
+        rebuild_daily_rollups(db, USER_ID, FakeUser.timezone)
+        db.commit()
+
+    with count_queries() as queries:
+        days = _series(client, "day", **params)
+    assert not [q for q in queries.statements if "FROM entries" in q]
+    assert len([q for q in queries.statements if "FROM daily_rollups" in q]) == 1
+    assert days == from_entries["day"]
+    assert _series(client, "week", **params) == from_entries["week"]
+    assert _series(client, "month", **params) == from_entries["month"]
+
+    # The series adds up to the rollup of the same range.
+    with Session() as db:
+        rollup = calculate_rollup(db, *get_est_date_range("2026-03-01", "2026-03-31", FakeUser.timezone),
+                                  user_id=USER_ID, tz_name=FakeUser.timezone)
+    assert sum(d["profit"] for d in days) == pytest.approx(rollup["profit"])
+    assert sum(d["revenue"] for d in days) == pytest.approx(rollup["revenue"])
+
+    assert client.get("/api/analytics/series", params={"bucket": "year"}).status_code == 400
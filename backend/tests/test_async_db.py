@@ -0,0 +1,151 @@
+"""Async session layer: the hot read routes (GET /entries, /rollup,
+/dashboard/overview) run on `get_async_db` and return exactly what the sync
+code computes over the same rows; async_database_url keeps the sync engine's
+TLS rules when it switches drivers."""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import Base, async_database_url, get_async_db, get_db
+from backend.auth import get_current_user
+from backend.models import AppType, AuthUser, Entry, EntryType
+from backend.routers import dashboard, entries, rollup
+from backend.services.period import get_est_date_range
+from backend.services.rollup_service import calculate_rollup
+
+USER_ID = "async-db-user"
+OTHER_ID = "async-db-other"
+TZ = "America/Denver"
+
+
+@pytest.fixture
+def harness(tmp_path):
+    db_path = tmp_path / "async.db"
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    session = Session()
+
+    for user_id in (USER_ID, OTHER_ID):
+        session.add(AuthUser(id=user_id, email=f"{user_id}@test.com", password_hash="x", timezone=TZ))
+    base = datetime(2026, 6, 1, 14, 0, 0)
+    for i in range(40):
+        session.add(Entry(
+            user_id=USER_ID if i % 4 else OTHER_ID,
+            timestamp=base + timedelta(hours=7 * i),
+            type=EntryType.EXPENSE if i % 5 == 0 else EntryType.ORDER,
+            app=AppType.UBEREATS if i % 2 else AppType.DOORDASH,
+            amount=Decimal("-3.25") if i % 5 == 0 else Decimal("11.50") + i,
+            distance_miles=1.25 * (i % 3), duration_minutes=10 + i,
+        ))
+    session.commit()
+
+    async def _async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app = FastAPI()
+    for module in (entries, rollup, dashboard):
+        app.include_router(module.router, prefix="/api")
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[get_async_db] = _async_db
+    app.dependency_overrides[get_current_user] = lambda: session.get(AuthUser, USER_ID)
+    with TestClient(app) as client:
+        yield client, session
+    session.close()
+    engine.dispose()
+
+
+def test_get_entries_matches_sync_query(harness):
+    client, session = harness
+    r = client.get("/api/entries", params={"from_date": "2026-06-01", "to_date": "2026-06-30"})
+    assert r.status_code == 200
+    from_dt, to_dt = get_est_date_range("2026-06-01", "2026-06-30", TZ)
+    expected = session.query(Entry).filter(
+        Entry.user_id == USER_ID, Entry.timestamp >= from_dt, Entry.timestamp <= to_dt,
+    ).order_by(Entry.timestamp.desc(), Entry.id.desc()).all()
+    assert [e["id"] for e in r.json()] == [e.id for e in expected]
+    assert expected and all(e.user_id == USER_ID for e in expected)
+
+
+
+def test_get_entries_keyset_pages_follow_sort_order(harness):
+    client, session = harness
+    # Backdated rows get high ids but old timestamps, and two share a
+    # timestamp: an id-only cursor would skip or repeat these.
+    tied = datetime(2026, 6, 3, 9, 0, 0)
+    for ts in (datetime(2026, 5, 20, 8, 0, 0), tied, tied):
+        session.add(Entry(user_id=USER_ID, timestamp=ts, type=EntryType.ORDER, app=AppType.DOORDASH,
+                          amount=Decimal("7.00"), distance_miles=1.0, duration_minutes=9))
+    session.commit()
+    expected = [e.id for e in session.query(Entry).filter(Entry.user_id == USER_ID)
+                .order_by(Entry.timestamp.desc(), Entry.id.desc())]
+
+    seen, cursor = [], None
+    while True:
+        r = client.get("/api/entries", params={"limit": 4, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200 and len(r.json()) <= 4
+        seen += [e["id"] for e in r.json()]
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == expected
+
+    # Default page size, and no cursor once everything fits.
+    r = client.get("/api/entries")
+    assert len(r.json()) == len(expected) and "X-Next-Cursor" not in r.headers
+
+    # A legacy integer cursor continues after that row in sort order.
+    r = client.get("/api/entries", params={"cursor": expected[9], "limit": 500})
+    assert [e["id"] for e in r.json()] == expected[10:]
+
+    assert client.get("/api/entries", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_get_rollup_matches_sync_calculation(harness):
+    client, session = harness
+    r = client.get("/api/rollup", params={"from_date": "2026-06-01", "to_date": "2026-06-14"})
+    assert r.status_code == 200
+    from_dt, to_dt = get_est_date_range("2026-06-01", "2026-06-14", TZ)
+    expected = calculate_rollup(session, from_dt, to_dt, None, USER_ID, TZ)
+    assert r.json()["revenue"] == expected["revenue"]
+    assert r.json()["profit"] == expected["profit"]
+    assert r.json()["by_app"] == expected["by_app"]
+
+
+def test_dashboard_overview_runs_on_async_session(harness):
+    client, _ = harness
+    r = client.get("/api/dashboard/overview", params={"timeframe": "THIS_MONTH"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["timeframe"] == "THIS_MONTH"
+    assert set(body["rollup"]) >= {"revenue", "expenses", "profit"}
+
+
+def test_async_url_keeps_tls_rules():
+    url, args = async_database_url("postgresql://u:p@db.example.com/app")
+    assert url == "postgresql+asyncpg://u:p@db.example.com/app"
+    assert args["ssl"] == "require"
+
+    url, args = async_database_url(
+        "postgres://u:p@db.example.com:6543/app?sslmode=verify-full&channel_binding=require"
+    )
+    assert url == "postgresql+asyncpg://u:p@db.example.com:6543/app"
+    assert args["ssl"] == "verify-full"
+
+    _, args = async_database_url("postgresql://u:p@localhost/app")
+    assert "ssl" not in args
+
+    with pytest.raises(RuntimeError):
+        async_database_url("postgresql://u:p@db.example.com/app?sslmode=disable")
+
+    url, args = async_database_url("sqlite:///./driver_ledger.db")
+    assert url == "sqlite+aiosqlite:///./driver_ledger.db" and args == {}
@@ -0,0 +1,150 @@
+"""get_current_user principal cache: repeat requests skip the auth_users
+SELECT, and every path that changes the row (password reset / email change
+revocation, timezone, entitlement, account deletion, raw bulk updates)
+takes effect on the very next request."""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import auth
+from backend.auth import invalidate_cached_user, principal_cache_stats
+from backend.db import Base, get_db
+from backend.models import AuthUser
+from backend.routers import auth_routes
+from backend.routers.auth_routes import create_access_token
+
+
+@pytest.fixture
+def harness(monkeypatch):
+    # Off by default (cross-process revocation); these tests opt in.
+    monkeypatch.setattr(auth._principal_cache, "ttl_seconds", 30)
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = Session()
+
+    user = AuthUser(
+        id=str(uuid.uuid4()), email=f"u-{uuid.uuid4().hex[:8]}@example.com",
+        password_hash="x", first_name="Cache", timezone="America/New_York",
+    )
+    session.add(user)
+    session.commit()
+
+    app = FastAPI()
+    app.include_router(auth_routes.router, prefix="/api")
+    # A fresh session per request, like production, so a hit really has to
+    # rebuild the principal without reading auth_users.
+    def _db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+    app.dependency_overrides[get_db] = _db
+
+    headers = {"Authorization": f"Bearer {create_access_token(user.id, user.email)}"}
+    with TestClient(app) as client:
+        yield client, session, engine, user, headers
+    session.close()
+    engine.dispose()
+
+
+def _user_selects(engine, fn):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    return result, [s for s in statements if "FROM auth_users" in s]
+
+
+def test_repeat_requests_hit_the_cache(harness):
+    client, _, engine, user, headers = harness
+    r, selects = _user_selects(engine, lambda: client.get("/api/auth/me", headers=headers))
+    assert r.status_code == 200 and len(selects) == 1
+
+    for _ in range(3):
+        r, selects = _user_selects(engine, lambda: client.get("/api/auth/me", headers=headers))
+        assert r.status_code == 200
+        assert r.json()["id"] == user.id and r.json()["email"] == user.email
+        assert selects == []
+
+    stats = principal_cache_stats()
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_cached_principal_is_writable(harness):
+    client, session, _, user, headers = harness
+    client.get("/api/auth/me", headers=headers)  # warm
+    r = client.post("/api/auth/timezone", json={"timezone": "Asia/Tokyo"}, headers=headers)
+    assert r.status_code == 200
+    session.expire_all()
+    assert session.get(AuthUser, user.id).timezone == "Asia/Tokyo"
+    # The write invalidated the cached copy, so the next read sees it.
+    assert client.get("/api/auth/me", headers=headers).json()["timezone"] == "Asia/Tokyo"
+
+
+def test_password_change_revokes_cached_token(harness):
+    client, session, _, user, headers = harness
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    # Equivalent of /auth/reset-password: stamp a change after the token's iat.
+    user.password_changed_at = (datetime.utcnow() + timedelta(seconds=5)).isoformat()
+    session.commit()
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_entitlement_and_email_changes_are_visible_immediately(harness):
+    client, session, _, user, headers = harness
+    client.get("/api/auth/me", headers=headers)
+    user.pro_entitlement_active = True
+    user.email = "renamed@example.com"
+    session.commit()
+    assert client.get("/api/auth/me", headers=headers).json()["email"] == "renamed@example.com"
+
+
+def test_bulk_update_and_delete_invalidate(harness):
+    client, session, _, user, headers = harness
+    client.get("/api/auth/me", headers=headers)
+    session.execute(update(AuthUser).where(AuthUser.id == user.id).values(first_name="Bulk"))
+    session.commit()
+    assert client.get("/api/auth/me", headers=headers).json()["first_name"] == "Bulk"
+
+    assert client.delete("/api/auth/account", headers=headers).status_code == 200
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_explicit_invalidation_forces_reload(harness):
+    client, _, engine, user, headers = harness
+    client.get("/api/auth/me", headers=headers)
+    invalidate_cached_user(user.id)
+    r, selects = _user_selects(engine, lambda: client.get("/api/auth/me", headers=headers))
+    assert r.status_code == 200 and len(selects) == 1
+
+
+def test_disabled_by_default_so_other_process_writes_revoke_at_once(harness, monkeypatch):
+    client, _, engine, user, headers = harness
+    monkeypatch.setattr(auth._principal_cache, "ttl_seconds", auth.AUTH_USER_CACHE_TTL_SECONDS)
+    assert auth.AUTH_USER_CACHE_TTL_SECONDS == 0
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    # A raw write fires no Session hooks here, like a reset handled by another worker.
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE auth_users SET password_changed_at = :at WHERE id = :id"),
+                     {"at": (datetime.utcnow() + timedelta(seconds=5)).isoformat(), "id": user.id})
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
@@ -0,0 +1,112 @@
+"""Streaming CSV import: raw platform exports are parsed server-side as the
+body streams in, inserted in fixed-size chunks, and follow the same
+validation / order_id dedup rules as the JSON import."""
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from backend.models import AppType, Entry, EntryType
+from backend.routers import entries
+from backend.services.csv_import import CsvRecordSplitter, CsvRowMapper
+
+USER_ID = "csv-import-user"
+TZ = "America/New_York"
+
+
+@pytest.fixture
+def harness(db_session, pro_user, api_client):
+    db_session.add(pro_user(USER_ID, TZ))
+    db_session.commit()
+    return api_client(entries.router, user_id=USER_ID), db_session
+
+
+def _chunked(text: str, size: int = 37):
+    data = text.encode()
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _post(client, text, **params):
+    return client.post("/api/entries/import/csv", params=params, content=_chunked(text),
+                       headers={"Content-Type": "text/csv"})
+
+
+def test_uber_export_streams_in_chunks(harness, monkeypatch):
+    client, session = harness
+    monkeypatch.setattr(entries, "IMPORT_BATCH_SIZE", 7)
+    lines = ["﻿Trip UUID,Trip request time,Description,Distance (mi),Duration (min),Paid to you"]
+    for i in range(50):
+        lines.append(f'uber-{i},2026-04-{1 + i % 28:02d} 18:{i % 60:02d}:00,"Delivery, #{i}",{i % 5}.5,{10 + i}.0,${8 + i}.25')
+    lines.append("uber-3,2026-04-04 18:03:00,dup,1,1,$1.00")        # repeated in file, other chunk
+    lines.append("uber-bad,whenever,x,1,1,$4.00")                  # unparseable time
+    lines.append('uber-refund,04/30/2026 9:05 PM,"Refund\nline two",0,0,($3.50)')
+    r = _post(client, "\r\n".join(lines) + "\r\n")
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["format"] == "uber"
+    assert body["rows"] == 53 and body["count"] == 51
+    assert [(x["row"], x["reason"]) for x in body["rejected"]] == [(51, "duplicate_in_file"), (52, "invalid_row")]
+    assert body["rejected"][1]["detail"].startswith("timestamp")
+
+    first = session.query(Entry).filter(Entry.order_id == "uber-0").one()
+    assert first.app == AppType.UBEREATS and first.type == EntryType.ORDER
+    assert first.amount == Decimal("8.25") and first.note == "Delivery, #0" and first.duration_minutes == 10
+    assert first.timestamp == datetime(2026, 4, 1, 22, 0)  # 18:00 EDT
+    refund = session.query(Entry).filter(Entry.order_id == "uber-refund").one()
+    assert refund.type == EntryType.CANCELLATION and refund.amount == Decimal("-3.50")
+    assert refund.note == "Refund\nline two"
+
+    # Re-uploading the same export adds nothing.
+    again = _post(client, "\r\n".join(lines)).json()
+    assert again["count"] == 0 and again["skipped_duplicates"] == 52
+
+
+def test_doordash_and_generic_formats(harness):
+    client, session = harness
+    dd = "Delivery ID,Dash Date,Store Name,Miles,Total Pay\nd-1,2026-05-02,Taco Spot,3.1,11.40\n"
+    body = _post(client, dd).json()
+    assert body["format"] == "doordash" and body["count"] == 1
+    assert session.query(Entry).filter(Entry.order_id == "d-1").one().app == AppType.DOORDASH
+
+    generic = (
+        "date,time,type,app,amount,miles,category,note\n"
+        "2026-05-03,9:30,expense,other,12,,gas,fuel\n"
+        "05/04/2026,9:30 PM,order,doordash,8,,,evening\n"
+        "2026-05-32,9:30,order,doordash,5,,,bad date\n"
+        ",10:00,order,doordash,5,,,no date\n"
+    )
+    body = _post(client, generic).json()
+    assert body["format"] == "generic" and body["count"] == 2
+    assert [(x["row"], x["reason"]) for x in body["rejected"]] == [(3, "invalid_row"), (4, "invalid_row")]
+    expense = session.query(Entry).filter(Entry.note == "fuel").one()
+    assert expense.type == EntryType.EXPENSE and expense.amount == Decimal("-12.00")
+    evening = session.query(Entry).filter(Entry.note == "evening").one()
+    assert evening.timestamp == datetime(2026, 5, 5, 1, 30)  # 21:30 EDT
+
+
+def test_unknown_format_and_empty_file_are_rejected(harness):
+    client, session = harness
+    r = _post(client, "foo,bar\n1,2\n")
+    assert r.status_code == 400 and "Unrecognized" in r.json()["detail"]
+    assert _post(client, "").status_code == 400
+    assert _post(client, "a,b\n", platform="lyft").status_code == 400
+    assert session.query(Entry).count() == 0
+
+
+def test_record_splitter_handles_any_chunk_boundary():
+    text = 'h1,h2\r\n1,"x\r\ny"\r\n2,"q""z"\r\n\r\n3,last'
+    for size in range(1, len(text) + 1):
+        splitter = CsvRecordSplitter()
+        records = []
+        for i in range(0, len(text), size):
+            records += splitter.feed(text[i:i + size])
+        records += splitter.close()
+        assert records == [["h1", "h2"], ["1", "x\r\ny"], ["2", 'q"z'], ["3", "last"]]
+
+    mapper = CsvRowMapper(["Batch ID", "Delivered At", "Total Earnings"])
+    assert mapper.format == "instacart"
+    assert mapper(["b-1", "2026-05-01T10:00:00Z", "1,204.00"]) == {
+        "amount": "1204.00", "app": "INSTACART", "type": "ORDER",
+        "timestamp": "2026-05-01T10:00:00+00:00", "order_id": "b-1",
+    }
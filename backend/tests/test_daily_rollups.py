@@ -0,0 +1,155 @@
+"""Materialized daily rollups: entry writes keep `daily_rollups` current inside
+the same transaction, whole-day windows read the rollups, and the result is
+always identical to aggregating `entries` directly (including after a
+timezone change, which re-buckets every day)."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from backend.models import AuthUser, DailyRollup, DailyRollupState, Entry
+from backend.routers import auth_routes, entries
+from backend.services.daily_rollup_service import (
+    daily_rollups_ready, rebuild_daily_rollups, whole_day_span,
+)
+from backend.services.period import get_est_date_range, get_this_month
+from backend.services.rollup_service import calculate_rollup, _entry_groups, _fold_groups
+
+USER_ID = "daily-rollup-user"
+TZ = "America/Chicago"
+
+
+@pytest.fixture
+def harness(db_session, pro_user, api_client):
+    db_session.add(pro_user(USER_ID, TZ))
+    db_session.commit()
+    return api_client(entries.router, auth_routes.router, user_id=USER_ID), db_session, db_session.get_bind()
+
+
+def _direct(session, from_dt, to_dt):
+    """The same rollup computed straight from `entries` (no rollup rows)."""
+    return _fold_groups(_entry_groups(session, USER_ID, from_dt, to_dt))
+
+
+def _from_rollups(session, from_dt, to_dt, tz=TZ):
+    from backend.services.daily_rollup_service import daily_rollup_groups
+    span = whole_day_span(from_dt, to_dt, tz)
+    assert span is not None
+    return _fold_groups(daily_rollup_groups(session, USER_ID, *span))
+
+
+def _post(client, date, time, amount, type_="ORDER", app="DOORDASH", miles=2.5, minutes=15):
+    r = client.post("/api/entries", json={
+        "type": type_, "app": app, "amount": amount, "date": date, "time": time,
+        "distance_miles": miles, "duration_minutes": minutes,
+    })
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_create_update_delete_keep_rollups_in_lockstep(harness):
+    client, session, _ = harness
+    first = _post(client, "2026-06-01", "23:30", 20)  # late-night: UTC is next day
+    _post(client, "2026-06-02", "08:00", 12.75, app="UBEREATS")
+    _post(client, "2026-06-02", "09:00", 30, type_="EXPENSE", app="OTHER", miles=0, minutes=0)
+
+    assert daily_rollups_ready(session, USER_ID, TZ)
+    from_dt, to_dt = get_est_date_range("2026-06-01", "2026-06-30", TZ)
+    assert _from_rollups(session, from_dt, to_dt) == _direct(session, from_dt, to_dt)
+
+    # Local-day bucketing: the 23:30 Chicago entry belongs to June 1st.
+    day1 = get_est_date_range("2026-06-01", "2026-06-01", TZ)
+    assert _from_rollups(session, *day1)["revenue"] == 20
+
+    # Moving an entry to another day must drain the old day and fill the new.
+    r = client.put(f"/api/entries/{first['id']}", json={"date": "2026-06-03", "time": "10:00", "amount": 25})
+    assert r.status_code == 200
+    assert _from_rollups(session, *day1)["entry_count"] == 0
+    assert _from_rollups(session, from_dt, to_dt) == _direct(session, from_dt, to_dt)
+
+    assert client.delete(f"/api/entries/{first['id']}").status_code == 200
+    assert _from_rollups(session, from_dt, to_dt) == _direct(session, from_dt, to_dt)
+    assert session.query(DailyRollup).filter(DailyRollup.local_date == datetime(2026, 6, 3).date()).count() == 0
+
+
+def test_import_refreshes_every_touched_day(harness):
+    client, session, _ = harness
+    rows = [
+        {"type": "ORDER", "app": "DOORDASH", "amount": 10 + i, "order_id": f"o-{i}",
+         "date": f"2026-05-{1 + i:02d}", "time": "12:00", "distance_miles": 1.5}
+        for i in range(20)
+    ]
+    r = client.post("/api/entries/import", json=rows)
+    assert r.status_code == 200 and r.json()["count"] == 20
+    from_dt, to_dt = get_est_date_range("2026-05-01", "2026-05-31", TZ)
+    assert _from_rollups(session, from_dt, to_dt) == _direct(session, from_dt, to_dt)
+    assert session.query(DailyRollup).count() == 20
+
+
+def test_delete_all_entries_clears_rollups(harness):
+    client, session, _ = harness
+    _post(client, "2026-06-01", "12:00", 20)
+    assert client.delete("/api/entries").status_code == 200
+    assert session.query(DailyRollup).count() == 0
+    assert session.get(DailyRollupState, USER_ID) is None
+
+
+def test_calculate_rollup_reads_rollups_for_whole_day_windows(harness):
+    client, session, engine = harness
+    today = datetime.now(timezone.utc)
+    for i in range(5):
+        _post(client, (today - timedelta(days=i)).strftime("%Y-%m-%d"), "12:00", 10 + i)
+
+    from_dt, to_dt = get_this_month(TZ)
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        fast = calculate_rollup(session, from_dt, to_dt, None, USER_ID, TZ)
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert not [s for s in statements if "FROM entries" in s]
+    assert any("FROM daily_rollups" in s for s in statements)
+
+    # ISO windows that don't cover whole local days still hit `entries`.
+    assert whole_day_span(from_dt + timedelta(minutes=1), to_dt, TZ) is None
+
+    session.query(DailyRollupState).delete()
+    session.commit()
+    assert calculate_rollup(session, from_dt, to_dt, None, USER_ID, TZ) == fast
+
+
+def test_timezone_change_rebuckets_and_reads_stay_correct(harness):
+    client, session, _ = harness
+    _post(client, "2026-06-01", "23:30", 20)  # 04:30 UTC June 2nd
+    _post(client, "2026-06-02", "12:00", 5)
+
+    # A zone change made behind the API's back leaves stale buckets: reads
+    # must notice and fall back to `entries` rather than serve Chicago days.
+    user = session.get(AuthUser, USER_ID)
+    user.timezone = "UTC"
+    session.commit()
+    assert not daily_rollups_ready(session, USER_ID, "UTC")
+    june2 = get_est_date_range("2026-06-02", "2026-06-02", "UTC")
+    assert calculate_rollup(session, *june2, None, USER_ID, "UTC")["revenue"] == 25
+
+    # The settings endpoint re-buckets immediately.
+    r = client.post("/api/auth/timezone", json={"timezone": "Asia/Tokyo"})
+    assert r.status_code == 200
+    assert daily_rollups_ready(session, USER_ID, "Asia/Tokyo")
+    june = get_est_date_range("2026-06-01", "2026-06-30", "Asia/Tokyo")
+    assert _from_rollups(session, *june, tz="Asia/Tokyo") == _direct(session, *june)
+
+
+def test_rebuild_is_idempotent(harness):
+    client, session, _ = harness
+    _post(client, "2026-06-01", "12:00", 20)
+    _post(client, "2026-06-01", "13:00", 7, app="GRUBHUB")
+    before = session.query(DailyRollup).count()
+    assert rebuild_daily_rollups(session, USER_ID, TZ) == before
+    session.commit()
+    assert session.query(DailyRollup).count() == before
+    assert session.query(Entry).count() == 2
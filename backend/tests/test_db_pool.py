@@ -0,0 +1,104 @@
+"""Connection pool profiles come from the environment, and every pool
+reports checkouts, in-use / overflow and time spent waiting for a connection
+through the operator-only diagnostics endpoint."""
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as SATimeoutError
+from sqlalchemy.pool import NullPool
+
+from backend import db
+from backend.routers import diagnostics
+
+PG = "postgresql://u:p@db.example.com/app"
+
+
+def test_pool_profiles_from_env():
+    assert db.pool_settings("sqlite:///x.db", {})["pool_size"] == 1
+
+    direct = db.pool_settings(PG, {})
+    assert direct == {"mode": "direct", "pool_size": 5, "max_overflow": 10,
+                      "async_pool_size": 5, "async_max_overflow": 10, "pool_timeout": 30,
+                      "pool_recycle": 300, "pool_pre_ping": False, "statement_timeout_ms": 0}
+    kwargs = db.engine_pool_kwargs(direct)
+    assert kwargs["poolclass"] is db.InstrumentedQueuePool and kwargs["pool_use_lifo"]
+
+    # A 40-connection budget over 4 workers: 10 each, half to each engine.
+    budget = db.pool_settings(PG, {"DB_CONNECTION_BUDGET": "40", "WEB_CONCURRENCY": "4"})
+    assert (budget["pool_size"], budget["max_overflow"]) == (5, 0)
+    assert (budget["async_pool_size"], budget["async_max_overflow"]) == (5, 0)
+    tight = db.pool_settings(PG, {"DB_CONNECTION_BUDGET": "8", "WEB_CONCURRENCY": "4"})
+    assert (tight["pool_size"], tight["max_overflow"]) == (1, 0)
+    assert (tight["async_pool_size"], tight["async_max_overflow"]) == (1, 0)
+
+    pooler = db.pool_settings(PG, {"DB_POOL_MODE": "pooler", "DB_STATEMENT_TIMEOUT_MS": "5000"})
+    assert db.engine_pool_kwargs(pooler) == {"poolclass": NullPool}
+    assert pooler["statement_timeout_ms"] == 0
+
+    tuned = db.pool_settings(PG, {"DB_POOL_PRE_PING": "1", "DB_STATEMENT_TIMEOUT_MS": "5000"})
+    assert tuned["pool_pre_ping"] and tuned["statement_timeout_ms"] == 5000
+    with pytest.raises(RuntimeError):
+        db.pool_settings(PG, {"DB_POOL_MODE": "bouncy"})
+
+
+@pytest.mark.parametrize("budget,workers,share", [
+    (40, 4, None), (100, 4, None), (9, 2, None), (30, 3, "0.25"), (60, 2, "0.9"), (5, 1, "0"),
+])
+def test_sync_and_async_pools_share_the_process_budget(budget, workers, share):
+    env = {"DB_CONNECTION_BUDGET": str(budget), "WEB_CONCURRENCY": str(workers)}
+    if share is not None:
+        env["DB_ASYNC_POOL_SHARE"] = share
+    settings = db.pool_settings(PG, env)
+    sync = db.engine_pool_kwargs(settings)
+    async_ = db.engine_pool_kwargs(settings, db.InstrumentedAsyncQueuePool, prefix="async_")
+    held = sum(k["pool_size"] + k["max_overflow"] for k in (sync, async_))
+    assert held <= budget // workers
+    assert sync["pool_size"] >= 1 and async_["pool_size"] >= 1
+
+
+def test_checkout_waits_and_timeouts_are_measured(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=db.InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.2,
+                           connect_args={"check_same_thread": False})
+    metrics = db.instrument_pool(engine.pool)
+    held = engine.connect()
+
+    def release_soon():
+        time.sleep(0.1)
+        held.close()
+
+    threading.Thread(target=release_soon).start()
+    with engine.connect() as conn:  # waits ~100 ms for the held connection
+        conn.execute(text("SELECT 1"))
+        stats = metrics.snapshot(engine.pool)
+        assert stats["checked_out"] == 1 and stats["size"] == 1
+        with pytest.raises(SATimeoutError):
+            engine.connect()
+
+    stats = metrics.snapshot(engine.pool)
+    assert stats["checkouts"] == 2 and stats["connects"] == 1
+    assert stats["checkout_timeouts"] == 1 and stats["waits"] >= 2
+    assert 0.05 < stats["wait_seconds_max"] < 1
+    assert stats["waits_over_ms"]["100"] >= 1 and stats["checked_out"] == 0
+    engine.dispose()
+
+
+def test_diagnostics_endpoint_requires_token(monkeypatch):
+    app = FastAPI()
+    app.include_router(diagnostics.router, prefix="/api")
+    client = TestClient(app)
+
+    monkeypatch.delenv("DIAGNOSTICS_TOKEN", raising=False)
+    assert client.get("/api/diagnostics/pool").status_code == 503
+    monkeypatch.setenv("DIAGNOSTICS_TOKEN", "ops-token")
+    assert client.get("/api/diagnostics/pool", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+    r = client.get("/api/diagnostics/pool", headers={"Authorization": "Bearer ops-token"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["settings"] == db.POOL_SETTINGS
+    assert {"checkouts", "wait_seconds_total", "checked_out", "overflow"} <= set(body["sync"])
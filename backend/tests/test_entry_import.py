@@ -0,0 +1,119 @@
+"""Bulk import: rows land in a few multi-row INSERT ... RETURNING statements,
+duplicate order ids are rejected by uq_entries_user_order_id (across imports)
+and by the in-file check, and every row that doesn't become an entry comes
+back in `rejected` with its position and reason."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, text
+
+from backend.models import Entry
+from backend.routers import entries
+from backend.services import entry_import
+
+USER_ID = "import-user"
+OTHER_ID = "import-other"
+TZ = "America/Los_Angeles"
+
+
+@pytest.fixture
+def harness(db_session, pro_user, api_client):
+    db_session.add_all([pro_user(USER_ID, TZ), pro_user(OTHER_ID, TZ)])
+    db_session.commit()
+    return api_client(entries.router, user_id=USER_ID), db_session, db_session.get_bind()
+
+
+def _row(i, order_id=None, **extra):
+    row = {"type": "ORDER", "app": "UBEREATS", "amount": 5 + i % 7, "distance_miles": 2.0,
+           "date": f"2026-04-{1 + i % 28:02d}", "time": f"{8 + i % 12}:15"}
+    if order_id is not None:
+        row["order_id"] = order_id
+    row.update(extra)
+    return row
+
+
+def test_large_import_is_batched_not_per_row(harness, monkeypatch):
+    client, session, engine = harness
+    monkeypatch.setattr(entry_import, "IMPORT_BATCH_SIZE", 400)
+    inserts = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO entries"):
+            inserts.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        r = client.post("/api/entries/import", json=[_row(i, f"uber-{i}") for i in range(2000)])
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["count"] == 2000 and body["rejected"] == []
+    assert len(body["entries"]) == 2000 and all(e["id"] for e in body["entries"])
+    assert session.query(Entry).filter(Entry.user_id == USER_ID).count() == 2000
+    # 2000 rows / 400 per batch, not one statement per row.
+    assert len(inserts) <= 10
+
+
+def test_duplicates_and_invalid_rows_are_reported(harness):
+    client, session, _ = harness
+    session.add(Entry(user_id=USER_ID, timestamp=datetime(2026, 3, 1), type="ORDER", app="UBEREATS",
+                      order_id="already-here", amount=4))
+    # Another user's identical order id is not a duplicate for this user.
+    session.add(Entry(user_id=OTHER_ID, timestamp=datetime(2026, 3, 1), type="ORDER", app="UBEREATS",
+                      order_id="uber-1", amount=4))
+    session.commit()
+
+    rows = [
+        _row(0, "uber-0"),
+        _row(1, "uber-1"),
+        _row(2, "already-here"),
+        _row(3, "uber-0"),                 # repeated within the file
+        _row(4, amount="not-a-number"),
+        _row(5),                           # no order id: never deduped
+        _row(6, "  "),
+        _row(7, " uber-7 "),
+    ]
+    body = client.post("/api/entries/import", json=rows).json()
+    assert body["count"] == 5
+    assert body["skipped_duplicates"] == 2
+    assert [(r["row"], r["reason"]) for r in body["rejected"]] == [
+        (2, "duplicate_order_id"),
+        (3, "duplicate_in_file"),
+        (4, "invalid_row"),
+    ]
+    assert body["rejected"][2]["detail"].startswith("amount")
+    assert "invalid row rejected" in body["message"]
+
+    # Re-importing the same file only re-adds the rows without an order id.
+    again = client.post("/api/entries/import", json=rows).json()
+    assert again["count"] == 2
+    assert [r["reason"] for r in again["rejected"]].count("duplicate_order_id") == 4
+    stored = {e.order_id for e in session.query(Entry).filter(Entry.user_id == USER_ID)}
+    assert stored == {"already-here", "uber-0", "uber-1", "uber-7", None}
+
+
+def test_manual_create_with_taken_order_id_conflicts(harness):
+    client, _, _ = harness
+    assert client.post("/api/entries/import", json=[_row(0, "dd-9")]).json()["count"] == 1
+    r = client.post("/api/entries", json=_row(1, "dd-9"))
+    assert r.status_code == 409
+    assert client.post("/api/entries", json=_row(1)).status_code == 200
+
+
+def test_import_without_order_id_index_checks_existing_rows(harness):
+    client, session, engine = harness
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_entries_user_order_id"))
+    session.add(Entry(user_id=USER_ID, timestamp=datetime(2026, 3, 1), type="ORDER", app="UBEREATS",
+                      order_id="already-here", amount=4))
+    session.add(Entry(user_id=OTHER_ID, timestamp=datetime(2026, 3, 1), type="ORDER", app="UBEREATS",
+                      order_id="uber-1", amount=4))
+    session.commit()
+
+    rows = [_row(0, "already-here"), _row(1, "uber-1"), _row(2), _row(3, "uber-3")]
+    body = client.post("/api/entries/import", json=rows).json()
+    assert body["count"] == 3
+    assert [(r["row"], r["reason"]) for r in body["rejected"]] == [(0, "duplicate_order_id")]
+    again = client.post("/api/entries/import", json=rows).json()
+    assert again["count"] == 1 and len(again["rejected"]) == 3
@@ -0,0 +1,135 @@
+"""Query-plan regression tests for the per-user entry range scans.
+
+Runs the real hot read paths (GET /entries, dashboard overview,
+calculate_rollup, AI suggestions, daily-rollup refresh), captures every SQL
+statement they send against `entries`, and runs EXPLAIN QUERY PLAN on each.
+Every one must search ix_entries_user_timestamp_id, and the newest-first
+listings must come out of the index already ordered (no temp B-tree sort). A
+change that makes the planner fall back to the single-column indexes or a full
+scan fails here instead of silently in production.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.auth import get_current_user
+from backend.db import Base, get_async_db, get_db
+from backend.models import AppType, AuthUser, Entry, EntryType
+from backend.routers import dashboard, entries
+from backend.services.ai_suggestions import get_ai_suggestions
+from backend.services.daily_rollup_service import rebuild_daily_rollups, refresh_daily_rollups
+from backend.services.period import get_est_date_range
+from backend.services.rollup_service import calculate_rollup
+
+INDEX = "ix_entries_user_timestamp_id"
+USER_ID = "plan-user"
+TZ = "America/New_York"
+
+
+@pytest.fixture
+def harness(tmp_path):
+    db_path = tmp_path / "plans.db"
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    session = Session()
+
+    # Several users so user_id alone is far from unique, as in production.
+    base = datetime(2026, 1, 1)
+    for u in range(5):
+        user_id = USER_ID if u == 0 else f"plan-other-{u}"
+        session.add(AuthUser(id=user_id, email=f"{user_id}@test.com", password_hash="x", timezone=TZ))
+        session.bulk_save_objects([
+            Entry(user_id=user_id, timestamp=base + timedelta(hours=5 * i),
+                  type=EntryType.ORDER, app=AppType.DOORDASH, amount=Decimal("8.50"),
+                  distance_miles=1.5, duration_minutes=12)
+            for i in range(300)
+        ])
+    session.commit()
+
+    captured = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if "FROM entries" in statement and not statement.startswith("EXPLAIN"):
+            captured.append((statement, parameters))
+
+    for bind in (engine, async_engine.sync_engine):
+        event.listen(bind, "before_cursor_execute", _capture)
+
+    async def _async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(entries.router, prefix="/api")
+    app.include_router(dashboard.router, prefix="/api")
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[get_async_db] = _async_db
+    app.dependency_overrides[get_current_user] = lambda: session.get(AuthUser, USER_ID)
+    with TestClient(app) as client:
+        yield client, session, engine, captured
+    for bind in (engine, async_engine.sync_engine):
+        event.remove(bind, "before_cursor_execute", _capture)
+    session.close()
+    engine.dispose()
+
+
+def _plan(engine, statement, parameters) -> str:
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return "\n".join(row[-1] for row in rows)
+
+
+def _assert_uses_index(engine, captured, ordered: bool):
+    assert captured, "no query against entries was captured"
+    for statement, parameters in list(captured):
+        plan = _plan(engine, statement, parameters)
+        assert INDEX in plan, f"{statement}\n--- plan ---\n{plan}"
+        if ordered:
+            assert "TEMP B-TREE" not in plan, f"{statement}\n--- plan ---\n{plan}"
+
+
+def test_get_entries_range_uses_composite_index(harness):
+    client, _, engine, captured = harness
+    r = client.get("/api/entries", params={"from_date": "2026-01-10", "to_date": "2026-02-10"})
+    assert r.status_code == 200 and r.json()
+    _assert_uses_index(engine, captured, ordered=True)
+
+    captured.clear()
+    r = client.get("/api/entries", params={"limit": 20})
+    next_page = client.get("/api/entries", params={"limit": 20, "cursor": r.headers["X-Next-Cursor"]})
+    assert next_page.status_code == 200 and len(next_page.json()) == 20
+    _assert_uses_index(engine, captured, ordered=True)
+
+
+def test_dashboard_overview_uses_composite_index(harness):
+    client, _, engine, captured = harness
+    assert client.get("/api/dashboard/overview", params={"timeframe": "LAST_MONTH"}).status_code == 200
+    listing = [(s, p) for s, p in captured if "ORDER BY" in s]
+    _assert_uses_index(engine, listing, ordered=True)
+
+
+def test_rollup_and_suggestion_scans_use_composite_index(harness):
+    _, session, engine, captured = harness
+    from_dt, to_dt = get_est_date_range("2026-01-05", "2026-01-20", TZ)
+    # ISO bounds that aren't whole local days always aggregate `entries`.
+    calculate_rollup(session, from_dt + timedelta(hours=1), to_dt, None, USER_ID, TZ)
+    asyncio.run(get_ai_suggestions(session, from_dt, to_dt, USER_ID))
+
+    # The one-off full rebuild reads the user's whole history by design; the
+    # per-write refresh after it is the range scan the index is for.
+    rebuild_daily_rollups(session, USER_ID, TZ)
+    captured.clear()
+    refresh_daily_rollups(session, USER_ID, TZ, [from_dt + timedelta(days=3)])
+    session.rollback()
+    assert len(captured) == 1
+    _assert_uses_index(engine, captured, ordered=False)
@@ -5,10 +5,10 @@ import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from backend.db import Base, get_db
+from backend.db import Base, get_async_db, get_db
 from backend.auth import get_current_user
 from backend.routers import oauth, rollup
 
@@ -21,20 +21,26 @@ class FakeUser:
 
 
 @pytest.fixture
-def client():
-    engine = create_engine(
-        "sqlite:///:memory:",
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-    )
+def client(tmp_path):
+    # File-backed so the sync engine (oauth) and the async engine (/rollup)
+    # see the same database.
+    db_path = tmp_path / "sanitize.db"
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
     Base.metadata.create_all(bind=engine)
     TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncTestingSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
     session = TestingSession()
 
+    async def _async_db():
+        async with AsyncTestingSession() as db:
+            yield db
+
     app = FastAPI()
     app.include_router(oauth.router, prefix="/api")
     app.include_router(rollup.router, prefix="/api")
     app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[get_async_db] = _async_db
     app.dependency_overrides[get_current_user] = lambda: FakeUser()
 
     with TestClient(app) as c:
@@ -0,0 +1,106 @@
+"""Local hour × weekday aggregates: one grouped statement buckets entries by
+the driver's own clock (DST and midnight crossings included) and matches a
+per-entry Python reference; suggestion stats are folded from it."""
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from pytz import timezone as pytz_timezone
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import Base
+from backend.models import AppType, AuthUser, Entry, EntryType
+from backend.services.ai_suggestions import suggestion_stats
+from backend.services.hourly_stats import hour_weekday_buckets
+from backend.services.period import utc_offset_spans
+
+USER_ID = "hourly-user"
+TZ = "America/New_York"
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'hourly.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(AuthUser(id=USER_ID, email="hourly@test.com", password_hash="x", timezone=TZ))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _entry(db, ts, amount, entry_type=EntryType.ORDER):
+    db.add(Entry(user_id=USER_ID, timestamp=ts, type=entry_type, app=AppType.DOORDASH, amount=Decimal(str(amount))))
+
+
+def _by_key(buckets):
+    return {(b["weekday"], b["hour"]): b for b in buckets}
+
+
+def test_buckets_use_local_hour_and_weekday_across_dst(db, count_queries):
+    _entry(db, datetime(2026, 1, 14, 17, 0), 20)      # Wed 12:00 EST
+    _entry(db, datetime(2026, 7, 15, 16, 0), 30)      # Wed 12:00 EDT
+    _entry(db, datetime(2026, 7, 15, 16, 30), -5)     # cancellation: an entry, not an order
+    _entry(db, datetime(2026, 3, 3, 3, 0), 12)        # Tue 03:00 UTC = Mon 22:00 EST
+    _entry(db, datetime(2026, 3, 3, 3, 10), -7.5, EntryType.EXPENSE)
+    db.commit()
+
+    with count_queries() as queries:
+        buckets = _by_key(hour_weekday_buckets(db, USER_ID, TZ))
+    assert len(queries) == 1
+    assert set(buckets) == {(2, 12), (0, 22)}
+    noon = buckets[(2, 12)]
+    assert (noon["entries"], noon["orders"], noon["revenue"]) == (3, 2, 50.0)
+    assert (noon["min_order"], noon["max_order"], noon["expenses"]) == (20.0, 30.0, 0.0)
+    monday = buckets[(0, 22)]
+    assert (monday["entries"], monday["orders"], monday["expenses"]) == (2, 1, 7.5)
+
+    # Range bounds apply to the UTC instants.
+    summer = hour_weekday_buckets(db, USER_ID, TZ, datetime(2026, 6, 1), datetime(2026, 8, 1))
+    assert [(b["weekday"], b["hour"], b["orders"]) for b in summer] == [(2, 12, 1)]
+
+
+def test_buckets_match_python_reference(db):
+    rng = random.Random(7)
+    tz = pytz_timezone(TZ)
+    start = datetime(2025, 10, 20)
+    reference = {}
+    for _ in range(400):
+        ts = start + timedelta(minutes=rng.randrange(0, 60 * 24 * 200))
+        amount = rng.choice([rng.randint(3, 60), -rng.randint(1, 20)])
+        entry_type = EntryType.ORDER if rng.random() < 0.8 else EntryType.EXPENSE
+        _entry(db, ts, amount, entry_type)
+        local = ts.replace(tzinfo=timezone.utc).astimezone(tz)
+        ref = reference.setdefault((local.weekday(), local.hour), {"entries": 0, "orders": 0, "revenue": 0})
+        ref["entries"] += 1
+        if entry_type == EntryType.ORDER and amount > 0:
+            ref["orders"] += 1
+            ref["revenue"] += amount
+    db.commit()
+
+    got = {k: {"entries": b["entries"], "orders": b["orders"], "revenue": b["revenue"]}
+           for k, b in _by_key(hour_weekday_buckets(db, USER_ID, TZ)).items()}
+    assert got == reference
+
+
+def test_suggestion_stats_report_local_peaks(db):
+    db.get(AuthUser, USER_ID).timezone = "America/Los_Angeles"
+    for day in range(3):
+        _entry(db, datetime(2026, 5, 4 + day, 20, 0), 40)   # 13:00 PDT
+        _entry(db, datetime(2026, 5, 4 + day, 2, 0), 10)    # 19:00 PDT, the day before
+    _entry(db, datetime(2026, 5, 8, 20, 0), 90)             # Friday 13:00 PDT
+    db.commit()
+    stats = suggestion_stats(db, user_id=USER_ID)
+    assert stats["peak_hour"] == 13 and stats["peak_weekday"] == "Friday"
+    assert (stats["orders"], stats["min_order"], stats["max_order"]) == (7, 10.0, 90.0)
+    assert stats["avg_order"] == pytest.approx(240 / 7)
+
+
+def test_offset_spans():
+    assert utc_offset_spans("Asia/Kolkata", datetime(2026, 1, 1), datetime(2027, 1, 1)) == [(None, 330)]
+    assert utc_offset_spans(TZ, datetime(2026, 1, 1), datetime(2026, 12, 31)) == [
+        (datetime(2026, 3, 8, 7), -300), (datetime(2026, 11, 1, 6), -240), (None, -300),
+    ]
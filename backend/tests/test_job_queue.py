@@ -0,0 +1,199 @@
+"""Job queue + worker: periodic slots are enqueued once however many workers
+tick the schedule, a job is leased to one worker at a time (and only its
+current owner can finish it), failures back off and retry up to
+max_attempts, an abandoned lease is picked up again, and finished jobs are
+deleted after the retention period."""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+
+from backend import worker
+from backend.db import Base
+from backend.models import Job
+from backend.services import job_queue
+from backend.services.job_queue import (
+    JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SYNC_ORDERS, claim_next, complete, enqueue, fail,
+)
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def test_schedule_slot_is_enqueued_once(sessions):
+    a, b = sessions(), sessions()
+    now = datetime(2026, 5, 1, 13, 42)
+    assert worker.schedule_due_jobs(a, now) == 2
+    assert worker.schedule_due_jobs(b, now + timedelta(minutes=10)) == 0
+    assert worker.schedule_due_jobs(b, now + timedelta(minutes=20)) == 1
+    slots = a.query(Job.dedup_key, Job.run_at).order_by(Job.id).all()
+    assert slots == [
+        ("sync_orders@2026-05-01T13:00", datetime(2026, 5, 1, 13)),
+        ("precompute_suggestions@2026-05-01T09:00", datetime(2026, 5, 1, 9)),
+        ("sync_orders@2026-05-01T14:00", datetime(2026, 5, 1, 14)),
+    ]
+    # The nightly slot starts at its offset, not at midnight.
+    assert worker.schedule_due_jobs(a, datetime(2026, 5, 2, 8, 59)) == 1
+    assert worker.schedule_due_jobs(a, datetime(2026, 5, 2, 9, 0)) == 2
+
+
+def test_claim_leases_to_one_worker_until_expiry(sessions):
+    a, b = sessions(), sessions()
+    job_id = enqueue(a, JOB_SYNC_ORDERS, {"full": True}, max_attempts=2)
+    a.commit()
+
+    job = claim_next(a, "w1", [JOB_SYNC_ORDERS], lease_seconds=60)
+    assert job.id == job_id and job.status == JOB_RUNNING and job.attempts == 1
+    assert claim_next(b, "w2", [JOB_SYNC_ORDERS]) is None
+    assert claim_next(b, "w2", ["other_kind"]) is None
+
+    # w1 dies: once the lease runs out another worker takes the job over ...
+    a.execute(Job.__table__.update().values(locked_until=datetime.utcnow() - timedelta(seconds=1)))
+    a.commit()
+    again = claim_next(b, "w2", [JOB_SYNC_ORDERS])
+    assert again.id == job_id and again.locked_by == "w2" and again.attempts == 2
+
+    # ... and after the last attempt's lease expires too, it is failed.
+    b.execute(Job.__table__.update().values(locked_until=datetime.utcnow() - timedelta(seconds=1)))
+    b.commit()
+    assert claim_next(a, "w1", [JOB_SYNC_ORDERS]) is None
+    a.expire_all()
+    assert a.get(Job, job_id).status == JOB_FAILED
+
+
+def test_outcome_from_a_worker_that_lost_the_lease_is_dropped(sessions):
+    a, b = sessions(), sessions()
+    job_id = enqueue(a, JOB_SYNC_ORDERS, max_attempts=3)
+    a.commit()
+    stalled = claim_next(a, "w1", [JOB_SYNC_ORDERS], lease_seconds=60)
+    a.execute(Job.__table__.update().values(locked_until=datetime.utcnow() - timedelta(seconds=1)))
+    a.commit()
+    current = claim_next(b, "w2", [JOB_SYNC_ORDERS])
+
+    # w1 wakes up after w2 took the job over: neither outcome is written.
+    assert not complete(a, stalled, "w1", {"stale": True})
+    assert not fail(a, stalled, "w1", "RuntimeError: late")
+    b.expire_all()
+    job = b.get(Job, job_id)
+    assert (job.status, job.locked_by, job.result, job.last_error) == (JOB_RUNNING, "w2", None, None)
+
+    assert complete(b, current, "w2", {"credentials": 1})
+    b.expire_all()
+    assert b.get(Job, job_id).status == JOB_DONE
+    assert not complete(b, current, "w2", {"again": True})
+
+
+def test_finished_jobs_are_purged_after_retention(sessions, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_RETENTION_DAYS", 14)
+    db = sessions()
+    now = datetime(2026, 5, 20, 13, 30)
+    for status, finished_days_ago in [(JOB_DONE, 15), (JOB_FAILED, 30), (JOB_DONE, 13), (JOB_FAILED, 1)]:
+        db.add(Job(kind=JOB_SYNC_ORDERS, payload="{}", status=status, run_at=now, attempts=1, max_attempts=3,
+                   created_at=now, updated_at=now, finished_at=now - timedelta(days=finished_days_ago)))
+    # Queued and running jobs are never purged, however old.
+    db.add(Job(kind=JOB_SYNC_ORDERS, payload="{}", status=JOB_QUEUED, run_at=now - timedelta(days=60),
+               attempts=0, max_attempts=3, created_at=now, updated_at=now))
+    db.commit()
+
+    # A tick that opens no new slot doesn't sweep.
+    monkeypatch.setattr(worker, "SCHEDULES", [])
+    assert worker.schedule_due_jobs(db, now) == 0
+    assert db.query(Job).count() == 5
+
+    monkeypatch.setattr(worker, "SCHEDULES", [(JOB_SYNC_ORDERS, 60, {}, 0)])
+    assert worker.schedule_due_jobs(db, now) == 1
+    left = db.query(Job.status, Job.finished_at).order_by(Job.id).all()
+    assert [s for s, _ in left] == [JOB_DONE, JOB_FAILED, JOB_QUEUED, JOB_QUEUED]
+    assert all(f is None or f >= now - timedelta(days=14) for _, f in left)
+
+
+def test_failures_back_off_then_give_up(sessions, monkeypatch):
+    calls = []
+
+    def flaky(db, payload):
+        calls.append(payload)
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setitem(worker.JOB_HANDLERS, JOB_SYNC_ORDERS, flaky)
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BASE_SECONDS", 0)
+    monkeypatch.setattr(worker, "SCHEDULES", [])
+    db = sessions()
+    job_id = enqueue(db, JOB_SYNC_ORDERS, {"user_id": "u1"}, max_attempts=2)
+    db.commit()
+
+    assert worker.run_one(db, "w1")
+    job = db.get(Job, job_id)
+    assert job.status == JOB_QUEUED and job.last_error == "RuntimeError: upstream down"
+    assert worker.run_one(db, "w1")
+    assert not worker.run_one(db, "w1")
+    db.refresh(job)
+    assert job.status == JOB_FAILED and job.attempts == 2 and calls == [{"user_id": "u1"}] * 2
+
+
+def test_worker_drains_queue_and_records_results(sessions, monkeypatch):
+    seen = []
+    monkeypatch.setitem(worker.JOB_HANDLERS, JOB_SYNC_ORDERS,
+                        lambda db, payload: seen.append(payload) or {"credentials": 0})
+    db = sessions()
+    enqueue(db, JOB_SYNC_ORDERS, {"user_id": "u1"})
+    enqueue(db, JOB_SYNC_ORDERS, {"user_id": "later"}, run_at=datetime.utcnow() + timedelta(hours=1))
+    db.commit()
+
+    worker.run_worker(once=True, worker_id="w1", session_factory=sessions)
+
+    # The scheduled slot and the due ad-hoc job ran; the future one waits.
+    assert sorted(p.get("user_id", "") for p in seen) == ["", "u1"]
+    statuses = {j.status for j in db.query(Job).filter(Job.run_at <= datetime.utcnow())}
+    assert statuses == {JOB_DONE}
+    assert db.query(Job).filter(Job.status == JOB_QUEUED).count() == 1
+
+
+def test_running_job_keeps_renewing_its_lease(sessions, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 1)
+    monkeypatch.setattr(worker, "SCHEDULES", [])
+    seen = []
+
+    def slow(db, payload):
+        started = datetime.utcnow()
+        threading.Event().wait(1.5)
+        with sessions() as other:
+            job = other.query(Job).one()
+            seen.append((job.locked_until > started + timedelta(seconds=1), claim_next(other, "w2", [JOB_SYNC_ORDERS])))
+        return {}
+
+    monkeypatch.setitem(worker.JOB_HANDLERS, JOB_SYNC_ORDERS, slow)
+    db = sessions()
+    job_id = enqueue(db, JOB_SYNC_ORDERS)
+    db.commit()
+
+    assert worker.run_one(db, "w1")
+    # Past its original one-second lease, still w1's and not claimable.
+    assert seen == [(True, None)]
+    assert db.get(Job, job_id).status == JOB_DONE
+    assert not job_queue.renew_lease(db, job_id, "w1", 60)
+
+
+def test_worker_stops_when_signalled(sessions, monkeypatch):
+    monkeypatch.setattr(worker, "SCHEDULES", [])
+    monkeypatch.setattr(worker, "JOB_POLL_SECONDS", 30)
+    stop = threading.Event()
+    thread = threading.Thread(target=worker.run_worker,
+                              kwargs={"session_factory": sessions, "stop": stop})
+    thread.start()
+    stop.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_postgres_claim_skips_locked_rows():
+    sql = str(job_queue.claimable_jobs([JOB_SYNC_ORDERS], datetime.utcnow())
+              .compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
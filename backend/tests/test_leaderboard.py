@@ -0,0 +1,201 @@
+"""Leaderboard ranking reads the maintained `leaderboard_stats` table: entry
+writes keep it in step with the daily rollups, points match the old
+per-user formula, friend-only fields stay gated, and the endpoint's query
+count doesn't grow with the number of users. The friend-request and
+congratulation inboxes join their senders in and page by cursor."""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from backend.models import AuthUser, Congratulation, Entry, EntryType, AppType, Friend, LeaderboardStats
+from backend.routers import entries, leaderboard_routes
+from backend.services.daily_rollup_service import rebuild_daily_rollups
+
+ME = "lb-me"
+TZ = "America/New_York"
+
+
+@pytest.fixture
+def harness(db_session, pro_user, api_client):
+    db_session.add(pro_user(ME, TZ))
+    db_session.commit()
+    current = {"id": ME}
+    client = api_client(entries.router, leaderboard_routes.router, user_id=lambda: current["id"])
+    return client, db_session, db_session.get_bind(), current
+
+
+def _seed_user(session, user_id, amounts, first_name=None):
+    session.add(AuthUser(id=user_id, email=f"{user_id}@test.com", password_hash="x",
+                         first_name=first_name, timezone=TZ))
+    base = datetime(2026, 4, 1, 15, 0, 0)
+    for i, amount in enumerate(amounts):
+        entry_type = EntryType.ORDER if amount > 0 else EntryType.EXPENSE
+        session.add(Entry(
+            user_id=user_id, timestamp=base + timedelta(hours=i), type=entry_type,
+            app=AppType.DOORDASH, amount=Decimal(str(amount)),
+            distance_miles=1.0, duration_minutes=10,
+        ))
+    session.flush()
+    if amounts:
+        rebuild_daily_rollups(session, user_id, TZ)
+    session.commit()
+
+
+def _legacy_points(session, user_id):
+    """The formula the endpoint used to evaluate per user on every request."""
+    rows = session.query(Entry).filter(Entry.user_id == user_id).all()
+    return int(sum(float(e.amount) for e in rows if float(e.amount) > 0)) + len(rows) * 10
+
+
+def test_ranking_matches_legacy_points(harness):
+    client, session, _, _ = harness
+    _seed_user(session, "lb-a", [12.5, 40, -8], first_name="Ana")
+    _seed_user(session, "lb-b", [300.99])
+    _seed_user(session, "lb-c", [5, 5, 5, 5, 5, 5])
+    _seed_user(session, "lb-idle", [])
+
+    r = client.get("/api/leaderboard")
+    assert r.status_code == 200
+    board = r.json()["leaderboard"]
+    assert [row["points"] for row in board] == sorted((row["points"] for row in board), reverse=True)
+    expected = sorted(
+        (_legacy_points(session, uid) for uid in ("lb-a", "lb-b", "lb-c", "lb-idle")),
+        reverse=True,
+    )
+    assert [row["points"] for row in board] == expected
+    # Accounts with no entries still appear (at 0), the caller never does.
+    assert board[-1]["points"] == 0 and len(board) == 4
+    assert "Ana" in [row["username"] for row in board]
+
+
+def test_entry_writes_keep_stats_current(harness):
+    client, session, _, _ = harness
+    r = client.post("/api/entries", json={
+        "type": "ORDER", "app": "UBEREATS", "amount": 22.4, "date": "2026-06-01", "time": "12:00",
+    })
+    assert r.status_code == 200
+    stats = session.get(LeaderboardStats, ME)
+    assert stats.points == _legacy_points(session, ME) == 32
+    assert float(stats.order_earnings) == 22.4
+
+    assert client.delete(f"/api/entries/{r.json()['id']}").status_code == 200
+    assert session.get(LeaderboardStats, ME) is None
+
+
+def test_demo_transactions_are_ranked(harness):
+    from backend.routers.auth_routes import create_demo_transactions
+
+    _, session, _, _ = harness
+    session.add(AuthUser(id="lb-demo", email="demo@demo.local", password_hash="x", is_demo=True))
+    session.flush()
+    create_demo_transactions(session, "lb-demo")
+    stats = session.get(LeaderboardStats, "lb-demo")
+    assert stats is not None and stats.points == _legacy_points(session, "lb-demo") > 0
+
+
+def test_friend_fields_are_gated(harness):
+    client, session, _, _ = harness
+    _seed_user(session, "lb-friend", [50, -10])
+    _seed_user(session, "lb-stranger", [80])
+    session.add(Friend(user_id=ME, friend_id="lb-friend", status="accepted"))
+    session.commit()
+
+    body = client.get("/api/leaderboard").json()
+    rows = {row["points"]: row for row in body["leaderboard"]}
+    friend = rows[_legacy_points(session, "lb-friend")]
+    stranger = rows[_legacy_points(session, "lb-stranger")]
+    assert friend["is_friend"] and friend["id"] == "lb-friend"
+    assert friend["total_earnings"] == 50.0
+    assert stranger["id"] is None and stranger["total_earnings"] is None
+    assert [f["id"] for f in body["friends"]] == ["lb-friend"]
+
+
+def test_query_count_is_independent_of_user_count(harness):
+    client, session, engine, _ = harness
+
+    def _count_statements():
+        statements = []
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", _record)
+        try:
+            assert client.get("/api/leaderboard").status_code == 200
+        finally:
+            event.remove(engine, "before_cursor_execute", _record)
+        return statements
+
+    _seed_user(session, "lb-0", [10])
+    small = _count_statements()
+    for i in range(1, 30):
+        _seed_user(session, f"lb-{i}", [10 + i, 3])
+    large = _count_statements()
+    assert len(large) == len(small)
+    assert not [s for s in large if "FROM entries" in s]
+
+
+def _add_senders(session, n, make_row):
+    """Bring the caller's inbox up to n rows, each from a distinct user."""
+    have = session.query(AuthUser).filter(AuthUser.id.like("sender-%")).count()
+    for i in range(have, n):
+        session.add(AuthUser(id=f"sender-{i}", email=f"sender-{i}@test.com", password_hash="x",
+                             first_name=f"S{i}", timezone=TZ))
+        session.add(make_row(f"sender-{i}"))
+    session.commit()
+
+
+def test_friend_requests_query_count_is_constant(harness, assert_no_n_plus_one):
+    client, session, _, _ = harness
+    assert_no_n_plus_one(
+        lambda: client.get("/api/leaderboard/friend-requests"),
+        lambda n: _add_senders(session, n, lambda uid: Friend(user_id=uid, friend_id=ME, status="pending")),
+    )
+
+
+def test_recent_congrats_query_count_is_constant(harness, assert_no_n_plus_one):
+    client, session, _, _ = harness
+    assert_no_n_plus_one(
+        lambda: client.get("/api/leaderboard/recent-congrats"),
+        lambda n: _add_senders(session, n, lambda uid: Congratulation(from_user_id=uid, to_user_id=ME, message="gg")),
+    )
+
+
+def test_inboxes_page_newest_first_without_repeats(harness):
+    client, session, _, _ = harness
+    base = datetime(2026, 5, 1, 12, 0, 0)
+    for i in range(5):
+        session.add(AuthUser(id=f"pg-{i}", email=f"pg-{i}@test.com", password_hash="x",
+                             first_name=f"P{i}" if i % 2 else None, timezone=TZ))
+        # Two rows share a timestamp: the id tie-break keeps paging exact.
+        created = base + timedelta(minutes=min(i, 3))
+        session.add(Friend(user_id=f"pg-{i}", friend_id=ME, status="pending", created_at=created))
+        session.add(Congratulation(from_user_id=f"pg-{i}", to_user_id=ME, message=f"m{i}", created_at=created))
+    session.add(Friend(user_id=ME, friend_id="pg-0", status="pending"))   # outgoing: not listed
+    session.commit()
+
+    def walk(path, key, limit):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+            res = client.get(path, params=params)
+            assert len(res.json()[key]) <= limit
+            seen += res.json()[key]
+            cursor = res.headers.get("X-Next-Cursor")
+            if cursor is None:
+                return seen
+
+    requests = walk("/api/leaderboard/friend-requests", "requests", 2)
+    assert [r["from_username"] for r in requests] == ["Driver pg-4", "P3", "Driver pg-2", "P1", "Driver pg-0"]
+    assert len({r["request_id"] for r in requests}) == 5
+    congrats = walk("/api/leaderboard/recent-congrats", "congrats", 3)
+    assert [c["message"] for c in congrats] == ["m4", "m3", "m2", "m1", "m0"]
+
+    assert "X-Next-Cursor" not in client.get("/api/leaderboard/recent-congrats").headers
+    # No limit: every pending request, as before paging existed.
+    unpaged = client.get("/api/leaderboard/friend-requests")
+    assert len(unpaged.json()["requests"]) == 5 and "X-Next-Cursor" not in unpaged.headers
+    assert client.get("/api/leaderboard/friend-requests", params={"cursor": "%%%"}).status_code == 400
+    assert client.get("/api/leaderboard/friend-requests", params={"limit": 0}).status_code == 422
@@ -0,0 +1,175 @@
+"""Versioned migrations: a fresh or pre-versioning database runs every step
+once, an up-to-date one costs a single SELECT, each step is recorded on its
+own (so a deferred step is the only one retried), and --rerun re-applies a
+named step."""
+import pytest
+from sqlalchemy import create_engine, event, inspect, text
+
+from backend import migrations
+
+
+@pytest.fixture
+def bind(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    monkeypatch.setattr(migrations, "engine", engine)
+    yield engine
+    engine.dispose()
+
+
+def _version(step):
+    return next(v for v, s in migrations.MIGRATIONS if s is step)
+
+
+def _set_state(bind, version, status=None):
+    with bind.begin() as conn:
+        conn.execute(text("DELETE FROM schema_migrations WHERE version = :v"), {"v": version})
+        if status:
+            conn.execute(text("INSERT INTO schema_migrations (version, name, status) VALUES (:v, 'x', :s)"),
+                         {"v": version, "s": status})
+
+
+def _statements(engine):
+    seen = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: seen.append(statement))
+    return seen
+
+
+def test_fresh_database_is_built_and_recorded(bind):
+    assert migrations.step_states() is None
+    assert migrations.run_migrations() == []
+    states = migrations.step_states()
+    assert states == {v: migrations.STEP_APPLIED for v, _ in migrations.MIGRATIONS}
+
+    insp = inspect(bind)
+    assert insp.has_table("entries") and insp.has_table("daily_rollups")
+    # Index steps run after create_tables, so they land on the first boot too.
+    # (sqlite_master, since the inspector skips expression indexes.)
+    with bind.connect() as conn:
+        indexes = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    assert {"uq_user_platforms_user_lname", "uq_entries_user_order_id",
+            "uq_synced_orders_user_platform_order"} <= indexes
+
+
+def test_up_to_date_boot_is_one_select(bind):
+    migrations.run_migrations()
+    seen = _statements(bind)
+    assert migrations.run_migrations() == []
+    assert seen == ["SELECT version, status FROM schema_migrations"]
+
+
+def test_pre_versioning_database_runs_pending_steps_once(bind):
+    with bind.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE problem_reports (id INTEGER PRIMARY KEY, user_id VARCHAR, "
+            "message TEXT, created_at DATETIME)"
+        ))
+    migrations.run_migrations()
+    assert "title" in {c["name"] for c in inspect(bind).get_columns("problem_reports")}
+
+    # A new step only runs that step.
+    _set_state(bind, migrations.LATEST_VERSION)
+    seen = _statements(bind)
+    assert migrations.run_migrations() == []
+    assert not any("ALTER TABLE" in s for s in seen)
+
+
+def test_legacy_version_mark_is_adopted(bind):
+    migrations.run_migrations()
+    with bind.begin() as conn:
+        conn.execute(text("DROP TABLE schema_migrations"))
+        conn.execute(text("CREATE TABLE schema_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL, "
+                          "applied_at VARCHAR)"))
+        conn.execute(text("INSERT INTO schema_version (id, version) VALUES (1, :v)"),
+                     {"v": migrations.LATEST_VERSION - 1})
+    seen = _statements(bind)
+    assert migrations.run_migrations() == []
+    # Steps up to the old high-water mark are adopted as applied, not rerun.
+    assert not any("ALTER TABLE" in s for s in seen)
+    assert set(migrations.step_states().values()) == {migrations.STEP_APPLIED}
+
+
+def test_check_schema_refuses_unapplied_steps(bind, monkeypatch):
+    migrations.run_migrations()
+    monkeypatch.setattr(bind.dialect, "name", "postgresql")
+    seen = _statements(bind)
+    migrations.check_schema()
+    assert seen == ["SELECT version, status FROM schema_migrations"]
+
+    # Deferred is tolerated; never applied means the release step was skipped.
+    _set_state(bind, migrations.LATEST_VERSION - 1, migrations.STEP_DEFERRED)
+    migrations.check_schema()
+    _set_state(bind, migrations.LATEST_VERSION)
+    with pytest.raises(RuntimeError, match="python -m backend.migrations"):
+        migrations.check_schema()
+    assert not any("ALTER TABLE" in s or "CREATE" in s for s in seen)
+
+
+def test_rerun_applies_a_named_step_again(bind):
+    migrations.run_migrations()
+    with bind.begin() as conn:
+        conn.execute(text("DROP INDEX uq_entries_user_order_id"))
+    migrations.run_migrations()
+    assert "uq_entries_user_order_id" not in {ix["name"] for ix in inspect(bind).get_indexes("entries")}
+
+    migrations.run_migrations(rerun=["entries_order_id_unique"])
+    assert "uq_entries_user_order_id" in {ix["name"] for ix in inspect(bind).get_indexes("entries")}
+    with pytest.raises(ValueError):
+        migrations.run_migrations(rerun=["no_such_step"])
+
+
+def test_declined_step_alone_is_retried(bind):
+    migrations.run_migrations()
+    step_version = _version(migrations._migrate_entries_order_id_unique)
+    with bind.begin() as conn:
+        conn.execute(text("DROP INDEX uq_entries_user_order_id"))
+        conn.execute(text("DELETE FROM schema_migrations WHERE version >= :v"), {"v": step_version})
+        for entry_id in (1, 2):
+            conn.execute(text(
+                "INSERT INTO entries (id, user_id, timestamp, type, app, amount, order_id, created_at, updated_at) "
+                "VALUES (:id, 'u1', :ts, 'ORDER', 'DOORDASH', 5, 'dup', :ts, :ts)"
+            ), {"id": entry_id, "ts": "2026-01-01 00:00:00"})
+
+    # Duplicates in the way: the later steps still run and are recorded.
+    assert migrations.run_migrations() == ["entries_order_id_unique"]
+    states = migrations.step_states()
+    assert states[step_version] == migrations.STEP_DEFERRED
+    assert all(states[v] == migrations.STEP_APPLIED for v, _ in migrations.MIGRATIONS if v != step_version)
+
+    # The next run retries that step and nothing else.
+    seen = _statements(bind)
+    assert migrations.run_migrations() == ["entries_order_id_unique"]
+    assert len([s for s in seen if "GROUP BY user_id, order_id" in s]) == 1
+    assert not any("ALTER TABLE" in s or "INSERT INTO leaderboard_stats" in s for s in seen)
+
+    with bind.begin() as conn:
+        conn.execute(text("DELETE FROM entries WHERE id = 2"))
+    assert migrations.run_migrations() == []
+    assert "uq_entries_user_order_id" in {ix["name"] for ix in inspect(bind).get_indexes("entries")}
+
+
+def test_leaderboard_stats_backfilled_for_existing_entries(bind):
+    from datetime import datetime
+    from decimal import Decimal
+    from sqlalchemy.orm import Session
+    from backend.models import AppType, AuthUser, Entry, EntryType, LeaderboardStats
+
+    migrations.run_migrations()
+    with Session(bind) as db:
+        for user_id in ("ranked", "unranked"):
+            db.add(AuthUser(id=user_id, email=f"{user_id}@test.com", password_hash="x"))
+        for user_id, entry_type, amount in (("unranked", EntryType.ORDER, "12.5"),
+                                            ("unranked", EntryType.EXPENSE, "-4"), ("ranked", EntryType.ORDER, "30")):
+            db.add(Entry(user_id=user_id, timestamp=datetime(2026, 1, 1), type=entry_type, app=AppType.DOORDASH,
+                         amount=Decimal(amount)))
+        db.add(LeaderboardStats(user_id="ranked", points=7, entry_count=1, positive_earnings=30, order_earnings=30))
+        db.commit()
+    _set_state(bind, _version(migrations._migrate_leaderboard_stats_backfill))
+
+    migrations.run_migrations()
+    with bind.connect() as conn:
+        stats = {row.user_id: row for row in conn.execute(text("SELECT * FROM leaderboard_stats"))}
+    # 12 whole dollars + 10 per entry; an existing row is left as it was.
+    assert stats["unranked"].points == 32 and stats["unranked"].entry_count == 2
+    assert float(stats["unranked"].order_earnings) == 12.5
+    assert stats["ranked"].points == 7
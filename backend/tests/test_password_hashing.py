@@ -0,0 +1,68 @@
+"""bcrypt runs on the dedicated hashing pool: the event loop stays free while
+a hash is in progress, the queue is bounded, and auth routes answer 503
+rather than piling up work when it's full."""
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from backend.routers import auth_routes
+from backend.services import password_hashing
+from backend.services.password_hashing import PasswordHashingBusy, hashing_pool_stats, run_hashing
+
+
+def test_hash_and_verify_round_trip_off_the_loop_thread():
+    loop_thread = threading.get_ident()
+    seen = []
+
+    def _hash(password):
+        seen.append(threading.get_ident())
+        return auth_routes.hash_password(password)
+
+    async def _go():
+        hashed = await run_hashing(_hash, "s3cret-pass")
+        ok = await auth_routes.verify_password_async("s3cret-pass", hashed)
+        bad = await auth_routes.verify_password_async("wrong", hashed)
+        return ok, bad
+
+    assert asyncio.run(_go()) == (True, False)
+    assert seen and seen[0] != loop_thread
+
+
+def test_event_loop_keeps_ticking_while_hashing():
+    async def _go():
+        ticks = 0
+        stop = False
+
+        async def _heartbeat():
+            nonlocal ticks
+            while not stop:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        beat = asyncio.create_task(_heartbeat())
+        await run_hashing(time.sleep, 0.3)
+        stop = True
+        await beat
+        return ticks
+
+    # A blocking call would leave the heartbeat at ~1 tick.
+    assert asyncio.run(_go()) >= 10
+
+
+def test_queue_is_bounded_and_counted(monkeypatch):
+    monkeypatch.setattr(password_hashing, "PASSWORD_HASH_MAX_QUEUE", 0)
+    before = hashing_pool_stats()["rejected"]
+
+    with pytest.raises(PasswordHashingBusy):
+        asyncio.run(run_hashing(len, "x"))
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(auth_routes.hash_password_async("x"))
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers["Retry-After"] == "1"
+
+    stats = hashing_pool_stats()
+    assert stats["rejected"] == before + 2
+    assert stats["queued"] == 0 and stats["in_flight"] == 0
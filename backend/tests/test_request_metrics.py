@@ -0,0 +1,164 @@
+"""Request profiling: every request is timed and its SQL statements counted
+(sync routes, async routes on the async engine), reported per route template
+in a Server-Timing header (operators only) and as Prometheus histograms
+behind the diagnostics token; slow statements and query-heavy requests are logged with
+normalized SQL."""
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.db import Base, get_async_db, get_db
+from backend.auth import get_current_user
+from backend.models import AppType, AuthUser, Entry, EntryType
+from backend.routers import diagnostics, entries, health
+from backend.services import request_metrics
+from backend.services.job_queue import JOB_SYNC_ORDERS, claim_next, complete, enqueue
+
+USER_ID = "metrics-user"
+
+
+@pytest.fixture
+def harness(tmp_path, monkeypatch):
+    db_path = tmp_path / "metrics.db"
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    session = Session()
+    session.add(AuthUser(
+        id=USER_ID, email="metrics@test.com", password_hash="x", timezone="UTC",
+        pro_entitlement_active=True,
+        pro_entitlement_expires_at=(datetime.now(timezone.utc) + timedelta(days=30)).isoformat(),
+        pro_entitlement_updated_at=datetime.now(timezone.utc).isoformat(),
+    ))
+    for i in range(5):
+        session.add(Entry(user_id=USER_ID, timestamp=datetime(2026, 6, 1, 12) + timedelta(hours=i),
+                          type=EntryType.ORDER, app=AppType.DOORDASH, amount=Decimal("10")))
+    session.commit()
+
+    async def _async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app = FastAPI()
+    app.middleware("http")(request_metrics.profile_requests)
+    for module in (entries, health, diagnostics):
+        app.include_router(module.router, prefix="/api")
+    app.dependency_overrides[get_db] = lambda: session
+    app.dependency_overrides[get_async_db] = _async_db
+    app.dependency_overrides[get_current_user] = lambda: session.get(AuthUser, USER_ID)
+    monkeypatch.setattr(request_metrics, "request_metrics", request_metrics.RequestMetrics())
+    monkeypatch.setenv("DIAGNOSTICS_TOKEN", "ops-token")
+    yield TestClient(app), session
+    session.close()
+    engine.dispose()
+
+
+def _server_timing(response):
+    parts = dict(p.strip().split(";", 1) for p in response.headers["Server-Timing"].split(","))
+    return parts
+
+
+def test_queries_are_counted_per_request_and_route(harness):
+    client, session = harness
+    # Ordinary callers never see DB timings.
+    assert "Server-Timing" not in client.get("/api/health").headers
+    assert "Server-Timing" not in client.get("/api/health", headers={"X-Diagnostics-Token": "nope"}).headers
+
+    r = client.get("/api/entries", params={"limit": 2},   # async route on the async engine
+                   headers={"X-Diagnostics-Token": "ops-token"})
+    assert r.status_code == 200
+    timing = _server_timing(r)
+    assert timing["app"].startswith("dur=") and timing["db"].endswith('queries"')
+    listed = int(timing["db"].split('desc="')[1].split()[0])
+    assert listed >= 1
+
+    r = client.post("/api/entries", json={"type": "ORDER", "app": "UBEREATS", "amount": 7,
+                                          "date": "2026-06-02", "time": "10:00"})
+    assert r.status_code == 200
+    created_id = r.json()["id"]
+    client.delete(f"/api/entries/{created_id}")
+    client.delete("/api/entries/999999")
+    client.get("/no/such/path")
+
+    snap = request_metrics.request_metrics.snapshot()
+    assert snap[("GET", "/api/entries")]["queries_sum"] == listed
+    assert snap[("POST", "/api/entries")]["queries_sum"] >= 2
+    # Path parameters collapse into their route template.
+    by_id = snap[("DELETE", "/api/entries/{entry_id}")]
+    assert by_id["requests"] == 2 and by_id["statuses"] == {200: 1, 404: 1}
+    assert snap[("GET", "/api/health")]["queries_sum"] == 0
+    assert ("GET", request_metrics.UNMATCHED_ROUTE) in snap
+
+    # Nothing issued outside a request is attributed to one.
+    session.query(Entry).count()
+    assert request_metrics.request_metrics.snapshot()[("GET", "/api/health")]["queries_sum"] == 0
+
+
+def test_prometheus_endpoint(harness):
+    client, session = harness
+    enqueue(session, JOB_SYNC_ORDERS)
+    session.commit()
+    job = claim_next(session, "w1", [JOB_SYNC_ORDERS])
+    assert complete(session, job, "w1", {"credentials": 3, "entries_created": 7, "request_p50_ms": None})
+    client.get("/api/entries")
+
+    assert client.get("/api/diagnostics/metrics").status_code == 401
+    r = client.get("/api/diagnostics/metrics", headers={"Authorization": "Bearer ops-token"})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    lines = r.text.splitlines()
+    assert "# TYPE http_request_duration_seconds histogram" in lines
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/entries"} 1' in lines
+    assert 'http_request_db_queries_bucket{method="GET",route="/api/entries",le="0"} 0' in lines
+    assert 'http_request_db_queries_bucket{method="GET",route="/api/entries",le="+Inf"} 1' in lines
+    assert 'http_requests_total{method="GET",route="/api/entries",status="200"} 1' in lines
+    assert "sync_last_run_entries_created 7" in lines
+    assert any(line.startswith("db_pool_sync_checkouts ") for line in lines)
+    assert any(line.startswith("auth_principal_cache_hits ") for line in lines)
+    assert any(line.startswith("password_hashing_queued ") for line in lines)
+    assert not any("request_p50_ms" in line for line in lines)
+
+
+def test_normalize_sql_strips_values_and_collapses_lists():
+    sql = """SELECT entries.id FROM entries
+             WHERE entries.user_id = 'u-1' AND entries.amount > 12.50
+               AND entries.id IN (?, ?, ?) AND entries.app = %(app_1)s LIMIT $1"""
+    assert request_metrics.normalize_sql(sql) == (
+        "SELECT entries.id FROM entries WHERE entries.user_id = ? AND entries.amount > ? "
+        "AND entries.id IN (?...) AND entries.app = ? LIMIT ?"
+    )
+    assert request_metrics.normalize_sql("INSERT INTO t (a, b) VALUES (?, ?)") == "INSERT INTO t (a, b) VALUES (?...)"
+    assert request_metrics.normalize_sql("SELECT " + "x, " * 50 + "y", max_length=20) == "SELECT x, x, x, x, x…"
+
+
+def test_slow_queries_and_query_heavy_requests_are_logged(harness, monkeypatch, caplog):
+    client, session = harness
+    caplog.set_level(logging.WARNING, logger="backend.slow_query")
+
+    client.get("/api/entries")
+    assert not caplog.records   # defaults: nothing here is slow
+
+    monkeypatch.setattr(request_metrics, "SLOW_QUERY_MS", 1e-6)
+    monkeypatch.setattr(request_metrics, "REQUEST_QUERY_WARN_COUNT", 1)
+    client.get("/api/entries", params={"limit": 2})
+    messages = [r.getMessage() for r in caplog.records]
+    slow = [m for m in messages if m.startswith("Slow query")]
+    assert slow and all("[GET /api/entries]" in m for m in slow)
+    assert all(USER_ID not in m for m in messages)
+    assert any("GET /api/entries issued" in m and "possible N+1" in m for m in messages)
+    assert {r.levelno for r in caplog.records} == {logging.WARNING}
+
+    # Outside a request: logged without a route; over the critical bar, at ERROR.
+    caplog.clear()
+    monkeypatch.setattr(request_metrics, "SLOW_QUERY_CRITICAL_MS", 1e-6)
+    session.query(Entry).filter(Entry.user_id == USER_ID).count()
+    assert caplog.records and caplog.records[0].levelno == logging.ERROR
+    assert "[" not in caplog.records[0].getMessage().split(":")[0]
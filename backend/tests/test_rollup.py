@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -260,6 +262,6 @@ def test_rollup_requires_user_id(db_session):
 def test_suggestions_require_user_id(db_session):
     from backend.services.ai_suggestions import get_ai_suggestions
     with pytest.raises(ValueError):
-        get_ai_suggestions(db_session)
+        asyncio.run(get_ai_suggestions(db_session))
     with pytest.raises(ValueError):
-        get_ai_suggestions(db_session, user_id="")
+        asyncio.run(get_ai_suggestions(db_session, user_id=""))
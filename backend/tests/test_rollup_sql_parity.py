@@ -0,0 +1,187 @@
+"""Parity suite: the SQL-aggregate rollup must match the legacy per-row loop.
+
+`calculate_rollup` used to materialize every Entry in the window and sum in
+Python. It now pushes SUM/COUNT/MIN/MAX down into one grouped query. The
+reference implementation below is the old loop, kept verbatim (minus the goal
+lookup, which is unchanged) so any drift in totals, rounding, or the response
+shape fails here.
+"""
+import random
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from backend.db import Base
+from backend.models import Entry, Settings, EntryType, AppType, ExpenseCategory
+from backend.services.rollup_service import calculate_rollup
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+USER_ID = "parity-user"
+OTHER_USER_ID = "parity-other"
+
+
+@pytest.fixture
+def db_session():
+    test_engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=test_engine)
+    TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+    session = TestSessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=test_engine)
+
+
+def _legacy_rollup(db, from_date=None, to_date=None, user_id=""):
+    query = db.query(Entry).filter(Entry.user_id == user_id)
+    if from_date:
+        query = query.filter(Entry.timestamp >= from_date)
+    if to_date:
+        query = query.filter(Entry.timestamp <= to_date)
+    entries = query.all()
+
+    total_amount = Decimal("0")
+    revenue = Decimal("0")
+    expenses = Decimal("0")
+    miles = 0.0
+    total_minutes = 0
+    by_type = {t.value: Decimal("0") for t in EntryType}
+    by_app = {a.value: Decimal("0") for a in AppType}
+
+    for entry in entries:
+        amount = Decimal(str(entry.amount))
+        total_amount += amount
+        if amount > 0:
+            revenue += amount
+        else:
+            expenses += abs(amount)
+        miles += entry.distance_miles
+        total_minutes += entry.duration_minutes
+        by_type[entry.type.value] += amount
+        by_app[entry.app.value] += amount
+
+    hours = total_minutes / 60.0 if total_minutes > 0 else 0.0
+    profit = total_amount
+    dollars_per_mile = total_amount / Decimal(str(miles)) if miles > 0 else Decimal("0")
+
+    order_entries = [e for e in entries if e.type.value == 'ORDER']
+    order_count = len(order_entries)
+    average_order_value = Decimal("0")
+    dollars_per_hour = Decimal("0")
+    if entries:
+        total_order_revenue = Decimal("0")
+        for order in order_entries:
+            total_order_revenue += Decimal(str(order.amount))
+        if order_count > 0:
+            average_order_value = total_order_revenue / Decimal(str(order_count))
+        all_timestamps = sorted([e.timestamp for e in entries])
+        hours_first_to_last = (all_timestamps[-1] - all_timestamps[0]).total_seconds() / 3600.0
+        if hours_first_to_last > 0:
+            if hours_first_to_last < 1.0:
+                dollars_per_hour = revenue
+            else:
+                dollars_per_hour = profit / Decimal(str(hours_first_to_last))
+
+    return {
+        "revenue": float(revenue),
+        "expenses": float(expenses),
+        "profit": float(profit),
+        "miles": miles,
+        "hours": round(hours, 2),
+        "dollars_per_mile": float(round(dollars_per_mile, 2)),
+        "dollars_per_hour": float(round(dollars_per_hour, 2)),
+        "average_order_value": float(round(average_order_value, 2)),
+        "by_type": {k: float(v) for k, v in by_type.items()},
+        "by_app": {k: float(v) for k, v in by_app.items()},
+        "goal": None,
+        "goal_progress": None,
+    }
+
+
+def _seed_random(db_session, user_id, n, seed, base):
+    rng = random.Random(seed)
+    for _ in range(n):
+        entry_type = rng.choice(list(EntryType))
+        cents = rng.randint(1, 25000)
+        amount = Decimal(cents) / Decimal(100)
+        if entry_type in (EntryType.EXPENSE, EntryType.CANCELLATION):
+            amount = -amount
+        db_session.add(Entry(
+            user_id=user_id,
+            timestamp=base + timedelta(minutes=rng.randint(0, 60 * 24 * 40)),
+            type=entry_type,
+            app=rng.choice(list(AppType)),
+            amount=amount,
+            # Quarter-mile steps are exact in binary floating point, so the
+            # summation order (per-row vs per-group) can't perturb the total.
+            distance_miles=rng.randint(0, 80) / 4.0,
+            duration_minutes=rng.randint(0, 90),
+            category=ExpenseCategory.GAS if entry_type == EntryType.EXPENSE else None,
+        ))
+    db_session.commit()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 42])
+def test_sql_rollup_matches_legacy_loop(db_session, seed):
+    base = datetime(2026, 3, 1, 5, 0, 0)
+    db_session.add(Settings(id=1, user_id=USER_ID, cost_per_mile=Decimal("0")))
+    _seed_random(db_session, USER_ID, 300, seed, base)
+    _seed_random(db_session, OTHER_USER_ID, 50, seed + 1000, base)
+
+    windows = [
+        (None, None),
+        (base, base + timedelta(days=7)),
+        (base + timedelta(days=10), base + timedelta(days=10, minutes=30)),
+        (base + timedelta(days=90), base + timedelta(days=91)),
+    ]
+    for from_dt, to_dt in windows:
+        expected = _legacy_rollup(db_session, from_dt, to_dt, USER_ID)
+        actual = calculate_rollup(db_session, from_dt, to_dt, None, USER_ID)
+        assert actual == expected, (from_dt, to_dt)
+
+
+def test_sql_rollup_single_entry_and_sub_hour_windows(db_session):
+    base = datetime(2026, 5, 4, 12, 0, 0)
+    db_session.add(Entry(
+        user_id=USER_ID, timestamp=base, type=EntryType.ORDER,
+        app=AppType.DOORDASH, amount=Decimal("12.34"),
+        distance_miles=3.5, duration_minutes=20,
+    ))
+    db_session.commit()
+    assert calculate_rollup(db_session, user_id=USER_ID) == _legacy_rollup(db_session, user_id=USER_ID)
+
+    # Two entries 20 minutes apart: the under-an-hour $/hr rule uses revenue.
+    db_session.add(Entry(
+        user_id=USER_ID, timestamp=base + timedelta(minutes=20), type=EntryType.EXPENSE,
+        app=AppType.OTHER, amount=-Decimal("4.10"),
+        distance_miles=0.0, duration_minutes=0, category=ExpenseCategory.PARKING,
+    ))
+    db_session.commit()
+    rollup = calculate_rollup(db_session, user_id=USER_ID)
+    assert rollup == _legacy_rollup(db_session, user_id=USER_ID)
+    assert rollup["dollars_per_hour"] == 12.34
+
+
+def test_sql_rollup_empty_window_shape(db_session):
+    rollup = calculate_rollup(db_session, user_id=USER_ID)
+    assert rollup == _legacy_rollup(db_session, user_id=USER_ID)
+    assert set(rollup["by_type"]) == {t.value for t in EntryType}
+    assert set(rollup["by_app"]) == {a.value for a in AppType}
+
+
+def test_sql_rollup_issues_one_entries_query(db_session):
+    """The aggregate must not scale with row count: exactly one statement
+    touches `entries` regardless of how many rows are in the window."""
+    _seed_random(db_session, USER_ID, 200, 7, datetime(2026, 1, 1))
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    bind = db_session.get_bind()
+    event.listen(bind, "before_cursor_execute", _count)
+    try:
+        calculate_rollup(db_session, user_id=USER_ID)
+    finally:
+        event.remove(bind, "before_cursor_execute", _count)
+    assert len([s for s in statements if "FROM entries" in s]) == 1
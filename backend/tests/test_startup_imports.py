@@ -0,0 +1,31 @@
+"""Booting the app must not load the optional heavy stacks (OpenAI SDK,
+Resend): they are imported on first use so every worker doesn't pay their
+import time and memory. Checked in a fresh interpreter, since this
+test process has long since imported everything."""
+import json
+import os
+import subprocess
+import sys
+
+from backend.scripts.startup_profile import DEFERRED, REPO_ROOT, profile_once
+
+
+def test_app_import_defers_heavy_optional_stacks(tmp_path):
+    result = profile_once(REPO_ROOT, f"sqlite:///{tmp_path / 'boot.db'}")
+    assert result["loaded"] == []
+    assert not set(DEFERRED) & set(result["packages_ms"])
+
+
+def test_deferred_stacks_load_on_first_use(tmp_path):
+    code = (
+        "import json, sys\n"
+        "from backend.services import ai_suggestions, email_service\n"
+        "email_service.resend_client()\n"
+        "ai_suggestions._api_key = 'sk-test'\n"
+        "ai_suggestions.get_client()\n"
+        f"print(json.dumps([m for m in {DEFERRED!r} if m in sys.modules]))\n"
+    )
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'boot.db'}", RESEND_API_KEY="")
+    out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=env,
+                         check=True, capture_output=True, text=True).stdout
+    assert json.loads(out.strip().splitlines()[-1]) == list(DEFERRED)
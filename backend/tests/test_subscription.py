@@ -406,9 +406,11 @@ def test_suggestions_route_rejects_free_user(setup, monkeypatch):
 
 def test_suggestions_route_allows_pro_user(setup, monkeypatch):
     client, _ = setup
-    monkeypatch.setattr(
-        suggestions, "get_ai_suggestions", lambda db, f, t, uid: {"suggestions": []}
-    )
+    async def fake_stored(db, uid):
+        return {"suggestions": []}
+
+    # No range: the route answers from the stored (precomputed) suggestion.
+    monkeypatch.setattr(suggestions, "stored_suggestions", fake_stored)
     _post(client, _event("INITIAL_PURCHASE"))
     assert client.get("/api/suggestions").status_code == 200
 
@@ -421,9 +423,11 @@ def test_suggestions_route_rest_verified_pro_user_allowed(setup, monkeypatch):
         return {"active": True, "expires_at": None}
 
     monkeypatch.setattr(revenuecat_service, "fetch_pro_entitlement", fake_fetch)
-    monkeypatch.setattr(
-        suggestions, "get_ai_suggestions", lambda db, f, t, uid: {"suggestions": []}
-    )
+    async def fake_stored(db, uid):
+        return {"suggestions": []}
+
+    # No range: the route answers from the stored (precomputed) suggestion.
+    monkeypatch.setattr(suggestions, "stored_suggestions", fake_stored)
     assert client.get("/api/suggestions").status_code == 200
 
 
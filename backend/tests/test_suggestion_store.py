@@ -0,0 +1,153 @@
+"""Precomputed suggestions: the nightly job stores an answer for every active
+Pro user (chunked, bounded concurrency, resumable), GET /api/suggestions
+without a range serves the stored row, and a material change in the user's
+orders queues one background refresh."""
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import worker
+from backend.db import Base
+from backend.entitlements import require_pro
+from backend.models import AppType, AuthUser, Entry, EntryType, Job, UserSuggestion
+from backend.routers import suggestions
+from backend.services import ai_suggestions, suggestion_store
+from backend.services.job_queue import JOB_QUEUED, JOB_REFRESH_SUGGESTION
+
+NOW = datetime.utcnow()
+
+
+def _orders(db, user_id, n, amount=10, days_ago=1):
+    for i in range(n):
+        db.add(Entry(user_id=user_id, timestamp=NOW - timedelta(days=days_ago, minutes=i),
+                     type=EntryType.ORDER, app=AppType.DOORDASH, amount=Decimal(str(amount))))
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch, pro_user):
+    engine = create_engine(f"sqlite:///{tmp_path / 'suggest.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = Session()
+    for i in range(5):
+        db.add(pro_user(f"pro-{i}"))
+        _orders(db, f"pro-{i}", i + 1)
+    db.add(pro_user("pro-empty"))
+    db.add(pro_user("pro-lapsed", expires_in_days=-1))
+    db.add(AuthUser(id="free", email="free@test.com", password_hash="x"))
+    _orders(db, "pro-lapsed", 3)
+    _orders(db, "free", 3)
+    # Outside the window: never part of the stored stats.
+    _orders(db, "pro-0", 4, days_ago=suggestion_store.SUGGESTIONS_WINDOW_DAYS + 2)
+    db.commit()
+    db.close()
+    monkeypatch.setattr(ai_suggestions, "_api_key", None)
+    monkeypatch.setattr(ai_suggestions, "_loop", None)
+    yield Session
+    engine.dispose()
+
+
+def test_precompute_covers_active_pro_users_in_bounded_chunks(sessions, monkeypatch):
+    monkeypatch.setattr(suggestion_store, "SUGGESTIONS_BATCH_SIZE", 3)
+    monkeypatch.setattr(suggestion_store, "SUGGESTIONS_PRECOMPUTE_CONCURRENCY", 2)
+    real_for = suggestion_store.suggestion_for
+    in_flight = peak = 0
+
+    async def slow_for(stats, user_id, *args):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return await real_for(stats, user_id, *args)
+
+    monkeypatch.setattr(suggestion_store, "suggestion_for", slow_for)
+    db = sessions()
+    result = asyncio.run(suggestion_store.precompute_suggestions(db, NOW))
+    assert result["users"] == 6 and result["chunks"] == 2 and result["no_data"] == 1
+    assert peak == 2
+
+    rows = {r.user_id: r for r in db.query(UserSuggestion)}
+    assert sorted(rows) == ["pro-0", "pro-1", "pro-2", "pro-3", "pro-4", "pro-empty"]
+    assert rows["pro-0"].orders == 1 and rows["pro-0"].revenue == Decimal("10")
+    assert rows["pro-4"].orders == 5 and rows["pro-4"].generated_at == NOW
+    assert rows["pro-empty"].orders == 0 and rows["pro-empty"].stats is None
+
+    # A retried run the same night finds everyone fresh and does nothing.
+    assert asyncio.run(suggestion_store.precompute_suggestions(db, NOW + timedelta(hours=1)))["users"] == 0
+
+
+@pytest.fixture
+def client_for(sessions, api_client):
+    """client_for(user_id): a TestClient for the suggestions route signed in
+    as `user_id`, and the session it uses."""
+    def make(user_id):
+        db = sessions()
+        return api_client(suggestions.router, user_id=user_id, session=db, auth=require_pro), db
+    return make
+
+
+def test_stored_answer_is_served_and_refreshed_on_material_change(sessions, client_for, monkeypatch, count_queries):
+    db = sessions()
+    asyncio.run(suggestion_store.precompute_suggestions(db, NOW))
+    client, db = client_for("pro-4")
+
+    async def no_live_answers(*args):
+        raise AssertionError("served from user_suggestions without a live answer")
+
+    monkeypatch.setattr(suggestion_store, "suggestion_for", no_live_answers)
+    with count_queries() as queries:
+        body = client.get("/api/suggestions").json()
+    assert body["total_orders"] == 5 and body["generated_at"].startswith(NOW.isoformat()[:19])
+    assert body["window_start"].startswith(suggestion_store.window_start(NOW).isoformat()[:19])
+    # The stored row plus one aggregate; no entry rows are loaded.
+    entry_reads = [q for q in queries.statements if "FROM entries" in q]
+    assert len(entry_reads) == 1 and "count(entries.id)" in entry_reads[0]
+
+    # One small order isn't material (+1 order, +4% revenue) ...
+    _orders(db, "pro-4", 1, amount=2, days_ago=0)
+    db.commit()
+    assert client.get("/api/suggestions").json()["total_orders"] == 5
+    assert db.query(Job).count() == 0
+
+    # ... five more orders is: the stored answer is still served, and one
+    # refresh is queued however often the screen is opened until it runs.
+    _orders(db, "pro-4", 5, days_ago=0)
+    db.commit()
+    assert client.get("/api/suggestions").json()["total_orders"] == 5
+    client.get("/api/suggestions")
+    jobs = db.query(Job).all()
+    assert [(j.kind, j.status) for j in jobs] == [(JOB_REFRESH_SUGGESTION, JOB_QUEUED)]
+
+    monkeypatch.setattr(suggestion_store, "suggestion_for", ai_suggestions.suggestion_for)
+    monkeypatch.setattr(worker, "SCHEDULES", [])
+    assert worker.run_one(sessions(), "w1")
+    db.expire_all()
+    assert client.get("/api/suggestions").json()["total_orders"] == 11
+    assert db.query(Job).filter(Job.status == JOB_QUEUED).count() == 0
+
+
+def test_first_request_without_stored_row_is_answered_live_and_stored(client_for):
+    client, db = client_for("pro-1")
+    body = client.get("/api/suggestions").json()
+    assert body["total_orders"] == 2 and body["reasoning"].endswith("(AI suggestions unavailable)")
+    assert db.get(UserSuggestion, "pro-1").orders == 2
+    # An explicit range still gets a live answer for that range.
+    ranged = client.get("/api/suggestions", params={"from_date": (NOW - timedelta(days=400)).isoformat()}).json()
+    assert ranged["total_orders"] == 2 and "generated_at" not in ranged
+
+
+def test_stale_stored_row_is_answered_live(sessions, client_for):
+    db = sessions()
+    asyncio.run(suggestion_store.precompute_suggestions(
+        db, NOW - timedelta(hours=suggestion_store.SUGGESTIONS_MAX_AGE_HOURS + 1)))
+    _orders(db, "pro-1", 3, days_ago=0)
+    db.commit()
+    client, db = client_for("pro-1")
+    body = client.get("/api/suggestions").json()
+    assert body["total_orders"] == 5
+    assert db.get(UserSuggestion, "pro-1").generated_at > NOW
@@ -0,0 +1,250 @@
+"""Concurrent platform sync: credentials fan out over one pooled client per
+platform with bounded concurrency, throttled / failing upstream calls are
+retried with backoff, and every run reports request and throughput stats.
+Exercised against a loopback stub of the Uber / Shipt order APIs. Each
+credential's orders are deduped and inserted in a constant number of
+statements."""
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.db import Base
+from backend.models import ApiCredential, AppType, AuthUser, Entry, EntryType, PlatformIntegration, SyncedOrder
+from backend.services import sync_service
+
+STUB_DELAY = 0.2
+
+
+class _StubPlatform(BaseHTTPRequestHandler):
+    """Behavior is keyed on the bearer token: `ok-*` answers after STUB_DELAY,
+    `throttled-*` answers 429 once, `down-*` always 500, `slow-*` never in time,
+    `hourly-*` (Uber) has one order per hour for the past week and honors the
+    requested start_time / end_time."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        token = self.headers["Authorization"].split()[-1]
+        with server.lock:
+            server.calls[token] = server.calls.get(token, 0) + 1
+            attempt = server.calls[token]
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+        try:
+            if token.startswith("throttled") and attempt == 1:
+                return self._send(429, {}, {"Retry-After": "0"})
+            if token.startswith("down"):
+                return self._send(500, {})
+            if token.startswith("hourly"):
+                query = parse_qs(urlparse(self.path).query)
+                start, end = int(query["start_time"][0]), int(query["end_time"][0])
+                now = int(time.time())
+                orders = [
+                    {"order_id": f"{token}-{h}", "fare": {"total_amount": 9}, "completed_at": now - h * 3600 - 60}
+                    for h in range(24 * 7)
+                ]
+                return self._send(200, {"orders": [o for o in orders if start <= o["completed_at"] <= end]})
+            time.sleep(5 if token.startswith("slow") else STUB_DELAY)
+            order = {"order_id": f"{token}-1"}
+            if self.path.startswith("/uber"):
+                order.update(fare={"total_amount": 12.5}, trip_distance=3, trip_duration=900,
+                             completed_at=int(datetime(2026, 5, 1, 12).timestamp()))
+                return self._send(200, {"orders": [order]})
+            order.update(payout=20, estimated_mileage=4, estimated_time=30,
+                         completed_at="2026-05-01T12:00:00")
+            return self._send(200, {"results": [order]})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubPlatform)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.calls, server.in_flight, server.peak = {}, 0, 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(sync_service.UberSyncService, "BASE_URL", f"{base}/uber")
+    monkeypatch.setattr(sync_service.ShiptSyncService, "BASE_URL", f"{base}/shipt")
+    monkeypatch.setattr(sync_service, "SYNC_BACKOFF_BASE_SECONDS", 0.01)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    session.statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: session.statements.append(statement))
+    yield session
+    session.close()
+
+
+def _credentials(db, tokens):
+    now = datetime.now(timezone.utc).isoformat()
+    for i, (platform, token) in enumerate(tokens):
+        user_id = f"sync-user-{i}"
+        db.add(AuthUser(id=user_id, email=f"{user_id}@test.com", password_hash="x",
+                        timezone="UTC", pro_entitlement_updated_at=now))
+        db.add(ApiCredential(user_id=user_id, platform=platform, access_token=token))
+    db.commit()
+
+
+def test_credentials_sync_concurrently_within_the_bound(stub, db, monkeypatch):
+    monkeypatch.setattr(sync_service, "SYNC_CONCURRENCY", 4)
+    tokens = [(PlatformIntegration.UBER if i % 2 else PlatformIntegration.SHIPT, f"ok-{i}") for i in range(12)]
+    _credentials(db, tokens)
+
+    stats = asyncio.run(sync_service.sync_all_platforms(db))
+
+    assert stats["credentials"] == 12 and stats["succeeded"] == 12 and stats["failed"] == 0
+    assert stats["orders_fetched"] == 12 and stats["entries_created"] == 12
+    assert stats["requests"] == 12 and stats["retries"] == 0
+    # 12 x 200 ms sequentially; 4 at a time is ~600 ms.
+    assert stats["duration_s"] < 12 * STUB_DELAY / 2
+    assert 1 < stub.peak <= 4
+    assert stats["request_p50_ms"] >= STUB_DELAY * 1000 * 0.9
+    assert db.query(Entry).count() == 12 and db.query(SyncedOrder).count() == 12
+    assert sync_service.last_sync_run_stats() == stats
+
+    # A second run fetches the same orders but creates nothing new.
+    again = asyncio.run(sync_service.sync_all_platforms(db))
+    assert again["orders_fetched"] == 12 and again["entries_created"] == 0
+
+
+def test_throttling_errors_and_timeouts_are_retried_then_isolated(stub, db, monkeypatch):
+    monkeypatch.setattr(sync_service, "SYNC_MAX_RETRIES", 2)
+    monkeypatch.setattr(sync_service, "SYNC_REQUEST_TIMEOUT_SECONDS", 0.3)
+    _credentials(db, [
+        (PlatformIntegration.UBER, "throttled-a"),
+        (PlatformIntegration.SHIPT, "down-b"),
+        (PlatformIntegration.UBER, "slow-c"),
+        (PlatformIntegration.SHIPT, "ok-d"),
+    ])
+
+    stats = asyncio.run(sync_service.sync_all_platforms(db))
+
+    assert stub.calls["throttled-a"] == 2 and stub.calls["down-b"] == 3 and stub.calls["slow-c"] == 3
+    assert stats["succeeded"] == 2 and stats["failed"] == 2
+    assert stats["throttled"] == 1 and stats["server_errors"] == 3 and stats["timeouts"] == 3
+    assert stats["retries"] == 1 + 2 + 2
+    assert stats["entries_created"] == 2
+    assert {e.order_id for e in db.query(Entry)} == {"throttled-a-1", "ok-d-1"}
+
+
+def test_retry_after_is_honored():
+    response = sync_service.httpx.Response(429, headers={"Retry-After": "7"})
+    assert sync_service._retry_delay(0, response) == 7.0
+    assert 0 < sync_service._retry_delay(3, None) <= sync_service.SYNC_BACKOFF_BASE_SECONDS * 8
+
+
+def _shipt_orders(ids):
+    return [{"order_id": f"s-{i}", "payout": 10 + i, "estimated_mileage": 2, "estimated_time": 25,
+             "completed_at": f"2026-05-{1 + i % 28:02d}T12:00:00"} for i in ids]
+
+
+def test_sync_orders_is_batched(db, monkeypatch):
+    monkeypatch.setattr(sync_service, "SYNC_BATCH_SIZE", 1000)
+    _credentials(db, [(PlatformIntegration.SHIPT, "batch")])
+    service = sync_service.ShiptSyncService("batch", "sync-user-0")
+    asyncio.run(service.sync_orders(db, _shipt_orders(range(3))))
+
+    # An order already entered by hand (e.g. a CSV import of the same export)
+    # is linked to that entry instead of duplicated.
+    db.add(Entry(user_id="sync-user-0", timestamp=datetime(2026, 5, 9, 12), type=EntryType.ORDER,
+                 app=AppType.SHIPT, order_id="s-7", amount=5))
+    db.commit()
+    manual_id = db.query(Entry.id).filter(Entry.order_id == "s-7").scalar()
+
+    db.statements.clear()
+    orders = _shipt_orders(range(200)) + _shipt_orders([5])
+    created = asyncio.run(service.sync_orders(db, orders))
+
+    assert len(created) == 196
+    writes = [s for s in db.statements if not s.lstrip().upper().startswith(("SELECT", "BEGIN", "COMMIT"))]
+    inserts = [s for s in writes if s.startswith("INSERT INTO entries") or s.startswith("INSERT INTO synced_orders")]
+    assert len(inserts) == 2
+    lookups = [s for s in db.statements if "FROM synced_orders" in s]
+    assert len(lookups) == 1
+    assert len(db.statements) < 15
+    assert db.query(Entry).count() == 200
+    assert db.query(SyncedOrder).count() == 200
+    assert db.query(SyncedOrder.entry_id).filter(SyncedOrder.platform_order_id == "s-7").scalar() == manual_id
+
+    # A re-run only pays the lookup.
+    db.statements.clear()
+    assert asyncio.run(service.sync_orders(db, orders)) == []
+    assert not any(s.startswith("INSERT") for s in db.statements)
+
+
+def test_incremental_windows_with_periodic_full_reconciliation(stub, db):
+    _credentials(db, [(PlatformIntegration.UBER, "hourly-a"), (PlatformIntegration.SHIPT, "down-b")])
+    cred = db.query(ApiCredential).filter(ApiCredential.access_token == "hourly-a").one()
+    down = db.query(ApiCredential).filter(ApiCredential.access_token == "down-b").one()
+
+    first = asyncio.run(sync_service.sync_all_platforms(db))
+    assert first["full_syncs"] == 2 and first["entries_created"] == 24 * 7
+    assert cred.sync_cursor_at is not None and cred.last_full_sync_at == cred.sync_cursor_at
+    assert down.sync_cursor_at is None  # failed fetches don't advance the watermark
+
+    # An hour later: only the last hour plus the overlap is fetched.
+    cred.sync_cursor_at -= timedelta(hours=1)
+    cred.last_full_sync_at -= timedelta(hours=1)
+    db.commit()
+    hourly = asyncio.run(sync_service.sync_all_platforms(db))
+    assert hourly["full_syncs"] == 1  # down-b never completed one
+    assert hourly["window_hours"] < 24 * 7 + 2
+    assert hourly["orders_fetched"] <= 2 and hourly["entries_created"] == 0
+
+    # Once the reconcile interval has passed the whole window is fetched again.
+    cred.last_full_sync_at -= timedelta(hours=sync_service.SYNC_FULL_RECONCILE_HOURS)
+    db.commit()
+    again = asyncio.run(sync_service.sync_all_platforms(db))
+    assert again["full_syncs"] == 2 and again["orders_fetched"] == 24 * 7
+
+    forced = asyncio.run(sync_service.sync_all_platforms(db, full=True))
+    assert forced["full_syncs"] == 2
+
+
+def test_sync_window_overlap_is_clamped_to_the_full_window():
+    now = datetime(2026, 5, 10, 12)
+    cred = ApiCredential(sync_cursor_at=now - timedelta(hours=1), last_full_sync_at=now - timedelta(hours=2))
+    start, full = sync_service.sync_window(cred, now)
+    assert not full
+    assert start == now - timedelta(hours=1, minutes=sync_service.SYNC_OVERLAP_MINUTES)
+
+    cred.sync_cursor_at = now - timedelta(days=30)
+    assert sync_service.sync_window(cred, now)[0] == now - timedelta(days=sync_service.SYNC_FULL_WINDOW_DAYS)
+    assert sync_service.sync_window(cred, now, full=True) == (now - timedelta(days=7), True)
@@ -0,0 +1,182 @@
+"""
+Background worker: runs queued jobs (platform order sync, precomputed AI
+suggestions) outside the web processes.
+
+    python -m backend.worker            # poll forever
+    python -m backend.worker --once     # enqueue due slots, drain, exit
+
+Each loop ticks the schedule — enqueuing the current slot of every periodic
+job, which the slot's dedup_key makes a no-op once any worker has done it —
+then claims and runs one job (see services/job_queue.py). Run as many workers
+as sync volume needs; they share the queue and never double-run a slot. The
+web app no longer runs any scheduler, so at least one worker must be deployed
+for platform sync and suggestion jobs to happen: the `worker` process in the
+Procfile, a second Railway service configured from railway.worker.json, or the
+background process start.sh launches next to the API.
+
+While a job runs, a heartbeat thread keeps extending its lease (see
+renew_lease), so a long sync isn't handed to a second worker mid-run; only a
+worker that stops heartbeating — crashed, killed — loses the job.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from backend.db import SessionLocal
+from backend.migrations import check_schema
+from backend.services.job_queue import (
+    JOB_PRECOMPUTE_SUGGESTIONS, JOB_REFRESH_SUGGESTION, JOB_SYNC_ORDERS,
+    claim_next, complete, enqueue, fail, job_lease_seconds, job_payload, purge_finished, renew_lease,
+)
+
+logger = logging.getLogger("backend.worker")
+
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+SYNC_INTERVAL_MINUTES = int(os.getenv("SYNC_INTERVAL_MINUTES", "60"))
+# Off-peak for US drivers: 09:00 UTC is 4-5 am Eastern.
+SUGGESTIONS_PRECOMPUTE_HOUR_UTC = int(os.getenv("SUGGESTIONS_PRECOMPUTE_HOUR_UTC", "9"))
+
+
+def run_sync_orders(db: Session, payload: dict) -> dict:
+    from backend.services.sync_service import sync_all_platforms
+    return asyncio.run(sync_all_platforms(db, full=payload.get("full", False), user_id=payload.get("user_id")))
+
+
+def run_precompute_suggestions(db: Session, payload: dict) -> dict:
+    from backend.services.suggestion_store import precompute_suggestions
+    return asyncio.run(precompute_suggestions(db))
+
+
+def run_refresh_suggestion(db: Session, payload: dict) -> dict:
+    from backend.services.suggestion_store import refresh_user_suggestion
+    asyncio.run(refresh_user_suggestion(db, payload["user_id"]))
+    return {"user_id": payload["user_id"]}
+
+
+JOB_HANDLERS = {
+    JOB_SYNC_ORDERS: run_sync_orders,
+    JOB_PRECOMPUTE_SUGGESTIONS: run_precompute_suggestions,
+    JOB_REFRESH_SUGGESTION: run_refresh_suggestion,
+}
+
+# (kind, interval in minutes, payload, offset in minutes) — one job per
+# interval slot; slots start `offset` minutes past each interval boundary.
+SCHEDULES = [
+    (JOB_SYNC_ORDERS, SYNC_INTERVAL_MINUTES, {}, 0),
+    (JOB_PRECOMPUTE_SUGGESTIONS, 24 * 60, {}, SUGGESTIONS_PRECOMPUTE_HOUR_UTC * 60),
+]
+
+
+def schedule_due_jobs(db: Session, now: datetime) -> int:
+    """Enqueue the current slot of every schedule; returns how many were new.
+    The tick that opens a new slot also deletes jobs past their retention
+    (purge_finished), so that runs once per slot, not on every poll."""
+    created = 0
+    for kind, minutes, payload, offset in SCHEDULES:
+        epoch_minutes = int((now - datetime(1970, 1, 1)).total_seconds() // 60) - offset
+        slot = datetime(1970, 1, 1) + timedelta(minutes=epoch_minutes - epoch_minutes % minutes + offset)
+        if enqueue(db, kind, payload, dedup_key=f"{kind}@{slot:%Y-%m-%dT%H:%M}", run_at=slot) is not None:
+            created += 1
+            logger.info(f"Scheduled {kind} for {slot:%Y-%m-%d %H:%M}")
+    if created:
+        purged = purge_finished(db, now)
+        if purged:
+            logger.info(f"Deleted {purged} finished jobs older than the retention period")
+    db.commit()
+    return created
+
+
+@contextmanager
+def _lease_heartbeat(db: Session, job, worker_id: str):
+    """Renew `job`'s lease from a side thread (its own session) while the
+    body runs, every third of the lease."""
+    lease_seconds = job_lease_seconds(job.kind)
+    done = threading.Event()
+
+    def beat():
+        while not done.wait(lease_seconds / 3):
+            try:
+                with Session(bind=db.get_bind()) as hb_db:
+                    if not renew_lease(hb_db, job.id, worker_id, lease_seconds):
+                        logger.warning(f"Job {job.id} ({job.kind}): lease lost, no longer renewing")
+                        return
+            except Exception:
+                # Transient (DB blip): the lease still has two thirds left.
+                logger.exception(f"Job {job.id} ({job.kind}): lease renewal failed")
+
+    thread = threading.Thread(target=beat, name=f"job-{job.id}-lease", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        done.set()
+        thread.join()
+
+
+def run_one(db: Session, worker_id: str) -> bool:
+    """Claim and run a single job. Returns False if nothing was runnable."""
+    job = claim_next(db, worker_id, JOB_HANDLERS)
+    if job is None:
+        return False
+    logger.info(f"Running job {job.id} ({job.kind}), attempt {job.attempts}/{job.max_attempts}")
+    try:
+        with _lease_heartbeat(db, job, worker_id):
+            result = JOB_HANDLERS[job.kind](db, job_payload(job))
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Job {job.id} ({job.kind}) failed")
+        fail(db, job, worker_id, f"{type(e).__name__}: {e}")
+    else:
+        if complete(db, job, worker_id, result):
+            logger.info(f"Job {job.id} ({job.kind}) done")
+    return True
+
+
+def run_worker(once: bool = False, worker_id: str = None, session_factory=SessionLocal,
+               stop: threading.Event = None) -> None:
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        db = session_factory()
+        try:
+            schedule_due_jobs(db, datetime.utcnow())
+            ran = run_one(db, worker_id)
+        except Exception:
+            # Queue unreachable (DB restart, network blip): keep polling.
+            logger.exception("Worker loop error")
+            ran = False
+        finally:
+            db.close()
+        if not ran:
+            if once:
+                return
+            stop.wait(JOB_POLL_SECONDS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run background jobs (platform order sync, suggestions).")
+    parser.add_argument("--once", action="store_true", help="drain runnable jobs and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    check_schema()
+
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        # Finish the job in hand, then exit; an unfinished job's lease expires
+        # and another worker picks it up.
+        signal.signal(sig, lambda *_: stop.set())
+    logger.info("Worker started")
+    run_worker(once=args.once, stop=stop)
+    logger.info("Worker stopped")
+
+
+if __name__ == "__main__":
+    main()
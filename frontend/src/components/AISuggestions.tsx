@@ -3,6 +3,8 @@ import { useQuery } from '@tanstack/react-query';
 import { api, SuggestionResponse } from '../lib/api';
 
 interface AISuggestionsProps {
+  // Omit both for the trailing-window tips precomputed nightly (served from
+  // the stored row); pass a range to get a live answer for that range.
   fromDate?: string;
   toDate?: string;
 }
@@ -13,16 +15,19 @@ interface TimeBreakdown {
   minOrderAmount: number;
 }
 
+// The API sends naive UTC timestamps.
+const parseUtc = (value: string) =>
+  new Date(/[zZ]|[+-]\d\d:\d\d$/.test(value) ? value : `${value}Z`);
+
 export function AISuggestions({ fromDate, toDate }: AISuggestionsProps) {
   const [expanded, setExpanded] = useState(false);
 
   const { data: suggestions, isLoading, error } = useQuery({
-    queryKey: ['suggestions', fromDate, toDate],
+    queryKey: ['suggestions', fromDate ?? null, toDate ?? null],
     queryFn: () => api.getSuggestions(fromDate, toDate),
     staleTime: 0,
     gcTime: 0,
     refetchOnMount: true,
-    enabled: !!fromDate && !!toDate,
   });
 
   // Calculate time breakdowns for different hourly rates
@@ -99,6 +104,13 @@ export function AISuggestions({ fromDate, toDate }: AISuggestionsProps) {
                       <span className="font-semibold">Peak:</span> {suggestions.peak_time}
                     </p>
                   )}
+                  {suggestions.generated_at && (
+                    <p className="text-gray-500">
+                      {suggestions.window_start &&
+                        `Since ${parseUtc(suggestions.window_start).toLocaleDateString(undefined, { month: 'short', day: 'numeric' })} • `}
+                      Updated {parseUtc(suggestions.generated_at).toLocaleString(undefined, { month: 'short', day: 'numeric', hour: 'numeric', minute: '2-digit' })}
+                    </p>
+                  )}
                 </div>
               </div>
             </div>
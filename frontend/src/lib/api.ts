@@ -106,6 +106,9 @@ export interface SuggestionResponse {
   average_order: number;
   total_orders: number;
   reasoning: string;
+  // Set when answered from the precomputed suggestion (no range requested).
+  generated_at?: string;
+  window_start?: string;
 }
 
 export const api = {
@@ -140,12 +143,12 @@ export const api = {
     return res.json();
   },
 
-  async getEntries(timeframe?: string, dayOffset?: number, limit = 100, cursor?: number): Promise<Entry[]> {
+  async getEntries(timeframe?: string, dayOffset?: number, limit = 100, cursor?: string): Promise<Entry[]> {
     const params = new URLSearchParams();
     if (timeframe) params.append('timeframe', timeframe);
     if (dayOffset !== undefined && dayOffset !== 0) params.append('day_offset', dayOffset.toString());
     params.append('limit', limit.toString());
-    if (cursor) params.append('cursor', cursor.toString());
+    if (cursor) params.append('cursor', cursor);
     
     const res = await fetch(`${API_BASE}/api/entries?${params}`, {
       headers: getAuthHeaders(),
@@ -1055,55 +1055,10 @@ export function Dashboard({}: DashboardProps) {
         </div>
 
         <div>
-          {/* Only show AI suggestions if there is data */}
-          {entries.length > 0 && (() => {
-              let fromDate = '';
-              let toDate = '';
-              
-              const now = new Date();
-              const startOfDay = (date: Date) => {
-                const d = new Date(date);
-                d.setHours(0, 0, 0, 0);
-                return d;
-              };
-              const endOfDay = (date: Date) => {
-                const d = new Date(date);
-                d.setHours(23, 59, 59, 999);
-                return d;
-              };
-              
-              if (period === 'today' || period === 'yesterday') {
-                const offset = period === 'today' ? dayOffset : -1;
-                const targetDay = new Date(now);
-                targetDay.setDate(targetDay.getDate() + offset);
-                fromDate = startOfDay(targetDay).toISOString();
-                toDate = endOfDay(targetDay).toISOString();
-              } else if (period === 'week') {
-                const weekStart = new Date(now);
-                weekStart.setDate(weekStart.getDate() - weekStart.getDay());
-                fromDate = startOfDay(weekStart).toISOString();
-                toDate = endOfDay(now).toISOString();
-              } else if (period === 'last7') {
-                const last7 = new Date(now);
-                last7.setDate(last7.getDate() - 6);
-                fromDate = startOfDay(last7).toISOString();
-                toDate = endOfDay(now).toISOString();
-              } else if (period === 'month') {
-                const monthStart = new Date(now.getFullYear(), now.getMonth(), 1);
-                fromDate = startOfDay(monthStart).toISOString();
-                toDate = endOfDay(now).toISOString();
-              } else if (period === 'lastMonth') {
-                const lastMonthStart = new Date(now.getFullYear(), now.getMonth() - 1, 1);
-                const lastMonthEnd = new Date(now.getFullYear(), now.getMonth(), 0);
-                fromDate = startOfDay(lastMonthStart).toISOString();
-                toDate = endOfDay(lastMonthEnd).toISOString();
-              } else {
-                fromDate = startOfDay(now).toISOString();
-                toDate = endOfDay(now).toISOString();
-              }
-              
-              return <AISuggestions fromDate={fromDate} toDate={toDate} />;
-            })()}
+          {/* Only show AI suggestions if there is data. They cover the trailing
+              window precomputed nightly, not the selected period: a per-period
+              range would be answered live (an LLM call) on every view. */}
+          {entries.length > 0 && <AISuggestions />}
           </div>
 
         {selectedIds.length > 0 && (
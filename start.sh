@@ -6,9 +6,17 @@ echo "Starting Delivery Driver Earnings Dashboard..."
 # Get PORT from environment, default to 8000
 PORT=${PORT:-8000}
 
-# Initialize database if needed
-echo "Initializing database..."
-python -c "from backend.db import Base, engine; Base.metadata.create_all(bind=engine)" || true
+# Apply pending schema migrations once, before any process starts; the API
+# and the worker only check the schema is current.
+echo "Migrating database..."
+python -m backend.migrations
+
+# Background jobs (platform sync, precomputed suggestions) run in their own
+# process; the API doesn't run them. Stopped when the API exits.
+echo "Starting background worker..."
+python -m backend.worker &
+WORKER_PID=$!
+trap 'kill $WORKER_PID 2>/dev/null || true' EXIT
 
 # Start backend API with frontend static files
 echo "Starting backend API on port $PORT..."